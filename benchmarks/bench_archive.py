@@ -0,0 +1,110 @@
+"""
+Бенчмарк архива страниц (page_archive) на страницах синтетического сайта банка (см. fake_site).
+
+Сравнивается, сколько времени сохранение одной страницы занимает у сканера (в асинхронных
+сканерах всё это время стоит цикл событий), сколько места страницы занимают на диске
+и как быстро достаётся одна страница:
+- как было: print(content, file=open("exception.html", "a")) на каждую страницу;
+- PageArchive: очередь и фоновый поток, сжатые сегменты WARC с индексом.
+Запуск из корня репозитория:
+
+    python benchmarks/bench_archive.py --pages 5000 --page-kb 40
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "parsers"))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_site import FakeSiteServer  # noqa: E402
+from page_archive import ArchiveReader, PageArchive, read_segment  # noqa: E402
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def paced(pages: list[tuple[str, str]], rate: float | None):
+    """Страницы с темпом сканера: rate страниц в секунду (None - без пауз)."""
+    started = time.perf_counter()
+    for number, page in enumerate(pages):
+        if rate:
+            time.sleep(max(0.0, started + number / rate - time.perf_counter()))
+        yield page
+
+
+def bench_old(pages: list[tuple[str, str]], path: str, rate: float | None) -> dict:
+    waits = []
+    started = time.perf_counter()
+    for _, content in paced(pages, rate):
+        put_started = time.perf_counter()
+        print(content + "\n\n\n", file=open(path, "a", encoding="utf-8"))
+        waits.append(time.perf_counter() - put_started)
+    return {"waits": waits, "seconds": time.perf_counter() - started, "bytes": os.path.getsize(path)}
+
+
+def bench_archive(pages: list[tuple[str, str]], path: str, segment_size: int, rate: float | None) -> dict:
+    archive = PageArchive(path, segment_size)
+    headers = {"Content-Type": "text/html; charset=utf-8", "Server": "nginx"}
+    waits = []
+    started = time.perf_counter()
+    for url, content in paced(pages, rate):
+        put_started = time.perf_counter()
+        archive.put(url, url, 200, headers, content, {"User-Agent": "bench"})
+        waits.append(time.perf_counter() - put_started)
+    archive.close()
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in archive.segments)
+    return {"waits": waits, "seconds": time.perf_counter() - started, "bytes": size, "archive": archive}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--page-kb", type=float, default=40, help="Вес страницы, КБ")
+    parser.add_argument("--segment-mb", type=float, default=64, help="Размер сегмента архива, МБ")
+    parser.add_argument("--lookups", type=int, default=1000, help="Сколько страниц достать из архива")
+    parser.add_argument("--rate", type=float, nargs="+", default=[200, 0],
+                        help="Страниц в секунду от сканера (0 - без пауз, запись упирается в сжатие)")
+    args = parser.parse_args()
+
+    site = FakeSiteServer(size=args.pages, page_bytes=int(args.page_kb * 1024))
+    pages = [(f"https://www.bank.ru/p/{page}/", site.render_page(page).decode("utf-8")) for page in range(args.pages)]
+    raw = sum(len(content.encode("utf-8")) for _, content in pages)
+    directory = tempfile.mkdtemp()
+    print(f"Страниц {len(pages)}, {raw / 1024 ** 2:.1f} МБ HTML")
+
+    print(f"{'вариант':<22} | {'стр/с':>5} | {'ожидание p50, мс':>16} | {'p99, мс':>8} | {'всего, с':>8} | "
+          f"{'на диске, МБ':>12}")
+    for rate in args.rate:
+        old = bench_old(pages, os.path.join(directory, f"exception-{rate}.html"), rate)
+        new = bench_archive(pages, os.path.join(directory, f"archive-{rate}"), int(args.segment_mb * 1024 ** 2),
+                            rate)
+        for title, result in (("print в exception.html", old), ("PageArchive", new)):
+            print(f"{title:<22} | {rate or '-':>5} | {percentile(result['waits'], 0.5) * 1000:>16.3f} | "
+                  f"{percentile(result['waits'], 0.99) * 1000:>8.3f} | {result['seconds']:>8.2f} | "
+                  f"{result['bytes'] / 1024 ** 2:>12.1f}")
+    print(new["archive"].summary())
+
+    reader = ArchiveReader(new["archive"].path)
+    rng = random.Random(1)
+    urls = [rng.choice(pages)[0] for _ in range(args.lookups)]
+    started = time.perf_counter()
+    found = sum(reader.get(url) is not None for url in urls)
+    elapsed = time.perf_counter() - started
+    print(f"ArchiveReader.get: {elapsed / len(urls) * 1000:.2f} мс на страницу (найдено {found} из {len(urls)})")
+    segment = os.path.join(reader.path, new["archive"].segments[0])
+    started = time.perf_counter()
+    records = sum(1 for _ in read_segment(segment))
+    elapsed = time.perf_counter() - started
+    print(f"Без индекса - распаковать сегмент целиком: {elapsed * 1000:.0f} мс ({records} записей)")
+    reader.close()
+
+
+if __name__ == '__main__':
+    main()
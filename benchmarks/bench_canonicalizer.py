@@ -0,0 +1,127 @@
+"""
+Бенчмарк канонизации URL (url_canonicalizer) на миллионах ссылок: старая обработка ссылки
+(urlparse в extract_crawlable_links, в проверке домена и в URL, отбрасывание URL с "?", "#", "&")
+против UrlCanonicalizer - скорость и сколько разных адресов попадает в очередь.
+
+Ссылки похожи на ссылки сайта банка: на каждой странице меню из одних и тех же ссылок
+и ссылки на материалы, часть - в другом регистре, с портом по умолчанию, "./", якорем,
+utm-метками или номером страницы списка (PAGEN_1). Известно, сколько за ними на самом деле
+разных страниц. Запуск из корня репозитория:
+
+    python benchmarks/bench_canonicalizer.py --links 2000000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import urljoin, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers"))
+
+from link_extractor import is_url_file  # noqa: E402
+from url_canonicalizer import UrlCanonicalizer  # noqa: E402
+
+BASE_DOMAIN = "www.bank.ru"
+OLD_EXCLUDED_CHARS = ("%", "#", "&", "?", "@", "=")
+_OLD_FILE_EXTENSION_RE = re.compile(r'\.[a-zA-Z0-9]{2,6}$')
+
+
+def generate_links(count: int, pages: int, seed: int = 1) -> tuple[list[tuple[str, str]], int]:
+    """Пары (ссылка, страница, на которой она найдена) и число разных страниц за ссылками."""
+    rng = random.Random(seed)
+    menu = [f"/{section}/" for section in ("cards", "deposits", "mortgage", "business", "about", "offices")]
+    menu += [f"/{section}/{item}/" for section in ("cards", "deposits") for item in range(30)]
+    links: list[tuple[str, str, str | None]] = []  # (ссылка, страница с ней, куда ведёт на самом деле)
+    while len(links) < count:
+        page_url = f"https://{BASE_DOMAIN}/news/{rng.randrange(pages)}/"
+        links.extend((path, page_url, path) for path in menu)
+        for _ in range(20):
+            page = rng.randrange(pages)
+            path, variant = f"/news/{page}/", rng.random()
+            if variant < 0.05:
+                links.append((f"HTTPS://WWW.Bank.RU:443{path}", page_url, path))
+            elif variant < 0.10:
+                links.append((f"./../{page}/", page_url, path))
+            elif variant < 0.15:
+                links.append((f"{path}#comments", page_url, path))
+            elif variant < 0.25:
+                links.append((f"{path}?utm_source=mail&utm_campaign=promo{rng.randrange(5)}", page_url, path))
+            elif variant < 0.30:
+                path = f"/news/?PAGEN_1={rng.randrange(2, 50)}"
+                links.append((path, page_url, path))
+            else:
+                links.append((path, page_url, path))
+        links.append(("mailto:info@bank.ru", page_url, None))
+        links.append((f"https://partner.ru/offer/{rng.randrange(100)}", page_url, None))
+        links.append(("/docs/tariffs.pdf", page_url, None))
+    links = links[:count]
+    targets = {target for _, _, target in links if target is not None}
+    return [(href, page_url) for href, page_url, _ in links], len(targets)
+
+
+def old_pipeline(links: list[tuple[str, str]]) -> set[str]:
+    """Как было: urlparse при нормализации, при проверке домена, в is_url_file и в URL.__init__."""
+    accepted = set()
+    for href, page_url in links:
+        url_str = urlparse(urljoin(page_url, href).strip()).geturl()
+        if (
+                not url_str.startswith("http") or
+                urlparse(url_str).netloc != BASE_DOMAIN or
+                any(char in url_str for char in OLD_EXCLUDED_CHARS)
+        ):
+            continue
+        if _OLD_FILE_EXTENSION_RE.search(urlparse(url_str).path.rstrip("/")):
+            continue
+        accepted.add(urlparse(url_str.strip()).geturl())  # URL.__init__
+    return accepted
+
+
+def new_pipeline(links: list[tuple[str, str]], canonicalizer: UrlCanonicalizer) -> set[str]:
+    accepted = set()
+    for href, page_url in links:
+        url_str = canonicalizer.canonicalize(urljoin(page_url, href))
+        if url_str is None or canonicalizer.host(url_str) != BASE_DOMAIN or is_url_file(url_str):
+            continue
+        accepted.add(url_str)
+    return accepted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--links", type=int, default=2_000_000)
+    parser.add_argument("--pages", type=int, default=200_000, help="Сколько разных материалов на сайте")
+    args = parser.parse_args()
+
+    links, true_pages = generate_links(args.links, args.pages)
+    print(f"Ссылок: {len(links)}, разных страниц за ними: {true_pages}")
+
+    started = time.perf_counter()
+    joined = [urljoin(page_url, href) for href, page_url in links]
+    join_seconds = time.perf_counter() - started
+    print(f"urljoin (одинаков для обоих вариантов): {len(links) / join_seconds:,.0f} ссылок/с")
+
+    no_cache = type("NoCacheCanonicalizer", (UrlCanonicalizer,), {"CACHE_SIZE": 0})()
+    variants = [
+        ("urlparse + отбрасывание ?#&", lambda: old_pipeline(links)),
+        ("UrlCanonicalizer без кэша", lambda: new_pipeline(links, no_cache)),
+        ("UrlCanonicalizer", lambda: new_pipeline(links, UrlCanonicalizer())),
+    ]
+    print(f"{'вариант':<28} | {'ссылок/с':>10} | {'секунд':>7} | {'разных адресов':>15}")
+    for title, run in variants:
+        started = time.perf_counter()
+        accepted = run()
+        elapsed = time.perf_counter() - started
+        print(f"{title:<28} | {len(links) / elapsed:>10,.0f} | {elapsed:>7.2f} | {len(accepted):>15}")
+
+    canonicalizer = UrlCanonicalizer()
+    unique = {canonicalizer.canonicalize(url) for url in joined} - {None}
+    started = time.perf_counter()
+    traps = sum(canonicalizer.trap_reason(url) is not None for url in unique)
+    elapsed = time.perf_counter() - started
+    print(f"trap_reason: {len(unique) / elapsed:,.0f} адресов/с (ловушек {traps} из {len(unique)})")
+
+
+if __name__ == '__main__':
+    main()
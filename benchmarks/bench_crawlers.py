@@ -0,0 +1,211 @@
+"""
+Воспроизводимый бенчмарк сканеров на локальном синтетическом сайте банка (см. fake_site):
+без обращения к настоящим сайтам, с одинаковым сайтом от запуска к запуску.
+
+Каждый сканер запускается в отдельном процессе, чтобы CPU и пиковая память относились только
+к нему. Результат - JSON: параметры сайта, коммит и для каждого движка страниц в секунду,
+p50/p99 времени запроса страницы, время этапов (см. crawl_metrics), CPU и пиковый RSS.
+С --compare печатается сравнение с результатом прошлого запуска (например, другого коммита).
+Запуск из корня репозитория:
+
+    python benchmarks/bench_crawlers.py --pages 500 --latency 0.02 --error-rate 0.02 --js-rate 0.1 \\
+        --output bench.json
+    python benchmarks/bench_crawlers.py --engines static async-static --compare bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+PARSERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers")
+sys.path.insert(0, PARSERS_DIR)
+
+from fake_site import FakeSiteServer  # noqa: E402
+
+ENGINES = ("static", "async-static", "dynamic", "hybrid")
+STAGES = ("queue", "pacing", "connect", "ttfb", "fetch", "navigation", "readiness", "inner_html", "parse",
+          "fingerprint")
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def resource_usage() -> dict:
+    """CPU и пиковый RSS этого процесса и дождавшихся его дочерних (браузер, пул разбора)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"cpu_seconds": None, "peak_rss_mib": None, "children_cpu_seconds": None}
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    rss_unit = 1 if sys.platform == "darwin" else 1024  # ru_maxrss: байты на macOS, КиБ на Linux
+    return {
+        "cpu_seconds": round(own.ru_utime + own.ru_stime, 3),
+        "peak_rss_mib": round(own.ru_maxrss * rss_unit / 1024 ** 2, 1),
+        "children_cpu_seconds": round(children.ru_utime + children.ru_stime, 3),
+    }
+
+
+def create_scanner(engine: str, url: str, delay: float):
+    """Сканер движка с настройками для замера: без пауз, без кэша, без печати итогов по ходу."""
+    if engine == "static":
+        from site_crawler import DomainScanner
+    elif engine == "async-static":
+        from async_static_crawler import DomainScanner
+    elif engine == "dynamic":
+        from async_dynamic_crawler import DomainScanner
+    else:
+        from hybrid_crawler import DomainScanner
+    settings = {"DELAY": delay, "STATS_INTERVAL": None, "HTTP_CACHE_DIR": None, "SITEMAP_SEED": False}
+    return type("BenchScanner", (DomainScanner,), settings)(url)
+
+
+def run_engine(engine: str, url: str, concurrency: int, delay: float) -> dict:
+    """Один замер в текущем процессе (вызывается в дочернем процессе через --run-one)."""
+    os.chdir(tempfile.mkdtemp())  # Выгрузка и состояние сканирования пишутся относительно текущей папки
+    scanner = create_scanner(engine, url, delay)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):  # В stdout - только результат
+        if engine == "static":
+            scanner.start()
+        elif engine == "async-static":
+            asyncio.run(scanner.start(concurrency))
+        else:
+            asyncio.run(scanner.start(concurrency, headless=True))
+    elapsed = time.perf_counter() - started
+
+    latencies, errors = [], 0
+    with open(scanner._output_prefix() + ".jsonl", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            errors += record["error"] is not None
+            if record["elapsed"] is not None:
+                latencies.append(record["elapsed"])
+    stages = {}
+    for stage in STAGES:
+        histogram = scanner.metrics.stages.get(stage)
+        if histogram is not None and histogram.count:
+            stages[stage] = {"p50": round(histogram.quantile(0.5), 4), "p99": round(histogram.quantile(0.99), 4),
+                             "count": histogram.count}
+    return {
+        "engine": engine,
+        "pages": scanner.results_count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(scanner.results_count / elapsed, 2),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p99": percentile(latencies, 0.99),
+        "bytes": scanner.metrics.bytes,
+        "stages": stages,
+        **resource_usage(),
+    }
+
+
+def run_in_subprocess(engine: str, url: str, concurrency: int, delay: float, timeout: float) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--run-one", engine, "--url", url,
+               "--concurrency", str(concurrency), "--delay", str(delay)]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"engine": engine, "error": f"timeout {timeout} s"}
+    if completed.returncode != 0 or not completed.stdout.strip():
+        lines = completed.stderr.strip().splitlines() or ["нет вывода"]
+        # Строка с исключением, а не последняя: Playwright дописывает после неё рамку с подсказкой
+        error = next((line for line in reversed(lines) if re.match(r"[\w.]+(Error|Exception)\b", line)), lines[-1])
+        return {"engine": engine, "error": error[:300]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=PARSERS_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(report: dict, baseline: dict | None) -> None:
+    previous = {run["engine"]: run for run in (baseline or {}).get("runs", []) if "error" not in run}
+    print(f"{'engine':<13} | {'pages':>6} | {'err':>4} | {'pages/s':>8} | {'p50 ms':>7} | {'p99 ms':>7} | "
+          f"{'cpu s':>6} | {'rss MiB':>7}")
+    for run in report["runs"]:
+        if "error" in run:
+            print(f"{run['engine']:<13} | ошибка: {run['error']}")
+            continue
+        p50, p99 = (run[key] * 1000 if run[key] is not None else float("nan") for key in ("latency_p50", "latency_p99"))
+        line = (f"{run['engine']:<13} | {run['pages']:>6} | {run['errors']:>4} | {run['pages_per_sec']:>8.1f} | "
+                f"{p50:>7.1f} | {p99:>7.1f} | {run['cpu_seconds'] or 0:>6.2f} | {run['peak_rss_mib'] or 0:>7.1f}")
+        old = previous.get(run["engine"])
+        if old is not None:
+            line += f" | {run['pages_per_sec'] / old['pages_per_sec'] - 1:+.0%} pages/s к {baseline.get('commit')}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=["static", "dynamic"])
+    parser.add_argument("--pages", type=int, default=500, help="Размер сайта")
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=None, help="Глубина дерева страниц")
+    parser.add_argument("--nav-links", type=int, default=10, help="Ссылок общего меню на каждой странице")
+    parser.add_argument("--page-kb", type=float, default=40, help="Вес страницы, КБ")
+    parser.add_argument("--latency", type=float, default=0.01, help="Задержка ответа сайта, секунд")
+    parser.add_argument("--redirect-rate", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--js-rate", type=float, default=0.0, help="Доля ссылок, которые рисует JavaScript")
+    parser.add_argument("--concurrency", type=int, default=8, help="Вкладок или одновременных запросов")
+    parser.add_argument("--delay", type=float, default=0.0, help="DomainScanner.DELAY на время замера")
+    parser.add_argument("--timeout", type=float, default=900, help="Предел на один замер, секунд")
+    parser.add_argument("--output", help="Куда записать результат (JSON)")
+    parser.add_argument("--compare", help="Результат прошлого запуска (JSON) для сравнения")
+    parser.add_argument("--run-one", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_engine(args.run_one, args.url, args.concurrency, args.delay)))
+        return
+
+    server = FakeSiteServer(
+        size=args.pages, fanout=args.fanout, max_depth=args.depth, nav_links=args.nav_links,
+        page_bytes=int(args.page_kb * 1024), latency=args.latency, redirect_rate=args.redirect_rate,
+        error_rate=args.error_rate, js_rate=args.js_rate,
+    ).start_background()
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "site": server.settings,
+        "concurrency": args.concurrency,
+        "delay": args.delay,
+        "runs": [],
+    }
+    for engine in args.engines:
+        report["runs"].append(run_in_subprocess(engine, server.root_url, args.concurrency, args.delay, args.timeout))
+    server.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результат записан в {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Бенчмарк распределённого сканирования (distributed_crawl): как растёт скорость с числом обработчиков.
+
+Несколько синтетических сайтов банков (см. fake_site) работают в отдельном процессе, чтобы сервер
+не делил GIL ни с координатором, ни с обработчиками. Для каждого числа обработчиков сканирование
+запускается с нуля в отдельной папке; печатается скорость, ускорение относительно первого варианта
+и эффективность (ускорение / число обработчиков). Ускорение упирается в число ядер машины:
+на одном ядре обработчики делят одно и то же CPU. Запуск из корня репозитория:
+
+    python benchmarks/bench_distributed.py --sites 16 --pages 400 --workers 1 2 4 --latency 0.05
+"""
+import argparse
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "parsers"))
+sys.path.insert(0, BENCH_DIR)
+
+from distributed_crawl import CrawlCoordinator  # noqa: E402
+from fake_site import FakeSiteServer  # noqa: E402
+
+
+def serve_sites(count: int, settings: dict, urls: multiprocessing.Queue) -> None:
+    """Процесс с сайтами: отдаёт их адреса через очередь и работает, пока его не остановят."""
+    servers = [FakeSiteServer(**settings).start_background() for _ in range(count)]
+    urls.put([server.root_url for server in servers])
+    while True:
+        time.sleep(3600)
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """Глушит stdout на уровне дескриптора: его наследуют и процессы-обработчики."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def crawled_pages() -> int:
+    """Сколько разных страниц в выгрузках всех доменов (crawl_output)."""
+    pages = 0
+    for path in glob.glob(os.path.join("data", "crawled", "*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            pages += len({json.loads(line)["url"] for line in f})
+    return pages
+
+
+def run(sites: list[str], workers: int, engine: str, concurrency: int, per_domain: int) -> dict:
+    os.chdir(tempfile.mkdtemp())  # Общая очередь, выгрузка и история пишутся относительно текущей папки
+    coordinator = CrawlCoordinator(
+        sites, engine=engine, workers=workers, max_concurrency=concurrency, per_domain_concurrency=per_domain,
+        scanner_settings={"DELAY": 0, "STATS_INTERVAL": None, "SITEMAP_SEED": False, "HTTP_CACHE_DIR": None},
+    )
+    coordinator.MONITOR_INTERVAL = 0.5
+    started = time.perf_counter()
+    with quiet_stdout():
+        coordinator.start()
+    elapsed = time.perf_counter() - started
+    pages = crawled_pages()
+    return {"workers": workers, "pages": pages, "seconds": round(elapsed, 2),
+            "pages_per_sec": round(pages / elapsed, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=16, help="Сколько доменов")
+    parser.add_argument("--pages", type=int, default=400, help="Страниц на каждом сайте")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа сайта, секунд")
+    parser.add_argument("--page-kb", type=float, default=20, help="Вес страницы, КБ")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--engine", default="async-static", choices=("static", "async-static", "dynamic", "hybrid"))
+    parser.add_argument("--concurrency", type=int, default=8, help="Страниц одновременно в одном обработчике")
+    parser.add_argument("--per-domain", type=int, default=2, help="Страниц одного домена одновременно")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    urls = context.Queue()
+    settings = {"size": args.pages, "fanout": 5, "nav_links": 5, "latency": args.latency,
+                "page_bytes": int(args.page_kb * 1024)}
+    server = context.Process(target=serve_sites, args=(args.sites, settings, urls), daemon=True)
+    server.start()
+    sites = urls.get()
+    print(f"Сайтов {len(sites)} по {args.pages} стр., задержка ответа {args.latency * 1000:.0f} мс, "
+          f"движок {args.engine}, ядер {os.cpu_count()}")
+
+    print(f"{'обработчиков':>12} | {'страниц':>7} | {'секунд':>7} | {'стр/с':>7} | {'ускорение':>9} | "
+          f"{'эффективность':>13}")
+    base = None
+    try:
+        for workers in args.workers:
+            result = run(sites, workers, args.engine, args.concurrency, args.per_domain)
+            base = base or result["pages_per_sec"]
+            speedup = result["pages_per_sec"] / base
+            print(f"{workers:>12} | {result['pages']:>7} | {result['seconds']:>7.2f} | "
+                  f"{result['pages_per_sec']:>7.1f} | {speedup:>8.2f}x | {speedup / workers * args.workers[0]:>12.0%}")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Бенчмарк диспетчеризации async_dynamic_crawler: страниц в секунду при 1, 8 и 32 вкладках
+на локальном фейковом сайте. Запуск из корня репозитория:
+
+    python benchmarks/bench_dynamic_dispatch.py --pages 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers"))
+
+from async_dynamic_crawler import DomainScanner  # noqa: E402
+from fake_site import FakeSiteServer  # noqa: E402
+
+
+async def run_once(root_url: str, tabs: int) -> tuple[int, float]:
+    scanner = DomainScanner(root_url)
+    started = time.perf_counter()
+    await scanner.start(tabs, headless=True)
+    return scanner.scanned_count, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300, help="Размер фейкового сайта")
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--delay", type=float, default=DomainScanner.DELAY, help="DomainScanner.DELAY на время замера")
+    args = parser.parse_args()
+
+    DomainScanner.DELAY = args.delay
+    server = FakeSiteServer(size=args.pages, fanout=args.fanout).start_background()
+
+    os.chdir(tempfile.mkdtemp())  # _save_data пишет в data/crawled относительно текущей папки
+    print(f"{'tabs':>5} | {'pages':>6} | {'seconds':>8} | {'pages/sec':>9}")
+    for tabs in args.tabs:
+        pages, elapsed = asyncio.run(run_once(server.root_url, tabs))
+        print(f"{tabs:>5} | {pages:>6} | {elapsed:>8.2f} | {pages / elapsed:>9.1f}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
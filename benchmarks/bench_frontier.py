@@ -0,0 +1,101 @@
+"""
+Бенчмарк очереди URL (crawl_frontier) на синтетическом сайте банка (см. fake_site) с большим
+архивом новостей в общем меню и страницами тарифов в глубине дерева.
+
+Сайт сканируется async_static_crawler с бюджетом MAX_PAGES - как ночное окно, в которое
+помещается только часть сайта: сколько страниц тарифов и сколько новостей успевает попасть
+в выгрузку при обходе в ширину (fifo) и по приоритету (priority). Затем - цена приоритета:
+сколько стоит _url_priority и очередь с кучей против deque. Запуск из корня репозитория:
+
+    python benchmarks/bench_frontier.py --pages 3000 --news 5000 --budget 500 --latency 0.005
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "parsers"))
+sys.path.insert(0, BENCH_DIR)
+
+from async_static_crawler import DomainScanner  # noqa: E402
+from crawl_frontier import FifoFrontier, PriorityFrontier  # noqa: E402
+from crawl_url import URL  # noqa: E402
+from fake_site import FakeSiteServer  # noqa: E402
+
+
+def section(url: str) -> str:
+    return url.split("/", 4)[3]  # http://127.0.0.1:port/<раздел>/...
+
+
+def crawl(url: str, frontier: str, budget: int | None, concurrency: int) -> dict:
+    os.chdir(tempfile.mkdtemp())  # Выгрузка и состояние сканирования пишутся относительно текущей папки
+    settings = {"DELAY": 0, "STATS_INTERVAL": None, "HTTP_CACHE_DIR": None, "SITEMAP_SEED": False,
+                "FRONTIER": frontier, "MAX_PAGES": budget}
+    scanner = type("BenchScanner", (DomainScanner,), settings)(url)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(scanner.start(concurrency))
+    elapsed = time.perf_counter() - started
+    with open(scanner._output_prefix() + ".jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    pages = collections.Counter(section(record["url"]) for record in records if record["error"] is None)
+    return {"pages": sum(pages.values()), "sections": pages, "seconds": elapsed}
+
+
+def bench_priority_cost(server: FakeSiteServer, urls: int) -> None:
+    scanner = type("BenchScanner", (DomainScanner,), {"CHECKPOINT": False})(server.root_url)
+    root = URL(server.root_url)
+    paths = ("/p/{}/", "/news/2019/{}/", "/tariffs/{}/", "/news/?page={}", "/branches/{}/atm/3/")
+    url_objs = [URL(f"http://127.0.0.1:1{paths[n % len(paths)].format(n)}", parent=root) for n in range(urls)]
+    anchors = ["Тарифы и условия", "Новость", "Подробнее", "", "Кредит наличными"]
+
+    started = time.perf_counter()
+    priorities = [scanner._url_priority(url_obj, anchors[n % len(anchors)]) for n, url_obj in enumerate(url_objs)]
+    elapsed = time.perf_counter() - started
+    print(f"_url_priority: {urls / elapsed:,.0f} URL/с")
+
+    for frontier_cls in (FifoFrontier, PriorityFrontier):
+        frontier = frontier_cls()
+        started = time.perf_counter()
+        for url_obj, priority in zip(url_objs, priorities):
+            frontier.push(url_obj, priority)
+        while frontier:
+            frontier.popleft()
+        elapsed = time.perf_counter() - started
+        print(f"{frontier_cls.__name__}: {urls / elapsed:,.0f} URL/с (push + popleft)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=3000, help="Страниц в дереве /p/<n>/")
+    parser.add_argument("--news", type=int, default=5000, help="Новостей в архиве /news/")
+    parser.add_argument("--tariff-rate", type=float, default=0.05, help="Доля страниц дерева со ссылкой на тарифы")
+    parser.add_argument("--budget", type=int, nargs="+", default=[500, 1500], help="MAX_PAGES на домен")
+    parser.add_argument("--latency", type=float, default=0.005, help="Задержка ответа сайта, секунд")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--urls", type=int, default=200_000, help="URL для замера цены приоритета")
+    args = parser.parse_args()
+
+    server = FakeSiteServer(size=args.pages, fanout=5, nav_links=5, page_bytes=10 * 1024, latency=args.latency,
+                            news_pages=args.news, tariff_rate=args.tariff_rate).start_background()
+    print(f"Сайт: {args.pages} стр. в дереве, {args.news} новостей, {server.tariff_pages} стр. тарифов")
+    print(f"{'бюджет':>6} | {'очередь':<8} | {'загружено':>9} | {'тарифов':>7} | {'новостей':>8} | {'секунд':>7}")
+    for budget in args.budget:
+        for frontier in ("fifo", "priority"):
+            result = crawl(server.root_url, frontier, budget, args.concurrency)
+            sections = result["sections"]
+            print(f"{budget:>6} | {frontier:<8} | {result['pages']:>9} | {sections['tariffs']:>7} | "
+                  f"{sections['news']:>8} | {result['seconds']:>7.2f}")
+    server.shutdown()
+    bench_priority_cost(server, args.urls)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Бенчмарк инкрементального сканирования async_static_crawler на локальном фейковом сайте:
+полный первый запуск, повторный запуск без изменений (ответы 304) и запуск после того,
+как на сайте появились новые страницы. Запуск из корня репозитория:
+
+    python benchmarks/bench_incremental.py --pages 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers"))
+
+from async_static_crawler import DomainScanner  # noqa: E402
+from fake_site import FakeSiteServer  # noqa: E402
+
+
+class CountingScanner(DomainScanner):
+    INCREMENTAL = True
+    parsed = 0
+
+    def _extract_links(self, content, request_url, anchors=None):
+        CountingScanner.parsed += 1
+        return super()._extract_links(content, request_url, anchors)
+
+
+def run_once(server: FakeSiteServer, title: str) -> None:
+    CountingScanner.parsed, server.not_modified, server.bytes_sent = 0, 0, 0
+    scanner = CountingScanner(server.root_url)
+    started = time.perf_counter()
+    asyncio.run(scanner.start())
+    elapsed = time.perf_counter() - started
+    print(f"{title:<16} | {scanner.results_count:>6} | {CountingScanner.parsed:>6} | "
+          f"{server.not_modified:>6} | {server.bytes_sent // 1024:>8} | {elapsed:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2_000, help="Размер фейкового сайта")
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--growth", type=float, default=0.1, help="Доля новых страниц перед третьим запуском")
+    parser.add_argument("--delay", type=float, default=0, help="DomainScanner.DELAY на время замера")
+    args = parser.parse_args()
+
+    CountingScanner.DELAY = args.delay
+    server = FakeSiteServer(size=args.pages, fanout=args.fanout).start_background()
+
+    os.chdir(tempfile.mkdtemp())  # История и выгрузка пишутся в data/crawled относительно текущей папки
+    print(f"{'run':<16} | {'pages':>6} | {'parsed':>6} | {'304':>6} | {'body KiB':>8} | {'seconds':>8}")
+    run_once(server, "full")
+    run_once(server, "unchanged")
+    server.size = int(args.pages * (1 + args.growth))
+    run_once(server, f"+{args.growth:.0%} pages")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Микро-бенчмарк извлечения ссылок: stream против bs4 по времени и пиковой памяти.
+HTML-фикстуры берутся из папки --fixtures (сохранённые страницы банков, *.html);
+если там пусто, генерируются синтетические страницы с мега-меню.
+
+    python benchmarks/bench_link_extractor.py --fixtures benchmarks/fixtures
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers"))
+
+from link_extractor import BACKENDS, extract_links  # noqa: E402
+
+
+def synthetic_page(links: int) -> bytes:
+    """Страница банка с мега-меню: много ссылок, скрипты, стили и комментарии."""
+    menu = "".join(
+        f'<li class="menu__item"><a class="menu__link" href="/products/{i // 50}/item-{i}/" '
+        f'data-id="{i}">Продукт {i}</a></li>'
+        for i in range(links)
+    )
+    return (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8"><title>Банк</title>'
+        '<style>.menu__item{display:inline-block}</style>'
+        '<script>window.__STATE__ = {"links": ["<a href=\\"/fake\\">"]};</script></head><body>'
+        f'<!-- шапка --><nav><ul class="menu">{menu}</ul></nav>'
+        '<main>' + '<p>Тарифы и условия</p>' * 20 + '</main></body></html>'
+    ).encode("utf-8")
+
+
+def load_fixtures(path: str) -> dict[str, bytes]:
+    fixtures = {}
+    for filename in sorted(glob.glob(os.path.join(path, "*.html"))):
+        with open(filename, "rb") as f:
+            fixtures[os.path.basename(filename)] = f.read()
+    if not fixtures:
+        fixtures = {f"synthetic-{links}.html": synthetic_page(links) for links in (100, 1_000, 5_000)}
+    return fixtures
+
+
+def measure(backend: str, content: bytes, repeat: int) -> tuple[float, int, int]:
+    """Возвращает (мс на страницу, пик памяти в КБ, число ссылок)."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        links = extract_links(content, "https://www.bank.ru/", backend)
+    per_page = (time.perf_counter() - started) / repeat * 1000
+
+    tracemalloc.start()
+    extract_links(content, "https://www.bank.ru/", backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_page, peak // 1024, len(links)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'fixture':<28} | {'KB':>6} | {'backend':<7} | {'ms/page':>8} | {'peak KB':>8} | {'links':>6}")
+    for name, content in load_fixtures(args.fixtures).items():
+        results = {}
+        for backend in BACKENDS:
+            per_page, peak, links = measure(backend, content, args.repeat)
+            results[backend] = extract_links(content, "https://www.bank.ru/", backend)
+            print(f"{name:<28} | {len(content) // 1024:>6} | {backend:<7} | {per_page:>8.2f} | {peak:>8} | {links:>6}")
+        if results["stream"] != results["bs4"]:
+            print(f"  ! {name}: ссылки stream и bs4 отличаются")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Бенчмарк поиска почти одинаковых страниц (near_duplicates) на синтетическом сайте банка (см. fake_site)
+с разделом отделений: страницы городов и банкоматов отличаются только названием и адресом.
+
+Сайт сканируется async_static_crawler с поиском почти дублей и без него: сколько страниц загружено,
+сколько загрузок сэкономлено, сколько страниц с уникальным текстом (/p/<n>/) найдено и за сколько секунд.
+Затем - скорость отпечатка страницы и запросов к NearDuplicateIndex. Запуск из корня репозитория:
+
+    python benchmarks/bench_near_duplicates.py --pages 300 --cities 100 --atms 20 --latency 0.01
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "parsers"))
+sys.path.insert(0, BENCH_DIR)
+
+from async_static_crawler import DomainScanner  # noqa: E402
+from fake_site import FakeSiteServer  # noqa: E402
+from near_duplicates import NearDuplicateIndex, page_fingerprint  # noqa: E402
+
+
+def crawl(url: str, near_duplicates: bool, concurrency: int) -> dict:
+    os.chdir(tempfile.mkdtemp())  # Выгрузка и состояние сканирования пишутся относительно текущей папки
+    settings = {"DELAY": 0, "STATS_INTERVAL": None, "HTTP_CACHE_DIR": None, "SITEMAP_SEED": False,
+                "NEAR_DUPLICATES": near_duplicates}
+    scanner = type("BenchScanner", (DomainScanner,), settings)(url)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(scanner.start(concurrency))
+    elapsed = time.perf_counter() - started
+    with open(scanner._output_prefix() + ".jsonl", encoding="utf-8") as f:
+        urls = {json.loads(line)["url"] for line in f}
+    return {
+        "pages": len(urls),
+        "unique_pages": sum("/p/" in url for url in urls),
+        "branch_pages": sum("/branches/" in url for url in urls),
+        "avoided": scanner._avoided_fetches(),
+        "templates": len(scanner.templated_patterns),
+        "seconds": elapsed,
+    }
+
+
+def bench_index(server: FakeSiteServer, fingerprints: int, queries: int) -> None:
+    bodies = [server.render_page(page) for page in range(1, 201)]
+    started = time.perf_counter()
+    for body in bodies:
+        page_fingerprint(body)
+    elapsed = time.perf_counter() - started
+    print(f"page_fingerprint: {len(bodies) / elapsed:,.0f} стр/с "
+          f"({sum(map(len, bodies)) / elapsed / 2 ** 20:.1f} МБ/с)")
+
+    rng = random.Random(1)
+    stored = [rng.getrandbits(64) for _ in range(fingerprints)]
+    index = NearDuplicateIndex(3)
+    for fingerprint in stored:
+        index.add(fingerprint)
+    # Половина запросов - близкие к сохранённым отпечатки (1-3 бита изменено), половина - новые
+    probes = []
+    for _ in range(queries // 2):
+        fingerprint = rng.choice(stored)
+        for bit in rng.sample(range(64), rng.randint(1, 3)):
+            fingerprint ^= 1 << bit
+        probes += [fingerprint, rng.getrandbits(64)]
+    started = time.perf_counter()
+    found = sum(index.find(fingerprint) is not None for fingerprint in probes)
+    elapsed = time.perf_counter() - started
+    print(f"NearDuplicateIndex на {len(index):,} отпечатках: {len(probes) / elapsed:,.0f} запросов/с, "
+          f"найдено {found} из {len(probes)} (близких - {len(probes) // 2})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300, help="Страниц с уникальным текстом")
+    parser.add_argument("--cities", type=int, default=100, help="Страниц городов в разделе отделений")
+    parser.add_argument("--atms", type=int, default=20, help="Страниц банкоматов на город")
+    parser.add_argument("--latency", type=float, default=0.01, help="Задержка ответа сайта, секунд")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--fingerprints", type=int, default=1_000_000, help="Отпечатков в индексе")
+    args = parser.parse_args()
+
+    server = FakeSiteServer(size=args.pages, fanout=5, nav_links=5, page_bytes=20 * 1024, latency=args.latency,
+                            branch_cities=args.cities, branch_atms=args.atms).start_background()
+    print(f"Сайт: {args.pages} стр. с уникальным текстом, {server.branch_pages} стр. отделений и банкоматов")
+    print(f"{'почти дубли':<12} | {'загружено':>9} | {'уникальных':>10} | {'отделений':>9} | {'сэкономлено':>11} | "
+          f"{'шаблонов':>8} | {'секунд':>7}")
+    for near_duplicates in (False, True):
+        result = crawl(server.root_url, near_duplicates, args.concurrency)
+        print(f"{'вкл' if near_duplicates else 'выкл':<12} | {result['pages']:>9} | {result['unique_pages']:>10} | "
+              f"{result['branch_pages']:>9} | {result['avoided']:>11} | {result['templates']:>8} | "
+              f"{result['seconds']:>7.2f}")
+    server.shutdown()
+    bench_index(server, args.fingerprints, 200_000)
+
+
+if __name__ == '__main__':
+    main()
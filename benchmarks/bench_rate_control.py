@@ -0,0 +1,51 @@
+"""
+Бенчмарк темпа запросов async_static_crawler на фейковом сайте, который отвечает 429
+на запросы сверх --max-rate в секунду: постоянный DELAY против адаптивного темпа (AIMD).
+Запуск из корня репозитория:
+
+    python benchmarks/bench_rate_control.py --pages 300 --max-rate 40
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers"))
+
+from async_static_crawler import DomainScanner  # noqa: E402
+from fake_site import FakeSiteServer  # noqa: E402
+
+
+def run_once(server: FakeSiteServer, title: str, delay: float, adaptive: bool) -> None:
+    server.throttled, server.bytes_sent = 0, 0
+    scanner_class = type("Scanner", (DomainScanner,), {"DELAY": delay, "ADAPTIVE_RATE": adaptive})
+    scanner = scanner_class(server.root_url)
+    started = time.perf_counter()
+    asyncio.run(scanner.start())
+    elapsed = time.perf_counter() - started
+    controller = scanner.rate_controller
+    print(f"{title:<22} | {scanner.results_count:>6} | {server.throttled:>6} | {controller.retries:>7} | "
+          f"{controller.rate:>6.1f} | {elapsed:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300, help="Размер фейкового сайта")
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--max-rate", type=float, default=40, help="Запросов в секунду, которые выдерживает сайт")
+    args = parser.parse_args()
+
+    server = FakeSiteServer(size=args.pages, fanout=args.fanout, max_rate=args.max_rate).start_background()
+    os.chdir(tempfile.mkdtemp())  # Выгрузка пишется в data/crawled относительно текущей папки
+    print(f"{'run':<22} | {'200':>6} | {'429':>6} | {'retries':>7} | {'rate':>6} | {'seconds':>8}")
+    run_once(server, "fixed DELAY=0.1", 0.1, adaptive=False)
+    run_once(server, "fixed DELAY=0 (no cap)", 0, adaptive=False)
+    run_once(server, "adaptive from 0.1", 0.1, adaptive=True)
+    run_once(server, "adaptive from 0", 0, adaptive=True)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
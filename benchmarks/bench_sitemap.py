@@ -0,0 +1,100 @@
+"""
+Бенчмарк засева очереди из карты сайта на локальном фейковом сайте (дерево страниц,
+FANOUT ссылок с каждой): сколько страниц пришлось загрузить, пока были найдены все адреса,
+с картой сайта и без неё, и сколько памяти занимает потоковый разбор большой карты.
+Запуск из корня репозитория:
+
+    python benchmarks/bench_sitemap.py --pages 5000 --fanout 3
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers"))
+
+from async_static_crawler import DomainScanner  # noqa: E402
+from fake_site import FakeSiteServer, SITEMAP_NS  # noqa: E402
+from sitemap_seeder import iter_sitemap  # noqa: E402
+
+
+class DiscoveryScanner(DomainScanner):
+    DELAY = 0
+    CHECKPOINT = False
+    total_pages = 0
+
+    def __init__(self, start_url: str) -> None:
+        super().__init__(start_url)
+        self.fetched = 0
+        self.enqueued = 1
+        self.all_found_after: int | None = None  # Сколько страниц было загружено, когда нашлись все адреса
+
+    def _enqueue(self, url_obj, anchor=None) -> None:
+        self.enqueued += 1
+        if self.all_found_after is None and self.enqueued >= self.total_pages:
+            self.all_found_after = self.fetched
+        super()._enqueue(url_obj, anchor)
+
+    def _extract_links(self, content, request_url, anchors=None):
+        self.fetched += 1
+        return super()._extract_links(content, request_url, anchors)
+
+
+def run_crawl(server: FakeSiteServer, title: str, seed: bool, max_depth: int) -> None:
+    scanner_class = type("Scanner", (DiscoveryScanner,), {"SITEMAP_SEED": seed, "MAX_DEPTH": max_depth,
+                                                          "total_pages": server.size})
+    scanner = scanner_class(server.root_url)
+    started = time.perf_counter()
+    asyncio.run(scanner.start())
+    elapsed = time.perf_counter() - started
+    found = scanner.all_found_after if scanner.all_found_after is not None else "-"
+    print(f"{title:<18} | {scanner.results_count:>7} | {found:>14} | {elapsed:>8.2f}")
+
+
+def sitemap_memory(urls: int) -> None:
+    """Пиковая память: потоковый разбор сжатой карты против разбора целиком в дерево."""
+    entries = "".join(f"<url><loc>https://bank.example/products/{i}/</loc><lastmod>2024-05-01</lastmod></url>"
+                      for i in range(urls))
+    xml = f'<?xml version="1.0" encoding="UTF-8"?><urlset {SITEMAP_NS}>{entries}</urlset>'.encode()
+    compressed = gzip.compress(xml)
+    chunks = [compressed[i:i + 64 * 1024] for i in range(0, len(compressed), 64 * 1024)]
+    del entries, xml
+
+    for title, parse in (("stream", lambda: sum(1 for _ in iter_sitemap(iter(chunks)))),
+                         ("whole tree", lambda: len(ElementTree.fromstring(gzip.decompress(compressed))))):
+        started = time.perf_counter()
+        count = parse()
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()  # Отдельным проходом: tracemalloc сильно замедляет выделение памяти
+        parse()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{title:<18} | {count:>7} | {peak / 1024 ** 2:>9.1f} MiB | {elapsed:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5_000, help="Размер фейкового сайта")
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--max-depth", type=int, default=10, help="DomainScanner.MAX_DEPTH")
+    parser.add_argument("--sitemap-urls", type=int, default=200_000, help="Адресов в карте для замера памяти")
+    args = parser.parse_args()
+
+    server = FakeSiteServer(size=args.pages, fanout=args.fanout, sitemap=True).start_background()
+    os.chdir(tempfile.mkdtemp())  # Выгрузка пишется в data/crawled относительно текущей папки
+    print(f"{'run':<18} | {'visited':>7} | {'all URLs after':>14} | {'seconds':>8}")
+    run_crawl(server, "links only", seed=False, max_depth=args.max_depth)
+    run_crawl(server, "sitemap + links", seed=True, max_depth=args.max_depth)
+    server.shutdown()
+
+    print(f"\n{'sitemap parse':<18} | {'urls':>7} | {'peak memory':>13} | {'seconds':>8}")
+    sitemap_memory(args.sitemap_urls)
+
+
+if __name__ == '__main__':
+    main()
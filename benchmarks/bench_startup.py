@@ -0,0 +1,106 @@
+"""
+Бенчмарк холодного старта: сколько проходит от запуска интерпретатора до готового к работе
+планировщика (модули импортированы, сканеры созданы) - на сотнях коротких запусков по одному
+банку это время складывается.
+
+Каждый замер - отдельный процесс python (холодный старт, без модулей в памяти), берётся медиана
+из --repeat запусков:
+- python -c pass - цена самого интерпретатора;
+- python main.py --help;
+- для каждого движка: как было (все движки, Playwright и fake_useragent импортируются всегда,
+  UserAgent(platforms="desktop") создаётся заново) и сейчас (CrawlScheduler с одним сайтом:
+  только модуль выбранного движка и пул User-Agent из data/user_agents.json).
+Затем - в одном процессе: создание UserAgent против загрузки пула и цена .random.
+Запуск из корня репозитория:
+
+    python benchmarks/bench_startup.py --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PARSERS_DIR = os.path.join(ROOT_DIR, "parsers")
+sys.path.insert(0, PARSERS_DIR)
+
+ENGINES = ("static", "async-static", "dynamic", "hybrid")
+HEAVY_PACKAGES = ("playwright", "httpx", "bs4", "fake_useragent", "requests")
+ENGINE_MODULES = {"static": "site_crawler", "async-static": "async_static_crawler",
+                  "dynamic": "async_dynamic_crawler", "hybrid": "hybrid_crawler"}
+
+# Старт до ленивых импортов: crawl_scheduler импортировал все движки и создавал UserAgent
+OLD_START = """
+import site_crawler, async_static_crawler, async_dynamic_crawler, hybrid_crawler, http_fetcher
+from fake_useragent import UserAgent
+ua = UserAgent(platforms="desktop")
+{module}.DomainScanner("https://www.bank.ru/", ua=ua)
+"""
+NEW_START = """
+from crawl_scheduler import CrawlScheduler
+CrawlScheduler(["https://www.bank.ru/"], "{engine}")
+"""
+
+
+def cold_start(args: list[str], repeat: int) -> float:
+    """Медиана времени запуска процесса python с аргументами args, в секундах."""
+    env = dict(os.environ, PYTHONPATH=PARSERS_DIR)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=PARSERS_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def loaded_modules(code: str) -> set[str]:
+    """Какие из тяжёлых пакетов оказались загружены после выполнения code."""
+    check = code + f"\nimport sys\nprint(*(name for name in {HEAVY_PACKAGES} if name in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=PARSERS_DIR)
+    result = subprocess.run([sys.executable, "-c", check], cwd=PARSERS_DIR, env=env, check=True,
+                            capture_output=True, text=True)
+    return set(result.stdout.split())
+
+
+def bench_user_agents(calls: int) -> None:
+    from fake_useragent import UserAgent
+    from user_agents import load_user_agents
+
+    started = time.perf_counter()
+    ua = UserAgent(platforms="desktop")
+    print(f"UserAgent(platforms='desktop'): {(time.perf_counter() - started) * 1000:.1f} мс")
+    os.chdir(PARSERS_DIR)
+    started = time.perf_counter()
+    pool = load_user_agents()
+    print(f"load_user_agents(): {(time.perf_counter() - started) * 1000:.1f} мс ({len(pool)} строк)")
+    for title, source in (("UserAgent.random", ua), ("UserAgentPool.random", pool)):
+        started = time.perf_counter()
+        for _ in range(calls):
+            source.random
+        print(f"{title}: {(time.perf_counter() - started) / calls * 1e6:.1f} мкс")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10, help="Запусков на замер (берётся медиана)")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--calls", type=int, default=500, help="Вызовов .random для замера")
+    args = parser.parse_args()
+
+    print(f"python -c pass: {cold_start(['-c', 'pass'], args.repeat) * 1000:.0f} мс")
+    help_time = cold_start([os.path.join(ROOT_DIR, "main.py"), "--help"], args.repeat)
+    print(f"python main.py --help: {help_time * 1000:.0f} мс")
+    print(f"{'движок':<12} | {'было, мс':>8} | {'стало, мс':>9} | загружено сейчас")
+    for engine in args.engines:
+        old = cold_start(["-c", OLD_START.format(module=ENGINE_MODULES[engine])], args.repeat)
+        new_code = NEW_START.format(engine=engine)
+        new = cold_start(["-c", new_code], args.repeat)
+        loaded = " ".join(sorted(loaded_modules(new_code)))
+        print(f"{engine:<12} | {old * 1000:>8.0f} | {new * 1000:>9.0f} | {loaded}")
+    bench_user_agents(args.calls)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Бенчмарк памяти очереди и множества посещённых URL: байт на найденный URL
+у старой модели (URL с urlparse и кортежем referrers, дубликаты в очереди)
+и у компактной (crawl_url.URL со ссылкой на родителя, проверка при постановке в очередь)
+с разными режимами множества встреченных URL.
+
+    python benchmarks/bench_url_memory.py --pages 3000
+"""
+import argparse
+import collections
+import os
+import sys
+import tracemalloc
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parsers"))
+
+from crawl_url import URL  # noqa: E402
+from url_set import make_url_set  # noqa: E402
+
+
+class LegacyURL:
+    """URL в том виде, в каком он был в site_crawler до компактной записи."""
+
+    def __init__(self, url: str, response_code: int | None = None, referrers: tuple[str, ...] = tuple()):
+        self._referrers = referrers
+        self._url_parsed = urlparse(url.strip())
+        self._url_string = self._url_parsed.geturl()
+        self._response_code = response_code
+
+    @property
+    def url(self) -> str:
+        return self._url_string
+
+    @property
+    def referrers(self) -> tuple[str, ...]:
+        return self._referrers
+
+    def __eq__(self, other):
+        return isinstance(other, LegacyURL) and self.url == other.url
+
+    def __hash__(self):
+        return hash((self.url, self.referrers))
+
+
+SITE_SIZE = 1_000_000  # Страниц на портале - намного больше, чем успеваем обойти
+
+
+def page_links(page_id: int, menu: int, children: int, related: int = 10) -> list[str]:
+    """Ссылки страницы крупного банковского портала: мега-меню, дочерние и похожие страницы."""
+    links = [f"https://www.bank.ru/menu/section-{i}/" for i in range(menu)]
+    links += [
+        f"https://www.bank.ru/catalog/item-{child}/"
+        for child in range(page_id * children + 1, page_id * children + children + 1) if child < SITE_SIZE
+    ]
+    # "Похожие продукты" - одни и те же страницы, на которые ссылаются многие соседи
+    links += [f"https://www.bank.ru/catalog/item-{(page_id // 10 + k) * 7 % SITE_SIZE}/" for k in range(related)]
+    return links
+
+
+def crawl_legacy(pages: int, menu: int, children: int) -> int:
+    visited_urls: set[str] = set()
+    visited_url_objs: set[LegacyURL] = set()
+    queue = collections.deque([LegacyURL("https://www.bank.ru/catalog/item-0/", referrers=("https://www.bank.ru/",))])
+    page_id = 0
+    while queue and page_id < pages:
+        url_obj = queue.popleft()
+        if url_obj.url in visited_urls:
+            continue
+        visited_urls.add(url_obj.url)
+        visited_url_objs.add(LegacyURL(url_obj.url, 200, url_obj.referrers))
+        for link in page_links(page_id, menu, children):
+            next_obj = LegacyURL(link, referrers=url_obj.referrers + (url_obj.url,))
+            if next_obj.url not in visited_urls:  # В очереди проверки нет - дубликаты копятся
+                queue.append(next_obj)
+        page_id += 1
+    globals()["_keep"] = (visited_urls, visited_url_objs, queue)
+    return len(visited_urls | {url_obj.url for url_obj in queue})
+
+
+def crawl_compact(pages: int, menu: int, children: int, mode: str) -> int:
+    visited_urls: set[str] = set()
+    visited_url_objs: set[URL] = set()
+    seen_urls = make_url_set(mode, capacity=pages * (children + 10))
+    start = URL("https://www.bank.ru/catalog/item-0/")
+    seen_urls.add(start.url)
+    queue = collections.deque([start])
+    page_id = 0
+    while queue and page_id < pages:
+        url_obj = queue.popleft()
+        visited_urls.add(url_obj.url)
+        visited_url_objs.add(url_obj.with_response(url_obj.url, 200))
+        for link in page_links(page_id, menu, children):
+            next_obj = URL(link, parent=url_obj)
+            if next_obj.url not in seen_urls:  # Проверка при постановке в очередь
+                seen_urls.add(next_obj.url)
+                queue.append(next_obj)
+        page_id += 1
+    globals()["_keep"] = (visited_urls, visited_url_objs, queue, seen_urls)
+    return len(visited_urls) + len(queue)
+
+
+def measure(crawl, *args) -> tuple[int, int]:
+    """Возвращает (найдено URL, байт на найденный URL) по памяти, оставшейся после обхода."""
+    tracemalloc.start()
+    discovered = crawl(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    globals().pop("_keep", None)
+    return discovered, current // max(discovered, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=3_000, help="Сколько страниц обойти")
+    parser.add_argument("--menu", type=int, default=60, help="Ссылок мега-меню на каждой странице")
+    parser.add_argument("--children", type=int, default=5, help="Уникальных дочерних ссылок на странице")
+    args = parser.parse_args()
+
+    print(f"{'model':<18} | {'discovered':>10} | {'bytes/URL':>9}")
+    discovered, per_url = measure(crawl_legacy, args.pages, args.menu, args.children)
+    print(f"{'legacy':<18} | {discovered:>10} | {per_url:>9}")
+    for mode in ("exact", "hashed", "bloom"):
+        discovered, per_url = measure(crawl_compact, args.pages, args.menu, args.children, mode)
+        print(f"{'compact/' + mode:<18} | {discovered:>10} | {per_url:>9}")
+
+
+if __name__ == '__main__':
+    main()
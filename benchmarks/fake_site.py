@@ -0,0 +1,341 @@
+"""
+Локальный фейковый сайт для бенчмарков: дерево страниц /p/<n>/,
+у каждой страницы FANOUT ссылок на дочерние страницы.
+Страницы отдаются с ETag и отвечают 304 на If-None-Match с тем же значением.
+С max_rate сайт отвечает 429 с Retry-After на запросы сверх max_rate в секунду.
+С sitemap=True сайт отдаёт robots.txt и сжатый индекс карт сайта со всеми страницами.
+
+Чтобы сайт был похож на сайт банка, можно включить: общее меню со ссылками на разделы
+(nav_links), вес страницы (page_bytes), задержку ответа (latency), ссылки через редирект
+/r/<n>/ -> /p/<n>/ (redirect_rate), страницы с ошибкой 404/500 (error_rate) и ссылки,
+которые рисует JavaScript (js_rate) - их видит только браузер. Какие страницы и ссылки
+особые, зависит только от номера страницы, поэтому сайт одинаков от запуска к запуску.
+
+Текст страниц /p/<n>/ у каждой свой. Страницы, размноженные по шаблону, - раздел отделений
+/branches/ со страницами городов /branches/<n>/ (branch_cities) и банкоматов
+/branches/<n>/atm/<k>/ (branch_atms на город): у них один и тот же текст, кроме названия и адреса.
+
+Малоценные и ценные разделы - для приоритетной очереди URL: архив новостей /news/ со списками
+/news/?page=<k> и новостями /news/<год>/<n>/ (news_pages, ссылка на него - в общем меню)
+и страницы тарифов /tariffs/<n>/, на которые ссылается доля tariff_rate страниц дерева.
+"""
+import functools
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SITEMAP_NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+# Слова для текста страниц: у каждой страницы свой случайный текст из них
+VOCABULARY = (
+    "кредит карта вклад ипотека ставка процент срок сумма клиент тариф условия документ договор счёт платёж "
+    "перевод кэшбэк лимит рубль доллар евро комиссия отделение банкомат офис заявка онлайн приложение бизнес "
+    "зарплата пенсия страховка накопление инвестиции облигация акция депозит валюта обмен курс налог вычет "
+    "льгота программа семья молодёжь автокредит рефинансирование досрочно погашение график просрочка штраф "
+    "бесплатно выгодно быстро удобно надёжно новый особый премиальный базовый годовых месяц день год"
+).split()
+# Общий текст страниц отделений и банкоматов
+BRANCH_TEMPLATE = (
+    "<p>Часы работы: понедельник - пятница с 9:00 до 20:00, суббота с 10:00 до 17:00, воскресенье - выходной. "
+    "В отделении можно открыть счёт и вклад, оформить кредитную или дебетовую карту, получить кредит наличными, "
+    "подать заявку на ипотеку, оплатить услуги, перевести деньги и обменять валюту. Для юридических лиц - "
+    "открытие расчётного счёта, зарплатный проект, эквайринг и кредиты для бизнеса. Обслуживание маломобильных "
+    "клиентов: пандус, кнопка вызова сотрудника, зона обслуживания на первом этаже. Банкомат принимает и выдаёт "
+    "наличные в рублях, долларах и евро, поддерживает бесконтактную оплату и снятие по QR-коду.</p>"
+    "<p>Перед визитом можно записаться на удобное время в мобильном приложении или на сайте, чтобы не ждать "
+    "в очереди. При себе необходимо иметь паспорт. Актуальные курсы валют, тарифы и условия обслуживания - "
+    "в разделе документов. Если отделение закрыто на санитарный день или технический перерыв, информация "
+    "публикуется заранее на этой странице и в приложении. Справочная служба работает круглосуточно.</p>"
+)
+CITIES = ("Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург", "Самара", "Омск", "Уфа",
+          "Пермь", "Воронеж", "Волгоград", "Красноярск", "Саратов", "Тюмень", "Ижевск", "Барнаул")
+
+
+def chance(page_id: int, salt: str) -> float:
+    """Детерминированное "случайное" число из [0, 1) для страницы."""
+    digest = hashlib.md5(f"{salt}:{page_id}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+class FakeSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Иначе заголовки и тело уходят с задержкой delayed ACK (~40 мс)
+    server: "FakeSiteServer"
+
+    def log_message(self, format, *args):  # Не засоряем вывод бенчмарка
+        pass
+
+    def do_GET(self):
+        if not self.server.admit():
+            self.server.throttled += 1
+            self._send(429, b"<html><body>Too many requests</body></html>", retry_after=1)
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.sitemap and (self.path == "/robots.txt" or self.path.startswith("/sitemap")):
+            self._send_sitemap()
+            return
+        if self.path.startswith("/r/"):  # Старый адрес страницы
+            self.server.redirects += 1
+            self._send(301, b"", location="/p/" + self.path[len("/r/"):])
+            return
+        if self.path.startswith(("/news/", "/tariffs/")):
+            body = self.server.render_section(self.path)
+            self._send(200, body) if body is not None else self._send(404, b"<html><body>Not found</body></html>")
+            return
+        if self.path.startswith("/branches/"):
+            body = self.server.render_branch(self.path)
+            self._send(200, body) if body is not None else self._send(404, b"<html><body>Not found</body></html>")
+            return
+        page_id = self.server.page_id(self.path)
+        if page_id is None:
+            self._send(404, b"<html><body>Not found</body></html>")
+            return
+        if page_id and chance(page_id, "error") < self.server.error_rate:
+            self.server.errors += 1
+            status = 404 if chance(page_id, "error-status") < 0.5 else 500
+            self._send(status, f"<html><body>Ошибка {status}</body></html>".encode("utf-8"))
+            return
+
+        body = self.server.render_page(page_id)
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self._send(304, b"", etag)
+            return
+        self._send(200, body, etag)
+
+    def _send_sitemap(self) -> None:
+        server = self.server
+        if self.path == "/robots.txt":
+            rules = "".join(f"Disallow: {path}\n" for path in server.disallow)
+            body = f"User-agent: *\n{rules}\nSitemap: http://{self.headers['Host']}/sitemap_index.xml.gz\n"
+            self._send(200, body.encode(), content_type="text/plain")
+            return
+        host = f"http://{self.headers['Host']}"
+        per_file = server.SITEMAP_PAGE_SIZE
+        if self.path == "/sitemap_index.xml.gz":
+            entries = "".join(f"<sitemap><loc>{host}/sitemap-{k}.xml</loc></sitemap>"
+                              for k in range((server.size + per_file - 1) // per_file))
+            body = f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex {SITEMAP_NS}>{entries}</sitemapindex>'
+            self._send(200, gzip.compress(body.encode()), content_type="application/gzip")
+            return
+        k = int(self.path.removeprefix("/sitemap-").removesuffix(".xml"))
+        entries = "".join(f"<url><loc>{host}/p/{page}/</loc><lastmod>2024-05-{page % 28 + 1:02d}</lastmod></url>"
+                          for page in range(k * per_file, min(server.size, (k + 1) * per_file)))
+        body = f'<?xml version="1.0" encoding="UTF-8"?><urlset {SITEMAP_NS}>{entries}</urlset>'
+        self._send(200, body.encode(), content_type="application/xml")
+
+    def _send(self, status: int, body: bytes, etag: str | None = None, retry_after: int | None = None,
+              content_type: str = "text/html; charset=utf-8", location: str | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if location is not None:
+            self.send_header("Location", location)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+
+@functools.lru_cache(maxsize=4096)
+def filler(page_id: int, size: int) -> str:
+    """Текст страницы не короче size байт - свой для каждой страницы, одинаковый от запуска к запуску."""
+    words = random.Random(page_id).choices(VOCABULARY, k=max(0, size) // 12 + 1)  # ~12 байт на слово в UTF-8
+    return "".join(f"<p>{' '.join(words[i:i + 40]).capitalize()}.</p>" for i in range(0, len(words), 40))
+
+
+class FakeSiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+    SITEMAP_PAGE_SIZE = 1_000  # Адресов в одном файле карты сайта
+
+    def __init__(self, size: int = 500, fanout: int = 5, port: int = 0, max_rate: float | None = None,
+                 sitemap: bool = False, disallow: tuple[str, ...] = (), max_depth: int | None = None,
+                 nav_links: int = 0, page_bytes: int = 0, latency: float = 0.0, redirect_rate: float = 0.0,
+                 error_rate: float = 0.0, js_rate: float = 0.0, branch_cities: int = 0, branch_atms: int = 0,
+                 news_pages: int = 0, tariff_rate: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", port), FakeSiteHandler)
+        self.size = size  # Всего страниц на сайте
+        self.fanout = fanout  # Ссылок на дочерние страницы с каждой страницы
+        self.max_depth = max_depth  # У страниц этой глубины нет дочерних (None - дерево ограничено только size)
+        self.nav_links = nav_links  # Ссылок общего меню (на первые страницы сайта) на каждой странице
+        self.page_bytes = page_bytes  # До какого размера добивать страницу текстом
+        self.latency = latency  # Секунд задержки перед каждым ответом
+        self.redirect_rate = redirect_rate  # Доля ссылок через редирект /r/<n>/
+        self.error_rate = error_rate  # Доля страниц, отвечающих 404 или 500
+        self.js_rate = js_rate  # Доля ссылок, которые рисует JavaScript
+        self.branch_cities = branch_cities  # Страниц городов в разделе отделений (0 - раздела нет)
+        self.branch_atms = branch_atms  # Страниц банкоматов на каждый город
+        self.news_pages = news_pages  # Новостей в архиве /news/ (0 - раздела нет)
+        self.tariff_rate = tariff_rate  # Доля страниц дерева со ссылкой на свою страницу тарифов
+        self.redirects = 0  # Сколько раз ответили 301
+        self.errors = 0  # Сколько раз ответили 404/500 на страницу из дерева
+        self.max_rate = max_rate  # Запросов в секунду, сверх которых сайт отвечает 429 (None - без ограничения)
+        self.sitemap = sitemap  # Отдавать robots.txt и карту сайта
+        self.disallow = disallow  # Запреты Disallow в robots.txt
+        self.not_modified = 0  # Сколько раз ответили 304
+        self.throttled = 0  # Сколько раз ответили 429
+        self.bytes_sent = 0  # Сколько байт тел страниц отдали
+        self._tokens = max_rate or 0.0
+        self._tokens_at = time.monotonic()
+        self._rate_lock = threading.Lock()
+
+    def admit(self) -> bool:
+        """Token bucket на max_rate запросов в секунду (с запасом на секунду вперёд)."""
+        if self.max_rate is None:
+            return True
+        with self._rate_lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_rate, self._tokens + (now - self._tokens_at) * self.max_rate)
+            self._tokens_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def root_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/p/0/"
+
+    @property
+    def settings(self) -> dict:
+        """Параметры сайта - для отчёта бенчмарка."""
+        return {
+            "size": self.size, "fanout": self.fanout, "max_depth": self.max_depth, "nav_links": self.nav_links,
+            "page_bytes": self.page_bytes, "latency": self.latency, "redirect_rate": self.redirect_rate,
+            "error_rate": self.error_rate, "js_rate": self.js_rate, "max_rate": self.max_rate,
+            "branch_cities": self.branch_cities, "branch_atms": self.branch_atms,
+            "news_pages": self.news_pages, "tariff_rate": self.tariff_rate,
+        }
+
+    @property
+    def branch_pages(self) -> int:
+        """Сколько страниц в разделе отделений, включая его оглавление."""
+        return self.branch_cities * (1 + self.branch_atms) + 1 if self.branch_cities else 0
+
+    def has_tariff(self, page_id: int) -> bool:
+        return page_id > 0 and chance(page_id, "tariff") < self.tariff_rate
+
+    @property
+    def tariff_pages(self) -> int:
+        return sum(map(self.has_tariff, range(self.size)))
+
+    def depth(self, page_id: int) -> int:
+        depth = 0
+        while page_id:
+            page_id = (page_id - 1) // self.fanout
+            depth += 1
+        return depth
+
+    def children(self, page_id: int) -> range:
+        if self.max_depth is not None and self.depth(page_id) >= self.max_depth:
+            return range(0)
+        first = page_id * self.fanout + 1
+        return range(first, min(first + self.fanout, self.size))
+
+    def render_page(self, page_id: int) -> bytes:
+        html_links, js_links = [], []
+        for child in self.children(page_id):
+            if chance(child, "js") < self.js_rate:
+                js_links.append(child)
+                continue
+            prefix = "/r/" if chance(child, "redirect") < self.redirect_rate else "/p/"
+            html_links.append(f'<li><a href="{prefix}{child}/">Страница {child}</a></li>')
+        if self.has_tariff(page_id):
+            html_links.append(f'<li><a href="/tariffs/{page_id}/">Тарифы и условия</a></li>')
+        nav = '<a href="/news/">Новости</a>' if self.news_pages else ""
+        nav += "".join(f'<a href="/p/{section}/">Раздел {section}</a>'
+                      for section in range(1, min(self.nav_links + 1, self.size)))
+        if self.branch_cities:
+            nav += '<a href="/branches/">Отделения и банкоматы</a>'
+        script = ""
+        if js_links:
+            # Адреса собираются в скрипте: в HTML нет ни одной ссылки на эти страницы
+            script = (
+                '<div id="menu"></div><script>for (const id of ' + json.dumps(js_links) + ') {'
+                'const a = document.createElement("a"); a.setAttribute("hr" + "ef", "/p/" + id + "/");'
+                'a.textContent = "Страница " + id; document.getElementById("menu").appendChild(a);}</script>'
+            )
+        page = (f"<html><head><title>Страница {page_id}</title></head><body><nav>{nav}</nav>"
+                f"<ul>{''.join(html_links)}</ul>{script}")
+        if self.page_bytes:
+            page += filler(page_id, self.page_bytes - len(page.encode("utf-8")) - len("</body></html>"))
+        return (page + "</body></html>").encode("utf-8")
+
+    def render_branch(self, path: str) -> bytes | None:
+        """Страница раздела отделений: оглавление, город или банкомат; None - такой страницы нет."""
+        parts = path.strip("/").split("/")[1:]
+        if not parts:
+            links = [f'<li><a href="/branches/{city}/">{self.city_name(city)}</a></li>'
+                     for city in range(self.branch_cities)]
+            return f"<html><body><h1>Отделения и банкоматы</h1><ul>{''.join(links)}</ul></body></html>".encode()
+        if not all(part.isdigit() or part == "atm" for part in parts) or int(parts[0]) >= self.branch_cities:
+            return None
+        city = int(parts[0])
+        if len(parts) == 1:
+            title = f"Отделение в городе {self.city_name(city)}, ул. Ленина, д. {city + 1}"
+            links = "".join(f'<li><a href="/branches/{city}/atm/{atm}/">Банкомат {atm + 1}</a></li>'
+                            for atm in range(self.branch_atms))
+        elif len(parts) == 3 and parts[1] == "atm" and int(parts[2]) < self.branch_atms:
+            title = f"Банкомат {int(parts[2]) + 1} в городе {self.city_name(city)}, ул. Мира, д. {int(parts[2]) + 1}"
+            links = f'<li><a href="/branches/{city}/">Все отделения города</a></li>'
+        else:
+            return None
+        return (f"<html><head><title>{title}</title></head><body><nav><a href=\"/p/0/\">Главная</a></nav>"
+                f"<h1>{title}</h1>{BRANCH_TEMPLATE}<ul>{links}</ul></body></html>").encode("utf-8")
+
+    NEWS_PER_PAGE = 10
+
+    def render_section(self, path: str) -> bytes | None:
+        """Список или новость архива /news/, страница тарифов /tariffs/<n>/; None - такой страницы нет."""
+        path, _, query = path.partition("?")
+        parts = path.strip("/").split("/")
+        links = []
+        if parts == ["news"] and self.news_pages:
+            listing = int(query.removeprefix("page=")) if query.startswith("page=") and query[5:].isdigit() else 1
+            first = (listing - 1) * self.NEWS_PER_PAGE
+            if first >= self.news_pages:
+                return None
+            title = f"Новости банка, страница {listing}"
+            links = [f'<a href="/news/{2015 + news % 10}/{news}/">Новость {news}</a>'
+                     for news in range(first, min(first + self.NEWS_PER_PAGE, self.news_pages))]
+            links += [f'<a href="/news/?page={page}">{page}</a>'
+                      for page in range(listing + 1, listing + 4) if (page - 1) * self.NEWS_PER_PAGE < self.news_pages]
+            text_id = -listing
+        elif len(parts) == 3 and parts[0] == "news" and parts[2].isdigit() and int(parts[2]) < self.news_pages:
+            news = int(parts[2])
+            title = f"Новость {news}"
+            if news + 1 < self.news_pages:
+                links.append(f'<a href="/news/{2015 + (news + 1) % 10}/{news + 1}/">Следующая новость</a>')
+            text_id = self.size + news
+        elif len(parts) == 2 and parts[0] == "tariffs" and parts[1].isdigit() and self.has_tariff(int(parts[1])):
+            title = f"Тарифы и условия по продукту {parts[1]}"
+            text_id = 2 * self.size + self.news_pages + int(parts[1])
+        else:
+            return None
+        page = (f"<html><head><title>{title}</title></head><body><nav><a href=\"/p/0/\">Главная</a></nav>"
+                f"<h1>{title}</h1><ul>{''.join(f'<li>{link}</li>' for link in links)}</ul>")
+        if self.page_bytes:
+            page += filler(text_id, self.page_bytes - len(page.encode("utf-8")) - len("</body></html>"))
+        return (page + "</body></html>").encode("utf-8")
+
+    @staticmethod
+    def city_name(city: int) -> str:
+        return CITIES[city % len(CITIES)] + (f"-{city // len(CITIES)}" if city >= len(CITIES) else "")
+
+    def page_id(self, path: str) -> int | None:
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "p" and parts[1].isdigit() and int(parts[1]) < self.size:
+            return int(parts[1])
+        return None
+
+    def start_background(self) -> "FakeSiteServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
@@ -1,16 +1,134 @@
-# This is a sample Python script.
+"""
+Точка входа: сбор каталога банков и сканирование их сайтов.
 
-# Press Shift+F10 to execute it or replace it with your code.
-# Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
+    python main.py harvest                         # каталог mainfin.ru -> data/all_bank_sites.txt
+    python main.py crawl                           # все сайты из data/all_bank_sites.txt
+    python main.py crawl https://www.vtb.ru/ --engine dynamic --max-pages 500
+    python main.py crawl --engine async-static --workers 4 --format jsonl parquet
+    python main.py crawl https://www.bank.ru/ --set DELAY=0.5 --set FRONTIER=fifo
+    python main.py user-agents                     # пересобрать пул User-Agent (см. user_agents)
 
+Модули parsers/ (и asyncio) импортируются внутри команды, которой они нужны: --help, сбор каталога
+и статическое сканирование не загружают Playwright, а User-Agent берутся из готового пула
+в data/user_agents.json, без fake_useragent. Пути к данным в parsers/ относительные (data/...),
+поэтому команды выполняются из папки parsers/, как и запуск самих модулей; пути из аргументов
+приводятся к абсолютным до перехода в неё.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
 
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print(f'Hi, {name}')  # Press Ctrl+F8 to toggle the breakpoint.
+PARSERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parsers")
+ENGINES = ("static", "async-static", "dynamic", "hybrid")  # См. CrawlScheduler.ENGINES
 
 
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
+def _setting(text: str) -> tuple[str, object]:
+    """ИМЯ=значение из --set: значение разбирается как JSON (числа, true/false/null, списки), иначе - строка."""
+    name, separator, value = text.partition("=")
+    if not separator or not name.isupper():
+        raise argparse.ArgumentTypeError(f"ожидается ИМЯ=значение, получено {text!r}")
+    try:
+        return name, json.loads(value)
+    except json.JSONDecodeError:
+        return name, value
+
+
+def run_harvest(args: argparse.Namespace) -> None:
+    import asyncio
+    from bank_sites import CACHE_DIR, harvest_mainfin
+    asyncio.run(harvest_mainfin(args.concurrency, None if args.no_cache else CACHE_DIR, args.offline))
+
+
+def run_crawl(args: argparse.Namespace) -> None:
+    import asyncio
+    from crawl_scheduler import SITES_FILE, CrawlScheduler, load_sites, unique_sites
+    sites = unique_sites(args.sites) if args.sites else load_sites(args.sites_file or SITES_FILE)
+    if not sites:
+        sys.exit("Нет сайтов для сканирования")
+
+    # Переопределения атрибутов DomainScanner: сначала --set, поверх - отдельные параметры
+    settings = dict(args.settings)
+    for name, value in (("OUTPUT_DIR", args.output_dir),
+                        ("OUTPUT_FORMATS", tuple(args.format) if args.format else None),
+                        ("MAX_PAGES", args.max_pages),
+                        ("MAX_BYTES", int(args.max_mb * 1024 ** 2) if args.max_mb is not None else None),
+                        ("MAX_CRAWL_TIME", args.max_time)):
+        if value is not None:
+            settings[name] = value
+    scanner_cls = CrawlScheduler.engine_classes(args.engine)[0]
+    unknown = [name for name in settings if not hasattr(scanner_cls, name)]
+    if unknown:
+        sys.exit(f"Неизвестные настройки сканера {args.engine}: {', '.join(unknown)}")
+
+    if args.workers:
+        from distributed_crawl import CrawlCoordinator
+        CrawlCoordinator(sites, args.engine, args.workers, max_concurrency=args.concurrency,
+                         per_domain_concurrency=args.per_domain, scanner_settings=settings,
+                         headless=not args.headed).start()
+    else:
+        scheduler = CrawlScheduler(sites, args.engine, args.concurrency, args.per_domain, settings)
+        asyncio.run(scheduler.start(headless=not args.headed))
+
+
+def run_user_agents(args: argparse.Namespace) -> None:
+    from user_agents import USER_AGENTS_FILE, build_user_agents, save_user_agents
+    weights = build_user_agents()
+    save_user_agents(weights, USER_AGENTS_FILE)
+    print(f"Пул User-Agent: {len(weights)} строк ({sum(weights.values())} записей fake_useragent) "
+          f"-> {USER_AGENTS_FILE}")
+
 
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Каталог банков и сканирование их сайтов")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    harvest = commands.add_parser("harvest", help="Собрать каталог банков с mainfin.ru")
+    harvest.add_argument("--concurrency", type=int, default=8, help="Одновременных запросов к mainfin.ru")
+    harvest.add_argument("--offline", action="store_true", help="Только из кэша ответов, без сети")
+    harvest.add_argument("--no-cache", action="store_true", help="Без кэша ответов")
+    harvest.set_defaults(handler=run_harvest)
+
+    crawl = commands.add_parser("crawl", help="Сканировать сайты банков")
+    crawl.add_argument("sites", nargs="*", help="Стартовые URL (по умолчанию - все сайты из --sites-file)")
+    crawl.add_argument("--sites-file", help="Список сайтов, по одному URL в строке "
+                                            "(по умолчанию parsers/data/all_bank_sites.txt)")
+    crawl.add_argument("--engine", choices=ENGINES, default="static",
+                       help="static - requests, async-static - httpx, dynamic - Playwright, "
+                            "hybrid - httpx, а браузер только для страниц, которым он нужен")
+    crawl.add_argument("-c", "--concurrency", type=int, help="Страниц одновременно, на все домены")
+    crawl.add_argument("--per-domain", type=int, help="Страниц одного домена одновременно")
+    crawl.add_argument("--workers", type=int, help="Процессов-обработчиков (распределённое сканирование)")
+    crawl.add_argument("--output-dir", help="Папка выгрузки (по умолчанию parsers/data/crawled)")
+    crawl.add_argument("--format", nargs="+", choices=("jsonl", "parquet"), help="Форматы выгрузки")
+    crawl.add_argument("--max-pages", type=int, help="Бюджет домена на запуск: страниц")
+    crawl.add_argument("--max-mb", type=float, help="Бюджет домена на запуск: мегабайт")
+    crawl.add_argument("--max-time", type=float, help="Бюджет домена на запуск: секунд")
+    crawl.add_argument("--headed", action="store_true", help="Показывать окно браузера")
+    crawl.add_argument("--set", dest="settings", type=_setting, action="append", default=[], metavar="ИМЯ=значение",
+                       help="Любой атрибут DomainScanner, например --set DELAY=0.5")
+    crawl.set_defaults(handler=run_crawl)
+
+    user_agents = commands.add_parser("user-agents", help="Пересобрать пул User-Agent из fake_useragent")
+    user_agents.set_defaults(handler=run_user_agents)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    if args.command == "crawl":
+        args.sites_file = args.sites_file and os.path.abspath(args.sites_file)
+        args.output_dir = args.output_dir and os.path.abspath(args.output_dir)
+    sys.path.insert(0, PARSERS_DIR)
+    os.chdir(PARSERS_DIR)
+
+    start_time = datetime.now()
+    print(start_time)
+    args.handler(args)
+    delta = datetime.now() - start_time
+    print(delta)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,39 @@
 import asyncio
+import collections
+import itertools
+import multiprocessing
 import random
-import collections  # Импортируем deque
-import re
-from urllib.parse import urlparse, urljoin
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 import requests
 import warnings
 
-from playwright.async_api import async_playwright, ViewportSize, BrowserContext, Playwright, Browser, Page
+from playwright.async_api import async_playwright, ViewportSize, BrowserContext, Playwright, Browser, Route
+from playwright.async_api import Page, Response, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 from urllib3.exceptions import InsecureRequestWarning
 from datetime import datetime
 
+from browser_pool import BrowserPool, ContextPool, PageLost
+from crawl_frontier import FrontierMixin
+from crawl_history import IncrementalMixin
+from crawl_metrics import MetricsMixin
+from crawl_output import OutputMixin
+from crawl_url import URL
+from frontier_store import CheckpointMixin
+import resource_blocker
+from link_extractor import is_url_file
+from near_duplicates import NearDuplicateMixin, parse_page
+from page_archive import ArchiveMixin
+from rate_control import DomainRateController, TRANSIENT_STATUSES
+from resource_blocker import ResourceBlocker
+from response_cache import ResponseCache
+from sitemap_seeder import SitemapMixin
+from url_canonicalizer import CanonicalUrlMixin
+from url_set import make_url_set
+from user_agents import UserAgentPool, load_user_agents
+
 warnings.simplefilter(action='ignore', category=InsecureRequestWarning)
 
 
@@ -20,54 +41,38 @@ class StopProcessingURL(Exception):
     pass
 
 
-class URL:
-    def __init__(self, url: str, response_code: int | None = None, referrers: tuple[str, ...] = tuple()):
-        self._referrers = referrers
-        self._url_parsed = urlparse(url.strip())  # Нормализуем URL сразу
-        self._url_string = self._url_parsed.geturl()  # Кэшируем строку URL
-        self._response_code = response_code
-
-    @property
-    def data(self) -> tuple[str, int | None, tuple[str, ...]]:
-        return self.url, self.response, self.referrers
-
-    @property
-    def domain(self) -> str:
-        return self._url_parsed.netloc
-
-    @property
-    def url(self) -> str:
-        return self._url_string  # Возвращаем кэшированную строку
-
-    @property
-    def response(self) -> int | None:
-        return self._response_code
-
-    @property
-    def referrers(self) -> tuple[str, ...]:
-        return self._referrers
-
-    def set_response(self, response: int) -> None:
-        self._response_code = response
-
-    def __str__(self):
-        return self.url
-
-    # Важно для работы с set
-    def __eq__(self, other):
-        if isinstance(other, URL):
-            return self.url == other.url
-        return False
-
-    def __hash__(self):
-        return hash((self.url, self.referrers))
-
-
-class DomainScanner:
+class DomainScanner(CheckpointMixin, IncrementalMixin, SitemapMixin, OutputMixin, MetricsMixin, CanonicalUrlMixin,
+                    NearDuplicateMixin, ArchiveMixin, FrontierMixin):
     MAX_DEPTH = 10
     DELAY = 0.1  # Небольшая задержка между перед следующим запросом
+    # Темп запросов к домену (см. rate_control): DELAY - начальный интервал, дальше он подстраивается
+    ADAPTIVE_RATE = True  # False - всегда DELAY между запросами
+    MAX_RETRIES = 3  # Повторов временной ошибки (429, 5xx, таймаут) для одного URL
     TIMEOUT = 8_000  # timeout в мс
     VERIFY_REQUESTS = False
+    SEEN_SET = "exact"  # Как хранить встреченные и посещённые URL: exact, hashed, bloom, bloom-disk (см. url_set)
+    LINK_EXTRACTOR = "stream"  # Способ извлечения ссылок: stream (быстрый) или bs4, см. link_extractor
+    # Разбор страниц вне цикла событий: "process" - пул процессов, "thread" - пул потоков, None - в цикле
+    PARSE_EXECUTOR: str | None = "process"
+    PARSE_WORKERS: int | None = None  # None - по числу ядер
+    # Кэш ответов на диске (см. response_cache): None - без кэша
+    HTTP_CACHE_DIR: str | None = None
+    HTTP_CACHE_TTL: float | None = 24 * 3600  # в секундах, None - записи не устаревают
+    HTTP_CACHE_OFFLINE = False  # Отвечать только из кэша, в сеть не ходить
+
+    # Перехват запросов вкладки (см. resource_blocker): что не загружать
+    RESOURCE_BLOCKING = True
+    BLOCK_RESOURCE_TYPES: tuple[str, ...] = resource_blocker.BLOCKED_RESOURCE_TYPES
+    BLOCK_DOMAINS: tuple[str, ...] = resource_blocker.DENY_DOMAINS  # Аналитика, реклама, чаты
+    ALLOW_DOMAINS: tuple[str, ...] = ()  # Эти домены загружаются всегда (например, CDN со скриптами меню)
+    BLOCK_THIRD_PARTY_FRAMES = True  # Чужие iframe
+    BLOCK_THIRD_PARTY = False  # Вообще все запросы к чужим доменам
+
+    # Когда считать страницу готовой: "load" (все ресурсы), "domcontentloaded" (только HTML),
+    # "networkidle" (нет запросов 500 мс) или "links" (в DOM появились ссылки)
+    READINESS = "links"
+    READINESS_BY_DOMAIN: dict[str, str] = {}  # Стратегия для отдельных доменов
+    READINESS_TIMEOUT = 3_000  # мс: сколько ждать networkidle или ссылок после domcontentloaded
     BASE_HEADERS = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
         'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -101,37 +106,80 @@ class DomainScanner:
         '--disable-dev-shm-usage',  # Для Linux систем
     ]
 
-    def __init__(self, start_url: str) -> None:
-        # Инициализация start_url_obj с referrers = (start_url,)
-        self.start_url_obj = URL(start_url, response_code=None, referrers=(start_url,))
+    # Пул контекстов: контекст с вкладкой переиспользуется между URL и пересоздаётся
+    # (с новыми User-Agent и размером окна) после CONTEXT_MAX_PAGES страниц или CONTEXT_MAX_AGE секунд
+    CONTEXT_POOL_SIZE: int | None = None  # None - по одному контексту на вкладку
+    CONTEXT_MAX_PAGES = 50
+    CONTEXT_MAX_AGE = 300  # в секундах
+
+    # Браузеры (см. browser_pool): вкладки делятся между BROWSERS процессами Chromium,
+    # сторож перезапускает упавшие, зависшие и разросшиеся по памяти браузеры
+    BROWSERS = 2
+    BROWSER_MAX_RSS_MB: float | None = 1500  # Память браузера со всеми вкладками, None - без ограничения
+    BROWSER_CHECK_INTERVAL = 10  # в секундах
+    BROWSER_DRAIN_TIMEOUT = 60  # в секундах: сколько ждать вкладки браузера, который уходит на перезапуск
+    BROWSER_HEALTH_TIMEOUT = 10  # в секундах: браузер завис, если не создал контекст за это время
+    MAX_BROWSER_RETRIES = 2  # Сколько раз вернуть в очередь URL, потерянный при падении вкладки или браузера
+
+    def __init__(self, start_url: str, ua: UserAgentPool | None = None) -> None:
+        self._init_canonicalizer()  # Все URL сканирования - в каноническом виде (см. url_canonicalizer)
+        # Стартовая страница - корень дерева сканирования
+        self.start_url_obj = URL(self._canonical(start_url) or start_url.strip())
         self.base_domain = self.start_url_obj.domain
 
         self.playwright: Playwright | None = None
-        self.browser: Browser | None = None
+        self.browser_pool: BrowserPool | None = None
+        self.context_pool: ContextPool | None = None
+        self.parse_executor: Executor | None = None  # Можно передать общий до вызова start
+        self.response_cache: ResponseCache | None = None  # Можно передать общий до вызова start
+        self.resource_blocker = self._create_resource_blocker()
 
-        self.ua = UserAgent(platforms="desktop")  # Фейковый UserAgent
+        self.ua = ua or load_user_agents()  # Пул фейковых User-Agent (можно передать общий)
+        # Темп запросов и повторы ошибок для этого домена
+        self.rate_controller = DomainRateController(self.base_domain, self.DELAY, self.ADAPTIVE_RATE, self.MAX_RETRIES)
 
-        # Используем set для быстрой проверки уже посещенных URL
-        self.visited_urls: set[str] = set()
-        self.visited_url_objs: set[URL] = set()  # Для сохранения полного объекта URL
+        # Уже посещённые URL - в том же виде, что и встреченные (SEEN_SET, см. url_set)
+        # (сами результаты в памяти не хранятся, а сразу уходят в выгрузку - см. crawl_output)
+        self.visited_urls = make_url_set(self.SEEN_SET, path=self._visited_set_path())
 
-        # Используем deque для обхода в ширину (BFS)
-        self.urls_to_visit: collections.deque[URL] = collections.deque()
-        self.urls_to_visit.append(self.start_url_obj)
+        # Все URL, которые уже стояли в очереди или посещены: повторно в очередь не попадут
+        self.seen_urls = make_url_set(self.SEEN_SET, path=self._seen_set_path())
+        self.seen_urls.add(self.start_url_obj.url)
 
-        self.scanned_count = 0  # Счетчик для вывода
+        # Очередь URL (см. crawl_frontier), из неё забирают URL обработчики-вкладки
+        self.urls_to_visit: asyncio.Queue[URL] = self._new_frontier(asynchronous=True)
+        self.urls_to_visit.put_nowait(self.start_url_obj)
+        self.sitemap_lastmod: dict[str, str] = {}  # lastmod из карты сайта для адресов, взятых из неё
 
-        self.semaphore: str = ""  # Тут будут записаны места для процессов 1 - занят; 0 - свободен
+        self.scanned_count = 0  # Счетчик для вывода
+        self.lost_pages: collections.Counter[str] = collections.Counter()  # URL -> сколько раз терялся при падении
+        self._init_near_duplicates()  # Почти одинаковые страницы и размноженные разделы (см. near_duplicates)
+        self._init_frontier()  # Приоритеты очереди и бюджет домена (см. crawl_frontier)
+        self._init_metrics()  # Время этапов, темп и ошибки сканирования (см. crawl_metrics)
 
     async def start_browser(self, headless: bool = True):
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=headless,
-            args=self.BROWSER_ARGS  # Аргументы командной строки для браузера
+        self.browser_pool = await self._create_browser_pool(headless).start()
+
+    def _create_browser_pool(self, headless: bool) -> BrowserPool:
+        async def launch(extra_args: list[str]) -> Browser:
+            return await self.playwright.chromium.launch(
+                headless=headless,
+                args=self.BROWSER_ARGS + extra_args  # Аргументы командной строки для браузера
+            )
+
+        max_rss = self.BROWSER_MAX_RSS_MB
+        return BrowserPool(
+            launch,
+            size=self.BROWSERS,
+            max_rss=int(max_rss * 1024 ** 2) if max_rss is not None else None,
+            check_interval=self.BROWSER_CHECK_INTERVAL,
+            drain_timeout=self.BROWSER_DRAIN_TIMEOUT,
+            health_timeout=self.BROWSER_HEALTH_TIMEOUT,
         )
 
-    async def _get_context(self) -> BrowserContext:
-        return await self.browser.new_context(
+    async def _get_context(self, browser: Browser) -> BrowserContext:
+        context = await browser.new_context(
             viewport=ViewportSize({
                 'width': random.randint(1080, 1920),
                 'height': random.randint(1080, 1920), }),
@@ -140,113 +188,298 @@ class DomainScanner:
             timezone_id='Europe/Moscow',
             extra_http_headers=self.BASE_HEADERS
         )
+        if self.resource_blocker is not None or self.response_cache is not None:
+            await context.route("**/*", self._route_request)
+        if self.resource_blocker is not None:
+            context.on("response", self._count_response)
+        return context
+
+    def _create_resource_blocker(self) -> ResourceBlocker | None:
+        if not self.RESOURCE_BLOCKING:
+            return None
+        return ResourceBlocker(
+            blocked_types=self.BLOCK_RESOURCE_TYPES,
+            deny_domains=self.BLOCK_DOMAINS,
+            allow_domains=self.ALLOW_DOMAINS,
+            block_third_party_frames=self.BLOCK_THIRD_PARTY_FRAMES,
+            block_third_party=self.BLOCK_THIRD_PARTY,
+        )
+
+    async def _route_request(self, route: Route) -> None:
+        """Все запросы вкладки: лишние отсекаются, остальные идут через кэш ответов или в сеть."""
+        request = route.request
+        if self.resource_blocker is not None:
+            try:
+                frame = request.frame
+                page_url = frame.page.url
+                is_main_frame_navigation = request.is_navigation_request() and frame.parent_frame is None
+            except Exception:  # Запрос не из фрейма (например, из service worker)
+                page_url, is_main_frame_navigation = "", False
+            reason = self.resource_blocker.block_reason(
+                request.url, request.resource_type, page_url, is_main_frame_navigation)
+            if reason is not None:
+                self.resource_blocker.count_blocked(reason, request.resource_type)
+                await route.abort("blockedbyclient")
+                return
+
+        if self.response_cache is not None:
+            await self._route_from_cache(route)
+        else:
+            await route.continue_()
+
+    def _count_response(self, response: Response) -> None:
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            self.resource_blocker.count_loaded(response.request.resource_type, int(content_length))
+
+    async def _open_page(self, page: Page, url: str) -> Response | None:
+        """Открывает страницу в темпе домена, повторяя временные ошибки (429, 5xx, таймауты)."""
+        for attempt in itertools.count():
+            pause = self.rate_controller.reserve()
+            self.metrics.observe("pacing", pause)
+            await asyncio.sleep(pause)
+            started = time.monotonic()
+            try:
+                response = await self._goto(page, url)
+            except PlaywrightError as ex_:
+                if page.is_closed():
+                    raise  # Упала вкладка или браузер, а не сайт - темп домена не меняется
+                self.rate_controller.on_error(ex_.__class__.__name__)
+                delay = self.rate_controller.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                status = response.status if response is not None else 200
+                retry_after = self.rate_controller.on_response(
+                    status, time.monotonic() - started, response.headers.get("retry-after") if response else None)
+                if status not in TRANSIENT_STATUSES:
+                    return response
+                delay = self.rate_controller.retry_delay(attempt, retry_after)
+                if delay is None:
+                    return response
+            print(f"Повтор {url} через {delay:.1f} с (попытка {attempt + 2})")
+            await asyncio.sleep(delay)
+
+    async def _goto(self, page: Page, url: str) -> Response | None:
+        """Открывает страницу и ждёт её готовности по стратегии READINESS для домена."""
+        readiness = self.READINESS_BY_DOMAIN.get(self.base_domain, self.READINESS)
+        if readiness in ("load", "domcontentloaded"):
+            with self.metrics.timer("navigation"):
+                response = await page.goto(url, wait_until=readiness, timeout=self.TIMEOUT)
+            self._observe_timing(response)
+            return response
+
+        with self.metrics.timer("navigation"):
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=self.TIMEOUT)
+        self._observe_timing(response)
+        try:
+            with self.metrics.timer("readiness"):
+                if readiness == "networkidle":
+                    await page.wait_for_load_state("networkidle", timeout=self.READINESS_TIMEOUT)
+                elif readiness == "links":
+                    await page.wait_for_selector("a[href]", state="attached", timeout=self.READINESS_TIMEOUT)
+        except PlaywrightTimeoutError:
+            pass  # Не дождались - берём то, что успело отрисоваться
+        return response
+
+    def _observe_timing(self, response: Response | None) -> None:
+        """Разбивка загрузки документа по данным браузера (мс от начала запроса, -1 - этапа не было)."""
+        if response is None:
+            return
+        timing = response.request.timing
+        stages = {
+            "dns": ("domainLookupStart", "domainLookupEnd"),
+            "connect": ("connectStart", "connectEnd"),
+            "tls": ("secureConnectionStart", "connectEnd"),
+            "ttfb": ("requestStart", "responseStart"),
+        }
+        for stage, (start, end) in stages.items():
+            if timing.get(start, -1) >= 0 and timing.get(end, -1) >= timing[start]:
+                self.metrics.observe(stage, (timing[end] - timing[start]) / 1000)
+
+    def _create_response_cache(self) -> ResponseCache | None:
+        if self.HTTP_CACHE_DIR is None:
+            return None
+        return ResponseCache(self.HTTP_CACHE_DIR, ttl=self.HTTP_CACHE_TTL, offline=self.HTTP_CACHE_OFFLINE)
+
+    def _use_response_cache(self, cache: ResponseCache | None) -> None:
+        self.response_cache = cache
+
+    async def _route_from_cache(self, route: Route) -> None:
+        """Отвечает на запросы вкладки из кэша ответов; промахи загружает сам и кладёт в кэш."""
+        request, cache = route.request, self.response_cache
+        cached = cache.get(request.url) if request.method == "GET" else None
+        if cached is not None:
+            await route.fulfill(status=cached.status, headers=cached.headers, body=cached.content)
+            return
+        if cache.offline:
+            await route.abort("internetdisconnected")
+            return
+        if request.method != "GET":
+            await route.continue_()
+            return
+
+        try:
+            # Редиректы проходит сам браузер, а в кэш каждый шаг попадает отдельно
+            response = await route.fetch(max_redirects=0)
+            body = await response.body()
+        except Exception:
+            await route.abort("failed")
+            return
+        cache.put(request.url, response.url, response.status, response.headers, body)
+        await route.fulfill(response=response, body=body)
 
     def _save_data(self):
-        """Сохраняет собранные данные в файл."""
-        # Создаем директорию, если она не существует
-        import os
-        output_dir = f"data/crawled"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        filename = f"{self.base_domain.replace('.', '_')}.txt"
-        filepath = os.path.join(output_dir, filename)
-
-        with open(filepath, "w", encoding="utf-8") as file_out:
-            # Сортируем по URL для предсказуемого порядка
-            sorted_urls = sorted(self.visited_urls)
-            for url in sorted_urls:
-                # Записываем данные в формате, который может быть легко прочитан
-                file_out.write(f"{url}\n")
-        print(f"Данные сохранены в {filepath}")
+        """Дописывает на диск то, что ещё в буфере выгрузки, и печатает итоги по домену."""
+        self._flush_output()
+        if self.crawl_output is not None:
+            print(f"Данные сохранены в {', '.join(self.crawl_output.paths)} ({self.results_count} стр.)")
+        print(f"{self.base_domain}: {self.rate_controller.summary()}")
+        if self.trapped_urls:
+            print(f"{self.base_domain}: {self._traps_summary()}")
+        if self.duplicate_pages:
+            print(f"{self.base_domain}: {self._near_duplicates_summary()}")
+        if self.budget_stop is not None:
+            print(f"{self.base_domain}: остановлено по бюджету ({self.budget_stop})")
 
     def _is_valid_url(self, url_str: str, current_url_obj: URL) -> bool:
         """Проверяет, является ли URL подходящим для дальнейшего сканирования."""
         if (
-                url_str.startswith("http") and
-                len(current_url_obj.referrers) <= self.MAX_DEPTH and  # Проверка глубины парсинга сайта
-                urlparse(url_str).netloc == self.base_domain and  # Проверка домена
-                not any(char in url_str for char in ["%", "#", "&", "?", "@", "="]) and  # Исключаем параметры, якоря
-                url_str not in self.visited_urls
+                current_url_obj.depth <= self.MAX_DEPTH and  # Проверка глубины парсинга сайта
+                self.canonicalizer.host(url_str) == self.base_domain and  # Проверка домена
+                url_str not in self.seen_urls and  # Уже в очереди или посещён
+                url_str not in self.visited_urls and
+                self._robots_allows(url_str) and  # Не запрещён в robots.txt
+                not self._is_trap(url_str)  # Не календарь без конца, не бесконечная пагинация
         ):
             return True
         return False
 
-    def _parse_page_content(self, content: str, request_url: str, referrers: tuple, response_url: str) -> None:
-        def is_url_file(url: str) -> bool:
-            """Проверят, ведёт ли ссылка на файл, ищя расширения фалов в конце"""
-            url = urlparse(url).path.rstrip("/")
-            has_extension = bool(re.search(r'\.[a-zA-Z0-9]{2,6}$', url))
-            return has_extension
-
-        # Парсим HTML, используя response.content для потенциальной экономии памяти
-        soup = BeautifulSoup(content, 'html.parser')
-
-        for link_tag in soup.find_all('a', href=True):
-            href = link_tag['href']
-            absolute_url = urljoin(request_url, href)  # Получаем абсолютный URL
-
-            # Формируем новые referrers
-            new_referrers = referrers
-            if response_url not in referrers:
-                new_referrers = referrers + (request_url,)
-
-            next_url_obj = URL(absolute_url, referrers=new_referrers)
-
+    def _create_parse_executor(self) -> Executor | None:
+        if self.PARSE_EXECUTOR == "process":
+            # spawn, а не fork: в процессе уже работают потоки asyncio и драйвер Playwright
+            return ProcessPoolExecutor(self.PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        if self.PARSE_EXECUTOR == "thread":
+            return ThreadPoolExecutor(self.PARSE_WORKERS)
+        return None
+
+    async def _collect_links(self, content: str,
+                             request_url: str) -> tuple[list[str], list[str], int | None, dict[str, str]]:
+        """
+        Извлекает ссылки страницы (страницы, файлы), считает её отпечаток для поиска почти дублей
+        (см. near_duplicates) и собирает тексты ссылок для приоритета очереди - в пуле, не блокируя цикл событий.
+        """
+        parse = partial(parse_page, content, request_url, self.base_domain, self.canonicalizer,
+                        self.LINK_EXTRACTOR, self.NEAR_DUPLICATES, self.urls_to_visit.prioritized)
+        with self.metrics.timer("parse"):
+            if self.parse_executor is None:
+                return parse()
+            return await asyncio.get_running_loop().run_in_executor(self.parse_executor, parse)
+
+    @staticmethod
+    def _split_links(links: list[str]) -> tuple[list[str], list[str]]:
+        """Разделяет сохранённые ссылки страницы обратно на (страницы, файлы)."""
+        pages, files = [], []
+        for link in links:
+            (files if is_url_file(link) else pages).append(link)
+        return pages, files
+
+    async def _parse_page_content(self, content: str, request_url_obj: URL, response_code: int = 200) -> None:
+        previous_page = self._previous_page(request_url_obj.url)
+        anchors = None
+        if self._is_unchanged(previous_page, response_code, content):
+            pages, files = self._split_links(previous_page.links)  # Та же страница, что в прошлый раз
+        else:
+            pages, files, fingerprint, anchors = await self._collect_links(content, request_url_obj.url)
+            self._record_page(request_url_obj.url, response_code, None, content, pages + files)
+            if self._is_templated_duplicate(request_url_obj.url, fingerprint):
+                self._prune_links(pages + files)  # Почти дубль размноженного шаблона - ссылки ведут на такие же
+                return
+        self._enqueue_links(pages, files, request_url_obj, anchors)
+
+    def _enqueue_links(self, pages: list[str], files: list[str], parent_url_obj: URL,
+                       anchors: dict[str, str] | None = None) -> None:
+        """Ставит в очередь ссылки страницы, прошедшие проверку глубины и посещённости."""
+        for absolute_url in files:
+            file_url_obj = URL(absolute_url, parent=parent_url_obj)
+            if self._is_valid_url(absolute_url, file_url_obj):
+                self.seen_urls.add(absolute_url)
+                self.visited_urls.add(absolute_url)
+                self._add_result(file_url_obj)
+                self._print_progress(absolute_url)
+
+        for absolute_url in pages:
+            next_url_obj = URL(absolute_url, parent=parent_url_obj)
             if self._is_valid_url(next_url_obj.url, next_url_obj):
-                if is_url_file(absolute_url):
-                    self.visited_urls.add(absolute_url)
-                    self._print_progress(absolute_url)
-                    continue
-
-                self.urls_to_visit.append(next_url_obj)
-            else:
-                continue
-
-    async def _new_page(self) -> tuple[Page, BrowserContext]:
-        context = await self._get_context()
-        page = await context.new_page()
-        await page.add_init_script(self.PAGE_INIT_SCRIPT)
-
-        return page, context
+                self.seen_urls.add(next_url_obj.url)
+                self._checkpoint_pending(next_url_obj)
+                if not self._defer(next_url_obj):
+                    self._enqueue(next_url_obj, anchors.get(absolute_url) if anchors else None)
+
+    def _enqueue(self, url_obj: URL, anchor: str | None = None) -> None:
+        self._note_enqueued(url_obj.url)
+        self.urls_to_visit.push(url_obj, self._url_priority(url_obj, anchor))
+
+    def _queue_depth(self) -> int:
+        return self.urls_to_visit.qsize()
+
+    async def _prepare_browser(self, max_concurrent_tabs: int, headless: bool) -> None:
+        await self.start_browser(headless)
+        self.context_pool = self._create_context_pool(max_concurrent_tabs)
+
+    def _create_context_pool(self, max_concurrent_tabs: int) -> ContextPool:
+        return ContextPool(
+            self._get_context,
+            self.browser_pool,
+            size=self.CONTEXT_POOL_SIZE or max_concurrent_tabs,
+            max_pages=self.CONTEXT_MAX_PAGES,
+            max_age=self.CONTEXT_MAX_AGE,
+            init_script=self.PAGE_INIT_SCRIPT,
+        )
 
     async def _process_url(self, request_url_obj: URL) -> None:
         """Обрабатывает один URL: делает запрос, парсит, добавляет ссылки."""
-        async def stop_processing() -> None:
-            self.semaphore = self.semaphore.replace("1", "0", 1)
-            await page.close()
-            await context.close()
-
-        self.semaphore = self.semaphore.replace("0", "1", 1)
-
-        request_url, referrers = request_url_obj.url, request_url_obj.referrers
-
-        page, context = await self._new_page()
+        self._note_dequeued(request_url_obj.url)
+        self._start_budget_clock()
+        await self._render_url(request_url_obj)
+
+    async def _render_url(self, request_url_obj: URL) -> bool:
+        """Открывает URL во вкладке браузера. True - страница получена и записана в выгрузку."""
+        request_url = request_url_obj.url
+        rendered = False
+        with self.metrics.timer("tab_wait"):  # Ожидание свободной вкладки в пуле контекстов
+            pooled = await self.context_pool.acquire()
+        page = pooled.page
 
         try:
+            started = time.monotonic()
             try:
-                response = await page.goto(request_url, wait_until="load", timeout=self.TIMEOUT)
+                response = await self._open_page(page, request_url)
                 # await page.wait_for_selector("xpath=//a[@href]", timeout=self.TIMEOUT)
                 # await page.wait_for_timeout(timeout=self.TIMEOUT)
 
             except Exception as ex_:
+                if self.context_pool.is_lost(pooled):
+                    raise PageLost(request_url) from ex_
                 print(ex_.__class__.__name__)
+                self._add_error(request_url_obj, ex_.__class__.__name__, elapsed=time.monotonic() - started)
+                raise StopProcessingURL
+            elapsed = time.monotonic() - started
 
-            finally:
-                await asyncio.sleep(self.DELAY)
-
-            content = await page.inner_html("html")  # Получаем только HTML без лишних данных
-            print(content + "\n\n\n", file=open("exception.html", "a", encoding="utf-8"))
-            response_url = page.url.strip()
+            with self.metrics.timer("inner_html"):
+                content = await page.inner_html("html")  # Получаем только HTML без лишних данных
+            response_url = self._canonical(page.url) or page.url.strip()
             response_code = response.status
-
-            await page.close()  # Можно закрыть страницу
+            await self._archive_page_async(request_url, response_url, response_code, response.headers, content,
+                                           rendered=True)
 
             # Создаем новый URL-объект с учетом ответа сервера
-            processed_url_obj = URL(response_url, response_code, referrers=referrers)
+            processed_url_obj = request_url_obj.with_response(response_url, response_code)
 
-            self.visited_urls.add(response_url.rstrip("\\/"))  # Добавляем URL после редиректа
-            self.visited_url_objs.add(processed_url_obj)  # Сохраняем полный объект
+            self.visited_urls.add(response_url)  # Добавляем URL после редиректа
+            self._add_result(processed_url_obj, request_url, elapsed, response.headers.get("content-type"),
+                             len(content.encode("utf-8")))
+            rendered = True
 
             self._print_progress(request_url, response_code)
 
@@ -254,52 +487,136 @@ class DomainScanner:
             if processed_url_obj.domain != self.base_domain or "." in response_url.split("/")[-1]:
                 raise StopProcessingURL
 
-            self._parse_page_content(content, request_url, referrers, response_url)
+            await self._parse_page_content(content, request_url_obj, response_code)
             raise StopProcessingURL
 
         except StopProcessingURL:
             pass
 
+        except PageLost:
+            raise  # URL вернётся в очередь (_requeue_lost)
+
         except requests.exceptions.RequestException as ex_:
             # Обработка ошибок запросов
             print(f"Ошибка запроса {request_url}: {ex_}")
             self.visited_urls.add(request_url)
 
         except Exception as ex_:
+            if self.context_pool.is_lost(pooled):
+                raise PageLost(request_url) from ex_
             print(f"Неизвестная ошибка при обработке {request_url}: {ex_}")
             self.visited_urls.add(request_url)  # Добавляем в посещённые, чтобы не повторять
 
         finally:
-            await stop_processing()
+            await self.context_pool.release(pooled)  # Контекст остаётся открытым для следующего URL
+        return rendered
+
+    def _requeue_lost(self, url_obj: URL) -> bool:
+        """
+        URL, потерянный при падении вкладки или браузера, - снова в очередь. False - он терялся
+        уже MAX_BROWSER_RETRIES раз (скорее всего, страница сама роняет вкладку) и записан как ошибка.
+        """
+        self.lost_pages[url_obj.url] += 1
+        if self.lost_pages[url_obj.url] > self.MAX_BROWSER_RETRIES:
+            print(f"{url_obj.url} роняет браузер, пропускаем")
+            self._add_error(url_obj, "BrowserCrash")
+            self.visited_urls.add(url_obj.url)
+            return False
+        print(f"Вкладка с {url_obj.url} потеряна, URL возвращён в очередь")
+        self.visited_urls.discard(url_obj.url)
+        self._requeue(url_obj)
+        return True
+
+    def _requeue(self, url_obj: URL) -> None:
+        self._enqueue(url_obj)
+
+    async def stop_browser(self) -> None:
+        if self.context_pool is not None:
+            await self.context_pool.close()
+            print(f"Создано контекстов браузера: {self.context_pool.created_count}")
+        if self.resource_blocker is not None and self.resource_blocker.blocked:
+            print(f"{self.base_domain}: {self.resource_blocker.summary()}")
+        if self.browser_pool is not None:
+            await self.browser_pool.close()
+            print(f"{self.base_domain}: {self.browser_pool.summary()}")
+        if self.playwright is not None:
+            await self.playwright.stop()
+        self.browser_pool, self.playwright, self.context_pool = None, None, None
+
+    async def _worker(self) -> None:
+        """Одна вкладка: забирает URL из очереди, пока сканирование не закончится."""
+        while True:
+            current_url_obj = await self.urls_to_visit.get()
+            try:
+                if self._budget_exhausted():
+                    continue  # Очередь только опустошается: URL остаётся в сохранённом состоянии
+                url = current_url_obj.url
+                if url not in self.visited_urls:
+                    self.visited_urls.add(url)
+                    with self.metrics.tracking():
+                        await self._process_url(current_url_obj)
+                self._mark_done(current_url_obj)
+
+            except PageLost:
+                if not self._requeue_lost(current_url_obj):
+                    self._mark_done(current_url_obj)
 
-    async def start(self, max_concurrent_tabs):
+            except Exception as ex_:
+                print(f"Ошибка в обработчике {current_url_obj.url}: {ex_}")
+
+            finally:
+                self.urls_to_visit.task_done()
+
+    async def start(self, max_concurrent_tabs, headless: bool = False):
+        workers: list[asyncio.Task] = []
+        finished = False
+        owns_executor = self.parse_executor is None
+        if owns_executor:
+            self.parse_executor = self._create_parse_executor()
+        owns_cache = self.response_cache is None
+        if owns_cache:
+            self._use_response_cache(self._create_response_cache())
+        monitor = self._start_monitoring()
+        profiler = self._start_profile()
         try:
             print(f"Начинаем сканирование с URL: {self.start_url_obj.url} на домене: {self.base_domain}")
-            self.semaphore = "0" * max_concurrent_tabs
-            await self.start_browser(False)
-
-            async with asyncio.TaskGroup() as task_group:
-                while self.urls_to_visit or "1" in self.semaphore:  # Пока есть непосещённые url или активные процессы парсинга
-                    if "0" in self.semaphore:  # Если есть свободный процесс
-
-                        if self.urls_to_visit:  # Если есть что парсить
-                            current_url_obj = self.urls_to_visit.popleft()
-                            url = current_url_obj.url
+            self._open_checkpoint()
+            self._open_history()
+            self._open_output()
+            self._open_archive()
+            await self._seed_async()
+            await self._prepare_browser(max_concurrent_tabs, headless)
 
-                            if url not in self.visited_urls:
-                                self.visited_urls.add(url.rstrip("\\/"))
-                                task_group.create_task(self._process_url(current_url_obj))
+            workers = [asyncio.create_task(self._worker()) for _ in range(max_concurrent_tabs)]
 
-                    await asyncio.sleep(0.01)
+            # Очередь пуста и все взятые из неё URL обработаны (task_done) - сканирование закончено
+            await self.urls_to_visit.join()
+            while not self._budget_exhausted() and self._release_deferred():  # Размноженные разделы - в конце
+                await self.urls_to_visit.join()
+            finished = self.budget_stop is None  # Остановленное по бюджету продолжится при следующем запуске
 
             print("\nСканирование завершено.")
-            print(self.urls_to_visit)
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\nСканирование прервано пользователем.")
 
         finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._stop_profile(profiler)
+            monitor.stop()
+            await self.stop_browser()
+            if owns_executor and self.parse_executor is not None:
+                self.parse_executor.shutdown(cancel_futures=True)
+                self.parse_executor = None
             self._save_data()
+            self._close_checkpoint(finished)  # Прерванное сканирование продолжится при следующем запуске
+            self._close_history(finished)
+            self._close_output()
+            await self._close_archive_async()
+            if owns_cache and self.response_cache is not None:
+                self.response_cache.close()
 
     def _print_progress(self, url, response_code=-1):
         self.scanned_count += 1
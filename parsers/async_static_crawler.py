@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+
+import site_crawler
+from site_crawler import URL
+from http_fetcher import AsyncFetcher
+
+
+class DomainScanner(site_crawler.DomainScanner):
+    """
+    Асинхронный вариант site_crawler.DomainScanner: те же URL, проверки и формат выгрузки,
+    но страницы загружаются параллельно через общий пул соединений AsyncFetcher.
+    """
+    CONCURRENCY = 16  # Сколько страниц домена загружается одновременно
+
+    def __init__(self, start_url: str, ua=None) -> None:
+        super().__init__(start_url, ua=ua)
+        self.session.close()  # Синхронная сессия не нужна - запросы идут через fetcher
+
+        self.fetcher: AsyncFetcher | None = None  # Можно передать общий до вызова start
+
+        # Очередь URL (см. crawl_frontier), из неё забирают URL обработчики
+        self.urls_to_visit: asyncio.Queue[URL] = self._new_frontier(asynchronous=True)
+        self.urls_to_visit.put_nowait(self.start_url_obj)
+
+    def _create_fetcher(self, concurrency: int) -> AsyncFetcher:
+        return AsyncFetcher(
+            headers=self.BASE_HEADERS,
+            timeout=self.TIMEOUT,
+            verify=self.VERIFY_REQUESTS,
+            max_connections_per_host=concurrency,
+            cache=self.response_cache,
+        )
+
+    def _enqueue(self, url_obj: URL, anchor: str | None = None) -> None:
+        self._note_enqueued(url_obj.url)
+        self.urls_to_visit.push(url_obj, self._url_priority(url_obj, anchor))
+
+    def _queue_depth(self) -> int:
+        return self.urls_to_visit.qsize()
+
+    async def _process_url(self, request_url_obj: URL) -> None:
+        """Обрабатывает один URL: делает запрос, парсит, добавляет ссылки."""
+        request_url = request_url_obj.url
+        self._note_dequeued(request_url)
+        self._start_budget_clock()
+
+        if request_url in self.visited_urls:
+            return
+
+        if "." in request_url.split("/")[-1]:
+            self.visited_urls.add(request_url)
+            self._add_result(request_url_obj)
+
+            self.scanned_count += 1
+            print(
+                f"{self.scanned_count}) Посещаем {request_url}"
+            )
+            return
+
+        self.visited_urls.add(request_url)  # Сразу, чтобы параллельный обработчик не взял тот же URL
+
+        try:
+            previous_page = self._previous_page(request_url)  # Инкрементальный режим: что было в прошлый раз
+            request_headers = {'User-Agent': self.ua.random, **self._conditional_headers(previous_page)}
+            response = await self.fetcher.fetch_with_retries(request_url, self.rate_controller,
+                                                             headers=request_headers)
+            if response.status >= 400:
+                print(f"Ошибка запроса {request_url}: статус {response.status}")
+                self._add_error(request_url_obj, "HTTPStatusError", response.status, response.elapsed)
+                return
+            unchanged = self._is_unchanged(previous_page, response.status, response.content)
+
+            response_url = self._canonical(response.url) or response.url.strip()
+            response_code = previous_page.response if response.status == 304 else response.status
+
+            # Создаем новый URL-объект с учетом ответа сервера
+            processed_url_obj = request_url_obj.with_response(response_url, response_code)
+
+            self.visited_urls.add(response_url)  # Добавляем URL после редиректа
+            self._add_result(processed_url_obj, request_url, response.elapsed, response.content_type,
+                             len(response.content))
+            if response.status != 304:
+                await self._archive_page_async(request_url, response_url, response.status,
+                                               response.headers.multi_items(), response.content,
+                                               {**self.fetcher.client.headers, **request_headers})
+
+            self.scanned_count += 1
+            print(
+                f"{self.scanned_count}) Посещаем {request_url} | "
+                f"status:{response_code} | {response.http_version}"
+            )
+
+            # Если домен отличается или мы наткнулись на файл, прекращаем обработку этой ветки
+            if processed_url_obj.domain != self.base_domain or "." in response_url.split("/")[-1]:
+                return
+
+            duplicate = False
+            anchors = {} if self.urls_to_visit.prioritized else None  # Тексты ссылок - для приоритета
+            if unchanged:
+                links = previous_page.links  # Страница не изменилась с прошлого запуска - не разбираем
+            elif response.is_html:
+                with self.metrics.timer("parse"):
+                    links = self._extract_links(response.content, request_url, anchors)
+                with self.metrics.timer("fingerprint"):
+                    duplicate = self._is_templated_duplicate(response_url, self._page_fingerprint(response.content))
+            else:
+                return
+            self._record_page(request_url, response.status, response.headers, response.content, links)
+            if duplicate:
+                self._prune_links(links)  # Почти дубль размноженного шаблона - его ссылки ведут на такие же страницы
+            else:
+                self._enqueue_links(links, request_url_obj, anchors)
+
+        except httpx.HTTPError as ex_:
+            # Обработка ошибок запросов
+            print(f"Ошибка запроса {request_url}: {ex_.__class__.__name__} {ex_}")
+            self._add_error(request_url_obj, ex_.__class__.__name__)
+
+        except Exception as ex_:
+            print(f"Неизвестная ошибка при обработке {request_url}: {ex_}")
+
+    async def _worker(self) -> None:
+        while True:
+            current_url_obj = await self.urls_to_visit.get()
+            try:
+                if self._budget_exhausted():
+                    continue  # Очередь только опустошается: URL остаётся в сохранённом состоянии
+                with self.metrics.tracking():
+                    await self._process_url(current_url_obj)
+                self._mark_done(current_url_obj)
+            finally:
+                self.urls_to_visit.task_done()
+
+    async def start(self, concurrency: int | None = None) -> None:
+        """Запускает процесс сканирования."""
+        concurrency = concurrency or self.CONCURRENCY
+        owns_cache = self.response_cache is None
+        if owns_cache:
+            self._use_response_cache(self._create_response_cache())
+        owns_fetcher = self.fetcher is None
+        if owns_fetcher:
+            self.fetcher = self._create_fetcher(concurrency)
+            self.fetcher.metrics = self.metrics
+
+        workers: list[asyncio.Task] = []
+        finished = False
+        monitor = self._start_monitoring()
+        profiler = self._start_profile()
+        try:
+            print(f"Начинаем сканирование с URL: {self.start_url_obj.url} на домене: {self.base_domain}")
+            self._open_checkpoint()
+            self._open_history()
+            self._open_output()
+            self._open_archive()
+            await self._seed_async()
+            workers = [asyncio.create_task(self._worker()) for _ in range(concurrency)]
+            await self.urls_to_visit.join()
+            while not self._budget_exhausted() and self._release_deferred():  # Размноженные разделы - в конце
+                await self.urls_to_visit.join()
+            finished = self.budget_stop is None  # Остановленное по бюджету продолжится при следующем запуске
+            print("\nСканирование завершено.")
+
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("\nСканирование прервано пользователем.")
+
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._stop_profile(profiler)
+            monitor.stop()
+            if owns_fetcher:
+                await self.fetcher.close()
+            self._save_data()
+            self._close_checkpoint(finished)  # Прерванное сканирование продолжится при следующем запуске
+            self._close_history(finished)
+            self._close_output()
+            await self._close_archive_async()
+            if owns_cache and self.response_cache is not None:
+                self.response_cache.close()
+
+
+async def main():
+    ds = DomainScanner("https://www.vtb.ru/")
+    await ds.start()
+
+
+if __name__ == '__main__':
+    start_time = datetime.now()
+    print(start_time)
+    asyncio.run(main())
+    delta = datetime.now() - start_time
+    print(delta)
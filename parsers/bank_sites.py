@@ -1,58 +1,109 @@
-import requests
+import asyncio
+from datetime import datetime
+
+import httpx
 from bs4 import BeautifulSoup
 
+from http_fetcher import AsyncFetcher
+from response_cache import ResponseCache
+
+MAINFIN_URL = "https://mainfin.ru"
+LIST_PAGES = 18  # Страниц в каталоге банков mainfin.ru/banki
+CONCURRENCY = 8  # Одновременных запросов к mainfin.ru
+CACHE_DIR = "data/mainfin_cache"  # Кэш ответов (response_cache): повторный запуск не ходит в сеть
+
+LINKS_FILE = "data/all_links_to_mainfin.txt"
+NAMES_FILE = "data/all_bank_names.txt"
+SITES_FILE = "data/all_bank_sites.txt"
+
+
+async def fetch_html(fetcher: AsyncFetcher, path: str) -> str:
+    """Возвращает HTML страницы mainfin.ru ("" - при ошибке)."""
+    try:
+        response = await fetcher.fetch(f"{MAINFIN_URL}/{path.lstrip('/')}")
+    except httpx.HTTPError as ex_:
+        print(f"Ошибка запроса {path}: {ex_.__class__.__name__} {ex_}")
+        return ""
+    if response.status >= 400:
+        print(f"Ошибка запроса {path}: статус {response.status}")
+        return ""
+    return response.text
+
+
+def parse_list_page(html: str) -> list[str]:
+    """Ссылки вида /bank/<name> из таблицы банков на странице каталога."""
+    body = BeautifulSoup(html, 'html.parser').find("tbody")
+    if body is None:
+        return []
+    links = body.find_all('a', href=lambda href: href and href.startswith('/bank') and href.count('/') == 2)
+    return [link['href'] for link in links]
+
+
+def parse_bank_page(html: str) -> tuple[str | None, str | None]:
+    """Название банка и адрес его сайта со страницы банка на mainfin.ru."""
+    bank_name, bank_url = None, None
+    for container in BeautifulSoup(html, 'html.parser').find_all('div', attrs={'class': 'container'}):
+        about_bank = container.find('h1')
+        if about_bank and bank_name is None:
+            bank_name = about_bank.text
+        about_bank = container.find('div', attrs={'class': 'row about-bank-table'})
+        if about_bank and bank_url is None:
+            site_link = about_bank.find('a', target='_blank')
+            if site_link is not None:
+                bank_url = site_link.attrs['href']
+    return bank_name, bank_url
+
+
+async def find_links_to_mainfin(fetcher: AsyncFetcher) -> list[str]:
+    """Ссылки на страницы всех банков каталога; страницы каталога загружаются параллельно."""
+    pages = await asyncio.gather(*(fetch_html(fetcher, f"banki?page={i}") for i in range(1, LIST_PAGES + 1)))
+    return sorted({link for html in pages for link in parse_list_page(html)})
+
+
+async def find_bank_info(fetcher: AsyncFetcher, link: str) -> tuple[str | None, str | None]:
+    return parse_bank_page(await fetch_html(fetcher, link))
+
+
+async def harvest_mainfin(concurrency: int = CONCURRENCY,
+                          cache_dir: str | None = CACHE_DIR,
+                          offline: bool = False) -> None:
+    """
+    Собирает каталог банков mainfin.ru за один проход: каждая страница банка загружается
+    один раз (через общий пул соединений), из неё сразу берутся и название, и сайт банка.
+    Пишет все три файла: ссылки на mainfin.ru, названия банков и их сайты.
+    cache_dir=None - без кэша; offline=True - только из кэша, без сети.
+    """
+    cache = ResponseCache(cache_dir, ttl=None, offline=offline) if cache_dir is not None else None
+    try:
+        async with AsyncFetcher(max_connections=concurrency, max_connections_per_host=concurrency,
+                                cache=cache) as fetcher:
+            all_links = await find_links_to_mainfin(fetcher)
+            print(f"Банков в каталоге: {len(all_links)}")
+            if not all_links:
+                print("Каталог не загрузился, файлы данных не перезаписываем")
+                return
+            bank_infos = await asyncio.gather(*(find_bank_info(fetcher, link) for link in all_links))
+    finally:
+        if cache is not None:
+            cache.close()
+
+    with open(LINKS_FILE, "w", encoding="utf-8") as f_links, \
+            open(NAMES_FILE, "w", encoding="utf-8") as f_names, \
+            open(SITES_FILE, "w", encoding="utf-8") as f_sites:
+        for link, (bank_name, bank_url) in zip(all_links, bank_infos):
+            print(link, file=f_links)
+            if bank_name is None or bank_url is None:
+                print(f"{link}: не найдено {'название' if bank_name is None else 'сайт'} банка")
+            if bank_name is not None:
+                print(bank_name, file=f_names)
+            if bank_url is not None:
+                print(bank_url, file=f_sites)
+    print(f"Данные сохранены в {LINKS_FILE}, {NAMES_FILE}, {SITES_FILE}")
+
 
-def find_links_to_mainfin():
-    all_links = set()
-
-    for i in range(1, 19):
-        url = f"https://mainfin.ru/banki?page={i}"
-
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        body = soup.find("tbody")
-
-        links = body.find_all('a', href=lambda href: href and href.startswith('/bank') and href.count('/') == 2)
-        for link in links:
-            all_links.add(link['href'])
-
-        for link in links:
-            print(link['href'])
-            print(link.get_text(strip=True))
-        print("-" * 100)
-
-    print(len(all_links))
-    with open("data/all_links_to_mainfin.txt", "w", encoding="utf-8") as f:
-        for link in sorted(all_links):
-            print(link, file=f)
-
-
-def find_bank_names():
-    with open("data/all_links_to_mainfin.txt", "r", encoding="utf-8") as f, \
-            open("data/all_bank_names.txt", "w", encoding="utf-8") as f_out:
-        all_links = list(map(str.strip, f.readlines()))
-        for link in all_links:
-            response = requests.get(f"https://mainfin.ru/{link}")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            containers = soup.find_all('div', attrs={'class': 'container'})
-            for container in containers:
-                about_bank = container.find('h1')
-                if about_bank:
-                    bank_name = about_bank.text
-                    print(bank_name)
-                    print(bank_name, file=f_out)
-
-
-def find_bank_urls():
-    with open("data/all_links_to_mainfin.txt", "r", encoding="utf-8") as f, \
-            open("data/all_bank_sites.txt", "w", encoding="utf-8") as f_out:
-        all_links = list(map(str.strip, f.readlines()))
-        for link in all_links:
-            response = requests.get(f"https://mainfin.ru/{link}")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            containers = soup.find_all('div', attrs={'class': 'container'})
-            for container in containers:
-                about_bank = container.find('div', attrs={'class': 'row about-bank-table'})
-                if about_bank:
-                    bank_url = about_bank.find('a', target='_blank').attrs['href']
-                    print(bank_url, file=f_out)
+if __name__ == '__main__':
+    start_time = datetime.now()
+    print(start_time)
+    asyncio.run(harvest_mainfin())
+    delta = datetime.now() - start_time
+    print(delta)
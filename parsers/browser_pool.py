@@ -0,0 +1,343 @@
+"""
+Браузеры и контексты для динамических сканеров.
+
+BrowserPool - несколько процессов Chromium, между которыми распределяются вкладки. Падение
+одного браузера теряет только его вкладки, а не все. Сторож (watchdog) раз в check_interval секунд:
+- перезапускает браузер, который отключился или не отвечает (не создаёт контекст за health_timeout);
+- следит за памятью (RSS браузера и всех его процессов вкладок): за max_rss браузер больше
+  не получает новых контекстов, а когда его вкладки доработают (или через drain_timeout) -
+  перезапускается. Так память долгого сканирования не растёт.
+ContextPool - контексты с одной вкладкой, которые переиспользуются между URL; контекст
+создаётся в наименее загруженном браузере. Контекст упавшего или перезапущенного браузера
+считается потерянным (is_lost) - сканер возвращает такие URL в очередь.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+if TYPE_CHECKING:  # Playwright нужен только для аннотаций: PageLost ловит и статический планировщик
+    from playwright.async_api import Browser, BrowserContext, Page
+
+
+class PageLost(Exception):
+    """Вкладка или браузер упали, пока открывалась страница: URL нужно обработать заново."""
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _read_proc(path: str) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8", errors="replace")
+    except OSError:  # Процесс уже завершился или /proc нет (не Linux)
+        return None
+
+
+def find_process(marker: str) -> int | None:
+    """pid главного процесса браузера: в его командной строке есть marker, а --type= (процесса вкладки) нет."""
+    if not os.path.isdir("/proc"):
+        return None
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        cmdline = _read_proc(f"/proc/{pid}/cmdline")
+        if cmdline and marker in cmdline and "--type=" not in cmdline:
+            return int(pid)
+    return None
+
+
+def process_tree_rss(pid: int) -> int | None:
+    """RSS процесса и всех его потомков в байтах (общие страницы памяти считаются в каждом); None - нет /proc."""
+    children: dict[int, list[int]] = {}
+    for child in filter(str.isdigit, os.listdir("/proc")):
+        stat = _read_proc(f"/proc/{child}/stat")
+        if stat:
+            parent = int(stat.rpartition(")")[2].split()[1])  # Имя процесса в скобках может содержать пробелы
+            children.setdefault(parent, []).append(int(child))
+    total, stack, found = 0, [pid], False
+    while stack:
+        current = stack.pop()
+        statm = _read_proc(f"/proc/{current}/statm")
+        if statm:
+            found = True
+            total += int(statm.split()[1]) * _PAGE_SIZE
+        stack.extend(children.get(current, ()))
+    return total if found else None
+
+
+class BrowserHandle:
+    """Один процесс браузера в BrowserPool; после перезапуска - тот же handle со следующим generation."""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.browser: Browser | None = None
+        self.generation = 0  # Растёт с каждым запуском: контексты прошлых запусков - потеряны
+        self.marker = ""  # Метка в командной строке, по которой находится процесс браузера
+        self.pid: int | None = None
+        self.in_use = 0  # Контекстов этого запуска, выданных вкладкам
+        self.crashed = False
+        self.draining_since: float | None = None  # Когда перестал получать новые контексты
+        self.restarts = 0
+
+    @property
+    def draining(self) -> bool:
+        return self.draining_since is not None
+
+    def is_alive(self) -> bool:
+        return self.browser is not None and not self.crashed and self.browser.is_connected()
+
+    def rss(self) -> int | None:
+        if self.pid is None:
+            self.pid = find_process(self.marker)
+        return process_tree_rss(self.pid) if self.pid is not None else None
+
+
+class BrowserPool:
+    """Несколько браузеров со сторожем (см. описание модуля)."""
+
+    def __init__(self,
+                 launcher: Callable[[list[str]], Awaitable[Browser]],
+                 size: int = 2,
+                 max_rss: int | None = 1536 * 1024 ** 2,
+                 check_interval: float = 10,
+                 drain_timeout: float = 60,
+                 health_timeout: float = 10) -> None:
+        self.launcher = launcher  # Запускает браузер с дополнительными аргументами командной строки
+        self.max_rss = max_rss  # Байт на браузер со всеми его вкладками; None - без ограничения
+        self.check_interval = check_interval
+        self.drain_timeout = drain_timeout
+        self.health_timeout = health_timeout
+        self.handles = [BrowserHandle(index) for index in range(size)]
+        self.peak_rss = 0
+        self.restart_reasons: dict[str, int] = {}
+        self._watchdog: asyncio.Task | None = None
+        self._restarting: set[BrowserHandle] = set()
+
+    async def start(self) -> "BrowserPool":
+        await asyncio.gather(*(self._launch(handle) for handle in self.handles))
+        self._watchdog = asyncio.create_task(self._watch())
+        return self
+
+    async def _launch(self, handle: BrowserHandle) -> None:
+        handle.generation += 1
+        handle.marker = f"--bankselect-browser={uuid.uuid4().hex}"  # Chromium не знает этот ключ и пропускает его
+        handle.browser = await self.launcher([handle.marker])
+        handle.pid, handle.in_use, handle.crashed, handle.draining_since = None, 0, False, None
+        generation = handle.generation
+        handle.browser.on("disconnected", lambda _: self._on_disconnected(handle, generation))
+
+    def _on_disconnected(self, handle: BrowserHandle, generation: int) -> None:
+        if handle.generation == generation and handle not in self._restarting:
+            handle.crashed = True
+            print(f"Браузер {handle.index} отключился, его вкладки вернутся в очередь")
+
+    async def pick(self) -> BrowserHandle:
+        """Браузер для нового контекста: живой, не уходящий на перезапуск, с наименьшим числом вкладок."""
+        while True:
+            alive = [handle for handle in self.handles if handle.is_alive()]
+            if alive:
+                candidates = [handle for handle in alive if not handle.draining] or alive
+                return min(candidates, key=lambda handle: handle.in_use)
+            # Упали все браузеры - не ждём сторожа
+            crashed = [handle for handle in self.handles if handle not in self._restarting]
+            if crashed:
+                await self.restart(crashed[0], "crash")
+            else:
+                await asyncio.sleep(0.1)
+
+    async def restart(self, handle: BrowserHandle, reason: str) -> None:
+        if handle in self._restarting:
+            return
+        self._restarting.add(handle)
+        try:
+            handle.restarts += 1
+            self.restart_reasons[reason] = self.restart_reasons.get(reason, 0) + 1
+            print(f"Перезапуск браузера {handle.index} ({reason}), вкладок в работе: {handle.in_use}")
+            old = handle.browser
+            handle.browser = None
+            if old is not None:
+                try:
+                    await old.close()
+                except Exception as ex_:
+                    print(f"Ошибка при закрытии браузера {handle.index}: {ex_.__class__.__name__}")
+            await self._launch(handle)
+        finally:
+            self._restarting.discard(handle)
+
+    async def _responds(self, handle: BrowserHandle) -> bool:
+        try:
+            context = await asyncio.wait_for(handle.browser.new_context(), self.health_timeout)
+            await context.close()
+            return True
+        except Exception:
+            return False
+
+    async def check(self) -> None:
+        """Один обход сторожа: перезапускает упавшие, зависшие и переросшие max_rss браузеры."""
+        for handle in self.handles:
+            if handle in self._restarting:
+                continue
+            if not handle.is_alive():
+                await self.restart(handle, "crash")
+                continue
+            if handle.draining:
+                if handle.in_use == 0 or time.monotonic() - handle.draining_since >= self.drain_timeout:
+                    await self.restart(handle, "memory")
+                continue
+            if not await self._responds(handle):
+                await self.restart(handle, "hang")
+                continue
+            rss = handle.rss()
+            if rss is None:
+                continue
+            self.peak_rss = max(self.peak_rss, rss)
+            if self.max_rss is not None and rss > self.max_rss:
+                print(f"Браузер {handle.index}: {rss / 1024 ** 2:.0f} МБ памяти, больше не получает вкладок")
+                handle.draining_since = time.monotonic()
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception as ex_:
+                print(f"Ошибка сторожа браузеров: {ex_.__class__.__name__} {ex_}")
+
+    def total_rss(self) -> int:
+        return sum(rss for rss in (handle.rss() for handle in self.handles if handle.is_alive()) if rss)
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in self.restart_reasons.items()) or "нет"
+        return (f"браузеров {len(self.handles)}, перезапусков {sum(handle.restarts for handle in self.handles)} "
+                f"({reasons}), пик памяти браузера {self.peak_rss / 1024 ** 2:.0f} МБ")
+
+    async def close(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            await asyncio.gather(self._watchdog, return_exceptions=True)
+        for handle in self.handles:
+            self._restarting.add(handle)  # Закрытие - не падение
+            if handle.browser is not None:
+                try:
+                    await handle.browser.close()
+                except Exception as ex_:
+                    print(f"Ошибка при закрытии браузера {handle.index}: {ex_.__class__.__name__}")
+                handle.browser = None
+
+
+class PooledContext:
+    """Контекст браузера с одной вкладкой, который переиспользуется между URL."""
+
+    def __init__(self, context: BrowserContext, page: Page, handle: BrowserHandle | None = None) -> None:
+        self.context = context
+        self.page = page
+        self.handle = handle  # Браузер контекста (None - контекст не из BrowserPool)
+        self.generation = handle.generation if handle is not None else 0
+        self.pages_served = 0  # Сколько URL уже открыто в этом контексте
+        self.created_at = time.monotonic()
+        self.broken = False  # Вкладка упала/закрылась - контекст нужно пересоздать
+        page.on("crash", lambda _: setattr(self, "broken", True))
+
+    def is_lost(self) -> bool:
+        """Вкладка или весь её браузер упали (или браузер перезапущен): открытая в ней страница потеряна."""
+        if self.broken or self.page.is_closed():
+            return True
+        handle = self.handle
+        return handle is not None and (handle.generation != self.generation or not handle.is_alive())
+
+    def is_expired(self, max_pages: int, max_age: float) -> bool:
+        return (
+                self.is_lost() or
+                (self.handle is not None and self.handle.draining) or
+                self.pages_served >= max_pages or
+                time.monotonic() - self.created_at >= max_age
+        )
+
+    async def close(self) -> None:
+        if self.handle is not None and self.handle.generation != self.generation:
+            return  # Браузер уже перезапущен - контекст закрылся вместе с ним
+        try:
+            await self.context.close()
+        except Exception as ex_:
+            print(f"Ошибка при закрытии контекста: {ex_.__class__.__name__}")
+
+
+class ContextPool:
+    """
+    Пул контекстов браузера.
+    Контекст (и его вкладка) живёт max_pages страниц или max_age секунд, после чего
+    пересоздаётся - в этот момент меняются отпечатки (User-Agent, размер окна).
+    Контекст создаётся в браузере, который выбирает browser_pool (см. BrowserPool.pick).
+    """
+
+    def __init__(self,
+                 context_factory: Callable[[Browser], Awaitable[BrowserContext]],
+                 browser_pool: BrowserPool,
+                 size: int,
+                 max_pages: int,
+                 max_age: float,
+                 init_script: str | None = None) -> None:
+        self.context_factory = context_factory
+        self.browser_pool = browser_pool
+        self.size = size
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.init_script = init_script
+
+        self.created_count = 0  # Сколько контекстов создано за всё время (для статистики)
+
+        # Свободные места пула: None - место ещё не занято контекстом
+        self._free: asyncio.Queue[PooledContext | None] = asyncio.Queue()
+        for _ in range(size):
+            self._free.put_nowait(None)
+        self._all: set[PooledContext] = set()
+
+    async def _create(self) -> PooledContext:
+        handle = await self.browser_pool.pick()
+        context = await self.context_factory(handle.browser)
+        if self.init_script:
+            await context.add_init_script(self.init_script)  # Один раз на контекст, а не на каждую вкладку
+        page = await context.new_page()
+        self.created_count += 1
+        pooled = PooledContext(context, page, handle)
+        self._all.add(pooled)
+        return pooled
+
+    async def _discard(self, pooled: PooledContext) -> None:
+        self._all.discard(pooled)
+        await pooled.close()
+
+    async def acquire(self) -> PooledContext:
+        """Забирает свободный контекст из пула, при необходимости создавая новый."""
+        pooled = await self._free.get()
+        try:
+            if pooled is not None and pooled.is_expired(self.max_pages, self.max_age):
+                await self._discard(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = await self._create()
+        except BaseException:
+            self._free.put_nowait(None)  # Не теряем место в пуле, если создать контекст не вышло
+            raise
+        pooled.handle.in_use += 1
+        return pooled
+
+    async def release(self, pooled: PooledContext) -> None:
+        """Возвращает контекст в пул; отработавший своё контекст сразу закрывается."""
+        if pooled.handle.generation == pooled.generation:
+            pooled.handle.in_use -= 1
+        pooled.pages_served += 1
+        if pooled.is_expired(self.max_pages, self.max_age):
+            await self._discard(pooled)
+            pooled = None
+        self._free.put_nowait(pooled)
+
+    def is_lost(self, pooled: PooledContext) -> bool:
+        return pooled.is_lost()
+
+    async def close(self) -> None:
+        for pooled in list(self._all):
+            await self._discard(pooled)
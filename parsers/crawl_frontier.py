@@ -0,0 +1,202 @@
+"""
+Очередь URL сканирования (frontier) и бюджет домена.
+
+fifo     - обход в ширину: URL обрабатываются в порядке постановки в очередь;
+priority - сначала самые полезные URL (меньший приоритет - раньше), при равном приоритете -
+           в порядке постановки. Приоритет считает сканер (FrontierMixin._url_priority):
+           глубина, шаблон адреса (продукты и тарифы - раньше, новости и архивы - позже),
+           текст ссылки, свежесть lastmod из карты сайта; адреса размноженных разделов
+           (см. near_duplicates) - после всего остального.
+У каждой очереди два варианта: для синхронного сканера (append/popleft, как у deque)
+и для асинхронных (asyncio.Queue). Приоритет передаётся в push; append и put_nowait
+без приоритета ставят URL с нулевым.
+
+Бюджет домена на один запуск - страниц, байт и секунд (MAX_PAGES, MAX_BYTES, MAX_CRAWL_TIME).
+Когда он исчерпан, сканер больше не берёт URL из очереди: необработанные URL остаются
+в сохранённом состоянии (см. frontier_store), и следующий запуск продолжит с них.
+"""
+import asyncio
+import collections
+import heapq
+import itertools
+import re
+import time
+from datetime import date
+from urllib.parse import unquote
+
+from near_duplicates import path_pattern
+
+# Добавки к приоритету по адресу и тексту ссылки: отрицательная - раньше, положительная - позже.
+# Учитываются все совпавшие выражения
+PRIORITY_PATTERNS: tuple[tuple[str, float], ...] = (
+    (r"кредит|credit|kredit|loan|займ|zaym", -3),
+    (r"ипотек|ipotek|mortgage", -3),
+    (r"вклад|vklad|deposit|depozit|сбережен|saving", -3),
+    (r"тариф|tarif|ставк|stavk|rates|комисси|komiss|условия|uslovi", -3),
+    (r"карт[аы]|karty?\b|cards?\b", -2),
+    (r"курс|kurs|валют|valyut|currency|exchange", -1),
+    (r"новост|novost|news|пресс|press|media|медиа|blog|блог", 4),
+    (r"архив|arhiv|archive|/20\d\d/", 4),
+    (r"событ|sobyti|event|ваканс|vakans|vacanc|карьер|karer|career|investor|раскрыти|raskryt|disclosure", 3),
+    (r"[?&](page|pagen_\d+|p)=\d", 2),  # Дальние страницы списков
+)
+ANCHOR_MAX_LENGTH = 100  # Сколько символов текста ссылки учитывать
+
+
+class FifoFrontier(collections.deque):
+    prioritized = False
+
+    def push(self, url_obj, priority: float = 0.0) -> None:
+        self.append(url_obj)
+
+
+class PriorityFrontier:
+    prioritized = True
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, object]] = []
+        self._order = itertools.count()  # При равном приоритете - в порядке постановки
+
+    def push(self, url_obj, priority: float = 0.0) -> None:
+        heapq.heappush(self._heap, (priority, next(self._order), url_obj))
+
+    def append(self, url_obj) -> None:
+        self.push(url_obj)
+
+    def popleft(self):
+        return heapq.heappop(self._heap)[2]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class AsyncFifoFrontier(asyncio.Queue):
+    prioritized = False
+
+    def push(self, url_obj, priority: float = 0.0) -> None:
+        self.put_nowait(url_obj)
+
+
+class AsyncPriorityFrontier(asyncio.Queue):
+    prioritized = True
+
+    def _init(self, maxsize: int) -> None:
+        self._queue: list[tuple[float, int, object]] = []
+        self._order = itertools.count()
+
+    def _put(self, item) -> None:
+        priority, url_obj = item if isinstance(item, tuple) else (0.0, item)
+        heapq.heappush(self._queue, (priority, next(self._order), url_obj))
+
+    def _get(self):
+        return heapq.heappop(self._queue)[2]
+
+    def push(self, url_obj, priority: float = 0.0) -> None:
+        self.put_nowait((priority, url_obj))
+
+
+FRONTIERS = {
+    "fifo": (FifoFrontier, AsyncFifoFrontier),
+    "priority": (PriorityFrontier, AsyncPriorityFrontier),
+}
+
+
+def make_frontier(kind: str, asynchronous: bool = False):
+    if kind not in FRONTIERS:
+        raise ValueError(f"Неизвестная очередь URL: {kind}. Доступны: {', '.join(FRONTIERS)}")
+    return FRONTIERS[kind][asynchronous]()
+
+
+def lastmod_age(lastmod: str, today: date | None = None) -> int | None:
+    """Сколько дней назад страница менялась по lastmod из карты сайта; None - дата не разобрана."""
+    try:
+        changed = date.fromisoformat(lastmod[:10])
+    except ValueError:
+        return None
+    return max(0, ((today or date.today()) - changed).days)
+
+
+class FrontierMixin:
+    """
+    Очередь URL и бюджет домена в DomainScanner: urls_to_visit создаёт make_frontier(FRONTIER),
+    _url_priority считает приоритет при постановке в очередь, _start_budget_clock запускает
+    отсчёт времени с первой страницы, _charge_budget учитывает загруженную страницу,
+    _budget_exhausted говорит, пора ли остановиться.
+    """
+    FRONTIER = "priority"  # fifo - обход в ширину, как раньше
+    DEPTH_WEIGHT = 1.0  # Каждый уровень глубины отодвигает URL на столько
+    PATH_PATTERNS: tuple[tuple[str, float], ...] = PRIORITY_PATTERNS
+    ANCHOR_PATTERNS: tuple[tuple[str, float], ...] = PRIORITY_PATTERNS
+    ANCHOR_WEIGHT = 0.5  # Текст ссылки весит меньше адреса: "Подробнее" ничего не говорит о странице
+    LASTMOD_WEIGHT = 2.0  # Страница, изменённая сегодня, получает столько в плюс
+    LASTMOD_HORIZON_DAYS = 365  # ... и тем меньше, чем старше; старше горизонта - ничего
+    TEMPLATE_PENALTY = 1000.0  # Адреса размноженных разделов - после всех остальных
+
+    # Бюджет домена на один запуск (None - без ограничения)
+    MAX_PAGES: int | None = None
+    MAX_BYTES: int | None = None
+    MAX_CRAWL_TIME: float | None = None  # в секундах
+    BUDGETS_BY_DOMAIN: dict[str, dict[str, float]] = {}  # Домен -> {"pages", "bytes", "seconds"}
+
+    def _init_frontier(self) -> None:
+        self._path_weights = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in self.PATH_PATTERNS]
+        self._anchor_weights = [(re.compile(pattern, re.IGNORECASE), weight * self.ANCHOR_WEIGHT)
+                                for pattern, weight in self.ANCHOR_PATTERNS]
+        self._today = date.today()
+        budget = self.BUDGETS_BY_DOMAIN.get(self.base_domain, {})
+        self.max_pages = budget.get("pages", self.MAX_PAGES)
+        self.max_bytes = budget.get("bytes", self.MAX_BYTES)
+        self.max_crawl_time = budget.get("seconds", self.MAX_CRAWL_TIME)
+        self.budget_pages = 0  # Загружено страниц в этом запуске
+        self.budget_bytes = 0
+        self.budget_started: float | None = None  # Время отсчитывается с первой страницы, взятой в работу
+        self.budget_stop: str | None = None  # Что из бюджета исчерпано (None - сканирование не остановлено)
+
+    def _new_frontier(self, asynchronous: bool = False):
+        return make_frontier(self.FRONTIER, asynchronous)
+
+    def _url_priority(self, url_obj, anchor: str | None = None) -> float:
+        """Приоритет URL в очереди: меньше - раньше."""
+        if not self.urls_to_visit.prioritized:
+            return 0.0
+        url = url_obj.url
+        priority = url_obj.depth * self.DEPTH_WEIGHT
+        path = unquote(url.split("/", 3)[-1] if url.count("/") >= 3 else "")
+        priority += sum(weight for pattern, weight in self._path_weights if pattern.search(path))
+        if anchor:
+            anchor = anchor[:ANCHOR_MAX_LENGTH]
+            priority += sum(weight for pattern, weight in self._anchor_weights if pattern.search(anchor))
+        lastmod = self.sitemap_lastmod.get(url)
+        if lastmod is not None:
+            age = lastmod_age(lastmod, self._today)
+            if age is not None:
+                priority -= self.LASTMOD_WEIGHT * max(0.0, 1 - age / self.LASTMOD_HORIZON_DAYS)
+        if self.templated_patterns and self._is_templated(path_pattern(url)):
+            priority += self.TEMPLATE_PENALTY
+        return priority
+
+    def _charge_budget(self, size: int | None) -> None:
+        """Учитывает страницу в бюджете домена; файлы без загрузки (size is None) не считаются."""
+        if size is not None:
+            self.budget_pages += 1
+            self.budget_bytes += size
+
+    def _start_budget_clock(self) -> None:
+        """Запускает отсчёт MAX_CRAWL_TIME, когда домен берёт в работу первую страницу."""
+        if self.budget_started is None:
+            self.budget_started = time.monotonic()
+
+    def _budget_exhausted(self) -> bool:
+        """True - бюджет домена исчерпан, новые URL из очереди не берутся."""
+        if self.budget_stop is None:
+            if self.max_pages is not None and self.budget_pages >= self.max_pages:
+                self.budget_stop = f"{self.budget_pages} стр."
+            elif self.max_bytes is not None and self.budget_bytes >= self.max_bytes:
+                self.budget_stop = f"{self.budget_bytes / 1024 ** 2:.1f} МБ"
+            elif (self.max_crawl_time is not None and self.budget_started is not None
+                  and time.monotonic() - self.budget_started >= self.max_crawl_time):
+                self.budget_stop = f"{time.monotonic() - self.budget_started:.0f} с"
+            if self.budget_stop is not None:
+                print(f"{self.base_domain}: бюджет исчерпан ({self.budget_stop}), "
+                      f"необработанные URL остаются в очереди до следующего запуска")
+        return self.budget_stop is not None
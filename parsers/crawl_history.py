@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import time
+
+from frontier_store import BufferedSQLite
+
+
+def content_hash(content: bytes | str) -> str:
+    if isinstance(content, str):
+        content = content.encode("utf-8", errors="replace")
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def links_hash(links: list[str]) -> str:
+    """Хэш набора ссылок страницы: порядок и повторы не важны."""
+    return content_hash("\n".join(sorted(set(links))))
+
+
+class PageRecord:
+    """Что известно о странице из прошлых запусков."""
+
+    def __init__(self, etag: str | None, last_modified: str | None, body_hash: str | None,
+                 links: list[str], response: int | None) -> None:
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.links = links
+        self.response = response
+
+
+class CrawlHistory(BufferedSQLite):
+    """
+    История сканирований домена: валидаторы страниц (ETag, Last-Modified, хэш тела),
+    ссылки каждой страницы и номера запусков, в которых URL попадал в результаты.
+    Запуски нумеруются; прерванный запуск продолжается под тем же номером.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT,
+            response INTEGER,
+            links TEXT NOT NULL,
+            links_hash TEXT NOT NULL,
+            links_changed_run INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            url TEXT PRIMARY KEY,
+            response INTEGER,
+            first_run INTEGER NOT NULL,
+            prev_run INTEGER,
+            last_run INTEGER NOT NULL,
+            changed_run INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS runs (
+            run INTEGER PRIMARY KEY,
+            started REAL NOT NULL,
+            finished REAL
+        );
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        last_run = self._connection.execute("SELECT run, finished FROM runs ORDER BY run DESC LIMIT 1").fetchone()
+        if last_run is not None and last_run[1] is None:
+            self.run = last_run[0]  # Прошлый запуск прервался - продолжаем его
+        else:
+            self.run = last_run[0] + 1 if last_run is not None else 1
+            with self._connection:
+                self._connection.execute("INSERT INTO runs (run, started) VALUES (?, ?)", (self.run, time.time()))
+
+    @property
+    def previous_run(self) -> int | None:
+        return self.run - 1 if self.run > 1 else None
+
+    def get(self, url: str) -> PageRecord | None:
+        with self._lock:  # Соединение общее с записью пачек
+            row = self._connection.execute(
+                "SELECT etag, last_modified, body_hash, links, response FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body_hash, links, response = row
+        return PageRecord(etag, last_modified, body_hash, json.loads(links), response)
+
+    def record_page(self, url: str, response: int | None, etag: str | None, last_modified: str | None,
+                    body_hash: str, links: list[str]) -> None:
+        """Запоминает валидаторы и ссылки страницы; смену набора ссылок отмечает номером запуска."""
+        self._push(
+            "INSERT INTO pages (url, etag, last_modified, body_hash, response, links, links_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET "
+            "links_changed_run = CASE WHEN links_hash = excluded.links_hash THEN links_changed_run ELSE ? END, "
+            "etag = excluded.etag, last_modified = excluded.last_modified, "
+            "body_hash = excluded.body_hash, response = excluded.response, "
+            "links = excluded.links, links_hash = excluded.links_hash",
+            (url, etag, last_modified, body_hash, response,
+             json.dumps(links, ensure_ascii=False), links_hash(links), self.run),
+        )
+
+    def record_result(self, url: str, response: int | None) -> None:
+        """Отмечает, что URL попал в результаты этого запуска (повторная отметка в том же запуске не мешает)."""
+        self._push(
+            "INSERT INTO results (url, response, first_run, last_run) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET "
+            "changed_run = CASE WHEN response IS excluded.response THEN changed_run ELSE excluded.last_run END, "
+            "prev_run = CASE WHEN last_run = excluded.last_run THEN prev_run ELSE last_run END, "
+            "response = excluded.response, last_run = excluded.last_run",
+            (url, response, self.run, self.run),
+        )
+
+    def finish_run(self) -> None:
+        self._push("UPDATE runs SET finished = ? WHERE run = ?", (time.time(), self.run))
+        self.flush()
+
+    def changes(self) -> tuple[list[str], list[str], list[str]]:
+        """URL, добавленные, пропавшие и изменившиеся (код ответа или набор ссылок) относительно прошлого запуска."""
+        run, previous = self.run, self.previous_run
+        query = self._connection.execute
+        added = [url for (url,) in query(
+            "SELECT url FROM results WHERE last_run = ? AND (prev_run IS NULL OR prev_run IS NOT ?) ORDER BY url",
+            (run, previous))]
+        removed = [url for (url,) in query(
+            "SELECT url FROM results WHERE last_run = ? ORDER BY url", (previous,))]
+        changed = [url for (url,) in query(
+            "SELECT r.url FROM results r LEFT JOIN pages p ON p.url = r.url "
+            "WHERE r.last_run = ? AND r.prev_run = ? AND (r.changed_run = ? OR p.links_changed_run = ?) "
+            "ORDER BY r.url", (run, previous, run, run))]
+        return added, removed, changed
+
+
+class IncrementalMixin:
+    """
+    Инкрементальное сканирование для DomainScanner: условные запросы (If-None-Match,
+    If-Modified-Since) по валидаторам прошлого запуска, без разбора страниц, тело которых
+    не изменилось, и отчёт о добавленных, пропавших и изменившихся URL.
+    """
+    INCREMENTAL = False
+    HISTORY_DIR = "data/crawled"
+
+    crawl_history: CrawlHistory | None = None
+
+    def _history_path(self) -> str:
+        return os.path.join(self.HISTORY_DIR, f"{self.base_domain.replace('.', '_')}.history.sqlite")
+
+    def _open_history(self) -> None:
+        if not self.INCREMENTAL or self.crawl_history is not None:
+            return
+        self.crawl_history = CrawlHistory(self._history_path())
+        print(f"Инкрементальное сканирование {self.base_domain}: запуск №{self.crawl_history.run}")
+
+    def _previous_page(self, url: str) -> PageRecord | None:
+        return self.crawl_history.get(url) if self.crawl_history is not None else None
+
+    @staticmethod
+    def _conditional_headers(previous_page: PageRecord | None) -> dict[str, str]:
+        headers = {}
+        if previous_page is not None and previous_page.etag:
+            headers["If-None-Match"] = previous_page.etag
+        if previous_page is not None and previous_page.last_modified:
+            headers["If-Modified-Since"] = previous_page.last_modified
+        return headers
+
+    @staticmethod
+    def _is_unchanged(previous_page: PageRecord | None, status: int, content: bytes | str) -> bool:
+        """Страница та же, что в прошлый раз: сервер ответил 304 или тело совпало по хэшу."""
+        if previous_page is None:
+            return False
+        return status == 304 or (bool(content) and content_hash(content) == previous_page.body_hash)
+
+    def _record_page(self, url: str, status: int, headers, content: bytes | str, links: list[str]) -> None:
+        """Запоминает страницу для следующего запуска (ответ 304 не записывается - в нём нет тела)."""
+        if self.crawl_history is not None and status != 304:
+            headers = headers or {}
+            self.crawl_history.record_page(url, status, headers.get("ETag"), headers.get("Last-Modified"),
+                                           content_hash(content), links)
+
+    def _history_result(self, url_obj) -> None:
+        if self.crawl_history is not None:
+            self.crawl_history.record_result(url_obj.url, url_obj.response)
+
+    def _close_history(self, finished: bool) -> None:
+        """Завершённый запуск сравнивается с прошлым; прерванный продолжится при следующем start()."""
+        if self.crawl_history is None:
+            return
+        if finished:
+            self.crawl_history.finish_run()
+            self._save_changes()
+        self.crawl_history.close()
+        self.crawl_history = None
+
+    def _save_changes(self) -> None:
+        previous = self.crawl_history.previous_run
+        if previous is None:
+            print(f"{self.base_domain}: первый запуск, сравнивать не с чем")
+            return
+        added, removed, changed = self.crawl_history.changes()
+
+        filepath = os.path.join(self.HISTORY_DIR, f"{self.base_domain.replace('.', '_')}.changes.txt")
+        with open(filepath, "w", encoding="utf-8") as file_out:
+            file_out.write(f"# Запуск №{self.crawl_history.run} по сравнению с №{previous}\n")
+            for mark, urls in (("+", added), ("-", removed), ("~", changed)):
+                for url in urls:
+                    file_out.write(f"{mark} {url}\n")
+        print(f"{self.base_domain}: добавлено {len(added)}, пропало {len(removed)}, изменилось {len(changed)} URL "
+              f"- см. {filepath}")
@@ -0,0 +1,280 @@
+"""
+Метрики производительности сканирования.
+
+Для каждого этапа обработки страницы (ожидание в очереди, пауза темпа, соединение и TLS,
+ожидание ответа, навигация браузера, inner_html, разбор ссылок) копится гистограмма времени;
+кроме того считаются страницы, байты, ответы по кодам и ошибки по классам, а очередь и число
+страниц в работе снимаются в момент запроса метрик. Метрики отдаются по HTTP в текстовом
+формате Prometheus (/metrics) и раз в несколько секунд печатаются одной строкой.
+"""
+import bisect
+import collections
+import contextlib
+import cProfile
+import io
+import pstats
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+
+# Границы корзин гистограмм, в секундах
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_WINDOW = 60  # За сколько последних секунд считать страниц в секунду
+SUMMARY_STAGES = ("queue", "pacing", "fetch", "navigation", "inner_html", "parse")  # Этапы в строке итогов
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - больше самой большой границы
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Квантиль по корзинам (линейно внутри корзины)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class CrawlMetrics:
+    """Метрики одного сканирования (в планировщике - общие для всех доменов)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()  # Статический сканер в планировщике работает из потоков
+        self.started = time.monotonic()
+        self.stages: dict[str, Histogram] = collections.defaultdict(Histogram)
+        self.pages = 0
+        self.bytes = 0
+        self.statuses: collections.Counter[int] = collections.Counter()
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.in_flight = 0
+        self._page_times: collections.deque[float] = collections.deque()
+        self._gauges: dict[str, list[Callable[[], int]]] = collections.defaultdict(list)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Замеряет этап: with metrics.timer("parse"): ... (годится и для кода с await внутри)."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - started)
+
+    @contextlib.contextmanager
+    def tracking(self) -> Iterator[None]:
+        """Страница в работе: от того, как её взяли из очереди, до конца обработки."""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def count_page(self, status: int | None, size: int | None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.pages += 1
+            self.bytes += size or 0
+            if status is not None:
+                self.statuses[status] += 1
+            self._page_times.append(now)
+            while self._page_times[0] < now - RATE_WINDOW:
+                self._page_times.popleft()
+
+    def count_error(self, error: str, status: int | None = None) -> None:
+        with self._lock:
+            self.errors[error] += 1
+            if status is not None:
+                self.statuses[status] += 1
+
+    def add_gauge(self, name: str, source: Callable[[], int]) -> None:
+        """Значение, которое снимается в момент запроса метрик (у нескольких сканеров - суммируется)."""
+        self._gauges[name].append(source)
+
+    def gauge(self, name: str) -> int:
+        return sum(source() for source in self._gauges.get(name, ()))
+
+    def pages_per_second(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(1 for moment in self._page_times if moment >= now - RATE_WINDOW)
+        return recent / min(RATE_WINDOW, max(now - self.started, 1e-9))
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        with self._lock:
+            metric("crawl_pages_total", "counter", "Pages added to crawl results", [("", self.pages)])
+            metric("crawl_bytes_total", "counter", "Response body bytes downloaded", [("", self.bytes)])
+            metric("crawl_responses_total", "counter", "Responses by HTTP status",
+                   [(f'{{status="{status}"}}', count) for status, count in sorted(self.statuses.items())])
+            metric("crawl_errors_total", "counter", "Failed pages by error class",
+                   [(f'{{error="{error}"}}', count) for error, count in sorted(self.errors.items())])
+            metric("crawl_in_flight", "gauge", "Pages being processed (open tabs or requests)",
+                   [("", self.in_flight)])
+            histogram_lines = []
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += count
+                    histogram_lines.append((f'_bucket{{stage="{stage}",le="{bound}"}}', cumulative))
+                histogram_lines.append((f'_sum{{stage="{stage}"}}', round(histogram.total, 6)))
+                histogram_lines.append((f'_count{{stage="{stage}"}}', histogram.count))
+        metric("crawl_queue_depth", "gauge", "URLs waiting in crawl queues", [("", self.gauge("queue_depth"))])
+        metric("crawl_pages_per_second", "gauge", f"Pages per second over the last {RATE_WINDOW} s",
+               [("", round(self.pages_per_second(), 3))])
+        lines.append("# HELP crawl_stage_seconds Time spent in each page processing stage")
+        lines.append("# TYPE crawl_stage_seconds histogram")
+        lines.extend(f"crawl_stage_seconds{suffix} {value}" for suffix, value in histogram_lines)
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Строка итогов: темп, очередь, объём, ошибки и медиана/95-й процентиль основных этапов."""
+        with self._lock:
+            errors = ", ".join(f"{error}: {count}" for error, count in self.errors.most_common(3))
+            stages = []
+            for stage in SUMMARY_STAGES:
+                histogram = self.stages.get(stage)
+                if histogram is not None and histogram.count:
+                    stages.append(f"{stage} {histogram.quantile(0.5) * 1000:.0f}/"
+                                  f"{histogram.quantile(0.95) * 1000:.0f} мс")
+            pages, size, in_flight, error_count = self.pages, self.bytes, self.in_flight, sum(self.errors.values())
+        return (f"[метрики] {pages} стр. ({self.pages_per_second():.1f} стр/с), "
+                f"очередь {self.gauge('queue_depth')}, в работе {in_flight}, {size / 1024 ** 2:.1f} МБ, "
+                f"ошибок {error_count}{f' ({errors})' if errors else ''}"
+                f"{' | p50/p95: ' + ', '.join(stages) if stages else ''}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server: "MetricsServer"
+
+    def log_message(self, format, *args):  # Запросы метрик не засоряют вывод сканирования
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Локальный HTTP-сервер с метриками для Prometheus (http://127.0.0.1:<port>/metrics)."""
+    daemon_threads = True
+
+    def __init__(self, metrics: CrawlMetrics, port: int, host: str = "127.0.0.1") -> None:
+        super().__init__((host, port), _MetricsHandler)
+        self.metrics = metrics
+
+
+class CrawlMonitor:
+    """Фоновые потоки метрик одного сканирования: HTTP-сервер и периодическая строка итогов."""
+
+    def __init__(self, metrics: CrawlMetrics, port: int | None = None, interval: float | None = 10) -> None:
+        self.metrics = metrics
+        self.interval = interval
+        self.server = MetricsServer(metrics, port) if port is not None else None
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> "CrawlMonitor":
+        if self.server is not None:
+            self._threads.append(threading.Thread(target=self.server.serve_forever, daemon=True))
+            print(f"Метрики: http://127.0.0.1:{self.server.server_address[1]}/metrics")
+        if self.interval:
+            self._threads.append(threading.Thread(target=self._report, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _report(self) -> None:
+        while not self._stop.wait(self.interval):
+            print(self.metrics.summary())
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        print(self.metrics.summary())
+
+
+class MetricsMixin:
+    """
+    Метрики DomainScanner: сканер отмечает этапы через self.metrics, а start() на время
+    сканирования поднимает CrawlMonitor и, если задан PROFILE_PATH, профилировщик cProfile.
+    """
+    METRICS_PORT: int | None = None  # Порт HTTP-сервера с метриками (None - без сервера)
+    STATS_INTERVAL: float | None = 10  # Раз в сколько секунд печатать строку итогов (None - не печатать)
+    PROFILE_PATH: str | None = None  # Файл .pstats для профиля сканирования (None - без профилировщика)
+    QUEUE_WAIT_SAMPLE = 16  # Время в очереди замеряется у каждого N-го URL: не храним метку у всех
+
+    metrics: CrawlMetrics
+
+    def _init_metrics(self) -> None:
+        self.metrics = CrawlMetrics()  # Планировщик заменяет на общий до start
+        self._enqueued_at: dict[str, float] = {}
+
+    def _queue_depth(self) -> int:
+        raise NotImplementedError
+
+    def _start_monitoring(self) -> CrawlMonitor:
+        self.metrics.add_gauge("queue_depth", self._queue_depth)
+        return CrawlMonitor(self.metrics, self.METRICS_PORT, self.STATS_INTERVAL).start()
+
+    def _note_enqueued(self, url: str) -> None:
+        if hash(url) % self.QUEUE_WAIT_SAMPLE == 0:
+            self._enqueued_at[url] = time.monotonic()
+
+    def _note_dequeued(self, url: str) -> None:
+        enqueued_at = self._enqueued_at.pop(url, None)
+        if enqueued_at is not None:
+            self.metrics.observe("queue", time.monotonic() - enqueued_at)
+
+    def _start_profile(self) -> cProfile.Profile | None:
+        if self.PROFILE_PATH is None:
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, profiler: cProfile.Profile | None) -> None:
+        """Сохраняет профиль в PROFILE_PATH и печатает самые дорогие функции."""
+        if profiler is None:
+            return
+        profiler.disable()
+        profiler.dump_stats(self.PROFILE_PATH)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(15)
+        print(report.getvalue())
+        print(f"Профиль сохранён в {self.PROFILE_PATH} (python -m pstats {self.PROFILE_PATH})")
@@ -0,0 +1,246 @@
+"""
+Потоковая выгрузка результатов сканирования: запись о странице попадает в файл сразу после
+её обработки, а не копится в памяти до конца сканирования.
+
+Форматы: jsonl (по записи в строке) и parquet (каталог частей, нужен pyarrow). Записи пишутся
+пачками; каждая пачка дописывается целиком, поэтому после падения в файле остаются только
+полные записи, а продолженное сканирование дописывает выгрузку с того же места.
+Выгрузка сбрасывается на диск раньше сохранённого состояния сканирования, поэтому каждая
+страница, отмеченная обработанной, в ней уже есть; страницы, обработанные перед самым
+падением, после продолжения могут встретиться дважды (ключ для удаления повторов - url).
+"""
+import json
+import os
+import threading
+import time
+from typing import Any
+
+# Поля записи о странице
+FIELDS = (
+    "url",  # Запрошенный URL
+    "final_url",  # URL после редиректов
+    "status",  # Код ответа (None - ответа не было)
+    "depth",  # Глубина от стартовой страницы
+    "parent",  # Страница, на которой нашли ссылку (None - стартовая или из карты сайта)
+    "elapsed",  # Секунд на запрос
+    "content_type",
+    "bytes",  # Размер тела ответа
+    "fetched_at",  # Unix-время обработки
+    "error",  # Класс ошибки, если страницу не удалось получить
+)
+
+
+class BufferedSink:
+    """Приёмник записей с буфером: пишет на диск каждые FLUSH_EVERY записей или FLUSH_INTERVAL секунд."""
+    FLUSH_EVERY = 500
+    FLUSH_INTERVAL = 5
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._buffer: list[dict[str, Any]] = []
+        self._lock = threading.Lock()  # Статический сканер в планировщике пишет из потоков
+        self._last_flush = time.monotonic()
+
+    def write(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._buffer.append(record)
+            if (
+                    len(self._buffer) >= self.FLUSH_EVERY or
+                    time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL
+            ):
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def _write_batch(self, records: list[dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class JsonlSink(BufferedSink):
+    """Одна JSON-запись в строке. Пачка пишется одним вызовом write и сбрасывается на диск (fsync)."""
+
+    def __init__(self, path: str, append: bool = False) -> None:
+        super().__init__(path)
+        if append:
+            self._drop_partial_line()
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def _drop_partial_line(self) -> None:
+        """Отрезает недописанную последнюю строку, оставшуюся после падения."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            position = size
+            while position > 0:
+                step = min(64 * 1024, position)
+                f.seek(position - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != size:
+                f.truncate(position)
+
+    def _write_batch(self, records: list[dict[str, Any]]) -> None:
+        self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        super().close()
+        self._file.close()
+
+
+class ParquetSink(BufferedSink):
+    """
+    Каталог Parquet: каждая пачка - отдельный файл part-NNNNN.parquet, записанный через
+    временный файл, поэтому недописанных частей не бывает. Читается как один набор данных:
+    pyarrow.dataset.dataset(path) или pandas.read_parquet(path).
+    """
+    FLUSH_EVERY = 10_000
+    FLUSH_INTERVAL = 60
+
+    def __init__(self, path: str, append: bool = False) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as ex_:
+            raise ImportError("Для выгрузки в parquet нужен pyarrow: pip install pyarrow") from ex_
+        super().__init__(path)
+        self._pa, self._pq = pyarrow, pyarrow.parquet
+        self._schema = pyarrow.schema([
+            ("url", pyarrow.string()), ("final_url", pyarrow.string()), ("status", pyarrow.int16()),
+            ("depth", pyarrow.int32()), ("parent", pyarrow.string()), ("elapsed", pyarrow.float64()),
+            ("content_type", pyarrow.string()), ("bytes", pyarrow.int64()), ("fetched_at", pyarrow.float64()),
+            ("error", pyarrow.string()),
+        ])
+
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(name for name in os.listdir(path) if name.startswith("part-") and name.endswith(".parquet"))
+        if not append:
+            for name in parts:
+                os.remove(os.path.join(path, name))
+            parts = []
+        self._next_part = int(parts[-1][5:10]) + 1 if parts else 0
+
+    def _write_batch(self, records: list[dict[str, Any]]) -> None:
+        name = f"part-{self._next_part:05d}.parquet"
+        tmp_path = os.path.join(self.path, f"_{name}.tmp")  # Файлы на "_" читатели parquet пропускают
+        table = self._pa.Table.from_pylist(records, schema=self._schema)
+        self._pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, os.path.join(self.path, name))
+        self._next_part += 1
+
+
+SINKS = {
+    "jsonl": (JsonlSink, ".jsonl"),
+    "parquet": (ParquetSink, ".parquet"),
+}
+
+
+class CrawlOutput:
+    """Выгрузка одного домена во все выбранные форматы."""
+
+    def __init__(self, path_prefix: str, formats: tuple[str, ...] = ("jsonl",), append: bool = False) -> None:
+        unknown = set(formats) - set(SINKS)
+        if unknown:
+            raise ValueError(f"Неизвестные форматы выгрузки: {', '.join(sorted(unknown))}")
+        os.makedirs(os.path.dirname(path_prefix) or ".", exist_ok=True)
+        self.sinks: list[BufferedSink] = [
+            SINKS[output_format][0](path_prefix + SINKS[output_format][1], append) for output_format in formats
+        ]
+
+    @property
+    def paths(self) -> list[str]:
+        return [sink.path for sink in self.sinks]
+
+    def write(self, record: dict[str, Any]) -> None:
+        for sink in self.sinks:
+            sink.write(record)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+class OutputMixin:
+    """
+    Выгрузка результатов DomainScanner по мере сканирования (см. CrawlOutput).
+    _add_result - единая точка, куда сканер сообщает об обработанной странице:
+    отсюда запись уходит в выгрузку, в сохранённое состояние, в историю запусков и в метрики.
+    """
+    OUTPUT_DIR = "data/crawled"
+    OUTPUT_FORMATS: tuple[str, ...] = ("jsonl",)  # jsonl и/или parquet (нужен pyarrow)
+
+    crawl_output: CrawlOutput | None = None
+    results_count = 0  # Сколько страниц попало в результаты
+
+    def _output_prefix(self) -> str:
+        return os.path.join(self.OUTPUT_DIR, self.base_domain.replace('.', '_'))
+
+    def _open_output(self) -> None:
+        """Продолженное сканирование дописывает выгрузку, новое - начинает её заново."""
+        if self.crawl_output is None and self.OUTPUT_FORMATS:
+            self.crawl_output = CrawlOutput(self._output_prefix(), self.OUTPUT_FORMATS, append=self.resumed)
+            if self.frontier_store is not None:
+                self.frontier_store.before_flush = self.crawl_output.flush
+
+    def _write_record(self, url_obj, request_url: str | None, status: int | None, elapsed: float | None,
+                      content_type: str | None, size: int | None, error: str | None) -> None:
+        if self.crawl_output is None:
+            return
+        request_url = request_url or url_obj.url
+        parent = url_obj.referrers[-1]  # У стартовой страницы цепочка состоит из неё самой
+        self.crawl_output.write({
+            "url": request_url,
+            "final_url": url_obj.url if error is None else None,
+            "status": status,
+            "depth": url_obj.depth,
+            "parent": parent if parent not in (request_url, url_obj.url) else None,
+            "elapsed": round(elapsed, 4) if elapsed is not None else None,
+            "content_type": content_type or None,
+            "bytes": size,
+            "fetched_at": round(time.time(), 3),
+            "error": error,
+        })
+
+    def _add_result(self, url_obj, request_url: str | None = None, elapsed: float | None = None,
+                    content_type: str | None = None, size: int | None = None) -> None:
+        """Сохраняет обработанную страницу (url_obj - после редиректа, request_url - запрошенный URL)."""
+        self.results_count += 1
+        self.metrics.count_page(url_obj.response, size)
+        self._write_record(url_obj, request_url, url_obj.response, elapsed, content_type, size, None)
+        self._checkpoint_result(url_obj)
+        self._history_result(url_obj)
+        self._charge_budget(size)
+
+    def _add_error(self, url_obj, error: str, status: int | None = None, elapsed: float | None = None) -> None:
+        """Страница, которую не удалось получить: в выгрузку попадает, в результаты - нет."""
+        self.metrics.count_error(error, status)
+        self._write_record(url_obj, None, status, elapsed, None, None, error)
+
+    def _flush_output(self) -> None:
+        if self.crawl_output is not None:
+            self.crawl_output.flush()
+
+    def _close_output(self) -> None:
+        if self.crawl_output is not None:
+            self.crawl_output.close()
+            self.crawl_output = None
@@ -0,0 +1,412 @@
+import asyncio
+import collections
+import importlib
+import sys
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable
+from urllib.parse import urlparse
+
+from browser_pool import PageLost
+from crawl_metrics import CrawlMetrics, CrawlMonitor
+from user_agents import load_user_agents
+
+SITES_FILE = "data/all_bank_sites.txt"
+
+
+def unique_sites(urls: Iterable[str]) -> list[str]:
+    """Оставляет по одному стартовому URL на домен."""
+    sites: dict[str, str] = {}
+    for url in urls:
+        parsed = urlparse(url.strip())
+        if not parsed.scheme.startswith("http") or not parsed.netloc:
+            continue
+        # Отбрасываем utm-метки и якоря - сканирование начинаем с чистого адреса
+        start_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path or '/'}"
+        sites.setdefault(parsed.netloc, start_url)
+    return list(sites.values())
+
+
+def load_sites(path: str = SITES_FILE) -> list[str]:
+    """Читает список сайтов банков, оставляя по одному стартовому URL на домен."""
+    with open(path, "r", encoding="utf-8") as f:
+        return unique_sites(f)
+
+
+def _raise_open_files_limit() -> None:
+    """Поднимает мягкий лимит открытых файлов до жёсткого (где это поддерживается)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):  # Например, hard = RLIM_INFINITY на macOS
+            pass
+
+
+class _DomainSlot:
+    """Состояние одного домена внутри планировщика."""
+
+    def __init__(self, scanner, thread_pool: Executor | None = None) -> None:
+        self.scanner = scanner
+        self.thread_pool = thread_pool  # Потоки запросов синхронного сканера
+        self.in_flight = 0  # Сколько URL этого домена обрабатывается прямо сейчас
+        self.robots_loaded = True  # False - robots.txt ещё не прочитан, URL домена не раздаются
+        self.seeding = False  # Карты сайта ещё загружаются: домен не закончен, даже если очередь пуста
+
+    @property
+    def domain(self) -> str:
+        return self.scanner.base_domain
+
+    def has_pending(self) -> bool:
+        if self.scanner._budget_exhausted():
+            return False  # Остальные URL домена - в следующий запуск
+        return self._has_queued() or bool(self.scanner.deferred_urls)
+
+    def is_finished(self) -> bool:
+        return not self.seeding and not self.has_pending() and self.in_flight == 0
+
+    def pop_url(self):
+        """Возвращает следующий непосещённый URL домена или None."""
+        if not self.robots_loaded or self.scanner._budget_exhausted():
+            return None
+        url_obj = self._pop_queued()
+        # Адреса размноженных разделов (см. near_duplicates) - когда всё остальное обойдено
+        if url_obj is None and self.in_flight == 0 and self.scanner._release_deferred():
+            url_obj = self._pop_queued()
+        return url_obj
+
+    def _has_queued(self) -> bool:
+        return bool(self.scanner.urls_to_visit)
+
+    def _pop_queued(self):
+        while self.scanner.urls_to_visit:
+            url_obj = self.scanner.urls_to_visit.popleft()
+            if url_obj.url not in self.scanner.visited_urls:
+                return url_obj
+            self.scanner._mark_done(url_obj)  # Иначе он так и останется в сохранённой очереди
+        return None
+
+    async def process(self, url_obj) -> None:
+        raise NotImplementedError
+
+    def save(self, finished: bool = True) -> None:
+        self.scanner._save_data()
+        self.scanner._close_checkpoint(finished)
+        self.scanner._close_history(finished)
+        self.scanner._close_output()
+
+
+class _StaticDomainSlot(_DomainSlot):
+    def pop_url(self):
+        with self.scanner._frontier_lock:  # Ссылки в ту же очередь ставят потоки пула (_process_url)
+            return super().pop_url()
+
+    async def process(self, url_obj) -> None:
+        # Паузу темпа домена выжидаем в цикле событий: поток пула занят только запросом и разбором
+        reserved = self.scanner._will_fetch(url_obj.url)
+        if reserved:
+            await asyncio.sleep(self.scanner._reserve_request())
+        # Синхронный сканер работает через requests - уводим его в поток
+        await asyncio.get_running_loop().run_in_executor(self.thread_pool, self.scanner._process_url,
+                                                         url_obj, reserved)
+
+
+class _AsyncDomainSlot(_DomainSlot):
+    """Асинхронный сканер с очередью asyncio.Queue."""
+
+    def _has_queued(self) -> bool:
+        return not self.scanner.urls_to_visit.empty()
+
+    def _pop_queued(self):
+        queue = self.scanner.urls_to_visit
+        while not queue.empty():
+            url_obj = queue.get_nowait()
+            queue.task_done()  # Очередь сканера здесь только хранилище, учёт ведёт планировщик
+            if url_obj.url not in self.scanner.visited_urls:
+                return url_obj
+            self.scanner._mark_done(url_obj)
+        return None
+
+    async def process(self, url_obj) -> None:
+        await self.scanner._process_url(url_obj)
+
+
+class _DynamicDomainSlot(_AsyncDomainSlot):
+    def pop_url(self):
+        url_obj = super().pop_url()
+        if url_obj is not None:
+            self.scanner.visited_urls.add(url_obj.url)
+        return url_obj
+
+
+class CrawlScheduler:
+    """
+    Сканирует много доменов одновременно.
+    URL раздаются по кругу между доменами с общим лимитом параллельности
+    и отдельным (вежливым) лимитом на каждый домен.
+    """
+    MAX_CONCURRENCY = 32  # Общий лимит одновременно обрабатываемых страниц
+    PER_DOMAIN_CONCURRENCY = 2  # Сколько страниц одного сайта можно грузить одновременно
+    # Движок -> (модуль сканера, слот); модуль импортируется только для выбранного движка
+    # (см. engine_classes): статическому сканированию не нужно грузить Playwright
+    ENGINES = {
+        "static": ("site_crawler", _StaticDomainSlot),
+        "async-static": ("async_static_crawler", _AsyncDomainSlot),
+        "dynamic": ("async_dynamic_crawler", _DynamicDomainSlot),
+        "hybrid": ("hybrid_crawler", _DynamicDomainSlot),
+    }
+
+    def __init__(self, sites: list[str], engine: str = "static",
+                 max_concurrency: int | None = None, per_domain_concurrency: int | None = None,
+                 scanner_settings: dict | None = None) -> None:
+        if engine not in self.ENGINES:
+            raise ValueError(f"Неизвестный движок: {engine}. Доступны: {', '.join(self.ENGINES)}")
+        self.engine = engine
+        self.max_concurrency = max_concurrency or self.MAX_CONCURRENCY
+        self.per_domain_concurrency = per_domain_concurrency or self.PER_DOMAIN_CONCURRENCY
+
+        # Переопределения атрибутов DomainScanner (имя - значение), например {"MAX_PAGES": 500}
+        self.scanner_settings = scanner_settings or {}
+        self._scanner_cls = None
+        self.ua = load_user_agents()  # Один пул User-Agent на все сканеры
+        # Свой пул потоков для синхронного сканера: стандартный пул asyncio.to_thread - min(32, CPU + 4)
+        # потоков, и параллельность тихо упиралась бы в него, а не в max_concurrency
+        self.thread_pool = ThreadPoolExecutor(self.max_concurrency, "crawl") if engine == "static" else None
+        self.slots: collections.deque[_DomainSlot] = collections.deque(self._create_slot(site) for site in sites)
+
+        self.in_flight = 0
+        self.finished_domains = 0
+        self._wakeup = asyncio.Event()  # Сигнал о завершении очередной страницы
+
+        self.playwright = None
+        self.browser_pool = None
+        self.context_pool = None
+        self.fetcher = None
+        self.parse_executor = None
+        self.response_cache = None
+        self.page_archive = None
+        self.resource_blocker = None
+        self.metrics = CrawlMetrics()  # Одни метрики на все домены
+
+    @classmethod
+    def engine_classes(cls, engine: str) -> tuple[type, type[_DomainSlot]]:
+        """Класс сканера и класс слота движка; модуль сканера импортируется при первом вызове."""
+        module_name, slot_cls = cls.ENGINES[engine]
+        return importlib.import_module(module_name).DomainScanner, slot_cls
+
+    def _create_slot(self, site: str) -> _DomainSlot:
+        scanner_cls, slot_cls = self.engine_classes(self.engine)
+        if self._scanner_cls is None:  # Один подкласс с настройками на все домены запуска
+            self._scanner_cls = type("Scanner", (scanner_cls,), self.scanner_settings)
+        return slot_cls(self._scanner_cls(site, ua=self.ua), self.thread_pool)
+
+    async def _start_browser(self, headless: bool) -> None:
+        """Запускает пул браузеров, общий для всех динамических сканеров."""
+        first_scanner = self.slots[0].scanner
+        await first_scanner.start_browser(headless)
+        self.playwright, self.browser_pool = first_scanner.playwright, first_scanner.browser_pool
+        # Пул контекстов тоже общий: контекст не привязан к домену
+        self.context_pool = first_scanner._create_context_pool(self.max_concurrency)
+        # Запросы всех вкладок перехватывает первый сканер - и учёт заблокированного общий
+        self.resource_blocker = first_scanner.resource_blocker
+        for slot in self.slots:
+            slot.scanner.playwright, slot.scanner.browser_pool = self.playwright, self.browser_pool
+            slot.scanner.context_pool = self.context_pool
+            slot.scanner.resource_blocker = self.resource_blocker
+
+    async def _stop_browser(self) -> None:
+        if self.context_pool is not None:
+            await self.context_pool.close()
+            if self.resource_blocker is not None and self.resource_blocker.blocked:
+                print(f"Все домены: {self.resource_blocker.summary()}")
+        if self.browser_pool is not None:
+            await self.browser_pool.close()
+            print(f"Все домены: {self.browser_pool.summary()}")
+        if self.playwright is not None:
+            await self.playwright.stop()
+        self.browser_pool, self.playwright, self.context_pool = None, None, None
+
+    def _start_fetcher(self) -> None:
+        """Один пул HTTP-соединений на все домены."""
+        from http_fetcher import AsyncFetcher  # httpx - только для асинхронных движков
+        first_scanner = self.slots[0].scanner
+        self.fetcher = AsyncFetcher(
+            headers=first_scanner.BASE_HEADERS,
+            timeout=first_scanner.STATIC_TIMEOUT if self.engine == "hybrid" else first_scanner.TIMEOUT,
+            verify=first_scanner.VERIFY_REQUESTS,
+            max_connections=self.max_concurrency,
+            max_connections_per_host=self.per_domain_concurrency,
+            cache=self.response_cache,
+        )
+        self.fetcher.metrics = self.metrics
+        for slot in self.slots:
+            slot.scanner.fetcher = self.fetcher
+
+    def _start_response_cache(self) -> None:
+        """Один кэш ответов на все домены (если он включён в настройках сканера)."""
+        self.response_cache = self.slots[0].scanner._create_response_cache()
+        for slot in self.slots:
+            slot.scanner._use_response_cache(self.response_cache)
+
+    def _start_archive(self) -> None:
+        """Один архив страниц на все домены (если он включён в настройках сканера)."""
+        self.page_archive = self.slots[0].scanner._create_archive()
+        for slot in self.slots:
+            slot.scanner.page_archive = self.page_archive
+
+    def _start_parse_executor(self) -> None:
+        """Один пул разбора страниц на все домены."""
+        self.parse_executor = self.slots[0].scanner._create_parse_executor()
+        for slot in self.slots:
+            slot.scanner.parse_executor = self.parse_executor
+
+    def _start_monitoring(self) -> CrawlMonitor:
+        """Метрики всех доменов в одном месте: сервер и строка итогов - по настройкам сканера."""
+        for slot in self.slots:
+            slot.scanner.metrics = self.metrics
+        # list(): сервер метрик читает очереди из своего потока, пока планировщик убирает домены
+        self.metrics.add_gauge("queue_depth", lambda: sum(slot.scanner._queue_depth() for slot in list(self.slots)))
+        first_scanner = self.slots[0].scanner
+        return CrawlMonitor(self.metrics, first_scanner.METRICS_PORT, first_scanner.STATS_INTERVAL).start()
+
+    async def _seed_slot(self, slot: _DomainSlot) -> None:
+        """
+        robots.txt и карты сайта домена - фоном, пока сканируются остальные домены: домен
+        получает URL, как только прочитан его robots.txt, адреса из карт приходят пачками.
+        """
+        slot.robots_loaded, slot.seeding = False, True
+
+        def notify() -> None:
+            slot.robots_loaded = True
+            self._wakeup.set()
+
+        try:
+            await slot.scanner._seed_async(notify)
+        except Exception as ex_:
+            print(f"{slot.domain}: не удалось загрузить robots.txt и карты сайта: {ex_}")
+        finally:
+            slot.robots_loaded, slot.seeding = True, False
+            self._wakeup.set()
+
+    async def _run_slot(self, slot: _DomainSlot, url_obj) -> None:
+        try:
+            with self.metrics.tracking():
+                await slot.process(url_obj)
+            slot.scanner._mark_done(url_obj)
+        except PageLost:
+            # Вкладка или браузер упали: URL снова в очереди домена (или записан как ошибка)
+            if not slot.scanner._requeue_lost(url_obj):
+                slot.scanner._mark_done(url_obj)
+        except Exception as ex_:
+            print(f"Ошибка при обработке {url_obj.url}: {ex_}")
+        finally:
+            slot.in_flight -= 1
+            self.in_flight -= 1
+            self._wakeup.set()
+
+    def _dispatch(self, task_group: asyncio.TaskGroup) -> None:
+        """Раздаёт свободные места по кругу: за один проход - не больше одного URL на домен."""
+        dispatched = True
+        while dispatched and self.in_flight < self.max_concurrency:
+            dispatched = False
+            for _ in range(len(self.slots)):
+                if self.in_flight >= self.max_concurrency:
+                    break
+
+                slot = self.slots[0]
+                self.slots.rotate(-1)
+
+                if slot.in_flight >= self.per_domain_concurrency:
+                    continue
+
+                url_obj = slot.pop_url()
+                if url_obj is None:
+                    continue
+
+                slot.in_flight += 1
+                self.in_flight += 1
+                task_group.create_task(self._run_slot(slot, url_obj))
+                dispatched = True
+
+    def _collect_finished(self) -> None:
+        """Сохраняет данные доменов, которые закончили сканирование, и убирает их из ротации."""
+        for slot in [slot for slot in self.slots if slot.is_finished()]:
+            self.slots.remove(slot)
+            self.finished_domains += 1
+            stopped = slot.scanner.budget_stop is not None
+            slot.save(finished=not stopped)  # Остановленный по бюджету домен продолжится при следующем запуске
+            state = "остановлен по бюджету" if stopped else "просканирован"
+            print(f"[{self.finished_domains}] Домен {slot.domain} {state}, осталось {len(self.slots)}")
+
+    async def start(self, headless: bool = True) -> None:
+        print(f"Начинаем сканирование {len(self.slots)} доменов, движок: {self.engine}")
+        _raise_open_files_limit()  # У каждого домена свой файл состояния сканирования
+        for slot in self.slots:
+            slot.scanner._open_checkpoint()
+            slot.scanner._open_history()
+            slot.scanner._open_output()
+        first_scanner = self.slots[0].scanner if self.slots else None  # Домены уходят из slots по завершении
+        monitor, profiler = None, None
+        try:
+            if self.slots:
+                monitor = self._start_monitoring()
+                profiler = first_scanner._start_profile()
+                self._start_response_cache()
+                self._start_archive()
+            if self.engine in ("dynamic", "hybrid") and self.slots:
+                self._start_parse_executor()
+                await self._start_browser(headless)
+            if self.engine in ("async-static", "hybrid") and self.slots:
+                self._start_fetcher()
+
+            async with asyncio.TaskGroup() as task_group:
+                for slot in self.slots:
+                    task_group.create_task(self._seed_slot(slot))
+                while self.slots:
+                    self._wakeup.clear()
+                    self._dispatch(task_group)
+                    self._collect_finished()
+                    if self.slots:
+                        await self._wakeup.wait()  # Ждём, пока освободится место или появятся новые URL
+
+            print("\nСканирование всех доменов завершено.")
+
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("\nСканирование прервано пользователем.")
+
+        finally:
+            if profiler is not None:
+                first_scanner._stop_profile(profiler)
+            if monitor is not None:
+                monitor.stop()
+            for slot in self.slots:  # Сохраняем то, что успели собрать по недосканированным доменам
+                slot.save(finished=False)
+            await self._stop_browser()
+            if self.fetcher is not None:
+                await self.fetcher.close()
+            if self.parse_executor is not None:
+                self.parse_executor.shutdown(cancel_futures=True)
+            if self.thread_pool is not None:
+                self.thread_pool.shutdown(cancel_futures=True)
+            if self.response_cache is not None:
+                self.response_cache.close()
+            if self.page_archive is not None:
+                await self.page_archive.close_async()
+                print(f"Все домены: {self.page_archive.summary()}")
+
+
+async def main(engine: str = "static"):
+    scheduler = CrawlScheduler(load_sites(), engine=engine)
+    await scheduler.start()
+
+
+if __name__ == '__main__':
+    start_time = datetime.now()
+    print(start_time)
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "static"))
+    delta = datetime.now() - start_time
+    print(delta)
@@ -0,0 +1,92 @@
+import sys
+from urllib.parse import urlparse
+
+
+class URL:
+    """
+    Компактная запись об URL для очереди и результатов сканирования.
+    Хранит только строку URL, код ответа, глубину и ссылку на родительскую страницу;
+    цепочка referrers не копируется в каждый объект, а собирается по родителям, когда нужна.
+    """
+    __slots__ = ("_url_string", "_response_code", "_parent", "_depth")
+
+    def __init__(self,
+                 url: str,
+                 response_code: int | None = None,
+                 parent: "URL | None" = None,
+                 depth: int | None = None,
+                 referrers: tuple[str, ...] | None = None):
+        # URL приходит уже канонизированным (см. url_canonicalizer);
+        # intern - одна копия строки на все объекты с этим URL
+        self._url_string = sys.intern(url)
+        self._response_code = response_code
+
+        if referrers is not None:
+            # Восстановление из сохранённого состояния: родителя нет, цепочка известна целиком
+            self._parent: URL | tuple[str, ...] | None = tuple(referrers)
+            self._depth = depth if depth is not None else len(referrers)
+        else:
+            self._parent = parent
+            self._depth = depth if depth is not None else (parent.depth + 1 if parent is not None else 0)
+
+    @property
+    def data(self) -> tuple[str, int | None, tuple[str, ...]]:
+        return self.url, self.response, self.referrers
+
+    @property
+    def domain(self) -> str:
+        return urlparse(self._url_string).netloc
+
+    @property
+    def url(self) -> str:
+        return self._url_string
+
+    @property
+    def response(self) -> int | None:
+        return self._response_code
+
+    @property
+    def depth(self) -> int:
+        """Глубина от стартовой страницы (у стартовой - 0)."""
+        return self._depth
+
+    @property
+    def parent(self) -> "URL | None":
+        return self._parent if isinstance(self._parent, URL) else None
+
+    @property
+    def referrers(self) -> tuple[str, ...]:
+        """Цепочка страниц от стартовой до родительской."""
+        chain = []
+        node = self._parent
+        while isinstance(node, URL):
+            chain.append(node._url_string)
+            node = node._parent
+        chain.reverse()
+
+        referrers = list(node) if node is not None else []
+        for url in chain:
+            if not referrers or referrers[-1] != url:  # Стартовая страница не повторяется
+                referrers.append(url)
+        return tuple(referrers) or (self._url_string,)
+
+    def set_response(self, response: int) -> None:
+        self._response_code = response
+
+    def with_response(self, url: str, response_code: int | None) -> "URL":
+        """Объект для URL после редиректа: то же место в дереве сканирования, что и у запрошенного."""
+        result = URL(url, response_code, depth=self._depth)
+        result._parent = self._parent
+        return result
+
+    def __str__(self):
+        return self.url
+
+    # Важно для работы с set
+    def __eq__(self, other):
+        if isinstance(other, URL):
+            return self.url == other.url
+        return False
+
+    def __hash__(self):
+        return hash(self._url_string)
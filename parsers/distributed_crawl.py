@@ -0,0 +1,328 @@
+"""
+Распределённое сканирование: координатор и N процессов-обработчиков на одной машине.
+
+Одному процессу Python с одним браузером не загрузить машину для сканирования целиком:
+координатор делит домены между обработчиками (консистентное хэширование - HashRing),
+и каждый обработчик сканирует свои домены своим движком (CrawlScheduler: свой браузер
+или пул соединений). Очередь и множество встреченных URL - общие, в файле SQLite
+(shared_frontier.SharedFrontier). Домен обрабатывает только один обработчик, поэтому
+вежливость к сайту (лимит параллельности и темп запросов домена) соблюдается, как и без распределения.
+
+Обработчик берёт URL своих доменов в аренду пачками и раз в HEARTBEAT_INTERVAL отмечается в общем файле.
+Если процесс упал или перестал отмечаться, координатор возвращает его аренды в очередь и перезапускает
+его (до MAX_RESTARTS раз); дальше домены обработчика переезжают к остальным.
+Прерванное сканирование продолжается со следующего запуска координатора.
+
+    python distributed_crawl.py [движок] [число обработчиков]
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+from crawl_scheduler import CrawlScheduler, load_sites
+from shared_frontier import DomainFrontier, HashRing, SharedFrontier, SharedFrontierMixin
+from url_canonicalizer import shared_canonicalizer
+
+
+class CrawlWorker(CrawlScheduler):
+    """
+    Обработчик распределённого сканирования: CrawlScheduler для доменов, закреплённых за ним в общем файле.
+    В локальной очереди сканера домена только URL, взятые в аренду; найденные ссылки уходят в общую очередь.
+    """
+    LEASE_BATCH = 64  # Сколько URL домена брать в аренду за раз
+    HEARTBEAT_INTERVAL = 5  # в секундах
+    POLL_INTERVAL = 10  # Как часто проверять, не переехали ли к обработчику домены упавшего
+
+    def __init__(self, frontier_path: str, worker_id: int, engine: str = "static",
+                 max_concurrency: int | None = None, per_domain_concurrency: int | None = None,
+                 scanner_settings: dict | None = None) -> None:
+        self.worker_id = worker_id
+        self.frontier = SharedFrontier(frontier_path)
+        assigned = self.frontier.assigned_domains(worker_id)
+        self._seeded = {domain for domain, _, seeded in assigned if seeded}
+        self._domains = {domain for domain, _, _ in assigned}  # Все домены, которые обработчик уже взял
+        super().__init__([start_url for _, start_url, _ in assigned], engine,
+                         max_concurrency, per_domain_concurrency, scanner_settings)
+        self.frontier.before_flush = self._flush_outputs  # Выгрузка - раньше отметок об обработке
+        self._last_poll = time.monotonic()
+
+    def _create_slot(self, site: str):
+        scanner_cls, slot_cls = self.engine_classes(self.engine)
+        if self._scanner_cls is None:
+            settings = dict(self.scanner_settings)
+            port = settings.get("METRICS_PORT", scanner_cls.METRICS_PORT)
+            if port is not None:
+                settings["METRICS_PORT"] = port + self.worker_id  # У каждого обработчика свой порт
+            self._scanner_cls = type("DistributedScanner", (SharedFrontierMixin, scanner_cls), settings)
+        scanner = self._scanner_cls(site, ua=self.ua)
+        scanner.frontier_store = DomainFrontier(self.frontier, scanner.base_domain)
+        # Карты сайта уже загружены (этим или упавшим обработчиком) - выгрузка дописывается
+        scanner.resumed = scanner.base_domain in self._seeded
+        return slot_cls(scanner, self.thread_pool)
+
+    def _flush_outputs(self) -> None:
+        for slot in list(self.slots):  # Вызывается и из потоков статического сканера
+            slot.scanner._flush_output()
+
+    def _share_resources(self, scanner) -> None:
+        """Общие ресурсы обработчика - домену, который переехал к нему во время сканирования."""
+        scanner.metrics = self.metrics
+        scanner._use_response_cache(self.response_cache)
+        scanner.page_archive = self.page_archive
+        if self.parse_executor is not None:
+            scanner.parse_executor = self.parse_executor
+        if self.context_pool is not None:
+            scanner.playwright, scanner.browser_pool = self.playwright, self.browser_pool
+            scanner.context_pool, scanner.resource_blocker = self.context_pool, self.resource_blocker
+        if self.fetcher is not None:
+            scanner.fetcher = self.fetcher
+
+    async def _adopt_domain(self, start_url: str) -> None:
+        slot = self._create_slot(start_url)
+        self._share_resources(slot.scanner)
+        slot.scanner._open_checkpoint()
+        slot.scanner._open_history()
+        slot.scanner._open_output()
+        self.slots.append(slot)
+        await self._seed_slot(slot)
+        print(f"Обработчик {self.worker_id}: взят домен {slot.domain}")
+
+    def _poll_domains(self, task_group: asyncio.TaskGroup) -> None:
+        """Берёт домены, которые координатор закрепил за обработчиком уже во время сканирования."""
+        if time.monotonic() - self._last_poll < self.POLL_INTERVAL:
+            return
+        self._last_poll = time.monotonic()
+        for domain, start_url, seeded in self.frontier.assigned_domains(self.worker_id):
+            if domain not in self._domains:
+                self._domains.add(domain)
+                if seeded:
+                    self._seeded.add(domain)
+                task_group.create_task(self._adopt_domain(start_url))
+
+    def _lease(self) -> None:
+        """Берёт в аренду URL доменов, у которых кончается локальная очередь."""
+        hungry = [slot for slot in self.slots
+                  if slot.scanner.frontier_store.needs_lease and
+                  slot.scanner._queue_depth() < self.per_domain_concurrency]
+        if not hungry:
+            return
+        for slot in hungry:
+            # До записи пачки: ссылки, найденные после неё (в потоке статического сканера), снова поднимут флаг
+            slot.scanner.frontier_store.needs_lease = False
+        leased = self.frontier.lease(self.worker_id, [slot.domain for slot in hungry], self.LEASE_BATCH)
+        for slot in hungry:
+            rows = leased.get(slot.domain, [])
+            if len(rows) == self.LEASE_BATCH:  # В общей очереди может быть ещё
+                slot.scanner.frontier_store.needs_lease = True
+            url_cls = type(slot.scanner.start_url_obj)
+            for url, referrers, depth, lastmod in rows:
+                if lastmod is not None:
+                    slot.scanner.sitemap_lastmod[url] = lastmod
+                slot.scanner._enqueue_leased(url_cls(url, depth=depth, referrers=referrers))
+
+    def _dispatch(self, task_group: asyncio.TaskGroup) -> None:
+        self._poll_domains(task_group)
+        self._lease()
+        super()._dispatch(task_group)
+
+    def _collect_finished(self) -> None:
+        for slot in [slot for slot in self.slots if slot.is_finished()]:
+            if slot.scanner.budget_stop is not None:
+                # Бюджет домена исчерпан: остаток его очереди - следующему запуску
+                self.frontier.pause_domain(slot.domain, self.worker_id)
+                self.slots.remove(slot)
+                slot.save(finished=False)
+                print(f"Обработчик {self.worker_id}: домен {slot.domain} остановлен по бюджету")
+                continue
+            if not self.frontier.finish_domain(slot.domain, self.worker_id):
+                # В очереди домена остались URL (вернулись необработанные аренды) - берём их
+                slot.scanner.frontier_store.needs_lease = True
+                self._wakeup.set()
+                continue
+            self.slots.remove(slot)
+            self.finished_domains += 1
+            slot.save()
+            print(f"Обработчик {self.worker_id}: домен {slot.domain} просканирован, осталось {len(self.slots)}")
+
+    def _heartbeat(self) -> None:
+        self.frontier.heartbeat(self.worker_id, os.getpid(), self.metrics.pages)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            self._heartbeat()
+            self._wakeup.set()  # Заодно - проверить новые домены, даже если ни одна страница не закончилась
+
+    async def start(self, headless: bool = True) -> None:
+        self._heartbeat()
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        try:
+            await super().start(headless)
+        finally:
+            heartbeat.cancel()
+            self._heartbeat()
+            self.frontier.close()
+
+
+def run_worker(frontier_path: str, worker_id: int, engine: str, max_concurrency: int | None,
+               per_domain_concurrency: int | None, scanner_settings: dict | None, headless: bool) -> None:
+    """Точка входа процесса-обработчика."""
+    worker = CrawlWorker(frontier_path, worker_id, engine, max_concurrency, per_domain_concurrency, scanner_settings)
+    asyncio.run(worker.start(headless))
+
+
+class CrawlCoordinator:
+    """
+    Делит домены между процессами-обработчиками и следит за ними: перезапускает упавшие
+    и зависшие, возвращает их аренды в очередь, печатает общий прогресс.
+    """
+    FRONTIER_PATH = "data/distributed/frontier.sqlite"
+    MONITOR_INTERVAL = 5  # в секундах
+    WORKER_TIMEOUT = 120  # Обработчик, который столько секунд не отмечался, считается зависшим
+    MAX_RESTARTS = 3  # Перезапусков одного обработчика; дальше его домены переезжают к остальным
+
+    def __init__(self, sites: list[str], engine: str = "static", workers: int | None = None,
+                 frontier_path: str | None = None, max_concurrency: int | None = None,
+                 per_domain_concurrency: int | None = None, scanner_settings: dict | None = None,
+                 headless: bool = True) -> None:
+        if engine not in CrawlScheduler.ENGINES:
+            raise ValueError(f"Неизвестный движок: {engine}. Доступны: {', '.join(CrawlScheduler.ENGINES)}")
+        self.sites = sites
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.frontier_path = frontier_path or self.FRONTIER_PATH
+        # Настройки обработчиков; scanner_settings - переопределения атрибутов DomainScanner (имя - значение)
+        self.worker_args = (engine, max_concurrency, per_domain_concurrency, scanner_settings, headless)
+
+        self.frontier: SharedFrontier | None = None
+        self.ring = HashRing()
+        self.processes: dict[int, multiprocessing.Process] = {}
+        self.started_at: dict[int, float] = {}
+        self.restarts: dict[int, int] = {}
+        # spawn: обработчик - чистый процесс со своим циклом событий, браузером и пулом разбора
+        self._context = multiprocessing.get_context("spawn")
+
+    def _site_rows(self) -> list[tuple[str, str]]:
+        """(домен, стартовый URL) в том же каноническом виде, в каком их увидят сканеры."""
+        scanner_cls = CrawlScheduler.engine_classes(self.engine)[0]
+        settings = self.worker_args[3] or {}
+        canonicalizer = shared_canonicalizer(settings.get("ALLOWED_QUERY_PARAMS", scanner_cls.ALLOWED_QUERY_PARAMS),
+                                             settings.get("TRAILING_SLASH", scanner_cls.TRAILING_SLASH))
+        rows = []
+        for site in self.sites:
+            start_url = canonicalizer.canonicalize(site)
+            if start_url is not None:
+                rows.append((canonicalizer.host(start_url), start_url))
+        return rows
+
+    def _spawn(self, worker_id: int) -> None:
+        process = self._context.Process(target=run_worker, args=(self.frontier_path, worker_id, *self.worker_args),
+                                        name=f"crawl-worker-{worker_id}")
+        process.start()
+        self.processes[worker_id] = process
+        self.started_at[worker_id] = time.time()
+
+    def _stop_process(self, process: multiprocessing.Process, timeout: float = 10) -> None:
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _check_workers(self) -> None:
+        """Находит упавшие и зависшие обработчики и возвращает их работу в очередь."""
+        heartbeats = self.frontier.heartbeats()
+        now = time.time()
+        for worker_id, process in list(self.processes.items()):
+            last_seen = max(heartbeats.get(worker_id, 0), self.started_at[worker_id])
+            hung = process.is_alive() and now - last_seen > self.WORKER_TIMEOUT
+            if process.is_alive() and not hung:
+                continue
+            if hung:
+                print(f"Обработчик {worker_id} не отмечался {now - last_seen:.0f} с - останавливаем")
+                process.terminate()
+            self._stop_process(process)
+            del self.processes[worker_id]
+
+            reclaimed = self.frontier.reclaim(worker_id)
+            if not self.frontier.unfinished_domains(worker_id):
+                self.ring.remove(worker_id)  # Свои домены закончил - больше не нужен
+                continue
+            print(f"Обработчик {worker_id} остановился (код {process.exitcode}), "
+                  f"в очередь возвращено {reclaimed} URL")
+            if self.restarts[worker_id] < self.MAX_RESTARTS:
+                self.restarts[worker_id] += 1
+                self._spawn(worker_id)  # Тот же номер - те же домены (и их файлы истории и выгрузки)
+                continue
+            self.ring.remove(worker_id)
+            if not self.ring.nodes:
+                raise RuntimeError("все обработчики остановились, а домены не досканированы")
+            moved = self.frontier.assign_domains(self.ring)
+            print(f"Обработчик {worker_id} перезапускался {self.MAX_RESTARTS} раз - "
+                  f"его домены ({moved}) переезжают к остальным")
+
+    def _print_progress(self, previous_done: int, elapsed: float) -> int:
+        counts = self.frontier.counts()
+        print(f"[координатор] обработчиков {len(self.processes)}, доменов осталось {self.frontier.unfinished_domains()}"
+              f" | обработано {counts['done']}, в аренде {counts['leased']}, в очереди {counts['pending']}, "
+              f"брошено {counts['failed']} | {(counts['done'] - previous_done) / elapsed:.1f} URL/с")
+        return counts["done"]
+
+    def start(self) -> None:
+        self.frontier = SharedFrontier(self.frontier_path)
+        added = self.frontier.add_sites(self._site_rows())
+        reclaimed = self.frontier.reclaim()  # Аренды прошлого, прерванного запуска
+        self.frontier.resume_paused()  # Домены, которые прошлый запуск остановил по бюджету
+        self.frontier.reset_workers()
+        if reclaimed or added < len(self.sites):
+            print(f"Продолжаем распределённое сканирование: в очередь возвращено {reclaimed} URL")
+
+        self.ring = HashRing(range(self.workers))
+        self.frontier.assign_domains(self.ring)
+        print(f"Начинаем распределённое сканирование {self.frontier.unfinished_domains()} доменов: "
+              f"{self.workers} обработчиков, движок {self.engine}")
+        for worker_id in range(self.workers):
+            self.restarts[worker_id] = 0
+            self._spawn(worker_id)
+
+        finished = False
+        done, last_report = self.frontier.counts()["done"], time.monotonic()
+        try:
+            while self.frontier.unfinished_domains():
+                time.sleep(self.MONITOR_INTERVAL)
+                self._check_workers()
+                now = time.monotonic()
+                done, last_report = self._print_progress(done, now - last_report), now
+            finished = True
+            print("\nРаспределённое сканирование завершено.")
+
+        except KeyboardInterrupt:
+            print("\nСканирование прервано пользователем.")  # Обработчики получают Ctrl+C сами
+
+        finally:
+            for process in self.processes.values():
+                self._stop_process(process, timeout=30)
+            counts = self.frontier.counts()
+            left = counts['pending'] + counts['leased']
+            print(f"Обработано {counts['done']} URL, брошено {counts['failed']}, осталось в очереди {left}")
+            # Законченное сканирование следующий запуск начнёт заново, прерванное
+            # (или остановленное по бюджету доменов) - продолжит
+            self.frontier.close(remove=finished and not left)
+
+
+def main(engine: str = "static", workers: int | None = None) -> None:
+    coordinator = CrawlCoordinator(load_sites(), engine=engine, workers=workers)
+    coordinator.start()
+
+
+if __name__ == '__main__':
+    start_time = datetime.now()
+    print(start_time)
+    main(sys.argv[1] if len(sys.argv) > 1 else "static", int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    delta = datetime.now() - start_time
+    print(delta)
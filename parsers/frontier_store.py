@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterator
+
+
+class BufferedSQLite:
+    """
+    Файл SQLite в режиме WAL, в который изменения пишутся пачками:
+    они копятся в буфере, поэтому запись не тормозит сканирование,
+    а после падения теряется не больше одной пачки.
+    """
+    CHECKPOINT_EVERY = 500  # Записывать после стольких изменений
+    CHECKPOINT_INTERVAL = 5  # ... или не реже, чем раз в столько секунд
+    BUSY_TIMEOUT = 5.0  # Сколько секунд ждать, пока файл занят записью другого процесса
+
+    SCHEMA = ""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._connection = sqlite3.connect(path, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(self.SCHEMA)
+
+        self._lock = threading.Lock()  # Статический сканер в планировщике работает из потоков
+        self._pending_ops: list[tuple[str, tuple]] = []
+        self._last_flush = time.monotonic()
+        self.before_flush: Callable[[], None] | None = None  # Что записать раньше каждой пачки
+
+    def _push(self, sql: str, params: tuple) -> None:
+        with self._lock:
+            self._pending_ops.append((sql, params))
+            if (
+                    len(self._pending_ops) >= self.CHECKPOINT_EVERY or
+                    time.monotonic() - self._last_flush >= self.CHECKPOINT_INTERVAL
+            ):
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._pending_ops:
+            if self.before_flush is not None:
+                self.before_flush()
+            with self._connection:  # Одна транзакция на пачку
+                for sql, params in self._pending_ops:
+                    self._connection.execute(sql, params)
+            self._pending_ops.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self, remove: bool = False) -> None:
+        """Записывает остаток буфера; remove=True - удаляет файл."""
+        self.flush()
+        self._connection.close()
+        if remove:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+
+class FrontierStore(BufferedSQLite):
+    """
+    Состояние сканирования домена на диске: очередь URL, отметки об обработке и результаты.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS frontier (
+            url TEXT PRIMARY KEY,
+            referrers TEXT NOT NULL,
+            depth INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            lastmod TEXT
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            url TEXT PRIMARY KEY,
+            response INTEGER,
+            referrers TEXT NOT NULL,
+            depth INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(frontier)")}
+        if "lastmod" not in columns:  # Файл состояния от прошлой версии
+            with self._connection:
+                self._connection.execute("ALTER TABLE frontier ADD COLUMN lastmod TEXT")
+
+    def is_empty(self) -> bool:
+        return self._connection.execute("SELECT 1 FROM frontier LIMIT 1").fetchone() is None
+
+    def add_pending(self, url: str, referrers: tuple[str, ...], depth: int) -> None:
+        self._push("INSERT OR IGNORE INTO frontier (url, referrers, depth) VALUES (?, ?, ?)",
+                   (url, json.dumps(referrers, ensure_ascii=False), depth))
+
+    def add_pending_many(self, rows: list[tuple[str, tuple[str, ...], int, str | None]]) -> None:
+        """Добавляет в очередь сразу много URL (url, referrers, depth, lastmod) одной транзакцией."""
+        with self._lock:
+            self._flush_locked()  # Сначала то, что было поставлено в очередь раньше
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO frontier (url, referrers, depth, lastmod) VALUES (?, ?, ?, ?)",
+                    [(url, json.dumps(referrers, ensure_ascii=False), depth, lastmod)
+                     for url, referrers, depth, lastmod in rows])
+
+    def mark_done(self, url: str) -> None:
+        self._push("INSERT INTO frontier (url, referrers, done) VALUES (?, '[]', 1) "
+                   "ON CONFLICT(url) DO UPDATE SET done = 1",
+                   (url,))
+
+    def add_result(self, url: str, response: int | None, referrers: tuple[str, ...], depth: int) -> None:
+        self._push("INSERT OR REPLACE INTO results (url, response, referrers, depth) VALUES (?, ?, ?, ?)",
+                   (url, response, json.dumps(referrers, ensure_ascii=False), depth))
+
+    def iter_result_urls(self) -> Iterator[str]:
+        for (url,) in self._connection.execute("SELECT url FROM results"):
+            yield url
+
+    def iter_done(self) -> Iterator[str]:
+        for (url,) in self._connection.execute("SELECT url FROM frontier WHERE done = 1"):
+            yield url
+
+    def iter_pending(self) -> Iterator[tuple[str, tuple[str, ...], int, str | None]]:
+        """URL, которые ещё не обработаны, в порядке постановки в очередь (с lastmod из карты сайта)."""
+        for url, referrers, depth, lastmod in self._connection.execute(
+                "SELECT url, referrers, depth, lastmod FROM frontier WHERE done = 0 ORDER BY rowid"):
+            yield url, tuple(json.loads(referrers)), depth, lastmod
+
+
+class CheckpointMixin:
+    """
+    Сохранение и восстановление сканирования для DomainScanner.
+    Если сканирование домена прервалось, следующий start() продолжит его с того же места;
+    после успешного завершения файл состояния удаляется.
+    """
+    CHECKPOINT = True
+    CHECKPOINT_DIR = "data/checkpoints"
+
+    frontier_store: FrontierStore | None = None
+    resumed = False  # Очередь восстановлена из сохранённого состояния
+
+    def _checkpoint_path(self, suffix: str) -> str:
+        return os.path.join(self.CHECKPOINT_DIR, f"{self.base_domain.replace('.', '_')}{suffix}")
+
+    def _seen_set_path(self) -> str:
+        """Файл фильтра встреченных URL для режима bloom-disk."""
+        return self._checkpoint_path(".seen")
+
+    def _visited_set_path(self) -> str:
+        """Файл фильтра посещённых URL для режима bloom-disk."""
+        return self._checkpoint_path(".visited")
+
+    def _open_checkpoint(self) -> None:
+        if not self.CHECKPOINT or self.frontier_store is not None:
+            return
+        self.frontier_store = FrontierStore(self._checkpoint_path(".sqlite"))
+
+        if self.frontier_store.is_empty():
+            self._checkpoint_pending(self.start_url_obj)
+            return
+
+        self.resumed = True
+        url_cls = type(self.start_url_obj)
+        self.urls_to_visit = type(self.urls_to_visit)()  # Стартовый URL уже есть в сохранённой очереди
+
+        results = 0
+        for url in self.frontier_store.iter_result_urls():  # Сами результаты уже в выгрузке (crawl_output)
+            self.visited_urls.add(url)
+            self.seen_urls.add(url)
+            results += 1
+        for url in self.frontier_store.iter_done():
+            self.visited_urls.add(url)
+            self.seen_urls.add(url)
+
+        pending = 0
+        for url, referrers, depth, lastmod in self.frontier_store.iter_pending():
+            self.seen_urls.add(url)
+            if lastmod is not None:
+                self.sitemap_lastmod[url] = lastmod
+            if url not in self.visited_urls:
+                self._enqueue(url_cls(url, depth=depth, referrers=referrers))
+                pending += 1
+
+        self.scanned_count = self.results_count = results
+        print(f"Продолжаем сканирование {self.base_domain}: обработано {len(self.visited_urls)} URL, "
+              f"в очереди {pending}")
+
+    def _checkpoint_pending(self, url_obj) -> None:
+        if self.frontier_store is not None:
+            self.frontier_store.add_pending(url_obj.url, url_obj.referrers, url_obj.depth)
+
+    def _checkpoint_pending_many(self, url_objs: list) -> None:
+        if self.frontier_store is not None and url_objs:
+            self.frontier_store.add_pending_many([
+                (url_obj.url, url_obj.referrers, url_obj.depth, self.sitemap_lastmod.get(url_obj.url))
+                for url_obj in url_objs
+            ])
+
+    def _mark_done(self, url_obj) -> None:
+        """Отмечает, что URL из очереди обработан (успешно или с ошибкой)."""
+        if self.frontier_store is not None:
+            self.frontier_store.mark_done(url_obj.url)
+
+    def _checkpoint_result(self, url_obj) -> None:
+        if self.frontier_store is not None:
+            self.frontier_store.add_result(url_obj.url, url_obj.response, url_obj.referrers, url_obj.depth)
+
+    def _close_checkpoint(self, finished: bool) -> None:
+        if self.frontier_store is not None:
+            self.frontier_store.close(remove=finished)
+            self.frontier_store = None
+        # Фильтры в файле (bloom-disk) пересоздаются при каждом запуске
+        for url_set, path in ((self.seen_urls, self._seen_set_path()), (self.visited_urls, self._visited_set_path())):
+            if hasattr(url_set, "close"):
+                url_set.close()
+                if os.path.exists(path):
+                    os.remove(path)
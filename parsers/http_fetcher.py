@@ -0,0 +1,210 @@
+import asyncio
+import collections
+import importlib.util
+import itertools
+import time
+from urllib.parse import urlparse
+
+import httpx
+
+from crawl_metrics import CrawlMetrics
+from rate_control import DomainRateController, TRANSIENT_STATUSES
+from response_cache import ResponseCache
+
+
+class FetchResult:
+    """Ответ сервера, уже прочитанный и распакованный."""
+
+    def __init__(self, url: str, status: int, headers: httpx.Headers, content: bytes, http_version: str,
+                 elapsed: float = 0.0) -> None:
+        self.url = url  # URL после редиректов
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.http_version = http_version
+        self.elapsed = elapsed  # Секунд от отправки запроса до конца чтения (без ожидания в очереди хоста)
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("Content-Type", "")
+
+    @property
+    def is_html(self) -> bool:
+        return "html" in self.content_type
+
+    @property
+    def text(self) -> str:
+        charset = "utf-8"
+        for part in self.content_type.split(";"):
+            key, _, value = part.strip().partition("=")
+            if key.lower() == "charset" and value:
+                charset = value.strip('"\'')
+        try:
+            return self.content.decode(charset, errors="replace")
+        except LookupError:  # Неизвестная кодировка в заголовке
+            return self.content.decode("utf-8", errors="replace")
+
+
+class RequestTrace:
+    """
+    Отметки времени событий httpcore одного запроса (extensions={"trace": ...}): из них
+    видно, сколько ушло на DNS и TCP (connect), TLS и ожидание первого байта ответа (ttfb).
+    События соединения бывают только у запроса, открывшего новое соединение.
+    """
+
+    def __init__(self) -> None:
+        self.marks: dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        # http11.send_request_headers.started -> send_request_headers.started: HTTP/1.1 и HTTP/2 одинаково
+        self.marks[event_name.partition(".")[2]] = time.monotonic()
+
+    def _between(self, start: str, end: str) -> float | None:
+        if start in self.marks and end in self.marks:
+            return self.marks[end] - self.marks[start]
+        return None
+
+    def stages(self) -> dict[str, float]:
+        stages = {
+            "connect": self._between("connect_tcp.started", "connect_tcp.complete"),
+            "tls": self._between("start_tls.started", "start_tls.complete"),
+            "ttfb": self._between("send_request_headers.started", "receive_response_headers.complete"),
+        }
+        return {stage: seconds for stage, seconds in stages.items() if seconds is not None}
+
+
+class NotCachedError(httpx.TransportError):
+    """Режим offline: ответа нет в кэше, а в сеть ходить нельзя."""
+
+
+class AsyncFetcher:
+    """
+    Асинхронный HTTP-клиент для статических сканеров.
+    Один пул keep-alive соединений на всех, HTTP/2 там, где его предлагает сервер,
+    ограничение одновременных запросов на хост и потоковая распаковка ответа.
+    """
+    MAX_CONNECTIONS = 100  # Всего соединений в пуле
+    MAX_CONNECTIONS_PER_HOST = 4  # Одновременных запросов к одному хосту
+    KEEPALIVE_EXPIRY = 30  # Сколько секунд держать простаивающее соединение
+    MAX_BODY_SIZE = 10 * 1024 * 1024  # Больше не читаем - для поиска ссылок не нужно
+    # Заголовки, которые выставляет сам клиент: Accept-Encoding - по тем алгоритмам,
+    # что он умеет распаковывать, а Connection запрещён в HTTP/2
+    CLIENT_MANAGED_HEADERS = ("Accept-Encoding", "Connection")
+
+    def __init__(self,
+                 headers: dict[str, str] | None = None,
+                 timeout: float = 10,
+                 verify: bool = True,
+                 max_connections: int | None = None,
+                 max_connections_per_host: int | None = None,
+                 http2: bool = True,
+                 cache: ResponseCache | None = None) -> None:
+        headers = {
+            key: value for key, value in (headers or {}).items()
+            if key not in self.CLIENT_MANAGED_HEADERS
+        }
+        http2 = http2 and importlib.util.find_spec("h2") is not None  # HTTP/2 требует пакет h2
+        max_connections = max_connections or self.MAX_CONNECTIONS
+
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=self.KEEPALIVE_EXPIRY,
+            ),
+        )
+
+        self.cache = cache  # Кэш ответов на диске (response_cache), можно общий на несколько fetcher
+        self.metrics: CrawlMetrics | None = None  # Куда писать время этапов запроса (см. crawl_metrics)
+
+        per_host = max_connections_per_host or self.MAX_CONNECTIONS_PER_HOST
+        self._host_limits: collections.defaultdict[str, asyncio.Semaphore] = collections.defaultdict(
+            lambda: asyncio.Semaphore(per_host)
+        )
+
+    async def fetch(self, url: str, headers: dict[str, str] | None = None, read_body: bool = True) -> FetchResult:
+        """
+        Загружает URL. Тело читается по частям (с распаковкой на лету) и только для HTML,
+        если read_body=True; для файлов достаточно статуса и заголовков.
+        С кэшем ответ сначала ищется в нём, а загруженный сохраняется.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return FetchResult(cached.url, cached.status, httpx.Headers(cached.headers), cached.content, "cache")
+            if self.cache.offline:
+                raise NotCachedError(f"{url} нет в кэше (режим offline)")
+
+        queued = time.monotonic()
+        async with self._host_limits[urlparse(url).netloc]:
+            started = time.monotonic()
+            trace = RequestTrace() if self.metrics is not None else None
+            extensions = {"trace": trace} if trace is not None else None
+            async with self.client.stream("GET", url, headers=headers, extensions=extensions) as response:
+                chunks, size, truncated = [], 0, False
+                if read_body and "html" in response.headers.get("Content-Type", ""):
+                    async for chunk in response.aiter_bytes():
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.MAX_BODY_SIZE:
+                            truncated = True
+                            break
+
+                result = FetchResult(str(response.url), response.status_code, response.headers,
+                                     b"".join(chunks), response.http_version, time.monotonic() - started)
+
+        if trace is not None:
+            self.metrics.observe("host_wait", started - queued)
+            for stage, seconds in trace.stages().items():
+                self.metrics.observe(stage, seconds)
+            self.metrics.observe("fetch", result.elapsed)
+        # Без тела или с обрезанным телом в кэш не кладём - иначе из кэша потом придёт неполный HTML
+        if self.cache is not None and read_body and not truncated:
+            self.cache.put(url, result.url, result.status, result.headers, result.content)
+        return result
+
+    async def fetch_with_retries(self, url: str, rate_controller: DomainRateController,
+                                 headers: dict[str, str] | None = None) -> FetchResult:
+        """
+        fetch в темпе, который задаёт rate_controller домена, с повтором временных ошибок
+        (429, 5xx, таймауты, обрывы соединения). Ответ с ошибкой возвращается, когда повторы
+        закончились; сетевая ошибка - выбрасывается.
+        """
+        paced = self.cache is None or not self.cache.offline  # Из кэша отвечаем без пауз
+        for attempt in itertools.count():
+            if paced:
+                pause = rate_controller.reserve()
+                if self.metrics is not None:
+                    self.metrics.observe("pacing", pause)
+                await asyncio.sleep(pause)
+            try:
+                result = await self.fetch(url, headers=headers)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as ex_:
+                rate_controller.on_error(ex_.__class__.__name__)
+                delay = rate_controller.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                retry_after = rate_controller.on_response(result.status, result.elapsed,
+                                                          result.headers.get("Retry-After"))
+                if result.status not in TRANSIENT_STATUSES:
+                    return result
+                delay = rate_controller.retry_delay(attempt, retry_after)
+                if delay is None:
+                    return result
+            print(f"Повтор {url} через {delay:.1f} с (попытка {attempt + 2})")
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,199 @@
+import asyncio
+import collections
+import re
+from datetime import datetime
+
+import httpx
+
+import async_dynamic_crawler
+from async_dynamic_crawler import URL
+from http_fetcher import AsyncFetcher
+
+
+class DomainScanner(async_dynamic_crawler.DomainScanner):
+    """
+    Гибридный сканер: сначала страница загружается обычным HTTP-запросом,
+    и только если она похожа на JS-приложение или заглушку защиты от ботов,
+    её открывает Playwright. Если таких страниц на домене набирается много,
+    весь домен дальше сканируется через браузер.
+    """
+    STATIC_TIMEOUT = 10  # timeout обычного запроса в секундах
+    MIN_STATIC_LINKS = 5  # Меньше ссылок своего домена - вероятно, ссылки рисует JS
+    DOMAIN_ESCALATION_THRESHOLD = 3  # После стольких переходов в браузер весь домен идёт через браузер
+
+    # Признаки страниц-проверок от защиты от ботов
+    CHALLENGE_MARKERS = (
+        "cf-chl", "challenge-platform", "ddos-guard", "__qrator", "servicepipe",
+        "checking your browser", "проверка браузера", "captcha",
+    )
+    CHALLENGE_STATUSES = (403, 429, 503)  # Статусы ошибок, которыми отвечают проверки защиты от ботов
+    # Пустой контейнер SPA-приложения или просьба включить JavaScript
+    SPA_SHELL_RE = re.compile(
+        r'<div[^>]+id=["\'](?:root|app|__nuxt|__next)["\'][^>]*>\s*</div>'
+        r'|<noscript>[^<]*(?:enable javascript|включите javascript)',
+        re.IGNORECASE,
+    )
+
+    def __init__(self, start_url: str, ua=None) -> None:
+        super().__init__(start_url, ua=ua)
+
+        self.fetcher: AsyncFetcher | None = None  # Можно передать общий до вызова start
+
+        self.domain_needs_js = False  # Решение для всего домена: сразу открывать страницы в браузере
+        self.static_pages = 0
+        self.dynamic_pages = 0
+        self.escalation_reasons: collections.Counter[str] = collections.Counter()
+
+        self._browser_lock = asyncio.Lock()
+        self._browser_error: str | None = None  # Браузер не запустился: страницы, которым он нужен, - ошибки
+        self._max_concurrent_tabs = 1
+        self._headless = True
+
+    async def _prepare_browser(self, max_concurrent_tabs: int, headless: bool) -> None:
+        # Браузер запускается только при первой странице, которой он действительно нужен
+        self._max_concurrent_tabs, self._headless = max_concurrent_tabs, headless
+
+    async def _ensure_browser(self) -> bool:
+        """Запускает браузер при первой необходимости. False - браузер не запустился (и не будет перезапускаться)."""
+        async with self._browser_lock:
+            if self.context_pool is None and self._browser_error is None:
+                print(f"Запускаем браузер для домена {self.base_domain}")
+                try:
+                    await super()._prepare_browser(self._max_concurrent_tabs, self._headless)
+                except Exception as ex_:
+                    self._browser_error = ex_.__class__.__name__
+                    print(f"Не удалось запустить браузер для домена {self.base_domain}: {ex_}")
+            return self.context_pool is not None
+
+    def _is_challenge(self, html: str) -> bool:
+        lowered = html[:20_000].lower()
+        return any(marker in lowered for marker in self.CHALLENGE_MARKERS)
+
+    def _needs_js(self, html: str, links: list[str]) -> str | None:
+        """Возвращает причину открыть страницу в браузере или None, если хватает HTML."""
+        if len(html) < 2_000 and self._is_challenge(html):
+            return "challenge"
+        if self.SPA_SHELL_RE.search(html):
+            return "spa-shell"
+        if sum(self.canonicalizer.host(link) == self.base_domain for link in links) < self.MIN_STATIC_LINKS:
+            return "few-links"
+        return None
+
+    def _escalate(self, reason: str) -> None:
+        self.escalation_reasons[reason] += 1
+        escalations = sum(self.escalation_reasons.values())
+        if not self.domain_needs_js and (reason == "challenge" or escalations >= self.DOMAIN_ESCALATION_THRESHOLD):
+            self.domain_needs_js = True
+            print(f"Домен {self.base_domain} переводится на браузер (причина: {reason})")
+
+    async def _process_static(self, request_url_obj: URL) -> bool:
+        """Обрабатывает URL обычным запросом. Возвращает False, если страницу нужно открыть в браузере."""
+        request_url = request_url_obj.url
+
+        previous_page = self._previous_page(request_url)  # Инкрементальный режим: что было в прошлый раз
+        request_headers = {'User-Agent': self.ua.random, **self._conditional_headers(previous_page)}
+        try:
+            response = await self.fetcher.fetch_with_retries(request_url, self.rate_controller,
+                                                             headers=request_headers)
+        except httpx.HTTPError as ex_:
+            print(f"Ошибка запроса {request_url}: {ex_.__class__.__name__} {ex_}")
+            self._escalate("static-error")
+            return False  # Браузер может пройти там, где не прошёл обычный запрос
+
+        if response.status >= 400:
+            # Страница ошибки - не повод открывать браузер, если только это не проверка защиты от ботов
+            if response.status in self.CHALLENGE_STATUSES and response.is_html and self._is_challenge(response.text):
+                self._escalate("challenge")
+                return False
+            print(f"Ошибка запроса {request_url}: статус {response.status}")
+            self._add_error(request_url_obj, "HTTPStatusError", response.status, response.elapsed)
+            return True
+
+        response_url = self._canonical(response.url) or response.url.strip()
+        response_code = response.status
+        anchors = None
+        if self._is_unchanged(previous_page, response.status, response.content):
+            # Та же страница, что в прошлый раз: её не разбираем и не проверяем на JS заново
+            response_code = previous_page.response if response.status == 304 else response.status
+            pages, files = self._split_links(previous_page.links)
+        else:
+            html = response.text if response.is_html else ""
+            pages, files, fingerprint, anchors = (await self._collect_links(html, response_url) if response.is_html
+                                                  else ([], [], None, None))
+
+            reason = self._needs_js(html, pages + files) if response.is_html else None
+            if reason is not None:
+                self._escalate(reason)
+                return False
+            if response.is_html:
+                self._record_page(request_url, response.status, response.headers, response.content, pages + files)
+            if self._is_templated_duplicate(response_url, fingerprint):
+                self._prune_links(pages + files)  # Почти дубль размноженного шаблона - ссылки ведут на такие же
+                pages, files = [], []
+
+        processed_url_obj = request_url_obj.with_response(response_url, response_code)
+        if response.status != 304:
+            await self._archive_page_async(request_url, response_url, response.status, response.headers.multi_items(),
+                                           response.content, {**self.fetcher.client.headers, **request_headers})
+        self.visited_urls.add(response_url)
+        self._add_result(processed_url_obj, request_url, response.elapsed, response.content_type, len(response.content))
+        self.static_pages += 1
+        self._print_progress(request_url, response_code)
+
+        # Если домен отличается или мы наткнулись на файл, прекращаем обработку этой ветки
+        if processed_url_obj.domain == self.base_domain and "." not in response_url.split("/")[-1]:
+            self._enqueue_links(pages, files, request_url_obj, anchors)
+        return True
+
+    async def _process_url(self, request_url_obj: URL) -> None:
+        self._note_dequeued(request_url_obj.url)
+        self._start_budget_clock()
+        if not self.domain_needs_js and await self._process_static(request_url_obj):
+            return
+
+        if not await self._ensure_browser():
+            self._add_error(request_url_obj, self._browser_error)  # Страницу не открыть ни так, ни в браузере
+            return
+        if await self._render_url(request_url_obj):
+            self.dynamic_pages += 1
+
+    async def start(self, max_concurrent_tabs, headless: bool = False):
+        owns_cache = self.response_cache is None  # Кэш общий для обычных запросов и браузера
+        if owns_cache:
+            self._use_response_cache(self._create_response_cache())
+        owns_fetcher = self.fetcher is None
+        if owns_fetcher:
+            self.fetcher = AsyncFetcher(
+                headers=self.BASE_HEADERS,
+                timeout=self.STATIC_TIMEOUT,
+                verify=self.VERIFY_REQUESTS,
+                max_connections_per_host=max_concurrent_tabs,
+                cache=self.response_cache,
+            )
+            self.fetcher.metrics = self.metrics
+        try:
+            await super().start(max_concurrent_tabs, headless)
+        finally:
+            if owns_fetcher:
+                await self.fetcher.close()
+            if owns_cache and self.response_cache is not None:
+                self.response_cache.close()
+
+    def _save_data(self):
+        super()._save_data()
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in self.escalation_reasons.items()) or "нет"
+        print(f"{self.base_domain}: без браузера {self.static_pages} стр., через браузер {self.dynamic_pages} стр. "
+              f"(причины перехода в браузер - {reasons})")
+
+
+async def main():
+    ds = DomainScanner("https://www.vtb.ru/")
+    await ds.start(4, headless=True)
+
+
+if __name__ == '__main__':
+    start_time = datetime.now()
+    print(start_time)
+    asyncio.run(main())
+    delta = datetime.now() - start_time
+    print(delta)
@@ -0,0 +1,156 @@
+"""
+Извлечение ссылок из HTML.
+
+stream - быстрый разбор регулярными выражениями: проходит документ один раз,
+         пропускает комментарии, <script> и <style> и берёт только href у <a> и <base>,
+         не строя дерево документа.
+bs4    - BeautifulSoup, медленнее, но терпимее к очень кривой разметке. Используется
+         как запасной вариант, если stream не справился.
+Тексты ссылок (anchors) нужны приоритетной очереди URL (см. crawl_frontier).
+"""
+import html
+import re
+from urllib.parse import urljoin
+
+from url_canonicalizer import UrlCanonicalizer
+
+_TOKEN_RE = re.compile(
+    r'<!--.*?-->'  # Комментарии
+    r'|<(script|style|template)\b[^>]*>.*?</\1\s*>'  # Содержимое скриптов и стилей
+    r'|<(a|base)\s([^>]*)>',  # Нужные теги с атрибутами
+    re.IGNORECASE | re.DOTALL,
+)
+_HREF_RE = re.compile(r'''(?:^|\s)href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w-]+)', re.IGNORECASE)
+_FILE_EXTENSION_RE = re.compile(r'\.[a-zA-Z0-9]{2,6}$')
+# Конец текста ссылки: </a> или (в кривой разметке без </a>) следующая ссылка
+_ANCHOR_END_RE = re.compile(r'</a\s*>|<a\s', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]*>')
+ANCHOR_LOOKAHEAD = 1000  # Текст ссылки ищется не дальше стольких символов от <a>
+
+
+def decode_html(content: str | bytes) -> str:
+    """Текст страницы: байты декодируются по charset из <meta>, иначе как UTF-8."""
+    if isinstance(content, str):
+        return content
+    match = _META_CHARSET_RE.search(content[:4096])
+    charset = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return content.decode(charset, errors="replace")
+    except LookupError:  # Неизвестная кодировка в meta
+        return content.decode("utf-8", errors="replace")
+
+
+def _anchor_text(text: str, start: int) -> str:
+    """Текст ссылки, открывающий тег которой кончается на start."""
+    end = _ANCHOR_END_RE.search(text, start, start + ANCHOR_LOOKAHEAD)
+    if end is None:
+        return ""
+    return " ".join(html.unescape(_TAG_RE.sub(" ", text[start:end.start()])).split())
+
+
+def _extract_stream(content: str | bytes, page_url: str, anchors: dict[str, str] | None = None) -> list[str]:
+    hrefs: list[str] = []
+    texts: list[str] = []
+    base_url = page_url
+    text = decode_html(content)
+
+    for match in _TOKEN_RE.finditer(text):
+        tag = match.group(2)
+        if tag is None:  # Комментарий или скрипт - пропускаем
+            continue
+        href_match = _HREF_RE.search(match.group(3))
+        if href_match is None:
+            continue
+        href = html.unescape(next(value for value in href_match.groups() if value is not None)).strip()
+
+        if tag.lower() == "base":
+            if base_url is page_url:  # Учитывается только первый <base>
+                base_url = urljoin(page_url, href)
+        else:
+            hrefs.append(href)
+            if anchors is not None:
+                texts.append(_anchor_text(text, match.end()))
+
+    links = [urljoin(base_url, href) for href in hrefs]
+    if anchors is not None:
+        _add_anchors(anchors, links, texts)
+    return links
+
+
+def _extract_bs4(content: str | bytes, page_url: str, anchors: dict[str, str] | None = None) -> list[str]:
+    from bs4 import BeautifulSoup  # Тяжёлый импорт - только если действительно нужен
+
+    soup = BeautifulSoup(content, 'html.parser')
+    base_tag = soup.find('base', href=True)
+    base_url = urljoin(page_url, base_tag['href'].strip()) if base_tag else page_url
+    link_tags = soup.find_all('a', href=True)
+    links = [urljoin(base_url, link_tag['href'].strip()) for link_tag in link_tags]
+    if anchors is not None:
+        _add_anchors(anchors, links, [link_tag.get_text(" ", strip=True) for link_tag in link_tags])
+    return links
+
+
+def _add_anchors(anchors: dict[str, str], links: list[str], texts: list[str]) -> None:
+    """Текст ссылки для каждого адреса; если ссылок на адрес несколько - первый непустой."""
+    for link, text in zip(links, texts):
+        if text and link not in anchors:
+            anchors[link] = text
+
+
+BACKENDS = {
+    "stream": _extract_stream,
+    "bs4": _extract_bs4,
+}
+
+
+def extract_links(content: str | bytes, page_url: str, backend: str = "stream",
+                  anchors: dict[str, str] | None = None) -> list[str]:
+    """
+    Возвращает абсолютные URL всех ссылок <a href> страницы с учётом <base href>.
+    Если передан словарь anchors, в него попадают тексты ссылок: {абсолютный URL: текст}.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный способ извлечения ссылок: {backend}. Доступны: {', '.join(BACKENDS)}")
+    try:
+        return BACKENDS[backend](content, page_url, anchors)
+    except Exception as ex_:
+        if backend == "bs4":
+            raise
+        print(f"Ошибка извлечения ссылок ({backend}) на {page_url}: {ex_}, пробуем bs4")
+        if anchors is not None:
+            anchors.clear()
+        return _extract_bs4(content, page_url, anchors)
+
+
+def is_url_file(url: str) -> bool:
+    """Проверят, ведёт ли ссылка на файл, ищя расширения фалов в конце"""
+    after_host = url.partition("://")[2]
+    path = after_host[after_host.find("/"):] if "/" in after_host else ""  # Без хоста: у него тоже есть "."
+    return bool(_FILE_EXTENSION_RE.search(path.partition("#")[0].partition("?")[0].rstrip("/")))
+
+
+def extract_crawlable_links(content: str | bytes,
+                            page_url: str,
+                            base_domain: str,
+                            canonicalizer: UrlCanonicalizer,
+                            backend: str = "stream",
+                            anchors: dict[str, str] | None = None) -> tuple[list[str], list[str]]:
+    """
+    Извлекает ссылки, канонизирует их и отбрасывает заведомо неподходящие: не http(s)
+    и чужой домен. Возвращает (страницы, файлы) одним пакетом, без повторов.
+    Не зависит от состояния сканера, поэтому может выполняться в пуле процессов;
+    проверку глубины, ловушек и уже посещённых URL делает сам сканер.
+    В anchors (если передан) - тексты ссылок по каноническим URL.
+    """
+    pages, files, seen = [], [], set()
+    texts: dict[str, str] | None = {} if anchors is not None else None
+    for absolute_url in extract_links(content, page_url, backend, texts):
+        url_str = canonicalizer.canonicalize(absolute_url)
+        if url_str is None or url_str in seen or canonicalizer.host(url_str) != base_domain:
+            continue
+        seen.add(url_str)
+        (files if is_url_file(url_str) else pages).append(url_str)
+        if texts and absolute_url in texts:
+            anchors[url_str] = texts[absolute_url]
+    return pages, files
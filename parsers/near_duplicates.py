@@ -0,0 +1,272 @@
+"""
+Почти одинаковые страницы и размноженные по шаблону разделы сайта.
+
+На сайтах банков тысячи страниц, которые отличаются только городом, адресом или номером:
+отделения и банкоматы по городам, обёртки тарифов, копии разделов на другом языке.
+Точное сравнение URL их не различает - каждая загружается и разбирается, а её ссылки
+на такие же страницы ставятся в очередь.
+
+- page_fingerprint: 64-битный SimHash по тройкам слов текста страницы (без меню, шапки,
+  подвала и скриптов) - у почти одинаковых страниц отпечатки отличаются в нескольких битах;
+- NearDuplicateIndex: есть ли уже отпечаток не дальше distance бит. Отпечаток делится
+  на distance + 1 блоков: у близких отпечатков хотя бы один блок совпадает целиком,
+  поэтому сравниваются только отпечатки из тех же корзин, а не все;
+- path_pattern: шаблон адреса - путь без последнего сегмента, номеров и названий-слагов
+  (город, улица, отделение);
+- NearDuplicateMixin: если у шаблона набралось TEMPLATE_MIN_PAGES страниц и большая их часть -
+  почти дубли, шаблон считается размноженным: ссылки его страниц-дублей не ставятся в очередь,
+  а новые адреса этого шаблона ждут, пока не будут обойдены все остальные.
+"""
+import collections
+import functools
+import hashlib
+import re
+import struct
+from urllib.parse import unquote
+
+from link_extractor import decode_html, extract_crawlable_links
+from url_canonicalizer import UrlCanonicalizer
+from url_set import make_url_set
+
+FINGERPRINT_BITS = 64
+SHINGLE_WORDS = 3  # Признак страницы - тройка слов подряд
+MIN_WORDS = 50  # По меньшему числу слов отпечаток ненадёжен - такие страницы не сравниваются
+
+# Не содержимое страницы: <head>, меню, шапка, подвал, скрипты, списки выбора (например, городов)
+_BOILERPLATE_RE = re.compile(
+    r'<!--.*?-->|<(head|script|style|noscript|template|svg|nav|header|footer|aside|select)\b[^>]*>.*?</\1\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+')
+_DIGITS_RE = re.compile(r'\d+')
+# Байт -> 1, если в нём стоит бит с этим номером: bytes.translate + count считают бит у всех хэшей сразу
+_BIT_TABLES = tuple(bytes((byte >> bit) & 1 for byte in range(256)) for bit in range(8))
+
+
+@functools.lru_cache(maxsize=100_000)  # Разных слов на сайте тысячи, а троек слов - миллионы
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def shingles(words: list[str]) -> set[int]:
+    """64-битные хэши троек слов подряд."""
+    hashes = list(map(_word_hash, words))
+    # hash() кортежа чисел, в отличие от hash() строки, не зависит от PYTHONHASHSEED -
+    # отпечатки из пула процессов совпадают с отпечатками основного процесса
+    return {hash(shingle) for shingle in zip(*(hashes[offset:] for offset in range(SHINGLE_WORDS)))}
+
+
+def simhash(features: set[int]) -> int:
+    """SimHash набора 64-битных хэшей: бит отпечатка равен 1, если он стоит у большинства хэшей."""
+    data = struct.pack(f"<{len(features)}q", *features)
+    fingerprint = 0
+    for index in range(FINGERPRINT_BITS // 8):
+        column = data[index::8]  # index-й байт всех хэшей
+        for bit, table in enumerate(_BIT_TABLES):
+            if column.translate(table).count(1) * 2 > len(features):
+                fingerprint |= 1 << (8 * index + bit)
+    return fingerprint
+
+
+def page_text(content: str | bytes) -> str:
+    """Видимый текст страницы без меню, шапки, подвала и скриптов."""
+    return _TAG_RE.sub(" ", _BOILERPLATE_RE.sub(" ", decode_html(content)))
+
+
+def page_fingerprint(content: str | bytes) -> int | None:
+    """Отпечаток страницы или None, если текста слишком мало для сравнения."""
+    # Номера (дом, телефон, банкомат) не делают страницу другой
+    words = _WORD_RE.findall(_DIGITS_RE.sub("#", page_text(content).lower()))
+    if len(words) < MIN_WORDS:
+        return None
+    return simhash(shingles(words))
+
+
+def parse_page(content: str | bytes,
+               page_url: str,
+               base_domain: str,
+               canonicalizer: UrlCanonicalizer,
+               backend: str = "stream",
+               fingerprint: bool = True,
+               anchors: bool = False) -> tuple[list[str], list[str], int | None, dict[str, str]]:
+    """
+    Ссылки страницы (см. extract_crawlable_links), её отпечаток и тексты ссылок одним заданием -
+    чтобы динамические сканеры не гоняли страницу в пул процессов дважды.
+    """
+    texts: dict[str, str] = {}
+    pages, files = extract_crawlable_links(content, page_url, base_domain, canonicalizer, backend,
+                                           texts if anchors else None)
+    return pages, files, page_fingerprint(content) if fingerprint else None, texts
+
+
+class NearDuplicateIndex:
+    """Отпечатки страниц с поиском почти одинаковых (расстояние Хэмминга не больше distance)."""
+
+    def __init__(self, distance: int = 3) -> None:
+        self.distance = distance
+        count = distance + 1
+        width = FINGERPRINT_BITS // count
+        # (сдвиг, маска) блоков; последний забирает остаток битов
+        self._blocks = [(index * width, (1 << (width if index < count - 1 else FINGERPRINT_BITS - index * width)) - 1)
+                        for index in range(count)]
+        self._buckets: list[dict[int, list[int]]] = [{} for _ in range(count)]
+        self._fingerprints: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def find(self, fingerprint: int) -> int | None:
+        """Близкий отпечаток из индекса или None."""
+        if fingerprint in self._fingerprints:
+            return fingerprint
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            for candidate in buckets.get((fingerprint >> shift) & mask, ()):
+                if (candidate ^ fingerprint).bit_count() <= self.distance:
+                    return candidate
+        return None
+
+    def add(self, fingerprint: int) -> None:
+        if fingerprint in self._fingerprints:
+            return
+        self._fingerprints.add(fingerprint)
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            buckets.setdefault((fingerprint >> shift) & mask, []).append(fingerprint)
+
+
+def _is_slug(segment: str) -> bool:
+    """Сегмент-название из нескольких слов или не латиницей: sankt-peterburg, ulitsa_lenina, москва."""
+    return "-" in segment or "_" in segment or not segment.isascii()
+
+
+def path_pattern(url: str) -> str:
+    """
+    Шаблон адреса: сегменты пути с цифрами заменяются на "#", последний и названия-слаги
+    глубже первого (см. _is_slug) - на "*", от запроса остаются имена параметров.
+    Путь сравнивается раскодированным (%D0%BC... -> м). /offices/12/atm/7/ -> /offices/#/atm/*/,
+    /offices/sankt-peterburg/atm/7/ -> /offices/*/atm/*/, /atm/?city=5 -> /atm/?city
+    """
+    path, _, query = url.split("/", 3)[-1].partition("?")
+    path = unquote(path)
+    segments = [segment for segment in path.split("/") if segment]
+    tail = "/" if path.endswith("/") and segments else ""
+    if query:
+        names = sorted({parameter.partition("=")[0] for parameter in query.split("&")})
+        return "/" + "/".join(segments) + tail + "?" + "&".join(names)
+    if segments:
+        # Первый сегмент - раздел сайта (credit-cards, o-banke): его название шаблон не обобщает
+        segments = ["#" if any(char.isdigit() for char in segment) else "*" if index and _is_slug(segment) else segment
+                    for index, segment in enumerate(segments[:-1])] + ["*"]
+    return "/" + "/".join(segments) + tail
+
+
+class NearDuplicateMixin:
+    """
+    Поиск почти одинаковых страниц в DomainScanner. Отпечаток страницы считается после загрузки
+    (_page_fingerprint), _is_templated_duplicate решает, разбирать ли её ссылки дальше,
+    _defer откладывает адреса размноженных шаблонов, _release_deferred возвращает их в очередь,
+    когда остальные адреса закончились.
+    """
+    NEAR_DUPLICATES = True  # False - не считать отпечатки страниц
+    NEAR_DUPLICATE_DISTANCE = 3  # Страницы почти одинаковы, если отпечатки отличаются не больше чем в стольких битах
+    TEMPLATE_MIN_PAGES = 10  # Шаблон адреса оценивается, когда по нему загружено столько страниц
+    TEMPLATE_DUPLICATE_SHARE = 0.8  # Шаблон размножен, если такая доля его страниц - почти дубли
+    PRUNED_SAMPLE = 1000  # Сколько неразобранных ссылок помнить точно - по ним оценивается экономия загрузок
+
+    def _init_near_duplicates(self) -> None:
+        self.near_duplicates = NearDuplicateIndex(self.NEAR_DUPLICATE_DISTANCE)
+        # Шаблон адреса -> [страниц с отпечатком, из них почти дублей]
+        self.template_stats: dict[str, list[int]] = collections.defaultdict(lambda: [0, 0])
+        self.templated_patterns: set[str] = set()  # Размноженные шаблоны
+        self.deferred_urls: collections.deque = collections.deque()  # Адреса размноженных шаблонов - в конец обхода
+        self.duplicate_pages = 0  # Загружено почти дублей
+        self.pruned_pages = 0  # Из них страниц, чьи ссылки не ставились в очередь
+        # Ссылки этих страниц, ещё не встреченные сканером: сколько их, сами они - в том же виде,
+        # что и встреченные URL (SEEN_SET, см. url_set), первые PRUNED_SAMPLE - строками для отчёта
+        self.pruned_links = 0
+        self._pruned_links = make_url_set("bloom" if self.SEEN_SET == "bloom-disk" else self.SEEN_SET)
+        self._pruned_sample: list[str] = []
+
+    def _page_fingerprint(self, content: str | bytes) -> int | None:
+        return page_fingerprint(content) if self.NEAR_DUPLICATES else None
+
+    def _is_templated(self, pattern: str) -> bool:
+        pages, duplicates = self.template_stats.get(pattern, (0, 0))
+        return pages >= self.TEMPLATE_MIN_PAGES and duplicates >= pages * self.TEMPLATE_DUPLICATE_SHARE
+
+    def _is_templated_duplicate(self, url: str, fingerprint: int | None) -> bool:
+        """
+        Учитывает отпечаток загруженной страницы. True - страница почти повторяет уже загруженную
+        и её шаблон адреса размножен: ссылки такой страницы в очередь не ставятся.
+        """
+        if fingerprint is None:
+            return False
+        duplicate = self.near_duplicates.find(fingerprint) is not None
+        if duplicate:
+            self.duplicate_pages += 1
+        else:
+            self.near_duplicates.add(fingerprint)
+        pattern = path_pattern(url)
+        stats = self.template_stats[pattern]
+        stats[0] += 1
+        stats[1] += duplicate
+        templated = self._is_templated(pattern)
+        if templated and pattern not in self.templated_patterns:
+            self.templated_patterns.add(pattern)
+            print(f"{self.base_domain}: страницы {pattern} размножены по шаблону "
+                  f"({stats[1]} почти одинаковых из {stats[0]}), их ссылки больше не разбираются")
+        return duplicate and templated
+
+    def _prune_links(self, links: list[str]) -> None:
+        """Ссылки почти дубля в очередь не ставятся - только учитываются для отчёта."""
+        self.pruned_pages += 1
+        for link in links:
+            url_str = self._canonical(link)
+            if (url_str is None or self.canonicalizer.host(url_str) != self.base_domain
+                    or url_str in self.seen_urls or url_str in self.visited_urls or url_str in self._pruned_links):
+                continue
+            self._pruned_links.add(url_str)
+            self.pruned_links += 1
+            if len(self._pruned_sample) < self.PRUNED_SAMPLE:
+                self._pruned_sample.append(url_str)
+
+    def _defer(self, url_obj) -> bool:
+        """
+        True - адрес размноженного шаблона отложен до конца обхода. Приоритетная очередь
+        (см. crawl_frontier) откладывает такие адреса сама - через приоритет.
+        """
+        if self.urls_to_visit.prioritized:
+            return False
+        if not self.templated_patterns or not self._is_templated(path_pattern(url_obj.url)):
+            return False
+        self.deferred_urls.append(url_obj)
+        return True
+
+    def _release_deferred(self) -> bool:
+        """Возвращает отложенные адреса в очередь. False - отложенных нет."""
+        if not self.deferred_urls:
+            return False
+        while self.deferred_urls:
+            self._enqueue(self.deferred_urls.popleft())
+        return True
+
+    def _avoided_fetches(self) -> int:
+        """
+        Сколько адресов со страниц-дублей так и не пришлось загружать: часть выборки, которую сканер
+        так и не встретил по другим ссылкам, на все неразобранные ссылки (до PRUNED_SAMPLE - точно).
+        """
+        if not self._pruned_sample:
+            return 0
+        avoided = sum(url not in self.seen_urls and url not in self.visited_urls for url in self._pruned_sample)
+        return round(avoided * self.pruned_links / len(self._pruned_sample))
+
+    def _near_duplicates_summary(self) -> str | None:
+        if not self.duplicate_pages:
+            return None
+        summary = f"почти одинаковых страниц - {self.duplicate_pages}"
+        if self.templated_patterns:
+            summary += (f", размножено шаблонов - {len(self.templated_patterns)} "
+                        f"({', '.join(sorted(self.templated_patterns)[:5])}), "
+                        f"не разобрано ссылок на {self.pruned_pages} стр., сэкономлено загрузок - "
+                        f"{'' if self.pruned_links <= self.PRUNED_SAMPLE else '~'}{self._avoided_fetches()}")
+        return summary
@@ -0,0 +1,422 @@
+"""
+Архив загруженных страниц в формате WARC 1.1 - для повторного разбора без повторного сканирования.
+
+Сканер только кладёт страницу в ограниченную очередь (PageArchive.put), всё остальное делает
+фоновый поток: собирает записи request/response (для страниц из браузера - resource
+с отрисованным HTML), сжимает каждую запись отдельным gzip-блоком и дописывает в текущий
+сегмент pages-<время>-<pid>-NNNNN.warc.gz. Когда сегмент дорастает до segment_size, начинается
+следующий. Если очередь заполнена (диск не успевает), сканер ждёт - память не растёт; асинхронные
+сканеры ждут через put_async в отдельном потоке, чтобы не останавливать цикл событий.
+
+Где лежит каждая страница (сегмент, смещение и длина сжатого блока), записано в index.sqlite
+рядом с сегментами: ArchiveReader.get распаковывает только нужный блок, а не весь сегмент.
+Сегменты читаются и обычными инструментами для WARC (warcio, pywb); read_segment перебирает
+записи сегмента без индекса - например, чтобы восстановить индекс.
+
+Тело ответа хранится уже распакованным (как его отдал requests/httpx), поэтому заголовки
+передачи (Content-Encoding, Transfer-Encoding) из записи убраны, а Content-Length - пересчитан.
+"""
+import asyncio
+import base64
+import hashlib
+import http
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator
+
+from response_cache import HOP_BY_HOP_HEADERS
+
+SOFTWARE = "BankSelect-Parsers"
+
+
+class ArchivedPage:
+    """Страница из архива."""
+
+    def __init__(self, url: str, record_type: str, warc_headers: dict[str, str], status: int | None,
+                 headers: dict[str, str], content: bytes) -> None:
+        self.url = url
+        self.record_type = record_type  # response - ответ сервера, resource - HTML, отрисованный браузером
+        self.warc_headers = warc_headers
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    @property
+    def fetched_at(self) -> str:
+        return self.warc_headers.get("WARC-Date", "")
+
+
+class _PendingPage:
+    __slots__ = ("url", "final_url", "status", "headers", "content", "request_headers", "rendered", "fetched_at")
+
+    def __init__(self, url, final_url, status, headers, content, request_headers, rendered) -> None:
+        self.url = url
+        self.final_url = final_url
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.request_headers = request_headers
+        self.rendered = rendered
+        self.fetched_at = time.time()
+
+
+def _warc_date(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _digest(block: bytes) -> str:
+    return "sha1:" + base64.b32encode(hashlib.sha1(block).digest()).decode("ascii")
+
+
+def _header_lines(headers) -> str:
+    return "".join(f"{name}: {value}\r\n" for name, value in headers)
+
+
+def _reason(status: int) -> str:
+    try:
+        return http.HTTPStatus(status).phrase
+    except ValueError:
+        return ""
+
+
+def _warc_record(fields: list[tuple[str, str]], block: bytes) -> bytes:
+    head = "WARC/1.1\r\n" + _header_lines(fields + [("Content-Length", str(len(block)))]) + "\r\n"
+    return head.encode("utf-8") + block + b"\r\n\r\n"
+
+
+def _gzip_member(data: bytes, level: int) -> bytes:
+    """Отдельный gzip-блок: его можно распаковать, не читая остальные блоки сегмента."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _parse_headers(lines: list[bytes]) -> dict[str, str]:
+    headers = {}
+    for line in lines:
+        name, _, value = line.decode("utf-8", errors="replace").partition(":")
+        if name:
+            headers[name.strip()] = value.strip()
+    return headers
+
+
+def _parse_record(data: bytes) -> ArchivedPage:
+    head, _, rest = data.partition(b"\r\n\r\n")
+    warc_headers = _parse_headers(head.split(b"\r\n")[1:])
+    block = rest[:int(warc_headers.get("Content-Length", len(rest)))]
+    record_type = warc_headers.get("WARC-Type", "")
+    url = warc_headers.get("WARC-Target-URI", "")
+    if record_type != "response":
+        status = int(warc_headers["WARC-Http-Status"]) if "WARC-Http-Status" in warc_headers else None
+        return ArchivedPage(url, record_type, warc_headers, status, {}, block)
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    status_line, *header_lines = http_head.split(b"\r\n")
+    status = int(status_line.split()[1])
+    return ArchivedPage(url, record_type, warc_headers, status, _parse_headers(header_lines), body)
+
+
+def read_record(path: str, offset: int, length: int) -> ArchivedPage:
+    """Одна запись сегмента по смещению и длине её gzip-блока."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return _parse_record(zlib.decompress(f.read(length), 31))
+
+
+def read_segment(path: str, chunk_size: int = 1024 ** 2) -> Iterator[tuple[int, int, ArchivedPage]]:
+    """Все записи сегмента по порядку: (смещение, длина сжатого блока, запись). Сегмент читается кусками."""
+    offset, data = 0, b""
+    with open(path, "rb") as f:
+        while True:
+            decompressor = zlib.decompressobj(31)
+            parts, length = [], 0
+            while not decompressor.eof:
+                if not data:
+                    data = f.read(chunk_size)
+                    if not data:  # Конец сегмента или недописанный блок (сканирование прервалось)
+                        return
+                parts.append(decompressor.decompress(data))
+                length += len(data) - len(decompressor.unused_data)
+                data = decompressor.unused_data
+            yield offset, length, _parse_record(b"".join(parts))
+            offset += length
+
+
+class PageArchive:
+    """Запись архива страниц в фоновом потоке (см. описание модуля)."""
+    SEGMENT_SIZE = 1024 ** 3  # Байт в сегменте (сжатых), как советует стандарт WARC
+    QUEUE_SIZE = 256  # Страниц, ждущих записи; когда очередь полна, put ждёт
+    COMPRESS_LEVEL = 3  # Втрое быстрее уровня 6 на HTML при файлах на ~10% больше
+    INDEX_EVERY = 500  # Записывать индекс после стольких страниц (и всегда, когда очередь опустела)
+    BUSY_TIMEOUT = 30.0  # Индекс может быть общим для нескольких процессов (distributed_crawl)
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            url TEXT NOT NULL,
+            final_url TEXT NOT NULL,
+            status INTEGER,
+            content_type TEXT,
+            rendered INTEGER NOT NULL,
+            fetched_at REAL NOT NULL,
+            segment TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS records_url ON records (url, fetched_at);
+        CREATE INDEX IF NOT EXISTS records_final_url ON records (final_url, fetched_at);
+    """
+
+    def __init__(self, path: str = "data/archive", segment_size: int | None = None,
+                 queue_size: int | None = None) -> None:
+        self.path = path
+        self.segment_size = segment_size or self.SEGMENT_SIZE
+        os.makedirs(path, exist_ok=True)
+        self._queue: queue.Queue[_PendingPage | None] = queue.Queue(queue_size or self.QUEUE_SIZE)
+        self._prefix = f"pages-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+        self._segment_number = 0
+        self._segment = None
+        self._segment_name = ""
+        self._index_rows: list[tuple] = []
+        self.pages = 0  # Записано страниц
+        self.raw_bytes = 0  # Несжатых байт записей
+        self.stored_bytes = 0  # Байт на диске
+        self.segments: list[str] = []
+        self.dropped = 0  # Страниц, не записанных из-за ошибки архива
+        self.error: Exception | None = None
+        self._thread = threading.Thread(target=self._run, name="page-archive", daemon=True)
+        self._thread.start()
+
+    def put(self, url: str, final_url: str, status: int | None, headers, content: str | bytes,
+            request_headers=None, rendered: bool = False) -> None:
+        """
+        Ставит страницу в очередь записи. headers и request_headers - заголовки ответа
+        и запроса (dict или пары), rendered=True - content отрисован браузером.
+        """
+        page = self._pending(url, final_url, status, headers, content, request_headers, rendered)
+        if page is not None:
+            self._queue.put(page)
+
+    async def put_async(self, url: str, final_url: str, status: int | None, headers, content: str | bytes,
+                        request_headers=None, rendered: bool = False) -> None:
+        """put для асинхронных сканеров: места в полной очереди ждёт поток, а не цикл событий."""
+        page = self._pending(url, final_url, status, headers, content, request_headers, rendered)
+        if page is None:
+            return
+        try:
+            self._queue.put_nowait(page)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, page)
+
+    def _pending(self, url, final_url, status, headers, content, request_headers, rendered) -> _PendingPage | None:
+        if self.error is not None:
+            self.dropped += 1
+            return None
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        headers = list(headers.items()) if hasattr(headers, "items") else list(headers or ())
+        request_headers = list(request_headers.items()) if hasattr(request_headers, "items") else request_headers
+        return _PendingPage(url, final_url, status, headers, content, request_headers, rendered)
+
+    def flush(self) -> None:
+        """Ждёт, пока всё из очереди записано на диск и в индекс."""
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    async def close_async(self) -> None:
+        """close для асинхронных сканеров: дописывание очереди не останавливает цикл событий."""
+        await asyncio.to_thread(self.close)
+
+    def summary(self) -> str:
+        ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0
+        text = (f"архив страниц {self.path}: {self.pages} стр., {self.raw_bytes / 1024 ** 2:.1f} МБ -> "
+                f"{self.stored_bytes / 1024 ** 2:.1f} МБ (сжатие {ratio:.1f}x), сегментов {len(self.segments)}")
+        if self.error is not None:
+            text += f", не записано {self.dropped} стр. из-за ошибки: {self.error}"
+        return text
+
+    def _run(self) -> None:
+        connection = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=self.BUSY_TIMEOUT)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(self.SCHEMA)
+        try:
+            while True:
+                page = self._queue.get()
+                try:
+                    if page is None:
+                        break
+                    if self.error is None:
+                        self._write_page(page)
+                        if len(self._index_rows) >= self.INDEX_EVERY or self._queue.empty():
+                            self._write_index(connection)
+                    else:
+                        self.dropped += 1
+                except (OSError, sqlite3.Error) as ex_:
+                    print(f"Ошибка записи архива страниц {self.path}: {ex_}; дальше страницы не сохраняются")
+                    self.error = ex_
+                    self.dropped += 1
+                finally:
+                    self._queue.task_done()
+            if self.error is None:
+                self._write_index(connection)
+        finally:
+            if self._segment is not None:
+                self._segment.close()
+            connection.close()
+
+    def _open_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+        self._segment_name = f"{self._prefix}-{self._segment_number:05d}.warc.gz"
+        self._segment_number += 1
+        self._segment = open(os.path.join(self.path, self._segment_name), "wb")
+        self.segments.append(self._segment_name)
+        info = _header_lines([("software", SOFTWARE), ("format", "WARC File Format 1.1")]).encode("utf-8")
+        self._append(_warc_record([
+            ("WARC-Type", "warcinfo"),
+            ("WARC-Record-ID", f"<urn:uuid:{uuid.uuid4()}>"),
+            ("WARC-Date", _warc_date(time.time())),
+            ("WARC-Filename", self._segment_name),
+            ("Content-Type", "application/warc-fields"),
+        ], info))
+
+    def _append(self, record: bytes) -> tuple[int, int]:
+        member = _gzip_member(record, self.COMPRESS_LEVEL)
+        offset = self._segment.tell()
+        self._segment.write(member)
+        self.raw_bytes += len(record)
+        self.stored_bytes += len(member)
+        return offset, len(member)
+
+    def _write_page(self, page: _PendingPage) -> None:
+        if self._segment is None or self._segment.tell() >= self.segment_size:
+            self._open_segment()
+        date = _warc_date(page.fetched_at)
+        record_id = f"<urn:uuid:{uuid.uuid4()}>"
+        content_type = next((value for name, value in page.headers if name.lower() == "content-type"), None)
+        digest = _digest(page.content)
+        fields = [("WARC-Record-ID", record_id), ("WARC-Date", date), ("WARC-Target-URI", page.final_url),
+                  ("WARC-Payload-Digest", digest)]
+        if page.final_url != page.url:
+            fields.append(("WARC-Refers-To-Target-URI", page.url))  # Запрошенный URL до редиректов
+        if page.rendered:
+            # HTML из браузера - не ответ сервера: resource с кодом ответа в расширенном поле
+            fields = [("WARC-Type", "resource")] + fields + [("Content-Type", "text/html; charset=utf-8")]
+            if page.status is not None:
+                fields.append(("WARC-Http-Status", str(page.status)))
+            block = page.content
+        else:
+            fields = [("WARC-Type", "response")] + fields + [("Content-Type", "application/http; msgtype=response")]
+            headers = [(name, value) for name, value in page.headers if name.lower() not in HOP_BY_HOP_HEADERS]
+            headers.append(("Content-Length", str(len(page.content))))
+            head = f"HTTP/1.1 {page.status} {_reason(page.status)}\r\n{_header_lines(headers)}\r\n"
+            block = head.encode("utf-8") + page.content
+        offset, length = self._append(_warc_record(fields, block))
+        if page.request_headers is not None:
+            request = f"GET {page.url} HTTP/1.1\r\n{_header_lines(page.request_headers)}\r\n".encode("utf-8")
+            self._append(_warc_record([
+                ("WARC-Type", "request"),
+                ("WARC-Record-ID", f"<urn:uuid:{uuid.uuid4()}>"),
+                ("WARC-Date", date),
+                ("WARC-Target-URI", page.url),
+                ("WARC-Concurrent-To", record_id),
+                ("Content-Type", "application/http; msgtype=request"),
+            ], request))
+        self._index_rows.append((page.url, page.final_url, page.status, content_type, page.rendered,
+                                 page.fetched_at, self._segment_name, offset, length, digest))
+        self.pages += 1
+
+    def _write_index(self, connection: sqlite3.Connection) -> None:
+        """Индекс пишется после сегмента: в нём нет ссылок на недописанные данные."""
+        if not self._index_rows:
+            return
+        self._segment.flush()
+        with connection:
+            connection.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._index_rows)
+        self._index_rows.clear()
+
+
+class ArchiveReader:
+    """Чтение архива по индексу: одна страница - один распакованный gzip-блок."""
+
+    def __init__(self, path: str = "data/archive") -> None:
+        self.path = path
+        self._connection = sqlite3.connect(f"file:{os.path.join(path, 'index.sqlite')}?mode=ro", uri=True)
+
+    def get(self, url: str) -> ArchivedPage | None:
+        """Последняя сохранённая версия страницы (url - запрошенный URL или URL после редиректов)."""
+        row = self._connection.execute(
+            "SELECT segment, offset, length FROM records WHERE url = ? OR final_url = ? "
+            "ORDER BY fetched_at DESC LIMIT 1", (url, url)).fetchone()
+        return read_record(os.path.join(self.path, row[0]), row[1], row[2]) if row is not None else None
+
+    def urls(self) -> list[str]:
+        return [url for (url,) in self._connection.execute("SELECT DISTINCT url FROM records ORDER BY url")]
+
+    def __iter__(self) -> Iterator[ArchivedPage]:
+        """Все страницы архива по порядку записи."""
+        for segment, offset, length in self._connection.execute(
+                "SELECT segment, offset, length FROM records ORDER BY segment, offset"):
+            yield read_record(os.path.join(self.path, segment), offset, length)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ArchiveMixin:
+    """
+    Архив загруженных страниц в DomainScanner (см. PageArchive). Выключен, пока ARCHIVE_DIR не задан.
+    Планировщик делает один архив на все домены и раздаёт его сканерам до start.
+    """
+    ARCHIVE_DIR: str | None = None  # Например, "data/archive"
+    ARCHIVE_SEGMENT_SIZE = PageArchive.SEGMENT_SIZE
+
+    page_archive: PageArchive | None = None
+    _owns_archive = False
+
+    def _create_archive(self) -> PageArchive | None:
+        if self.ARCHIVE_DIR is None:
+            return None
+        return PageArchive(self.ARCHIVE_DIR, self.ARCHIVE_SEGMENT_SIZE)
+
+    def _open_archive(self) -> None:
+        if self.page_archive is None:
+            self.page_archive = self._create_archive()
+            self._owns_archive = self.page_archive is not None
+
+    def _archive_page(self, url: str, final_url: str, status: int | None, headers, content: str | bytes,
+                      request_headers=None, rendered: bool = False) -> None:
+        if self.page_archive is None or not content:
+            return
+        with self.metrics.timer("archive"):  # Дольше микросекунд - только если очередь записи заполнена
+            self.page_archive.put(url, final_url, status, headers, content, request_headers, rendered)
+
+    async def _archive_page_async(self, url: str, final_url: str, status: int | None, headers,
+                                  content: str | bytes, request_headers=None, rendered: bool = False) -> None:
+        """_archive_page для асинхронных сканеров (см. PageArchive.put_async)."""
+        if self.page_archive is None or not content:
+            return
+        with self.metrics.timer("archive"):
+            await self.page_archive.put_async(url, final_url, status, headers, content, request_headers, rendered)
+
+    def _close_archive(self) -> None:
+        if self._owns_archive:
+            self.page_archive.close()
+            self._forget_archive()
+
+    async def _close_archive_async(self) -> None:
+        if self._owns_archive:
+            await self.page_archive.close_async()
+            self._forget_archive()
+
+    def _forget_archive(self) -> None:
+        print(f"{self.base_domain}: {self.page_archive.summary()}")
+        self.page_archive = None
+        self._owns_archive = False
@@ -0,0 +1,165 @@
+"""
+Темп запросов к домену и повторы временных ошибок.
+
+DomainRateController ведёт темп (запросов в секунду) по схеме AIMD: после каждого нормального
+ответа темп растёт на постоянную величину, а при признаках перегрузки сайта (429/503, 5xx,
+сетевые ошибки, резкий рост задержки) уменьшается в разы. Retry-After соблюдается: до указанного
+времени к домену не идёт ни один запрос. Временные ошибки повторяются с экспоненциальной
+задержкой со случайным разбросом, но общее число повторов на домен ограничено бюджетом.
+"""
+import collections
+import email.utils
+import random
+import threading
+import time
+from datetime import timezone
+
+TRANSIENT_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))  # Стоит повторить
+THROTTLE_STATUSES = frozenset((429, 503))  # Сайт прямо просит снизить темп
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After в секундах: заголовок бывает числом секунд или HTTP-датой."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class DomainRateController:
+    MIN_RATE = 0.2  # запросов в секунду
+    MAX_RATE = 50.0
+    INCREASE_STEP = 0.25  # Прибавка к темпу после нормального ответа
+    DECREASE_FACTOR = 0.5  # Множитель темпа при ошибке или просьбе сайта притормозить
+    SLOW_DECREASE_FACTOR = 0.8  # ... и при ответе намного медленнее обычного
+    SLOW_LATENCY_FACTOR = 4  # "Намного медленнее" - средняя задержка во столько раз больше лучшей...
+    SLOW_LATENCY_MIN = 0.5  # ... и не меньше стольких секунд (доли секунды - шум, а не перегрузка)
+    LATENCY_SMOOTHING = 0.2  # Вес нового замера в скользящей средней задержки
+
+    MAX_RETRY_AFTER = 120  # Дольше не ждём, даже если сайт просит
+    BASE_BACKOFF = 0.5  # Задержка перед первым повтором (верхняя граница, с разбросом)
+    MAX_BACKOFF = 30
+    RETRY_BUDGET_RATIO = 0.1  # Повторов не больше 10% от числа запросов к домену...
+    RETRY_BUDGET_MIN = 10  # ... плюс столько в запасе на начало сканирования
+
+    def __init__(self, domain: str, initial_interval: float = 0.1, adaptive: bool = True,
+                 max_retries: int = 3) -> None:
+        self.domain = domain
+        self.adaptive = adaptive  # False - постоянный интервал initial_interval, как раньше
+        self.interval = initial_interval
+        self.rate = min(self.MAX_RATE, 1 / initial_interval) if initial_interval > 0 else self.MAX_RATE
+        self.paced = initial_interval > 0  # DELAY = 0 - без пауз, пока сайт не попросит притормозить
+        self.max_retries = max_retries
+        self.max_rate = self.MAX_RATE
+
+        self._lock = threading.Lock()  # Статический сканер в планировщике работает из потоков
+        self._next_slot = 0.0
+        self._pause_until = 0.0
+        self._latency: float | None = None  # Скользящая средняя задержки ответа
+        self._last_decrease = 0.0
+        self._best_latency: float | None = None
+
+        # Статистика домена
+        self.requests = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.throttled = 0
+        self.statuses: collections.Counter[int] = collections.Counter()
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.min_rate_seen = self.max_rate_seen = self.rate
+
+    def reserve(self) -> float:
+        """Занимает очередное место в расписании домена; возвращает, сколько секунд подождать до запроса."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot, self._pause_until)
+            if self.paced:
+                self._next_slot = start + (1 / self.rate if self.adaptive else self.interval)
+            return start - now
+
+    def limit_interval(self, seconds: float) -> None:
+        """Не чаще одного запроса в seconds секунд (Crawl-delay из robots.txt)."""
+        with self._lock:
+            self.max_rate = min(self.max_rate, 1 / seconds)
+            self.rate = min(self.rate, self.max_rate)
+            self.interval = max(self.interval, seconds)
+            self.paced = True
+
+    def on_response(self, status: int, latency: float, retry_after: str | None = None) -> float | None:
+        """Учитывает ответ сервера; возвращает Retry-After в секундах, если сайт его прислал."""
+        pause = parse_retry_after(retry_after) if status in THROTTLE_STATUSES else None
+        with self._lock:
+            self.requests += 1
+            self.statuses[status] += 1
+            if pause is not None:
+                pause = min(pause, self.MAX_RETRY_AFTER)
+                self._pause_until = max(self._pause_until, time.monotonic() + pause)
+
+            if status in THROTTLE_STATUSES or status >= 500:
+                self.throttled += status in THROTTLE_STATUSES
+                self._decrease(self.DECREASE_FACTOR)
+            elif latency > 0 and self._is_slow(latency):
+                self._decrease(self.SLOW_DECREASE_FACTOR)
+            else:
+                self._increase()
+        return pause
+
+    def on_error(self, error: str) -> None:
+        """Учитывает сетевую ошибку или таймаут - тоже признак перегрузки."""
+        with self._lock:
+            self.requests += 1
+            self.errors[error] += 1
+            self._decrease(self.DECREASE_FACTOR)
+
+    def retry_delay(self, attempt: int, retry_after: float | None = None) -> float | None:
+        """Сколько ждать перед повтором после попытки attempt (с нуля) или None, если не повторять."""
+        with self._lock:
+            if attempt >= self.max_retries:
+                return None
+            if self.retries >= self.RETRY_BUDGET_MIN + self.RETRY_BUDGET_RATIO * self.requests:
+                self.budget_exhausted += 1
+                return None
+            self.retries += 1
+        backoff = random.uniform(0, min(self.MAX_BACKOFF, self.BASE_BACKOFF * 2 ** attempt))  # "Full jitter"
+        return max(backoff, retry_after or 0)
+
+    def _is_slow(self, latency: float) -> bool:
+        smoothing = self.LATENCY_SMOOTHING
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency = (1 - smoothing) * self._latency + smoothing * latency
+        if self._best_latency is None or self._latency < self._best_latency:
+            self._best_latency = self._latency
+        return self._latency > max(self.SLOW_LATENCY_MIN, self.SLOW_LATENCY_FACTOR * self._best_latency)
+
+    def _increase(self) -> None:
+        if self.adaptive:
+            self.rate = min(self.max_rate, self.rate + self.INCREASE_STEP)
+            self.max_rate_seen = max(self.max_rate_seen, self.rate)
+
+    def _decrease(self, factor: float) -> None:
+        # Не чаще раза за время ответа: пачка одновременных ошибок - это одна перегрузка, а не десять
+        now = time.monotonic()
+        if self.adaptive and now - self._last_decrease >= max(self._latency or 0, 1 / self.rate):
+            self.paced = True
+            self.rate = max(self.MIN_RATE, self.rate * factor)
+            self.min_rate_seen = min(self.min_rate_seen, self.rate)
+            self._last_decrease = now
+
+    def summary(self) -> str:
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(self.statuses.items())) or "нет"
+        errors = ", ".join(f"{error}: {count}" for error, count in self.errors.most_common()) or "нет"
+        latency = f"{self._latency * 1000:.0f} мс" if self._latency is not None else "-"
+        return (f"запросов {self.requests}, повторов {self.retries} (бюджет исчерпан {self.budget_exhausted} раз), "
+                f"просьб притормозить {self.throttled}; темп {self.rate:.1f} запр/с "
+                f"(от {self.min_rate_seen:.1f} до {self.max_rate_seen:.1f}), задержка {latency}; "
+                f"ответы - {statuses}; ошибки - {errors}")
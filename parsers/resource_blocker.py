@@ -0,0 +1,108 @@
+"""
+Отсечение лишних запросов вкладки через перехват (context.route): картинки, шрифты, стили,
+медиа, счётчики аналитики, чаты и чужие iframe не нужны, чтобы найти ссылки на странице,
+но именно они занимают большую часть трафика и времени загрузки.
+"""
+import collections
+from urllib.parse import urlparse
+
+# Типы ресурсов Playwright, которые по умолчанию не загружаются
+BLOCKED_RESOURCE_TYPES = ("image", "media", "font", "stylesheet", "texttrack", "manifest")
+
+# Аналитика, тег-менеджеры, реклама и виджеты чатов (домен и все его поддомены)
+DENY_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "mc.yandex.ru", "mc.yandex.com", "an.yandex.ru", "top-fwz1.mail.ru", "counter.yadro.ru",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "criteo.com", "mindbox.ru",
+    "jivosite.com", "jivo.ru", "livetex.ru", "carrotquest.io", "carrotquest.app", "webim.ru",
+    "usedesk.ru", "envybox.io", "callibri.ru", "calltouch.ru", "roistat.com",
+)
+
+# Примерный размер ресурса, пока не загружено ни одного такого же (для оценки сэкономленного)
+TYPICAL_SIZES = {
+    "image": 40_000, "media": 500_000, "font": 40_000, "stylesheet": 30_000,
+    "script": 50_000, "document": 50_000, "texttrack": 5_000, "manifest": 1_000,
+}
+
+
+def _matches(host: str, domains) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+def site_of(host: str) -> str:
+    """Сайт, к которому относится хост: без www., поддомены считаются тем же сайтом."""
+    return host[4:] if host.startswith("www.") else host
+
+
+class ResourceBlocker:
+    """
+    Решает, загружать ли запрос вкладки, и ведёт учёт заблокированного.
+    Порядок правил: allow_domains > deny_domains > тип ресурса > чужие iframe > все чужие запросы.
+    Сама страница (навигация в главном фрейме) не блокируется никогда.
+    """
+
+    def __init__(self,
+                 blocked_types=BLOCKED_RESOURCE_TYPES,
+                 deny_domains=DENY_DOMAINS,
+                 allow_domains=(),
+                 block_third_party_frames: bool = True,
+                 block_third_party: bool = False) -> None:
+        self.blocked_types = frozenset(blocked_types)
+        self.deny_domains = tuple(deny_domains)
+        self.allow_domains = tuple(allow_domains)
+        self.block_third_party_frames = block_third_party_frames
+        self.block_third_party = block_third_party
+
+        self.blocked: collections.Counter[str] = collections.Counter()  # Причина -> число запросов
+        self.blocked_by_type: collections.Counter[str] = collections.Counter()
+        self._loaded_bytes: collections.Counter[str] = collections.Counter()  # Тип -> байт загружено
+        self._loaded_count: collections.Counter[str] = collections.Counter()
+
+    def block_reason(self, url: str, resource_type: str, page_url: str, is_main_frame_navigation: bool) -> str | None:
+        """Причина не загружать запрос или None, если его нужно пропустить."""
+        if is_main_frame_navigation:
+            return None
+        host = (urlparse(url).hostname or "").lower()
+        if _matches(host, self.allow_domains):
+            return None
+        if _matches(host, self.deny_domains):
+            return "deny-list"
+        if resource_type in self.blocked_types:
+            return resource_type
+
+        page_site = site_of((urlparse(page_url).hostname or "").lower())
+        third_party = bool(page_site) and not _matches(site_of(host), (page_site,))
+        if third_party and resource_type == "document" and self.block_third_party_frames:
+            return "third-party-frame"
+        if third_party and self.block_third_party:
+            return "third-party"
+        return None
+
+    def count_blocked(self, reason: str, resource_type: str) -> None:
+        self.blocked[reason] += 1
+        self.blocked_by_type[resource_type] += 1
+
+    def count_loaded(self, resource_type: str, size: int) -> None:
+        self._loaded_bytes[resource_type] += size
+        self._loaded_count[resource_type] += 1
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(self._loaded_bytes.values())
+
+    @property
+    def saved_bytes(self) -> int:
+        """Оценка: средний размер загруженных ресурсов того же типа (или типичный) на число заблокированных."""
+        saved = 0
+        for resource_type, count in self.blocked_by_type.items():
+            if self._loaded_count[resource_type]:
+                average = self._loaded_bytes[resource_type] / self._loaded_count[resource_type]
+            else:
+                average = TYPICAL_SIZES.get(resource_type, 10_000)
+            saved += int(average * count)
+        return saved
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in self.blocked.most_common()) or "нет"
+        return (f"заблокировано запросов {sum(self.blocked.values())} ({reasons}), "
+                f"сэкономлено ~{self.saved_bytes / 1024 ** 2:.1f} МБ, загружено {self.loaded_bytes / 1024 ** 2:.1f} МБ")
@@ -0,0 +1,233 @@
+"""
+Кэш HTTP-ответов на диске, общий для всех парсеров.
+
+Тела ответов хранятся сжатыми (zlib) в файлах, названных по хэшу содержимого, поэтому
+одинаковые страницы занимают место один раз. Индекс (URL -> статус, заголовки, хэш тела)
+лежит в SQLite. Записи старше ttl считаются устаревшими; когда кэш превышает max_size,
+удаляются давно не использованные записи (LRU). В режиме offline кэш отдаёт всё,
+что в нём есть, независимо от возраста, а запросы мимо кэша не выполняются.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from url_canonicalizer import shared_canonicalizer
+
+# Заголовки, которые описывают передачу, а не содержимое: тело в кэше уже распаковано
+HOP_BY_HOP_HEADERS = frozenset((
+    "content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive", "set-cookie",
+))
+
+
+def normalize_url(url: str) -> str:
+    """Ключ кэша: канонический URL (см. url_canonicalizer) со всеми параметрами запроса."""
+    return shared_canonicalizer(None).canonicalize(url) or url.strip()
+
+
+class CachedResponse:
+    def __init__(self, url: str, status: int, headers: dict[str, str], content: bytes) -> None:
+        self.url = url  # URL после редиректов
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+
+class ResponseCache:
+    CACHEABLE_STATUSES = range(200, 400)  # Ошибки не кэшируем, чтобы повторный запуск их перепроверил
+    COMPRESS_LEVEL = 6
+    EVICT_TO = 0.9  # При переполнении освобождаем место до этой доли max_size
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            body_hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+        CREATE INDEX IF NOT EXISTS entries_body_hash ON entries (body_hash);
+    """
+
+    def __init__(self,
+                 path: str = "data/http_cache",
+                 ttl: float | None = 24 * 3600,
+                 max_size: int = 2 * 1024 ** 3,
+                 offline: bool = False) -> None:
+        self.path = path
+        self.ttl = ttl  # None - записи не устаревают
+        self.max_size = max_size  # В байтах сжатых тел
+        self.offline = offline
+        os.makedirs(os.path.join(path, "blobs"), exist_ok=True)
+
+        self._connection = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(self.SCHEMA)
+        self._lock = threading.Lock()  # Кэш общий для потоков статического сканера и цикла событий
+
+        self.total_size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def _blob_path(self, body_hash: str) -> str:
+        return os.path.join(self.path, "blobs", body_hash[:2], body_hash)
+
+    def get(self, url: str) -> CachedResponse | None:
+        key = normalize_url(url)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, status, headers, body_hash, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and (self.offline or self.ttl is None or time.time() - row[4] <= self.ttl):
+                with self._connection:
+                    self._connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            else:
+                row = None
+
+        content = self._read_blob(row[3]) if row is not None else None
+        if content is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        final_url, status, headers, _, _ = row
+        return CachedResponse(final_url, status, json.loads(headers), content)
+
+    def _read_blob(self, body_hash: str) -> bytes | None:
+        try:
+            with open(self._blob_path(body_hash), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):  # Файл удалён вручную или повреждён - считаем промахом
+            return None
+
+    def put(self, url: str, final_url: str, status: int, headers, content: bytes) -> None:
+        if status not in self.CACHEABLE_STATUSES or status == 304:
+            return
+        headers = {name: value for name, value in headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+        body_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+
+        blob_path = self._blob_path(body_hash)
+        if os.path.exists(blob_path):  # То же содержимое уже лежит в кэше
+            size = os.path.getsize(blob_path)
+        else:
+            compressed = zlib.compress(content, self.COMPRESS_LEVEL)
+            size = len(compressed)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, blob_path)  # Читатель никогда не увидит недописанный файл
+
+        key, now = normalize_url(url), time.time()
+        with self._lock:
+            old = self._connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(key, url, status, headers, body_hash, size, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, final_url, status, json.dumps(headers, ensure_ascii=False),
+                     body_hash, size, now, now))
+            self.total_size += size - (old[0] if old is not None else 0)
+            if self.total_size > self.max_size:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        """Удаляет давно не использованные записи, пока кэш не станет меньше EVICT_TO * max_size."""
+        target = self.max_size * self.EVICT_TO
+        evicted = []
+        for key, body_hash, size in self._connection.execute(
+                "SELECT key, body_hash, size FROM entries ORDER BY accessed_at"):
+            if self.total_size <= target:
+                break
+            evicted.append((key, body_hash))
+            self.total_size -= size
+
+        with self._connection:
+            self._connection.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+        for _, body_hash in evicted:
+            still_used = self._connection.execute(
+                "SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+            if still_used is None and os.path.exists(self._blob_path(body_hash)):
+                os.remove(self._blob_path(body_hash))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+        if self.hits or self.misses:
+            print(f"Кэш ответов: попаданий {self.hits}, промахов {self.misses}, "
+                  f"размер {self.total_size / 1024 ** 2:.1f} МБ")
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    Транспорт requests, который отвечает из ResponseCache и складывает в него ответы.
+    Потоковые запросы (stream=True) не читаются целиком заранее: тело попадает в кэш
+    по мере того, как его читает вызывающий, и только если оно прочитано до конца.
+    """
+    MAX_STREAMED_BODY = 50 * 1024 ** 2  # Потоковый ответ больше этого не кэшируется (и не копится в памяти)
+
+    def __init__(self, cache: ResponseCache, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+
+        cached = self.cache.get(request.url)
+        if cached is not None:
+            return self._build_cached_response(request, cached)
+        if self.cache.offline:
+            raise requests.exceptions.ConnectionError(f"{request.url} нет в кэше (режим offline)", request=request)
+
+        response = super().send(request, **kwargs)
+        # Редиректы requests обрабатывает сам, поэтому каждый шаг кэшируется отдельно
+        if kwargs.get("stream"):
+            self._tee_to_cache(request.url, response)
+        else:
+            self.cache.put(request.url, response.url, response.status_code, response.headers, response.content)
+        return response
+
+    def _tee_to_cache(self, request_url: str, response: requests.Response) -> None:
+        """Подменяет iter_content ответа: прочитанные куски копятся и при полном чтении уходят в кэш."""
+        iter_content = response.iter_content
+
+        def teeing_iter_content(chunk_size: int | None = 1, decode_unicode: bool = False):
+            body, size = [], 0
+            for chunk in iter_content(chunk_size, decode_unicode):
+                if body is not None:
+                    size += len(chunk)
+                    if size > self.MAX_STREAMED_BODY:
+                        body = None  # Слишком большой ответ не кэшируется
+                    else:
+                        body.append(chunk)
+                yield chunk
+            if body is not None and not decode_unicode:
+                self.cache.put(request_url, response.url, response.status_code, response.headers, b"".join(body))
+
+        response.iter_content = teeing_iter_content
+
+    @staticmethod
+    def _build_cached_response(request, cached: CachedResponse) -> requests.Response:
+        response = requests.Response()
+        response.status_code = cached.status
+        response.headers = CaseInsensitiveDict(cached.headers)
+        response._content = cached.content
+        response._content_consumed = True  # iter_content (stream=True) отдаёт тело из памяти, а не из raw
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = cached.url
+        response.request = request
+        response.reason = "OK (cache)"
+        return response
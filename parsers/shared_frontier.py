@@ -0,0 +1,302 @@
+"""
+Общая очередь распределённого сканирования (см. distributed_crawl): один файл SQLite,
+с которым работают координатор и процессы-обработчики на одной машине.
+
+- domains: домены, за каким обработчиком закреплён каждый (по кольцу HashRing),
+  загружены ли уже карты сайта и закончено ли сканирование;
+- frontier: все URL всех доменов - и очередь, и множество встреченных URL (INSERT OR IGNORE):
+  URL, который уже был в очереди у любого обработчика, повторно в неё не попадёт;
+- workers: отметки "жив" (heartbeat) от обработчиков.
+
+URL выдаются обработчику в аренду пачками (lease). Если обработчик упал или завис,
+координатор возвращает его аренды в очередь (reclaim).
+"""
+import bisect
+import hashlib
+import json
+import time
+from typing import Iterable
+
+from frontier_store import BufferedSQLite
+
+# Состояния URL в общей очереди
+PENDING, LEASED, DONE, FAILED = 0, 1, 2, 3
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Консистентное хэширование доменов по обработчикам: когда обработчик уходит из кольца,
+    к другим переезжают только его домены, остальные остаются там, где были.
+    """
+    VIRTUAL_NODES = 64  # Точек на кольце у каждого обработчика - для равномерного распределения
+
+    def __init__(self, nodes: Iterable[int] = ()) -> None:
+        self._points: list[tuple[int, int]] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> set[int]:
+        return {node for _, node in self._points}
+
+    def add(self, node: int) -> None:
+        for replica in range(self.VIRTUAL_NODES):
+            bisect.insort(self._points, (_ring_hash(f"{node}#{replica}"), node))
+
+    def remove(self, node: int) -> None:
+        self._points = [point for point in self._points if point[1] != node]
+
+    def node(self, key: str) -> int | None:
+        """Обработчик, за которым закреплён ключ (домен); None - кольцо пусто."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, (_ring_hash(key), -1)) % len(self._points)
+        return self._points[index][1]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+class SharedFrontier(BufferedSQLite):
+    """
+    Общая очередь URL на диске. Найденные обработчиком ссылки и отметки об обработке
+    пишутся пачками (как в FrontierStore); аренда, heartbeat и команды координатора - сразу.
+    """
+    BUSY_TIMEOUT = 60.0  # Файл пишут несколько процессов: транзакция может подождать чужую
+    MAX_ATTEMPTS = 3  # После стольких возвратов в очередь URL считается необрабатываемым
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS domains (
+            domain TEXT PRIMARY KEY,
+            start_url TEXT NOT NULL,
+            worker INTEGER,
+            seeded INTEGER NOT NULL DEFAULT 0,
+            finished INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS frontier (
+            url TEXT PRIMARY KEY,
+            domain TEXT NOT NULL,
+            referrers TEXT NOT NULL,
+            depth INTEGER NOT NULL DEFAULT 0,
+            lastmod TEXT,
+            state INTEGER NOT NULL DEFAULT 0,
+            owner INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS frontier_domain_state ON frontier (domain, state);
+        CREATE INDEX IF NOT EXISTS frontier_leased ON frontier (owner) WHERE state = 1;
+        CREATE TABLE IF NOT EXISTS workers (
+            worker INTEGER PRIMARY KEY,
+            pid INTEGER,
+            heartbeat REAL NOT NULL,
+            pages INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    # Координатор
+
+    def add_sites(self, sites: list[tuple[str, str]]) -> int:
+        """Добавляет домены (домен, стартовый URL) и их стартовые URL; возвращает, сколько доменов новых."""
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO domains (domain, start_url) VALUES (?, ?)", sites)
+            added = self._connection.total_changes - before
+            self._connection.executemany("INSERT OR IGNORE INTO frontier (url, domain, referrers) VALUES (?, ?, '[]')",
+                                         [(start_url, domain) for domain, start_url in sites])
+        return added
+
+    def assign_domains(self, ring: HashRing) -> int:
+        """Закрепляет незаконченные домены за обработчиками по кольцу; возвращает, сколько доменов переехало."""
+        with self._lock, self._connection:
+            moves = [
+                (node, domain)
+                for domain, worker in self._connection.execute("SELECT domain, worker FROM domains WHERE finished = 0")
+                if (node := ring.node(domain)) != worker
+            ]
+            self._connection.executemany("UPDATE domains SET worker = ? WHERE domain = ?", moves)
+        return len(moves)
+
+    def reclaim(self, worker: int | None = None) -> int:
+        """Возвращает в очередь URL в аренде у обработчика (None - у всех); возвращает их число."""
+        with self._lock, self._connection:
+            if worker is None:
+                cursor = self._connection.execute("UPDATE frontier SET state = 0, owner = NULL WHERE state = 1")
+            else:
+                cursor = self._connection.execute(
+                    "UPDATE frontier SET state = 0, owner = NULL WHERE state = 1 AND owner = ?", (worker,))
+        return cursor.rowcount
+
+    def resume_paused(self) -> int:
+        """Домены, остановленные по бюджету (pause_domain) в прошлом запуске, снова в работе; возвращает их число."""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE domains SET finished = 0 WHERE finished = 1 AND EXISTS ("
+                "  SELECT 1 FROM frontier WHERE frontier.domain = domains.domain AND state = 0)")
+        return cursor.rowcount
+
+    def reset_workers(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM workers")
+
+    def heartbeats(self) -> dict[int, float]:
+        return dict(self._connection.execute("SELECT worker, heartbeat FROM workers"))
+
+    def unfinished_domains(self, worker: int | None = None) -> int:
+        if worker is None:
+            return self._connection.execute("SELECT COUNT(*) FROM domains WHERE finished = 0").fetchone()[0]
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM domains WHERE finished = 0 AND worker = ?", (worker,)).fetchone()[0]
+
+    def counts(self) -> dict[str, int]:
+        """Сколько URL в очереди, в аренде, обработано и брошено."""
+        counts = dict(self._connection.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state"))
+        return {name: counts.get(state, 0)
+                for name, state in (("pending", PENDING), ("leased", LEASED), ("done", DONE), ("failed", FAILED))}
+
+    # Обработчик
+
+    def heartbeat(self, worker: int, pid: int, pages: int) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO workers (worker, pid, heartbeat, pages) VALUES (?, ?, ?, ?)",
+                (worker, pid, time.time(), pages))
+
+    def assigned_domains(self, worker: int) -> list[tuple[str, str, bool]]:
+        """Незаконченные домены обработчика: (домен, стартовый URL, загружены ли карты сайта)."""
+        return [(domain, start_url, bool(seeded)) for domain, start_url, seeded in self._connection.execute(
+            "SELECT domain, start_url, seeded FROM domains WHERE finished = 0 AND worker = ? ORDER BY rowid",
+            (worker,))]
+
+    def add_pending(self, domain: str, url: str, referrers: tuple[str, ...], depth: int) -> None:
+        self._push("INSERT OR IGNORE INTO frontier (url, domain, referrers, depth) VALUES (?, ?, ?, ?)",
+                   (url, domain, json.dumps(referrers, ensure_ascii=False), depth))
+
+    def add_pending_many(self, domain: str, rows: list[tuple[str, tuple[str, ...], int, str | None]]) -> None:
+        with self._lock:
+            self._flush_locked()
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO frontier (url, domain, referrers, depth, lastmod) VALUES (?, ?, ?, ?, ?)",
+                    [(url, domain, json.dumps(referrers, ensure_ascii=False), depth, lastmod)
+                     for url, referrers, depth, lastmod in rows])
+
+    def mark_done(self, url: str) -> None:
+        self._push("UPDATE frontier SET state = 2, owner = NULL WHERE url = ?", (url,))
+
+    def mark_seeded(self, domain: str) -> None:
+        self._push("UPDATE domains SET seeded = 1 WHERE domain = ?", (domain,))
+
+    def lease(self, worker: int, domains: list[str],
+              limit: int) -> dict[str, list[tuple[str, tuple[str, ...], int, str | None]]]:
+        """
+        Берёт в аренду до limit URL из очереди каждого домена - в порядке постановки в очередь.
+        Возвращает {домен: [(url, referrers, depth, lastmod), ...]}.
+        """
+        leased = {}
+        with self._lock:
+            self._flush_locked()  # Сначала ссылки, найденные самим обработчиком
+            with self._connection:
+                for domain in domains:
+                    rows = self._connection.execute(
+                        "UPDATE frontier SET state = 1, owner = ? WHERE rowid IN ("
+                        "  SELECT rowid FROM frontier WHERE domain = ? AND state = 0 ORDER BY rowid LIMIT ?"
+                        ") RETURNING rowid, url, referrers, depth, lastmod",
+                        (worker, domain, limit)).fetchall()
+                    rows.sort()  # RETURNING не обещает порядок
+                    leased[domain] = [(url, tuple(json.loads(referrers)), depth, lastmod)
+                                      for _, url, referrers, depth, lastmod in rows]
+        return leased
+
+    def pause_domain(self, domain: str, worker: int) -> None:
+        """
+        Домен остановлен по бюджету: в этом запуске он закончен, а его аренды возвращаются в очередь
+        (без учёта попытки) - с них продолжит следующий запуск (см. resume_paused).
+        """
+        with self._lock:
+            self._flush_locked()
+            with self._connection:
+                self._connection.execute("UPDATE frontier SET state = 0, owner = NULL "
+                                         "WHERE domain = ? AND state = 1 AND owner = ?", (domain, worker))
+                self._connection.execute("UPDATE domains SET finished = 1 WHERE domain = ?", (domain,))
+
+    def finish_domain(self, domain: str, worker: int) -> bool:
+        """
+        Отмечает домен законченным, если в его очереди больше ничего нет.
+        URL, которые обработчик взял в аренду, но так и не отметил обработанными (ошибка при обработке),
+        возвращаются в очередь - до MAX_ATTEMPTS раз; тогда домен не закончен и возвращается False.
+        """
+        with self._lock:
+            self._flush_locked()
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE frontier SET state = CASE WHEN attempts + 1 >= ? THEN 3 ELSE 0 END, "
+                    "attempts = attempts + 1, owner = NULL WHERE domain = ? AND state = 1 AND owner = ?",
+                    (self.MAX_ATTEMPTS, domain, worker))
+                if self._connection.execute("SELECT 1 FROM frontier WHERE domain = ? AND state < 2 LIMIT 1",
+                                            (domain,)).fetchone() is not None:
+                    return False
+                self._connection.execute("UPDATE domains SET finished = 1 WHERE domain = ?", (domain,))
+        return True
+
+
+class DomainFrontier:
+    """
+    Часть общей очереди, относящаяся к одному домену, - то, что CheckpointMixin
+    ждёт от frontier_store, поэтому сканер пишет в общую очередь так же, как в свой файл состояния.
+    """
+
+    def __init__(self, frontier: SharedFrontier, domain: str) -> None:
+        self.frontier = frontier
+        self.domain = domain
+        # В общей очереди могут быть URL домена, которых нет в локальной очереди сканера
+        self.needs_lease = True
+        self.before_flush = None  # Выгрузку перед записью пачки сбрасывает CrawlWorker - для всех доменов сразу
+
+    def add_pending(self, url: str, referrers: tuple[str, ...], depth: int) -> None:
+        self.frontier.add_pending(self.domain, url, referrers, depth)
+        self.needs_lease = True
+
+    def add_pending_many(self, rows: list[tuple[str, tuple[str, ...], int, str | None]]) -> None:
+        self.frontier.add_pending_many(self.domain, rows)
+        self.needs_lease = True
+
+    def mark_done(self, url: str) -> None:
+        self.frontier.mark_done(url)
+
+    def add_result(self, url: str, response: int | None, referrers: tuple[str, ...], depth: int) -> None:
+        pass  # Результаты - в выгрузке домена (crawl_output)
+
+    def mark_seeded(self) -> None:
+        self.frontier.mark_seeded(self.domain)
+
+    def close(self, remove: bool = False) -> None:
+        self.frontier.flush()  # Общий файл закрывает обработчик
+
+
+class SharedFrontierMixin:
+    """
+    DomainScanner в распределённом режиме. Найденные ссылки и адреса из карт сайта уходят
+    только в общую очередь (через frontier_store - DomainFrontier), а в локальную очередь сканера
+    попадают URL, которые обработчик взял в аренду (_enqueue_leased).
+    """
+
+    def _open_checkpoint(self) -> None:
+        # Стартовый URL тоже в общей очереди: его выдаст аренда, как и все остальные
+        self.urls_to_visit = type(self.urls_to_visit)()
+
+    def _enqueue(self, url_obj, anchor: str | None = None) -> None:
+        pass  # URL уже записан в общую очередь (_checkpoint_pending)
+
+    def _enqueue_leased(self, url_obj) -> None:
+        super()._enqueue(url_obj)
+
+    def _requeue(self, url_obj) -> None:
+        self._enqueue_leased(url_obj)  # URL по-прежнему в аренде у этого обработчика
+
+    async def _seed_async(self, notify=None) -> None:
+        await super()._seed_async(notify)
+        self.frontier_store.mark_seeded()  # Карты сайта домена больше не загружаются - даже другим обработчиком
@@ -1,66 +1,47 @@
+import itertools
+import threading
 import time
-import collections  # Импортируем deque
-from urllib.parse import urlparse, urljoin
 
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 import requests
 import sys
 import warnings
 
 from urllib3.exceptions import InsecureRequestWarning
 
-warnings.simplefilter(action='ignore', category=InsecureRequestWarning)
-
-
-class URL:
-    def __init__(self, url: str, response_code: int | None = None, referrers: tuple[str, ...] = tuple()):
-        self._referrers = referrers
-        self._url_parsed = urlparse(url.strip())  # Нормализуем URL сразу
-        self._url_string = self._url_parsed.geturl()  # Кэшируем строку URL
-        self._response_code = response_code
-
-    @property
-    def data(self) -> tuple[str, int | None, tuple[str, ...]]:
-        return self.url, self.response, self.referrers
-
-    @property
-    def domain(self) -> str:
-        return self._url_parsed.netloc
-
-    @property
-    def url(self) -> str:
-        return self._url_string  # Возвращаем кэшированную строку
-
-    @property
-    def response(self) -> int | None:
-        return self._response_code
-
-    @property
-    def referrers(self) -> tuple[str, ...]:
-        return self._referrers
-
-    def set_response(self, response: int) -> None:
-        self._response_code = response
+from crawl_frontier import FrontierMixin
+from crawl_history import IncrementalMixin
+from crawl_metrics import MetricsMixin
+from crawl_output import OutputMixin
+from crawl_url import URL
+from frontier_store import CheckpointMixin
+from link_extractor import extract_links
+from near_duplicates import NearDuplicateMixin
+from page_archive import ArchiveMixin
+from rate_control import DomainRateController, TRANSIENT_STATUSES
+from response_cache import CachingAdapter, ResponseCache
+from sitemap_seeder import SitemapMixin
+from url_canonicalizer import CanonicalUrlMixin
+from url_set import make_url_set
+from user_agents import UserAgentPool, load_user_agents
 
-    def __str__(self):
-        return self.url
-
-    # Важно для работы с set
-    def __eq__(self, other):
-        if isinstance(other, URL):
-            return self.url == other.url
-        return False
-
-    def __hash__(self):
-        return hash((self.url, self.referrers))
+warnings.simplefilter(action='ignore', category=InsecureRequestWarning)
 
 
-class DomainScanner:
+class DomainScanner(CheckpointMixin, IncrementalMixin, SitemapMixin, OutputMixin, MetricsMixin, CanonicalUrlMixin,
+                    NearDuplicateMixin, ArchiveMixin, FrontierMixin):
     MAX_DEPTH = 10
     DELAY = 0.1  # Небольшая задержка
     TIMEOUT = 10
     VERIFY_REQUESTS = False
+    SEEN_SET = "exact"  # Как хранить встреченные и посещённые URL: exact, hashed, bloom, bloom-disk (см. url_set)
+    LINK_EXTRACTOR = "stream"  # Способ извлечения ссылок: stream (быстрый) или bs4, см. link_extractor
+    # Темп запросов к домену (см. rate_control): DELAY - начальный интервал, дальше он подстраивается
+    ADAPTIVE_RATE = True  # False - всегда DELAY между запросами
+    MAX_RETRIES = 3  # Повторов временной ошибки (429, 5xx, таймаут) для одного URL
+    # Кэш ответов на диске (см. response_cache): None - без кэша
+    HTTP_CACHE_DIR: str | None = None
+    HTTP_CACHE_TTL: float | None = 24 * 3600  # в секундах, None - записи не устаревают
+    HTTP_CACHE_OFFLINE = False  # Отвечать только из кэша, в сеть не ходить
     BASE_HEADERS = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
         'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -72,49 +53,81 @@ class DomainScanner:
         'Cache-Control': 'max-age=0',
     }
 
-    def __init__(self, start_url: str) -> None:
-        # Инициализация start_url_obj с referrers = (start_url,)
-        self.start_url_obj = URL(start_url, response_code=None, referrers=(start_url,))
+    def __init__(self, start_url: str, ua: UserAgentPool | None = None) -> None:
+        self._init_canonicalizer()  # Все URL сканирования - в каноническом виде (см. url_canonicalizer)
+        # Стартовая страница - корень дерева сканирования
+        self.start_url_obj = URL(self._canonical(start_url) or start_url.strip())
         self.base_domain = self.start_url_obj.domain
 
-        self.ua = UserAgent(platforms="desktop")  # Фейковый UserAgent
+        self.ua = ua or load_user_agents()  # Пул фейковых User-Agent (можно передать общий)
+        # Темп запросов и повторы ошибок для этого домена
+        self.rate_controller = DomainRateController(self.base_domain, self.DELAY, self.ADAPTIVE_RATE, self.MAX_RETRIES)
 
         self.session = requests.Session()
         self.session.headers.update(self.BASE_HEADERS)
+        self.response_cache: ResponseCache | None = None  # Можно передать общий через _use_response_cache
 
-        # Используем set для быстрой проверки уже посещенных URL
-        self.visited_urls: set[str] = set()
-        self.visited_url_objs: set[URL] = set()  # Для сохранения полного объекта URL
+        # Уже посещённые URL - в том же виде, что и встреченные (SEEN_SET, см. url_set)
+        # (сами результаты в памяти не хранятся, а сразу уходят в выгрузку - см. crawl_output)
+        self.visited_urls = make_url_set(self.SEEN_SET, path=self._visited_set_path())
 
-        # Используем deque для обхода в ширину (BFS)
-        self.urls_to_visit: collections.deque[URL] = collections.deque()
+        # Все URL, которые уже стояли в очереди или посещены: повторно в очередь не попадут
+        self.seen_urls = make_url_set(self.SEEN_SET, path=self._seen_set_path())
+        self.seen_urls.add(self.start_url_obj.url)
+        # В планировщике ссылки ставят в очередь потоки пула (_process_url), а карты сайта и выдача URL -
+        # цикл событий: проверка по seen_urls и постановка в очередь идут под этой блокировкой
+        self._frontier_lock = threading.Lock()
+
+        # Очередь URL: по приоритету или в ширину (BFS), см. crawl_frontier
+        self.urls_to_visit = self._new_frontier()
         self.urls_to_visit.append(self.start_url_obj)
+        self.sitemap_lastmod: dict[str, str] = {}  # lastmod из карты сайта для адресов, взятых из неё
 
         self.scanned_count = 0  # Счетчик для вывода
+        self._init_near_duplicates()  # Почти одинаковые страницы и размноженные разделы (см. near_duplicates)
+        self._init_frontier()  # Приоритеты очереди и бюджет домена (см. crawl_frontier)
+        self._init_metrics()  # Время этапов, темп и ошибки сканирования (см. crawl_metrics)
+
+    def _create_response_cache(self) -> ResponseCache | None:
+        if self.HTTP_CACHE_DIR is None:
+            return None
+        return ResponseCache(self.HTTP_CACHE_DIR, ttl=self.HTTP_CACHE_TTL, offline=self.HTTP_CACHE_OFFLINE)
+
+    def _use_response_cache(self, cache: ResponseCache | None) -> None:
+        self.response_cache = cache
+        if cache is not None:
+            adapter = CachingAdapter(cache)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+    def _seed_session(self) -> requests.Session:
+        return self.session
 
     def _is_valid_url(self, url_str: str, current_url_obj: URL) -> bool:
         """Проверяет, является ли URL подходящим для дальнейшего сканирования."""
         if (
-                url_str.startswith("http") and
-                len(current_url_obj.referrers) <= self.MAX_DEPTH and  # Проверка глубины парсинга сайта
-                urlparse(url_str).netloc == self.base_domain and  # Проверка домена
-                not any(char in url_str for char in ["%", "#", "&", "?"]) and  # Исключаем параметры, якоря
-                url_str not in self.visited_urls
+                current_url_obj.depth <= self.MAX_DEPTH and  # Проверка глубины парсинга сайта
+                self.canonicalizer.host(url_str) == self.base_domain and  # Проверка домена
+                url_str not in self.seen_urls and  # Уже в очереди или посещён
+                url_str not in self.visited_urls and
+                self._robots_allows(url_str) and  # Не запрещён в robots.txt
+                not self._is_trap(url_str)  # Не календарь без конца, не бесконечная пагинация
         ):
             return True
         return False
 
-    def _process_url(self, request_url_obj: URL) -> None:
-        """Обрабатывает один URL: делает запрос, парсит, добавляет ссылки."""
+    def _process_url(self, request_url_obj: URL, reserved: bool = False) -> None:
+        """Обрабатывает один URL: делает запрос, парсит, добавляет ссылки (reserved - см. _fetch)."""
         request_url = request_url_obj.url
-        referrers = request_url_obj.referrers
+        self._note_dequeued(request_url)
+        self._start_budget_clock()
 
         if request_url in self.visited_urls:
             return
 
         if "." in request_url.split("/")[-1]:
             self.visited_urls.add(request_url)
-            self.visited_url_objs.add(request_url_obj)
+            self._add_result(request_url_obj)
 
             self.scanned_count += 1
             print(
@@ -125,26 +138,27 @@ class DomainScanner:
         if request_url in self.visited_urls:
             return
 
-        self._prepare_for_request()
-        time.sleep(self.DELAY)
-
         try:
-            response = self.session.get(request_url,
-                                        timeout=self.TIMEOUT,
-                                        allow_redirects=True,
-                                        verify=self.VERIFY_REQUESTS)
+            previous_page = self._previous_page(request_url)  # Инкрементальный режим: что было в прошлый раз
+            headers = {**self._request_headers(), **self._conditional_headers(previous_page)}
+            response = self._fetch(request_url, headers, reserved)
             response.raise_for_status()  # Выбрасывает исключение для плохих ответов (4xx, 5xx)
+            unchanged = self._is_unchanged(previous_page, response.status_code, response.content)
 
-            response_url = response.url.strip()
-            response_code = response.status_code
+            response_url = self._canonical(response.url) or response.url.strip()
+            response_code = previous_page.response if response.status_code == 304 else response.status_code
 
             # Создаем новый URL-объект с учетом ответа сервера
-            processed_url_obj = URL(response_url, response_code, referrers=referrers)
+            processed_url_obj = request_url_obj.with_response(response_url, response_code)
 
             self.visited_urls.add(request_url)  # Добавляем исходный URL в посещенные
             self.visited_urls.add(response_url)  # Добавляем URL после редиректа
 
-            self.visited_url_objs.add(processed_url_obj)  # Сохраняем полный объект
+            self._add_result(processed_url_obj, request_url, response.elapsed.total_seconds(),
+                             response.headers.get("Content-Type"), len(response.content))
+            if response.status_code != 304:
+                self._archive_page(request_url, response_url, response.status_code, response.headers,
+                                   response.content, response.request.headers)
 
             self.scanned_count += 1
             print(
@@ -157,27 +171,30 @@ class DomainScanner:
             if processed_url_obj.domain != self.base_domain or "." in response_url.split("/")[-1]:
                 return
 
-            # Парсим HTML, используя response.content для потенциальной экономии памяти
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            for link_tag in soup.find_all('a', href=True):
-                href = link_tag['href']
-                absolute_url = urljoin(request_url, href)  # Получаем абсолютный URL
-
-                # Формируем новые referrers
-                new_referrers = referrers
-                if response_url not in referrers:
-                    new_referrers = referrers + (request_url,)
-
-                next_url_obj = URL(absolute_url, referrers=new_referrers)
-
-                if self._is_valid_url(next_url_obj.url, next_url_obj):
-                    self.urls_to_visit.append(next_url_obj)
+            duplicate = False
+            anchors = {} if self.urls_to_visit.prioritized else None  # Тексты ссылок - для приоритета
+            if unchanged:
+                links = previous_page.links  # Страница не изменилась с прошлого запуска - не разбираем
+            else:
+                # Парсим HTML, используя response.content для потенциальной экономии памяти
+                with self.metrics.timer("parse"):
+                    links = self._extract_links(response.content, request_url, anchors)
+                with self.metrics.timer("fingerprint"):
+                    duplicate = self._is_templated_duplicate(response_url, self._page_fingerprint(response.content))
+            self._record_page(request_url, response.status_code, response.headers, response.content, links)
+            if duplicate:
+                self._prune_links(links)  # Почти дубль размноженного шаблона - его ссылки ведут на такие же страницы
+            else:
+                self._enqueue_links(links, request_url_obj, anchors)
 
         except requests.exceptions.RequestException as e:
             # Обработка ошибок запросов
             print(f"Ошибка запроса {request_url}: {e}")
             self.visited_urls.add(request_url)
+            response = e.response
+            self._add_error(request_url_obj, e.__class__.__name__,
+                            response.status_code if response is not None else None,
+                            response.elapsed.total_seconds() if response is not None else None)
 
         except KeyboardInterrupt:
             self._save_data()
@@ -188,46 +205,146 @@ class DomainScanner:
             print(f"Неизвестная ошибка при обработке {request_url}: {ex_}")
             self.visited_urls.add(request_url)  # Добавляем в посещённые, чтобы не повторять
 
-    def _prepare_for_request(self) -> None:
-        """Обновляет User-Agent для следующего запроса."""
-        new_ua_header = {'User-Agent': self.ua.random}
-        self.session.headers.update(new_ua_header)
+    def _reserve_request(self) -> float:
+        """Занимает место в расписании домена; возвращает, сколько секунд ждать до запроса."""
+        if self.response_cache is not None and self.response_cache.offline:
+            return 0.0  # Из кэша отвечаем без пауз
+        pause = self.rate_controller.reserve()
+        self.metrics.observe("pacing", pause)
+        return pause
+
+    def _will_fetch(self, request_url: str) -> bool:
+        """False - URL обработается без запроса (уже посещён или это файл)."""
+        return request_url not in self.visited_urls and "." not in request_url.split("/")[-1]
+
+    def _fetch(self, url: str, headers: dict[str, str], reserved: bool = False) -> requests.Response:
+        """
+        GET в темпе, который задаёт rate_controller домена, с повтором временных ошибок.
+        Ответ с ошибкой возвращается, когда повторы закончились; сетевая ошибка - выбрасывается.
+        reserved=True - место в расписании для первой попытки уже занято и выждано вызывающим.
+        """
+        for attempt in itertools.count():
+            if attempt or not reserved:
+                time.sleep(self._reserve_request())
+            try:
+                with self.metrics.timer("fetch"):
+                    response = self.session.get(url,
+                                                headers=headers,
+                                                timeout=self.TIMEOUT,
+                                                allow_redirects=True,
+                                                verify=self.VERIFY_REQUESTS)
+            except requests.exceptions.SSLError:
+                raise  # Повтор не поможет
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ex_:
+                self.rate_controller.on_error(ex_.__class__.__name__)
+                delay = self.rate_controller.retry_delay(attempt)
+                if delay is None:
+                    raise
+            else:
+                self.metrics.observe("ttfb", response.elapsed.total_seconds())  # До заголовков последнего ответа
+                retry_after = self.rate_controller.on_response(response.status_code, response.elapsed.total_seconds(),
+                                                               response.headers.get("Retry-After"))
+                if response.status_code not in TRANSIENT_STATUSES:
+                    return response
+                delay = self.rate_controller.retry_delay(attempt, retry_after)
+                if delay is None:
+                    return response
+            print(f"Повтор {url} через {delay:.1f} с (попытка {attempt + 2})")
+            time.sleep(delay)
+
+    def _extract_links(self, content: bytes | str, request_url: str,
+                       anchors: dict[str, str] | None = None) -> list[str]:
+        """Возвращает абсолютные URL всех ссылок страницы (и их тексты в anchors, если он передан)."""
+        return extract_links(content, request_url, self.LINK_EXTRACTOR, anchors)
+
+    def _enqueue_links(self, links: list[str], parent_url_obj: URL, anchors: dict[str, str] | None = None) -> None:
+        """Отбирает подходящие ссылки страницы и ставит их в очередь."""
+        candidates = []
+        for absolute_url in links:
+            url_str = self._canonical(absolute_url)
+            if url_str is not None:  # None - mailto:, javascript: и прочее не-http
+                candidates.append((absolute_url, URL(url_str, parent=parent_url_obj)))
+        with self._frontier_lock:
+            for absolute_url, next_url_obj in candidates:
+                if self._is_valid_url(next_url_obj.url, next_url_obj):
+                    self.seen_urls.add(next_url_obj.url)
+                    self._checkpoint_pending(next_url_obj)
+                    if not self._defer(next_url_obj):
+                        self._enqueue(next_url_obj, anchors.get(absolute_url) if anchors else None)
+
+    def _add_seeds(self, seeds) -> int:
+        with self._frontier_lock:
+            return super()._add_seeds(seeds)
+
+    def _enqueue(self, url_obj: URL, anchor: str | None = None) -> None:
+        self._note_enqueued(url_obj.url)
+        self.urls_to_visit.push(url_obj, self._url_priority(url_obj, anchor))
+
+    def _queue_depth(self) -> int:
+        return len(self.urls_to_visit)
+
+    def _request_headers(self) -> dict[str, str]:
+        """
+        User-Agent для следующего запроса. Передаётся в сам запрос: заголовки общей сессии
+        не меняются, потому что в планировщике одним сканером пользуются несколько потоков.
+        """
+        return {'User-Agent': self.ua.random}
 
     def _save_data(self):
-        """Сохраняет собранные данные в файл."""
-        # Создаем директорию, если она не существует
-        import os
-        output_dir = f"data/crawled"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        filename = f"{self.base_domain.replace('.', '_')}.txt"
-        filepath = os.path.join(output_dir, filename)
-
-        with open(filepath, "w", encoding="utf-8") as file_out:
-            # Сортируем по URL для предсказуемого порядка
-            sorted_urls = sorted(self.visited_url_objs, key=lambda url_obj: url_obj.url)
-            for url_obj in sorted_urls:
-                # Записываем данные в формате, который может быть легко прочитан
-                file_out.write(f"{url_obj.url}, {url_obj.response}, {url_obj.referrers}\n")
-        print(f"Данные сохранены в {filepath}")
+        """Дописывает на диск то, что ещё в буфере выгрузки, и печатает итоги по домену."""
+        self._flush_output()
+        if self.crawl_output is not None:
+            print(f"Данные сохранены в {', '.join(self.crawl_output.paths)} ({self.results_count} стр.)")
+        print(f"{self.base_domain}: {self.rate_controller.summary()}")
+        if self.trapped_urls:
+            print(f"{self.base_domain}: {self._traps_summary()}")
+        if self.duplicate_pages:
+            print(f"{self.base_domain}: {self._near_duplicates_summary()}")
+        if self.budget_stop is not None:
+            print(f"{self.base_domain}: остановлено по бюджету ({self.budget_stop})")
 
     def start(self) -> None:
         """Запускает процесс сканирования."""
         print(f"Начинаем сканирование с URL: {self.start_url_obj.url} на домене: {self.base_domain}")
-        while self.urls_to_visit:
-            try:
-                current_url_obj = self.urls_to_visit.popleft()  # Извлекаем из начала очереди (BFS)
-                self._process_url(current_url_obj)
-            except KeyboardInterrupt:
-                self._save_data()
-                print("\nСканирование прервано пользователем.")
-                sys.exit(0)
-            except Exception as e:
-                print(f"Ошибка в основном цикле: {e}")
-
-        print("\nСканирование завершено.")
-        self._save_data()
+        owns_cache = self.response_cache is None
+        if owns_cache:
+            self._use_response_cache(self._create_response_cache())
+        self._open_checkpoint()
+        self._open_history()
+        self._open_output()
+        self._open_archive()
+        monitor = self._start_monitoring()
+        profiler = self._start_profile()
+        finished = False
+        try:
+            self._seed()
+            # Размноженные разделы - в последнюю очередь
+            while (self.urls_to_visit or self._release_deferred()) and not self._budget_exhausted():
+                try:
+                    current_url_obj = self.urls_to_visit.popleft()  # Самый приоритетный (или самый ранний) URL
+                    with self.metrics.tracking():
+                        self._process_url(current_url_obj)
+                    self._mark_done(current_url_obj)
+                except KeyboardInterrupt:
+                    self._save_data()
+                    print("\nСканирование прервано пользователем.")
+                    sys.exit(0)
+                except Exception as e:
+                    print(f"Ошибка в основном цикле: {e}")
+
+            finished = self.budget_stop is None  # Остановленное по бюджету продолжится при следующем запуске
+            print("\nСканирование завершено.")
+            self._save_data()
+
+        finally:
+            self._stop_profile(profiler)
+            monitor.stop()
+            self._close_checkpoint(finished)  # Прерванное сканирование продолжится при следующем запуске
+            self._close_history(finished)
+            self._close_output()
+            self._close_archive()
+            if owns_cache and self.response_cache is not None:
+                self.response_cache.close()
 
 
 if __name__ == '__main__':
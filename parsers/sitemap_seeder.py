@@ -0,0 +1,371 @@
+"""
+Засев очереди сканирования из sitemap.xml и правила robots.txt.
+
+robots.txt читается один раз на домен: из него берутся запреты (Disallow/Allow), Crawl-delay
+и адреса карт сайта. Карты сайта (и индексы карт, в том числе сжатые gzip) разбираются
+потоково, по мере загрузки: в памяти одновременно лежит один блок ответа и одна запись <url>,
+поэтому даже карта на десятки тысяч адресов не загружается целиком.
+"""
+import asyncio
+import collections
+import itertools
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator
+from urllib.parse import urlsplit
+from xml.parsers import expat
+
+import requests
+
+from link_extractor import is_url_file
+from response_cache import CachingAdapter
+
+GZIP_MAGIC = b"\x1f\x8b"
+MAX_SITEMAP_BYTES = 100 * 1024 ** 2  # Распакованный размер одной карты (по стандарту - до 50 МБ)
+
+
+class RobotsRules:
+    """
+    Правила robots.txt для одного User-agent (RFC 9309): из подходящих правил побеждает
+    самое длинное, при равной длине - Allow. Поддерживаются шаблоны с * и $.
+    """
+
+    def __init__(self, rules: list[tuple[bool, str]], crawl_delay: float | None = None,
+                 sitemaps: list[str] | None = None) -> None:
+        self.crawl_delay = crawl_delay
+        self.sitemaps = sitemaps or []
+        # Длинные правила проверяются первыми, поэтому первое совпадение и есть ответ
+        ordered = sorted(((allow, pattern) for allow, pattern in rules if pattern),
+                         key=lambda rule: (-len(rule[1]), not rule[0]))
+        self._rules = [(allow, self._compile(pattern)) for allow, pattern in ordered]
+
+    @staticmethod
+    def _compile(pattern: str) -> re.Pattern:
+        anchored = pattern.endswith("$")
+        regex = ".*".join(re.escape(part) for part in pattern.rstrip("$").split("*"))
+        return re.compile(regex + ("$" if anchored else ""))
+
+    @classmethod
+    def parse(cls, text: str, user_agent: str = "*") -> "RobotsRules":
+        """Разбирает robots.txt; правила берутся из групп user_agent, а если таких нет - из группы *."""
+        token = user_agent.lower()
+        groups: list[tuple[list[str], list[tuple[bool, str]], list[float]]] = []
+        sitemaps: list[str] = []
+        agents: list[str] = []
+        rules: list[tuple[bool, str]] = []
+        delays: list[float] = []
+        for line in text.splitlines():
+            key, _, value = line.split("#", 1)[0].partition(":")
+            key, value = key.strip().lower(), value.strip()
+            if key == "user-agent":
+                if rules or delays or not agents:  # После правил User-agent начинает новую группу
+                    agents, rules, delays = [], [], []
+                    groups.append((agents, rules, delays))
+                agents.append(value.lower())
+            elif key in ("allow", "disallow") and agents:
+                rules.append((key == "allow", value))
+            elif key == "crawl-delay" and agents:
+                try:
+                    delays.append(float(value))
+                except ValueError:
+                    pass
+            elif key == "sitemap" and value:
+                sitemaps.append(value)
+
+        matched = [group for group in groups if any(agent != "*" and agent in token for agent in group[0])]
+        if not matched:
+            matched = [group for group in groups if "*" in group[0]]
+        merged_rules = [rule for _, group_rules, _ in matched for rule in group_rules]
+        merged_delays = [delay for _, _, group_delays in matched for delay in group_delays]
+        return cls(merged_rules, max(merged_delays) if merged_delays else None, sitemaps)
+
+    def allows(self, url: str) -> bool:
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        for allow, regex in self._rules:
+            if regex.match(path):
+                return allow
+        return True
+
+
+def parse_lastmod(value: str | None) -> str | None:
+    """<lastmod> в формате W3C Datetime (от YYYY до даты со временем) -> ISO 8601, время - в UTC."""
+    if not value:
+        return None
+    value = value.strip()
+    if re.fullmatch(r"\d{4}(-\d{2})?", value):  # Только год или год и месяц
+        value = value + "-01-01"[len(value) - 4:]
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if len(value) == 10:
+        return parsed.date().isoformat()
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.isoformat(timespec="seconds")
+
+
+def _decompressed(chunks: Iterable[bytes], max_bytes: int) -> Iterator[bytes]:
+    """Распаковывает поток, если это gzip (файл .xml.gz), и обрывает его после max_bytes."""
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if first.startswith(GZIP_MAGIC) else None
+    total = 0
+    for chunk in itertools.chain((first,), chunks):
+        if decompressor is not None:
+            # Не больше остатка лимита за раз - защита от "zip-бомбы"
+            chunk = decompressor.decompress(chunk, max_bytes - total + 1)
+        total += len(chunk)
+        if total > max_bytes:
+            print(f"Карта сайта больше {max_bytes // 1024 ** 2} МБ, остаток пропущен")
+            return
+        yield chunk
+
+
+def _text_entry(line: bytes) -> Iterator[tuple[str, None, bool]]:
+    url = line.strip().decode("utf-8", errors="replace")
+    if url.startswith("http"):
+        yield url, None, False
+
+
+def iter_sitemap(chunks: Iterable[bytes], max_bytes: int = MAX_SITEMAP_BYTES) -> Iterator[tuple[str, str | None, bool]]:
+    """
+    Записи карты сайта по мере загрузки: (адрес, lastmod, это ли ссылка на другую карту).
+    Понимает <urlset>, <sitemapindex> и текстовые карты (по адресу в строке), сжатые и нет.
+    XML разбирается обработчиками expat без построения дерева.
+    """
+    entries: list[tuple[str, str | None, bool]] = []
+    entry: dict[str, str] = {}  # loc и lastmod текущей записи
+    text: list[str] = []
+    capture: str | None = None  # Какой элемент сейчас читаем: loc или lastmod
+
+    def start_element(name: str, _attrs) -> None:
+        nonlocal capture
+        tag = name.rpartition("}")[2]  # Без пространства имён
+        if tag in ("loc", "lastmod") and tag not in entry:  # Первый <loc>, а не <image:loc> той же записи
+            capture = tag
+            text.clear()
+
+    def end_element(name: str) -> None:
+        nonlocal capture
+        tag = name.rpartition("}")[2]
+        if tag == capture:
+            entry[tag] = "".join(text).strip()
+            capture = None
+        elif tag in ("url", "sitemap"):
+            if entry.get("loc"):
+                entries.append((entry["loc"], entry.get("lastmod"), tag == "sitemap"))
+            entry.clear()
+
+    def character_data(data: str) -> None:
+        if capture is not None:
+            text.append(data)
+
+    parser = None
+    text_mode: bool | None = None
+    text_tail = b""
+    try:
+        for chunk in _decompressed(chunks, max_bytes):
+            if text_mode is None:
+                chunk = chunk.lstrip().removeprefix(b"\xef\xbb\xbf").lstrip()  # До <?xml ничего быть не должно
+                if not chunk:
+                    continue
+                text_mode = not chunk.startswith(b"<")
+                if not text_mode:
+                    parser = expat.ParserCreate(namespace_separator="}")
+                    parser.StartElementHandler = start_element
+                    parser.EndElementHandler = end_element
+                    parser.CharacterDataHandler = character_data
+
+            if text_mode:
+                lines = (text_tail + chunk).split(b"\n")
+                text_tail = lines.pop()
+                for line in lines:
+                    yield from _text_entry(line)
+                continue
+
+            parser.Parse(chunk, False)
+            yield from entries
+            entries.clear()
+
+        if text_mode:
+            yield from _text_entry(text_tail)
+        elif parser is not None:
+            parser.Parse(b"", True)
+            yield from entries
+    except expat.ExpatError as ex_:
+        yield from entries  # Что успели разобрать до ошибки
+        print(f"Ошибка разбора карты сайта: {ex_}")
+
+
+class SitemapSeeder:
+    """Загружает robots.txt и обходит карты сайта (индексы карт - в ширину)."""
+    MAX_SITEMAPS = 1_000  # Не больше стольких файлов карт на домен
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, session: requests.Session, timeout: float = 30, verify: bool = True,
+                 pace: Callable[[], float] | None = None) -> None:
+        self.session = session
+        self.timeout = timeout
+        self.verify = verify
+        self.pace = pace  # Сколько подождать перед запросом (темп домена, см. rate_control)
+
+        self.sitemaps_read = 0
+        self.urls_found = 0
+
+    def _get(self, url: str, stream: bool = False) -> requests.Response:
+        if self.pace is not None:
+            time.sleep(self.pace())
+        return self.session.get(url, timeout=self.timeout, verify=self.verify, stream=stream)
+
+    def fetch_robots(self, root_url: str, user_agent: str = "*") -> RobotsRules | None:
+        """Правила robots.txt сайта; None - файла нет или он недоступен (тогда ограничений нет)."""
+        try:
+            response = self._get(f"{root_url}/robots.txt")
+        except requests.exceptions.RequestException as ex_:
+            print(f"robots.txt {root_url} недоступен: {ex_.__class__.__name__}")
+            return None
+        if response.status_code != 200 or "html" in response.headers.get("Content-Type", ""):
+            return None  # Вместо robots.txt часто отдают страницу "не найдено" с кодом 200
+        return RobotsRules.parse(response.text, user_agent)
+
+    def iter_urls(self, sitemap_urls: Iterable[str], max_urls: int) -> Iterator[tuple[str, str | None]]:
+        """Адреса страниц из карт сайта с их lastmod, не больше max_urls."""
+        queue = collections.deque(sitemap_urls)
+        queued = set(queue)
+        while queue and self.sitemaps_read < self.MAX_SITEMAPS:
+            sitemap_url = queue.popleft()
+            self.sitemaps_read += 1
+            for loc, lastmod, is_sitemap in self._iter_entries(sitemap_url):
+                if is_sitemap:
+                    if loc not in queued:
+                        queued.add(loc)
+                        queue.append(loc)
+                    continue
+                self.urls_found += 1
+                yield loc, parse_lastmod(lastmod)
+                if self.urls_found >= max_urls:
+                    return
+
+    def _iter_entries(self, sitemap_url: str) -> Iterator[tuple[str, str | None, bool]]:
+        try:
+            with self._get(sitemap_url, stream=True) as response:
+                if response.status_code != 200:
+                    return
+                yield from iter_sitemap(response.iter_content(self.CHUNK_SIZE))
+        except requests.exceptions.RequestException as ex_:
+            print(f"Карта сайта {sitemap_url} недоступна: {ex_.__class__.__name__}")
+
+
+class SitemapMixin:
+    """
+    Засев очереди DomainScanner адресами из карт сайта и соблюдение robots.txt.
+    Адреса из карт ставятся в очередь сразу после стартовой страницы (на глубине 1),
+    поэтому глубокие страницы находятся без обхода всех промежуточных.
+    """
+    SITEMAP_SEED = True
+    SITEMAP_MAX_URLS = 100_000  # Не больше стольких адресов из карт на домен
+    SITEMAP_TIMEOUT = 30  # в секундах
+    RESPECT_ROBOTS = True  # Не сканировать запрещённое в robots.txt и соблюдать Crawl-delay
+    ROBOTS_USER_AGENT = "*"  # Чьи правила robots.txt соблюдать
+    SEED_BATCH = 1_000  # Столько адресов записывается в сохранённую очередь одной транзакцией
+
+    robots_rules: RobotsRules | None = None
+
+    def _robots_allows(self, url: str) -> bool:
+        return self.robots_rules is None or self.robots_rules.allows(url)
+
+    def _seed_session(self) -> requests.Session:
+        """Сессия для robots.txt и карт сайта; через кэш ответов, если он есть."""
+        session = requests.Session()
+        session.headers.update(self.BASE_HEADERS)
+        session.headers["User-Agent"] = self.ua.random
+        if self.response_cache is not None:
+            adapter = CachingAdapter(self.response_cache)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return session
+
+    def _load_robots(self) -> tuple[SitemapSeeder, list[str]] | None:
+        """
+        Читает robots.txt (правила, Crawl-delay). Возвращает загрузчик и адреса карт сайта
+        или None, если карты не нужны (засев выключен или очередь восстановлена из сохранения).
+        """
+        if not (self.SITEMAP_SEED or self.RESPECT_ROBOTS):
+            return None
+        seeder = SitemapSeeder(self._seed_session(), self.SITEMAP_TIMEOUT, self.VERIFY_REQUESTS,
+                               self.rate_controller.reserve)
+        parts = urlsplit(self.start_url_obj.url)
+        root_url = f"{parts.scheme}://{parts.netloc}"
+
+        robots = seeder.fetch_robots(root_url, self.ROBOTS_USER_AGENT)
+        if self.RESPECT_ROBOTS and robots is not None:
+            self.robots_rules = robots
+            if robots.crawl_delay:
+                self.rate_controller.limit_interval(robots.crawl_delay)
+        if not self.SITEMAP_SEED or self.resumed:
+            return None
+        return seeder, robots.sitemaps if robots is not None and robots.sitemaps else [f"{root_url}/sitemap.xml"]
+
+    def _sitemap_seeds(self, seeder: SitemapSeeder, sitemaps: list[str]) -> Iterator[tuple[str, str | None]]:
+        """Адреса из карт сайта - по мере загрузки и разбора."""
+        started = time.monotonic()
+        yield from seeder.iter_urls(sitemaps, self.SITEMAP_MAX_URLS)
+        if seeder.urls_found:
+            print(f"{self.base_domain}: в картах сайта {seeder.urls_found} адресов "
+                  f"({seeder.sitemaps_read} файлов, {time.monotonic() - started:.1f} с)")
+
+    def _add_seeds(self, seeds: Iterable[tuple[str, str | None]]) -> int:
+        """Ставит адреса из карт сайта в очередь; возвращает, сколько из них новых."""
+        url_cls = type(self.start_url_obj)
+        added, batch = 0, []
+        for url, lastmod in seeds:
+            url = self._canonical(url)
+            if url is None or is_url_file(url):
+                continue
+            url_obj = url_cls(url, parent=self.start_url_obj)
+            if not self._is_valid_url(url_obj.url, url_obj):
+                continue
+            self.seen_urls.add(url_obj.url)
+            if lastmod is not None:
+                self.sitemap_lastmod[url_obj.url] = lastmod
+            self._enqueue(url_obj)
+            batch.append(url_obj)
+            added += 1
+            if len(batch) >= self.SEED_BATCH:
+                self._checkpoint_pending_many(batch)
+                batch = []
+        self._checkpoint_pending_many(batch)
+        return added
+
+    def _report_seeds(self, added: int) -> None:
+        if added:
+            print(f"{self.base_domain}: из карт сайта в очередь добавлено {added} адресов")
+
+    def _seed(self) -> None:
+        loaded = self._load_robots()
+        if loaded is not None:
+            self._report_seeds(self._add_seeds(self._sitemap_seeds(*loaded)))
+
+    async def _seed_async(self, notify: Callable[[], None] | None = None) -> None:
+        """
+        То же, что _seed, но сетевая часть - в потоке, чтобы не блокировать цикл событий.
+        Адреса из карт ставятся в очередь пачками по SEED_BATCH по мере разбора (в памяти -
+        не больше одной пачки). notify вызывается, как только прочитан robots.txt (с этого момента
+        домен можно сканировать, не дожидаясь карт сайта), и после каждой пачки.
+        """
+        loaded = await asyncio.to_thread(self._load_robots)
+        if notify is not None:
+            notify()
+        if loaded is None:
+            return
+        seeds = self._sitemap_seeds(*loaded)
+        added = 0
+        while batch := await asyncio.to_thread(lambda: list(itertools.islice(seeds, self.SEED_BATCH))):
+            added += self._add_seeds(batch)
+            if notify is not None:
+                notify()
+        self._report_seeds(added)
@@ -0,0 +1,212 @@
+"""
+Канонизация URL: один вид для всех ссылок на одну и ту же страницу, чтобы она не попадала
+в очередь дважды (http://Bank.ru:80/a/./b/?utm_source=x#top -> http://bank.ru/a/b/).
+
+- схема и хост в нижнем регистре, кириллический хост - в punycode, без порта по умолчанию,
+  без логина/пароля и без якоря;
+- в пути убираются "." и "..", двойные слэши, %-кодирование приводится к одному виду
+  (кириллица в пути кодируется, незарезервированные символы раскодируются);
+- из параметров запроса остаются только разрешённые (ALLOWED_QUERY_PARAMS), по алфавиту;
+  остальные (utm-метки, идентификаторы сессий, сортировки) отбрасываются;
+- слэш в конце пути по умолчанию не трогается: сайт, у которого страницы со слэшем,
+  на адрес без слэша ответит редиректом, и каждая страница стоила бы лишнего запроса.
+
+Правила компилируются один раз при создании; результат канонизации кэшируется, поэтому
+ссылки общего меню, повторяющиеся на каждой странице, разбираются один раз.
+
+trap_reason распознаёт ловушки для сканера - бесконечные адреса, которые сайт порождает сам:
+календари на годы вперёд, пагинацию на тысячи страниц, повторяющиеся куски пути
+(относительная ссылка, которая с каждой страницей удлиняет адрес), слишком длинные адреса.
+"""
+import collections
+import datetime
+import functools
+import re
+from urllib.parse import quote, urlsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Параметры, которые меняют содержимое страницы (имена или регулярные выражения, без учёта регистра):
+# номер страницы списка (PAGEN_1 - пагинация 1С-Битрикс) и идентификаторы записей
+ALLOWED_QUERY_PARAMS: tuple[str, ...] = ("page", r"pagen_\d+", "id", "element_id", "section_id")
+TRAILING_SLASH_MODES = ("keep", "strip", "add")
+
+_PERCENT_RE = re.compile(r"%([0-9a-fA-F]{2})")
+_UNRESERVED = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+_PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+_QUERY_SAFE = _PATH_SAFE + "?"
+_DATE_RE = re.compile(r"(?<!\d)((?:19|20|21)\d{2})[-/._](0?[1-9]|1[0-2])(?!\d)")  # 2024-05, 2024/5, 2024.05
+_YEAR_PARAM_RE = re.compile(r"(?:^|&)(?:year|y)=(\d{4})(?:&|$)", re.IGNORECASE)
+_PAGE_RE = re.compile(r"(?:/page/|[?&](?:page|p|pagen_\d+)=)(\d+)", re.IGNORECASE)
+
+
+def _normalize_percent(match: re.Match) -> str:
+    """%7e -> ~ (незарезервированный символ), %2f -> %2F (остальное - в верхнем регистре)."""
+    code = int(match.group(1), 16)
+    return chr(code) if code in _UNRESERVED else "%" + match.group(1).upper()
+
+
+def _remove_dot_segments(path: str) -> str:
+    """Убирает из пути "." и ".." (RFC 3986, 5.2.4) и пустые сегменты от двойных слэшей."""
+    segments = path.split("/")[1:]
+    output: list[str] = []
+    last = len(segments) - 1
+    for index, segment in enumerate(segments):
+        if segment == "..":
+            if output:
+                output.pop()
+            if index == last:
+                output.append("")
+        elif segment == ".":
+            if index == last:
+                output.append("")
+        elif segment or index == last:
+            output.append(segment)
+    return "/" + "/".join(output)
+
+
+class UrlCanonicalizer:
+    """Канонизация URL и распознавание ловушек с одним набором настроек."""
+    CACHE_SIZE = 50_000  # Сколько последних URL помнить
+    # Пределы для trap_reason
+    MAX_URL_LENGTH = 1024
+    MAX_PATH_SEGMENTS = 15
+    MAX_SEGMENT_REPEATS = 3  # Один и тот же сегмент пути столько раз - ловушка
+    MAX_PAGE_NUMBER = 500  # Номер страницы списка больше этого - ловушка
+    YEARS_AHEAD = 1  # Даты в адресе дальше стольких лет вперёд - календарь без конца
+
+    def __init__(self, allowed_params: tuple[str, ...] | None = ALLOWED_QUERY_PARAMS,
+                 trailing_slash: str = "keep") -> None:
+        """allowed_params=None - оставлять все параметры запроса (только упорядочить)."""
+        if trailing_slash not in TRAILING_SLASH_MODES:
+            raise ValueError(f"trailing_slash: одно из {', '.join(TRAILING_SLASH_MODES)}, а не {trailing_slash}")
+        self.allowed_params = tuple(allowed_params) if allowed_params is not None else None
+        self.trailing_slash = trailing_slash
+        self._allowed_re = (
+            re.compile("|".join(f"(?:{pattern})" for pattern in self.allowed_params), re.IGNORECASE)
+            if self.allowed_params else None
+        )
+        self.canonicalize = functools.lru_cache(maxsize=self.CACHE_SIZE)(self._canonicalize)
+
+    def __reduce__(self):
+        # В пул процессов передаются только настройки: в процессе разбора канонизатор (и его кэш) один
+        return shared_canonicalizer, (self.allowed_params, self.trailing_slash)
+
+    def _canonicalize(self, url: str) -> str | None:
+        """Канонический вид URL или None, если это не http(s)-адрес."""
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:  # Битый IPv6-адрес или порт
+            return None
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS:
+            return None
+        host = (parts.hostname or "").rstrip(".")
+        if not host:
+            return None
+        if not host.isascii():
+            try:
+                host = host.encode("idna").decode("ascii")
+            except UnicodeError:
+                return None
+        if ":" in host:  # IPv6
+            host = f"[{host}]"
+        netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+
+        path = parts.path or "/"
+        if not path.isascii() or " " in path:
+            path = quote(path, safe=_PATH_SAFE)
+        if "%" in path:
+            path = _PERCENT_RE.sub(_normalize_percent, path)
+        if "/." in path or "//" in path:
+            path = _remove_dot_segments(path)
+        if self.trailing_slash == "strip" and len(path) > 1:
+            path = path.rstrip("/") or "/"
+        elif self.trailing_slash == "add" and not path.endswith("/") and "." not in path.rsplit("/", 1)[-1]:
+            path += "/"
+
+        query = self._canonical_query(parts.query) if parts.query else ""
+        return f"{scheme}://{netloc}{path}?{query}" if query else f"{scheme}://{netloc}{path}"
+
+    def _canonical_query(self, query: str) -> str:
+        if self.allowed_params is not None and self._allowed_re is None:
+            return ""
+        params = []
+        for param in query.split("&"):
+            if not param:
+                continue
+            name = param.partition("=")[0]
+            if self._allowed_re is None or self._allowed_re.fullmatch(name):
+                params.append(param)
+        if not params:
+            return ""
+        query = "&".join(sorted(params, key=lambda param: param.partition("=")[0]))
+        if not query.isascii() or " " in query:
+            query = quote(query, safe=_QUERY_SAFE)
+        return _PERCENT_RE.sub(_normalize_percent, query) if "%" in query else query
+
+    @staticmethod
+    def host(url: str) -> str:
+        """Хост (с портом) канонического URL - без повторного разбора."""
+        return url.split("/", 3)[2]
+
+    def trap_reason(self, url: str) -> str | None:
+        """Почему канонический URL похож на ловушку для сканера, или None."""
+        if len(url) > self.MAX_URL_LENGTH:
+            return "long-url"
+        path, _, query = url.split("/", 3)[3].partition("?")
+        segments = [segment for segment in path.split("/") if segment]
+        if len(segments) > self.MAX_PATH_SEGMENTS:
+            return "deep-path"
+        if segments:
+            if collections.Counter(segments).most_common(1)[0][1] >= self.MAX_SEGMENT_REPEATS:
+                return "repeating-path"
+            for size in range(2, len(segments) // 2 + 1):  # /a/b/a/b/ - кусок пути повторяется подряд
+                for start in range(len(segments) - 2 * size + 1):
+                    if segments[start:start + size] == segments[start + size:start + 2 * size]:
+                        return "repeating-path"
+
+        last_year = datetime.date.today().year + self.YEARS_AHEAD
+        years = [int(match.group(1)) for match in _DATE_RE.finditer(url)]
+        years += [int(year) for year in _YEAR_PARAM_RE.findall(query)]
+        if any(year > last_year or year < 1990 for year in years):
+            return "calendar"
+        if any(int(number) > self.MAX_PAGE_NUMBER for number in _PAGE_RE.findall(url)):
+            return "pagination"
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def shared_canonicalizer(allowed_params: tuple[str, ...] | None = ALLOWED_QUERY_PARAMS,
+                         trailing_slash: str = "keep") -> UrlCanonicalizer:
+    """Один канонизатор на набор настроек в процессе - общий кэш для всех сканеров."""
+    return UrlCanonicalizer(allowed_params, trailing_slash)
+
+
+class CanonicalUrlMixin:
+    """
+    Канонизация URL в DomainScanner: все адреса (стартовый, ссылки, адреса из карт сайта,
+    адреса после редиректа) приводятся к одному виду до проверок и постановки в очередь.
+    """
+    # Параметры запроса, которые остаются в URL (остальные отбрасываются); None - оставлять все
+    ALLOWED_QUERY_PARAMS: tuple[str, ...] | None = ALLOWED_QUERY_PARAMS
+    TRAILING_SLASH = "keep"  # Слэш в конце пути: keep - как в ссылке, strip - убирать, add - добавлять
+
+    def _init_canonicalizer(self) -> None:
+        self.canonicalizer = shared_canonicalizer(self.ALLOWED_QUERY_PARAMS, self.TRAILING_SLASH)
+        self.trapped_urls: collections.Counter[str] = collections.Counter()  # Отброшенные ловушки по причинам
+
+    def _canonical(self, url: str) -> str | None:
+        return self.canonicalizer.canonicalize(url)
+
+    def _is_trap(self, url: str) -> bool:
+        reason = self.canonicalizer.trap_reason(url)
+        if reason is not None:
+            self.trapped_urls[reason] += 1
+        return reason is not None
+
+    def _traps_summary(self) -> str | None:
+        if not self.trapped_urls:
+            return None
+        return "отброшено похожих на ловушки адресов - " + ", ".join(
+            f"{reason}: {count}" for reason, count in self.trapped_urls.most_common())
@@ -0,0 +1,116 @@
+"""
+Множества уже встреченных URL для проверки при постановке в очередь.
+
+exact      - обычный set строк, точный, но самый большой по памяти
+hashed     - set 64-битных хэшей: в несколько раз меньше, коллизии практически невозможны
+bloom      - фильтр Блума фиксированного размера: память не растёт с числом URL,
+             но с вероятностью error_rate новый URL ошибочно считается встреченным
+bloom-disk - тот же фильтр в файле через mmap: память отдаёт ОС по мере надобности
+
+Тем же способом хранятся и посещённые URL (visited_urls), поэтому множествам нужен discard:
+URL со вкладки, потерянной при падении браузера, снова ставится в очередь.
+"""
+import hashlib
+import math
+import mmap
+import os
+
+
+def _digest(url: str, size: int) -> bytes:
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=size).digest()
+
+
+class HashedUrlSet:
+    def __init__(self) -> None:
+        self._hashes: set[int] = set()
+
+    @staticmethod
+    def _key(url: str) -> int:
+        return int.from_bytes(_digest(url, 8), "little")
+
+    def add(self, url: str) -> None:
+        self._hashes.add(self._key(url))
+
+    def discard(self, url: str) -> None:
+        self._hashes.discard(self._key(url))
+
+    def __contains__(self, url: str) -> bool:
+        return self._key(url) in self._hashes
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+
+class BloomUrlSet:
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001, path: str | None = None) -> None:
+        # Оптимальные размер фильтра и число хэш-функций для заданных ёмкости и доли ошибок
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._count = 0
+        # Биты из фильтра не убрать: удалённые URL помнятся отдельно (их единицы - см. discard)
+        self._discarded: set[str] = set()
+
+        n_bytes = (self.size + 7) // 8
+        self._file = None
+        if path is None:
+            self._bits: bytearray | mmap.mmap = bytearray(n_bytes)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "w+b")
+            self._file.truncate(n_bytes)
+            self._bits = mmap.mmap(self._file.fileno(), n_bytes)
+
+    def _positions(self, url: str):
+        digest = _digest(url, 16)
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, url: str) -> None:
+        added = False
+        for position in self._positions(url):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        self._count += added
+        self._discarded.discard(url)
+
+    def discard(self, url: str) -> None:
+        self._discarded.add(url)
+
+    def __contains__(self, url: str) -> bool:
+        if url in self._discarded:
+            return False
+        for position in self._positions(url):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self._count  # Приблизительно: URL, добавление которых изменило фильтр
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._bits.close()
+            self._file.close()
+            self._file = None
+
+
+URL_SET_MODES = ("exact", "hashed", "bloom", "bloom-disk")
+
+
+def make_url_set(mode: str = "exact", path: str | None = None, capacity: int = 1_000_000,
+                 error_rate: float = 0.001) -> set[str] | HashedUrlSet | BloomUrlSet:
+    if mode == "exact":
+        return set()
+    if mode == "hashed":
+        return HashedUrlSet()
+    if mode == "bloom":
+        return BloomUrlSet(capacity, error_rate)
+    if mode == "bloom-disk":
+        if path is None:
+            raise ValueError("Для режима bloom-disk нужен путь к файлу")
+        return BloomUrlSet(capacity, error_rate, path)
+    raise ValueError(f"Неизвестный режим множества URL: {mode}. Доступны: {', '.join(URL_SET_MODES)}")
@@ -0,0 +1,70 @@
+"""
+Пул User-Agent для сканеров.
+
+fake_useragent при создании UserAgent читает и фильтрует свой файл браузеров (несколько тысяч
+записей JSON) - на сотнях коротких запусков по одному банку это заметная часть старта.
+Пул строится из fake_useragent один раз и лежит в USER_AGENTS_FILE: строка User-Agent -
+сколько раз она встречается среди записей, из которых выбирает UserAgent.random, поэтому
+частота выбора та же. Следующие запуски только читают этот файл (один раз на процесс).
+Пересобрать пул, например после обновления fake_useragent:
+
+    python main.py user-agents
+"""
+import collections
+import functools
+import itertools
+import json
+import os
+import random
+
+USER_AGENTS_FILE = "data/user_agents.json"
+
+
+class UserAgentPool:
+    """Случайный User-Agent из готового списка - замена fake_useragent.UserAgent для сканеров."""
+
+    def __init__(self, weights: dict[str, int]) -> None:
+        if not weights:
+            raise ValueError("Пул User-Agent пуст")
+        self.user_agents = list(weights)
+        self._cum_weights = list(itertools.accumulate(weights.values()))
+
+    @property
+    def random(self) -> str:
+        return random.choices(self.user_agents, cum_weights=self._cum_weights)[0]
+
+    def __len__(self) -> int:
+        return len(self.user_agents)
+
+
+def build_user_agents(platforms: str = "desktop") -> dict[str, int]:
+    """Собирает пул из данных fake_useragent: строка User-Agent -> число записей с ней."""
+    from fake_useragent import UserAgent  # Тяжёлый импорт - только при сборке пула
+    # Те же записи, из которых UserAgent(platforms=...).random выбирает случайную
+    entries = UserAgent(platforms=platforms)._filter_useragents()
+    return dict(collections.Counter(entry["useragent"] for entry in entries).most_common())
+
+
+def save_user_agents(weights: dict[str, int], path: str = USER_AGENTS_FILE) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(weights, f, ensure_ascii=False, indent=0)
+    os.replace(path + ".tmp", path)  # Запуски, которые читают пул прямо сейчас, не увидят его наполовину
+
+
+@functools.lru_cache(maxsize=None)
+def load_user_agents(path: str = USER_AGENTS_FILE) -> UserAgentPool:
+    """
+    Пул из файла - один на процесс, общий для всех сканеров.
+    Файла нет - пул собирается из fake_useragent и сохраняется для следующих запусков.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            weights = json.load(f)
+    except FileNotFoundError:
+        weights = build_user_agents()
+        try:
+            save_user_agents(weights, path)
+        except OSError as ex_:
+            print(f"Не удалось сохранить пул User-Agent в {path}: {ex_}")
+    return UserAgentPool(weights)
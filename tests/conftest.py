@@ -0,0 +1,59 @@
+"""
+Общие фикстуры тестов. Модули parsers/ импортируются плоско, как в самих сканерах
+и в бенчмарках; синтетический сайт банка - из benchmarks/fake_site, поддельный Playwright -
+из fake_playwright.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "parsers"))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "benchmarks"))
+
+from fake_playwright import FakeChromium, FakePlaywright  # noqa: E402
+from fake_site import FakeSiteServer  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Выгрузка и состояние сканирования пишутся относительно текущей папки - у каждого теста своя."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_site():
+    """Запускает синтетический сайт: fake_site(size=..., ...) -> FakeSiteServer."""
+    servers = []
+
+    def start(**options) -> FakeSiteServer:
+        server = FakeSiteServer(**options).start_background()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def chromium(monkeypatch) -> FakeChromium:
+    """Браузеры динамических сканеров - поддельные (см. fake_playwright); остальное - настоящее."""
+    import async_dynamic_crawler
+    chromium = FakeChromium()
+    monkeypatch.setattr(async_dynamic_crawler, "async_playwright", lambda: FakePlaywright(chromium))
+    return chromium
+
+
+def scanner_class(scanner_cls, **settings):
+    """Сканер для тестов: без пауз, кэша, карт сайта и печати статистики; settings - поверх."""
+    defaults = {"DELAY": 0, "STATS_INTERVAL": None, "HTTP_CACHE_DIR": None, "SITEMAP_SEED": False}
+    return type("TestScanner", (scanner_cls,), {**defaults, **settings})
+
+
+def read_output(scanner) -> list[dict]:
+    with open(scanner._output_prefix() + ".jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
@@ -0,0 +1,150 @@
+"""
+Поддельный Playwright для тестов динамических сканеров и пула браузеров: "браузер" загружает
+страницу обычным HTTP-запросом и отдаёт её HTML как есть (без JS). Запуски браузеров
+записываются в FakeChromium.launches; тест может уронить браузер на нужном адресе (crash_on)
+или запретить запуск (launch_error).
+"""
+import asyncio
+import urllib.error
+import urllib.request
+
+from playwright.async_api import Error as PlaywrightError
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: dict[str, str]) -> None:
+        self.status = status
+        self.headers = headers
+        self.request = type("FakeRequest", (), {"timing": {}, "resource_type": "document"})()
+
+
+class FakePage:
+    def __init__(self, context: "FakeContext") -> None:
+        self.context = context
+        self.url = "about:blank"
+        self.closed = False
+        self._content = ""
+
+    def on(self, event: str, callback) -> None:
+        pass
+
+    def is_closed(self) -> bool:
+        return self.closed or not self.context.browser.connected
+
+    async def goto(self, url: str, wait_until: str = "load", timeout: float | None = None) -> FakeResponse:
+        browser = self.context.browser
+        if self.is_closed():
+            raise PlaywrightError("Target page, context or browser has been closed")
+        crash = next((marker for marker in browser.chromium.crash_on if marker in url), None)
+        if crash is not None:
+            browser.chromium.crash_on.remove(crash)
+            browser.crash()
+            raise PlaywrightError("Target page, context or browser has been closed")
+        status, headers, body, self.url = await asyncio.to_thread(self._fetch, url)
+        self._content = body.decode("utf-8", errors="replace")
+        return FakeResponse(status, headers)
+
+    @staticmethod
+    def _fetch(url: str) -> tuple[int, dict[str, str], bytes, str]:
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                headers = {k.lower(): v for k, v in response.headers.items()}
+                return response.status, headers, response.read(), response.url
+        except urllib.error.HTTPError as ex_:
+            return ex_.code, {k.lower(): v for k, v in ex_.headers.items()}, ex_.read(), url
+
+    async def wait_for_selector(self, *args, **kwargs) -> None:
+        pass
+
+    async def wait_for_load_state(self, *args, **kwargs) -> None:
+        pass
+
+    async def inner_html(self, selector: str) -> str:
+        return self._content
+
+
+class FakeContext:
+    def __init__(self, browser: "FakeBrowser") -> None:
+        self.browser = browser
+        self.pages: list[FakePage] = []
+        self.closed = False
+
+    def on(self, event: str, callback) -> None:
+        pass
+
+    async def route(self, pattern: str, handler) -> None:
+        pass
+
+    async def add_init_script(self, script: str) -> None:
+        pass
+
+    async def new_page(self) -> FakePage:
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self) -> None:
+        self.closed = True
+        for page in self.pages:
+            page.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, chromium: "FakeChromium", args: list[str]) -> None:
+        self.chromium = chromium
+        self.args = args
+        self.connected = True
+        self.contexts: list[FakeContext] = []
+        self._on_disconnected = []
+
+    def on(self, event: str, callback) -> None:
+        if event == "disconnected":
+            self._on_disconnected.append(callback)
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def new_context(self, **options) -> FakeContext:
+        if not self.connected:
+            raise PlaywrightError("Browser has been closed")
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    def crash(self) -> None:
+        """Процесс браузера упал: все вкладки закрыты, подписчики получают disconnected."""
+        self._disconnect()
+
+    async def close(self) -> None:
+        self._disconnect()
+
+    def _disconnect(self) -> None:
+        if self.connected:
+            self.connected = False
+            for callback in self._on_disconnected:
+                callback(self)
+
+
+class FakeChromium:
+    def __init__(self) -> None:
+        self.launches: list[FakeBrowser] = []
+        self.launch_error: Exception | None = None  # Запуск браузера падает с этой ошибкой
+        self.crash_on: list[str] = []  # Браузер падает один раз при открытии адреса, содержащего эту строку
+
+    async def launch(self, headless: bool = True, args: list[str] | None = None) -> FakeBrowser:
+        browser = FakeBrowser(self, args or [])
+        self.launches.append(browser)
+        if self.launch_error is not None:
+            raise self.launch_error
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self, chromium: FakeChromium) -> None:
+        self.chromium = chromium
+
+    async def start(self) -> "FakePlaywright":
+        return self
+
+    async def stop(self) -> None:
+        pass
@@ -0,0 +1,124 @@
+import asyncio
+
+import async_dynamic_crawler
+from browser_pool import BrowserPool, ContextPool
+from conftest import read_output, scanner_class
+from crawl_scheduler import CrawlScheduler
+from fake_playwright import FakeChromium
+
+DYNAMIC_SETTINGS = {"PARSE_EXECUTOR": None, "BROWSER_MAX_RSS_MB": None, "CHECKPOINT": False}
+
+
+async def new_context(browser):
+    return await browser.new_context()
+
+
+def make_pools(chromium: FakeChromium, browsers: int = 2, contexts: int = 4, max_pages: int = 50):
+    browser_pool = BrowserPool(lambda args: chromium.launch(args=args), size=browsers, max_rss=None,
+                               check_interval=3600)
+    return browser_pool, ContextPool(new_context, browser_pool, size=contexts, max_pages=max_pages, max_age=3600)
+
+
+def test_contexts_spread_over_browsers_and_are_reused():
+    async def scenario():
+        chromium = FakeChromium()
+        browser_pool, context_pool = make_pools(chromium, max_pages=2)
+        await browser_pool.start()
+        pooled = [await context_pool.acquire() for _ in range(4)]
+        assert [handle.in_use for handle in browser_pool.handles] == [2, 2]
+        assert len({marker for browser in chromium.launches for marker in browser.args}) == 2
+
+        for item in pooled:
+            await context_pool.release(item)
+        again = [await context_pool.acquire() for _ in range(4)]
+        assert set(again) == set(pooled) and context_pool.created_count == 4
+        for item in again:
+            await context_pool.release(item)  # Второй URL контекста - max_pages исчерпан
+        await context_pool.acquire()
+        assert context_pool.created_count == 5
+        await context_pool.close()
+        await browser_pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_crashed_browser_loses_its_contexts_and_is_restarted():
+    async def scenario():
+        chromium = FakeChromium()
+        browser_pool, context_pool = make_pools(chromium)
+        await browser_pool.start()
+        first, second = await context_pool.acquire(), await context_pool.acquire()
+        crashed = first.handle
+
+        crashed.browser.crash()
+        assert context_pool.is_lost(first) and not context_pool.is_lost(second)
+        assert (await browser_pool.pick()) is second.handle  # Новые контексты - только в живом браузере
+
+        await browser_pool.check()
+        assert crashed.is_alive() and crashed.generation == 2
+        assert browser_pool.restart_reasons == {"crash": 1} and len(chromium.launches) == 3
+        assert context_pool.is_lost(first)  # Контекст прошлого запуска браузера не оживает
+
+        await context_pool.release(first)
+        assert first not in context_pool._all and crashed.in_use == 0
+        replacement = await context_pool.acquire()
+        assert replacement is not first and not context_pool.is_lost(replacement)
+        await browser_pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_pick_restarts_when_every_browser_is_down():
+    async def scenario():
+        chromium = FakeChromium()
+        browser_pool, _ = make_pools(chromium)
+        await browser_pool.start()
+        for handle in browser_pool.handles:
+            handle.browser.crash()
+        handle = await browser_pool.pick()  # Не ждёт сторожа
+        assert handle.is_alive() and handle.generation == 2
+        await browser_pool.close()
+        assert not any(browser.connected for browser in chromium.launches)
+
+    asyncio.run(scenario())
+
+
+def test_dynamic_crawl_requeues_pages_lost_in_browser_crash(fake_site, chromium):
+    server = fake_site(size=40)
+    chromium.crash_on = ["/p/7/"]
+    scanner = scanner_class(async_dynamic_crawler.DomainScanner, BROWSERS=1, BROWSER_CHECK_INTERVAL=0.05,
+                            **DYNAMIC_SETTINGS)(server.root_url)
+    asyncio.run(scanner.start(4, headless=True))
+    records = read_output(scanner)
+
+    lost_url = server.root_url.replace("/p/0/", "/p/7/")
+    # Вместе с виновником теряются и соседние вкладки упавшего браузера - каждая по одному разу
+    assert scanner.lost_pages[lost_url] == 1 and set(scanner.lost_pages.values()) == {1}
+    assert len(chromium.launches) == 2  # Единственный браузер упал и перезапущен
+    assert all(record["status"] == 200 and record["error"] is None for record in records)
+    assert len({record["url"] for record in records}) == len(records) == server.size
+
+
+def test_lost_page_is_dropped_after_max_browser_retries(fake_site, chromium):
+    server = fake_site(size=10)
+    chromium.crash_on = ["/p/3/"] * 3  # Страница роняет браузер при каждом открытии
+    scanner = scanner_class(async_dynamic_crawler.DomainScanner, MAX_BROWSER_RETRIES=2,
+                            **DYNAMIC_SETTINGS)(server.root_url)
+    asyncio.run(scanner.start(1, headless=True))  # Одна вкладка: соседей, теряемых вместе с ней, нет
+    errors = [record for record in read_output(scanner) if record["error"] is not None]
+
+    assert [record["error"] for record in errors] == ["BrowserCrash"]
+    assert errors[0]["url"].endswith("/p/3/")
+
+
+def test_scheduler_shares_browser_pool_across_domains(fake_site, chromium):
+    servers = [fake_site(size=15), fake_site(size=15)]
+    scheduler = CrawlScheduler([server.root_url for server in servers], "dynamic", max_concurrency=4,
+                               scanner_settings={**DYNAMIC_SETTINGS, "DELAY": 0, "STATS_INTERVAL": None,
+                                                 "SITEMAP_SEED": False})
+    slots = list(scheduler.slots)
+    asyncio.run(scheduler.start())
+
+    assert len(chromium.launches) == slots[0].scanner.BROWSERS  # Один пул на все домены
+    for slot, server in zip(slots, servers):
+        assert len(read_output(slot.scanner)) == server.size
@@ -0,0 +1,73 @@
+import time
+
+import site_crawler
+from conftest import read_output, scanner_class
+from crawl_frontier import FifoFrontier, PriorityFrontier
+from crawl_url import URL
+
+
+def crawl(server, **settings):
+    scanner = scanner_class(site_crawler.DomainScanner, **settings)(server.root_url)
+    scanner.start()
+    return scanner, read_output(scanner)
+
+
+def test_priority_frontier_order():
+    frontier = PriorityFrontier()
+    for url, priority in (("a", 2), ("b", 0), ("c", 2), ("d", -1)):
+        frontier.push(url, priority)
+    assert [frontier.popleft() for _ in range(len(frontier))] == ["d", "b", "a", "c"]  # Равные - по порядку
+
+    fifo = FifoFrontier()
+    for url, priority in (("a", 2), ("b", 0)):
+        fifo.push(url, priority)
+    assert list(fifo) == ["a", "b"]
+
+
+def test_url_priority():
+    scanner = site_crawler.DomainScanner("https://www.bank.ru/")
+
+    def priority(path, depth=1, anchor=None):
+        return scanner._url_priority(URL("https://www.bank.ru" + path, depth=depth), anchor)
+
+    assert priority("/ipoteka/") < priority("/about/") < priority("/news/2019/")
+    assert priority("/about/", anchor="Кредит наличными") < priority("/about/", anchor="Подробнее")
+    assert priority("/about/", depth=1) < priority("/about/", depth=3)
+
+
+def test_priority_crawl_reaches_tariffs_first(fake_site):
+    server = fake_site(size=300, nav_links=5, news_pages=300, tariff_rate=0.2)
+    fetched = {}
+    for frontier in ("fifo", "priority"):
+        _, records = crawl(server, FRONTIER=frontier, MAX_PAGES=60, CHECKPOINT=False, OUTPUT_DIR=frontier)
+        fetched[frontier] = [record["url"] for record in records]
+
+    def count(frontier, section):
+        return sum(f"/{section}/" in url for url in fetched[frontier])
+
+    assert count("priority", "tariffs") > count("fifo", "tariffs")
+    assert count("priority", "news") < count("fifo", "news")
+
+
+def test_page_and_byte_budgets_stop_crawl(fake_site):
+    server = fake_site(size=200, page_bytes=2_000)
+
+    scanner, records = crawl(server, MAX_PAGES=25, CHECKPOINT=False)
+    assert len(records) == 25
+    assert scanner.budget_stop == "25 стр."
+
+    scanner, records = crawl(server, MAX_BYTES=20_000, CHECKPOINT=False, OUTPUT_DIR="bytes")
+    assert scanner.budget_bytes >= 20_000
+    assert len(records) < server.size
+
+
+def test_crawl_time_counts_from_first_dispatch():
+    scanner = scanner_class(site_crawler.DomainScanner, MAX_CRAWL_TIME=0.05)("https://www.bank.ru/")
+    time.sleep(0.1)  # Создан, но ещё ничего не взял в работу (например, ждёт robots.txt и карту сайта)
+    assert not scanner._budget_exhausted()
+
+    scanner._start_budget_clock()
+    assert not scanner._budget_exhausted()
+    time.sleep(0.1)
+    assert scanner._budget_exhausted()
+    assert scanner.budget_stop.endswith(" с")
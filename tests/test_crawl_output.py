@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+
+import site_crawler
+from conftest import read_output, scanner_class
+from crawl_output import CrawlOutput, JsonlSink
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_sink_writes_in_batches():
+    sink = type("Sink", (JsonlSink,), {"FLUSH_EVERY": 3, "FLUSH_INTERVAL": 3600})("out.jsonl")
+    for n in range(4):
+        sink.write({"url": f"https://bank.ru/{n}/"})
+    assert len(read_lines("out.jsonl")) == 3  # Четвёртая запись ещё в буфере
+    sink.close()
+    assert [record["url"] for record in read_lines("out.jsonl")] == [f"https://bank.ru/{n}/" for n in range(4)]
+
+
+@pytest.mark.parametrize("tail, kept", [
+    (b'{"url": "https://bank.ru/2/", "sta', 2),  # Пачка оборвалась посреди записи
+    (b"", 2),
+    (b"x" * 200_000, 2),  # Недописанная строка длиннее блока, которым ищется конец строки
+])
+def test_append_drops_partial_last_line(tail, kept):
+    with open("out.jsonl", "wb") as f:
+        f.write(b'{"url": "https://bank.ru/0/"}\n{"url": "https://bank.ru/1/"}\n' + tail)
+    sink = JsonlSink("out.jsonl", append=True)
+    sink.write({"url": "https://bank.ru/3/"})
+    sink.close()
+
+    records = read_lines("out.jsonl")
+    assert len(records) == kept + 1
+    assert records[-1]["url"] == "https://bank.ru/3/"
+
+
+def test_append_to_file_without_complete_lines():
+    with open("out.jsonl", "wb") as f:
+        f.write(b'{"url": "https://ba')
+    JsonlSink("out.jsonl", append=True).close()
+    assert os.path.getsize("out.jsonl") == 0
+
+
+def test_new_output_starts_over_and_unknown_format_fails():
+    with open("out.jsonl", "w", encoding="utf-8") as f:
+        f.write('{"url": "old"}\n')
+    output = CrawlOutput("out", ("jsonl",))
+    output.write({"url": "new"})
+    output.close()
+    assert read_lines("out.jsonl") == [{"url": "new"}]
+    with pytest.raises(ValueError):
+        CrawlOutput("out", ("csv",))
+
+
+def test_resumed_crawl_appends_after_crash(fake_site):
+    server = fake_site(size=120)
+    scanner = scanner_class(site_crawler.DomainScanner, MAX_PAGES=40)(server.root_url)
+    scanner.start()  # Остановлен бюджетом: состояние сохранено, выгрузка - 40 записей
+    assert len(read_output(scanner)) == 40
+    with open(scanner._output_prefix() + ".jsonl", "a", encoding="utf-8") as f:
+        f.write('{"url": "' + server.root_url + 'p/9')  # Процесс упал посреди записи пачки
+
+    scanner = scanner_class(site_crawler.DomainScanner)(server.root_url)
+    scanner.start()
+    records = read_output(scanner)
+    assert scanner.resumed
+    assert all(record["status"] == 200 for record in records)
+    assert len({record["url"] for record in records}) == len(records) == server.size
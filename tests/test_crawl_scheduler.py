@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import site_crawler
+from conftest import read_output
+from crawl_scheduler import CrawlScheduler, unique_sites
+
+SETTINGS = {"DELAY": 0, "STATS_INTERVAL": None, "HTTP_CACHE_DIR": None, "SITEMAP_SEED": False, "CHECKPOINT": False}
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Запросы статического сканера: (время начала, reserved), их User-Agent и наибольшее число одновременных."""
+    calls, active, lock = [], [0], threading.Lock()
+    stats = {"calls": calls, "user_agents": [], "peak": 0}
+    fetch = site_crawler.DomainScanner._fetch
+
+    def spy(self, url, headers, reserved=False):
+        with lock:
+            calls.append((time.monotonic(), reserved))
+            stats["user_agents"].append(headers.get("User-Agent"))
+            active[0] += 1
+            stats["peak"] = max(stats["peak"], active[0])
+        try:
+            return fetch(self, url, headers, reserved)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(site_crawler.DomainScanner, "_fetch", spy)
+    return stats
+
+
+def test_unique_sites():
+    assert unique_sites(["https://bank.ru/?utm_source=x", "https://bank.ru/about/", "ftp://bank.ru/", "мусор",
+                         "http://vtb.ru"]) == ["https://bank.ru/", "http://vtb.ru/"]
+
+
+def test_static_concurrency_is_not_capped_by_default_executor(fake_site, fetches):
+    server = fake_site(size=200, fanout=60, latency=0.3)
+    scheduler = CrawlScheduler([server.root_url], "static", max_concurrency=48, per_domain_concurrency=48,
+                               scanner_settings=SETTINGS)
+    scanner = scheduler.slots[0].scanner
+    asyncio.run(scheduler.start())
+
+    assert len(read_output(scanner)) == server.size
+    assert fetches["peak"] > 32  # Больше, чем потоков в стандартном пуле asyncio.to_thread на любой машине
+
+
+def test_static_pacing_waits_on_event_loop(fake_site, fetches):
+    server = fake_site(size=12, fanout=11)
+    settings = {**SETTINGS, "DELAY": 0.1, "ADAPTIVE_RATE": False}
+    scheduler = CrawlScheduler([server.root_url], "static", per_domain_concurrency=4, scanner_settings=settings)
+    asyncio.run(scheduler.start())
+
+    starts = sorted(started for started, _ in fetches["calls"])
+    assert all(reserved for _, reserved in fetches["calls"])  # Поток не спит в паузе темпа
+    assert len(starts) == server.size
+    assert min(b - a for a, b in zip(starts, starts[1:])) >= 0.09  # Темп домена соблюдён
+
+
+def test_static_threads_share_one_scanner(fake_site, fetches):
+    # Ссылки меню на каждой странице: одни и те же URL ставят в очередь разные потоки, а карта сайта - цикл событий
+    server = fake_site(size=300, fanout=10, nav_links=30, sitemap=True)
+    scheduler = CrawlScheduler([server.root_url], "static", per_domain_concurrency=16,
+                               scanner_settings={**SETTINGS, "SITEMAP_SEED": True})
+    scanner = scheduler.slots[0].scanner
+    session_headers = dict(scanner.session.headers)
+    asyncio.run(scheduler.start())
+    urls = [record["url"] for record in read_output(scanner)]
+
+    assert len(urls) == len(set(urls)) == server.size
+    assert dict(scanner.session.headers) == session_headers  # User-Agent уходит с запросом, сессия общая
+    assert set(fetches["user_agents"]) <= set(scanner.ua.user_agents)
@@ -0,0 +1,58 @@
+import asyncio
+
+import hybrid_crawler
+from conftest import read_output, scanner_class
+
+
+def crawl(server, **settings):
+    settings = {"PARSE_EXECUTOR": None, "BROWSER_MAX_RSS_MB": None, **settings}
+    scanner = scanner_class(hybrid_crawler.DomainScanner, **settings)(server.root_url)
+    asyncio.run(scanner.start(4, headless=True))
+    return scanner
+
+
+def test_error_pages_do_not_escalate(fake_site, chromium):
+    server = fake_site(size=200, nav_links=10, error_rate=0.2)
+    scanner = crawl(server, MAX_RETRIES=0, ADAPTIVE_RATE=False)  # Каждая страница ошибки - один ответ сайта
+    records = read_output(scanner)
+    errors = [record for record in records if record["error"] is not None]
+
+    assert server.errors > scanner.DOMAIN_ESCALATION_THRESHOLD
+    assert chromium.launches == []
+    assert not scanner.domain_needs_js
+    assert scanner.dynamic_pages == 0
+    assert len(errors) == server.errors
+    assert {record["error"] for record in errors} == {"HTTPStatusError"}
+    assert {record["status"] for record in errors} <= {404, 500}
+    assert scanner.static_pages == len(records) - len(errors)
+
+
+def test_browser_launch_failure_is_cached_and_recorded(fake_site, chromium):
+    # Ссылки каждой страницы рисует JS: обычный запрос видит пустую страницу, домен уходит в браузер
+    server = fake_site(size=50, nav_links=10, js_rate=1.0)
+    chromium.launch_error = RuntimeError("браузер недоступен")
+    scanner = crawl(server, MIN_STATIC_LINKS=100, DOMAIN_ESCALATION_THRESHOLD=1)
+    records = read_output(scanner)
+
+    assert len(chromium.launches) == scanner.BROWSERS  # Один запуск пула, а не на каждый URL
+    assert scanner.dynamic_pages == 0
+    assert records and all(record["error"] == "RuntimeError" for record in records)
+
+
+def test_escalated_pages_are_rendered_in_browser(fake_site, chromium):
+    # Настоящий путь эскалации: _ensure_browser -> _prepare_browser -> пулы браузеров и контекстов
+    server = fake_site(size=50, nav_links=10, js_rate=1.0)
+    scanner = crawl(server, MIN_STATIC_LINKS=100, DOMAIN_ESCALATION_THRESHOLD=1)
+    records = read_output(scanner)
+
+    assert scanner.domain_needs_js
+    assert len(chromium.launches) == scanner.BROWSERS
+    assert any(browser.contexts for browser in chromium.launches)
+    assert scanner.dynamic_pages > 0
+    assert records and all(record["error"] is None and record["status"] == 200 for record in records)
+
+
+def test_challenge_markers():
+    scanner = hybrid_crawler.DomainScanner("https://www.bank.ru/")
+    assert scanner._is_challenge("<html><title>DDoS-Guard</title></html>")
+    assert not scanner._is_challenge("<html><title>404 Not Found</title></html>")
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+import site_crawler
+from conftest import scanner_class
+from near_duplicates import NearDuplicateIndex, page_fingerprint, path_pattern
+
+WORDS = ("вклад кредит ипотека карта валюта курс счёт перевод платёж кешбэк процент ставка срок сумма "
+         "договор заявка офис банкомат клиент менеджер консультация документ паспорт выписка").split()
+TEXT = "Отделение банка в городе {city}. " + " ".join(f"{a} и {b}" for a in WORDS[:8] for b in WORDS[8:])
+
+
+def test_fingerprint_of_near_duplicates():
+    moscow = page_fingerprint(f"<html><body><p>{TEXT.format(city='Москва')}</p></body></html>")
+    kazan = page_fingerprint(f"<html><body><p>{TEXT.format(city='Казань')}</p></body></html>")
+    other = page_fingerprint("<p>" + " ".join(f"{b} или {a}" for a in WORDS[:8] for b in WORDS[8:]) + "</p>")
+
+    assert (moscow ^ kazan).bit_count() <= 3
+    assert (moscow ^ other).bit_count() > 10
+    assert page_fingerprint("<p>мало слов</p>") is None
+
+
+def test_index_finds_fingerprints_within_distance():
+    rng = random.Random(1)
+    stored = [rng.getrandbits(64) for _ in range(2000)]
+    index = NearDuplicateIndex(3)
+    for fingerprint in stored:
+        index.add(fingerprint)
+    assert len(index) == len(stored)
+
+    for fingerprint in rng.sample(stored, 200):
+        probe = fingerprint
+        for bit in rng.sample(range(64), rng.randint(0, 3)):
+            probe ^= 1 << bit
+        assert index.find(probe) is not None
+    # Случайный отпечаток отличается от 2000 сохранённых на десятки бит
+    assert sum(index.find(rng.getrandbits(64)) is not None for _ in range(200)) == 0
+
+
+@pytest.mark.parametrize("url, pattern", [
+    ("https://bank.ru/offices/12/atm/7/", "/offices/#/atm/*/"),
+    ("https://bank.ru/offices/sankt-peterburg/atm/7/", "/offices/*/atm/*/"),
+    ("https://bank.ru/offices/nizhniy_novgorod/ulitsa-lenina-5/", "/offices/*/*/"),
+    ("https://bank.ru/offices/%D0%BA%D0%B0%D0%B7%D0%B0%D0%BD%D1%8C/atm/7/", "/offices/*/atm/*/"),
+    ("https://bank.ru/%D0%BE%D1%84%D0%B8%D1%81%D1%8B/ufa/", "/офисы/*/"),
+    ("https://bank.ru/credit-cards/platinum/", "/credit-cards/*/"),  # Раздел сайта не обобщается
+    ("https://bank.ru/atm/?city=5&page=2", "/atm/?city&page"),
+    ("https://bank.ru/", "/"),
+])
+def test_path_pattern(url, pattern):
+    assert path_pattern(url) == pattern
+
+
+def test_pruned_links_are_counted_and_sampled():
+    scanner = scanner_class(site_crawler.DomainScanner, PRUNED_SAMPLE=10)("https://www.bank.ru/")
+    links = [f"https://www.bank.ru/offices/{n}/" for n in range(100)]
+    scanner.seen_urls.add(links[0])  # Уже в очереди - не сэкономлен
+    scanner._prune_links(links)
+    scanner._prune_links(links)  # Те же ссылки со второй страницы-дубля не считаются дважды
+
+    assert scanner.pruned_pages == 2
+    assert scanner.pruned_links == 99
+    assert len(scanner._pruned_sample) == 10
+    for url in scanner._pruned_sample[:5]:  # Половину выборки сканер потом нашёл по другим ссылкам
+        scanner.seen_urls.add(url)
+    assert scanner._avoided_fetches() == 50
+
+
+def test_templated_branches_are_pruned(fake_site):
+    server = fake_site(size=30, branch_cities=5, branch_atms=20)
+    scanner = scanner_class(site_crawler.DomainScanner, CHECKPOINT=False)(server.root_url)
+    scanner.start()
+
+    assert "/branches/#/atm/*/" in scanner.templated_patterns
+    assert scanner.duplicate_pages > 0
+    assert scanner._avoided_fetches() <= scanner.pruned_links
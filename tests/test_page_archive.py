@@ -0,0 +1,64 @@
+import asyncio
+import os
+import threading
+import time
+
+from page_archive import ArchiveReader, PageArchive, read_segment
+
+
+def test_pages_round_trip_through_rotated_segments(workdir):
+    archive = PageArchive(str(workdir / "archive"), segment_size=4_000)
+    bodies = {f"http://bank.ru/{n}/": os.urandom(1_000) for n in range(20)}  # Не сжимается: сегменты растут
+    for url, body in bodies.items():
+        archive.put(url, url, 200, {"Content-Type": "text/html", "Content-Encoding": "gzip"}, body,
+                    {"User-Agent": "test"})
+    archive.put("http://bank.ru/old/", "http://bank.ru/new/", 200, {}, b"<html>moved</html>")
+    archive.put("http://bank.ru/js/", "http://bank.ru/js/", 200, {}, "<html>отрисовано</html>", rendered=True)
+    archive.close()
+
+    assert archive.pages == len(bodies) + 2 and archive.error is None
+    assert len(archive.segments) > 1
+    reader = ArchiveReader(str(workdir / "archive"))
+    page = reader.get("http://bank.ru/7/")
+    assert page.record_type == "response" and page.status == 200 and page.content == bodies["http://bank.ru/7/"]
+    assert "Content-Encoding" not in page.headers  # Тело хранится распакованным
+    assert page.headers["Content-Length"] == "1000"
+    assert reader.get("http://bank.ru/old/").url == reader.get("http://bank.ru/new/").url == "http://bank.ru/new/"
+    rendered = reader.get("http://bank.ru/js/")
+    assert rendered.record_type == "resource" and rendered.content.decode("utf-8") == "<html>отрисовано</html>"
+    assert reader.get("http://bank.ru/missing/") is None
+    reader.close()
+
+    records = [record for segment in archive.segments
+               for _, _, record in read_segment(str(workdir / "archive" / segment))]
+    assert [record.record_type for record in records].count("warcinfo") == len(archive.segments)
+    assert [record.record_type for record in records].count("request") == len(bodies)
+    pages = {record.url: record.content for record in records if record.record_type == "response"}
+    assert pages == {**bodies, "http://bank.ru/new/": b"<html>moved</html>"}
+
+
+def test_put_async_waits_for_queue_space_off_the_event_loop(workdir):
+    archive = PageArchive(str(workdir / "archive"), queue_size=1)
+    gate = threading.Event()
+    write_page = archive._write_page
+
+    def slow_write_page(page):
+        gate.wait()  # Диск "не успевает": очередь заполняется
+        write_page(page)
+
+    archive._write_page = slow_write_page
+    threading.Timer(5, gate.set).start()  # Если цикл событий всё же заблокирован - тест не виснет
+
+    async def scenario():
+        puts = asyncio.gather(*(archive.put_async(f"http://bank.ru/{n}/", f"http://bank.ru/{n}/", 200, {}, b"<html>")
+                                for n in range(5)))
+        started = time.monotonic()
+        await asyncio.sleep(0.05)
+        assert time.monotonic() - started < 1  # Цикл событий работает, пока put_async ждут места
+        assert not puts.done()
+        gate.set()
+        await puts
+        await archive.close_async()
+
+    asyncio.run(scenario())
+    assert archive.pages == 5
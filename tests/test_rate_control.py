@@ -0,0 +1,91 @@
+import email.utils
+import time
+
+import pytest
+
+import site_crawler
+from conftest import read_output, scanner_class
+from rate_control import DomainRateController, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("завтра") is None
+    assert 55 < parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+
+def test_additive_increase_multiplicative_decrease():
+    controller = DomainRateController("bank.ru", initial_interval=0.5)
+    assert controller.rate == 2.0
+    for _ in range(4):
+        controller.on_response(200, 0.05)
+    assert controller.rate == pytest.approx(2.0 + 4 * controller.INCREASE_STEP)
+
+    controller.on_response(503, 0.05)
+    assert controller.rate == pytest.approx(1.5)
+    controller.on_error("ConnectTimeout")  # Та же перегрузка: второй раз подряд темп не режется
+    assert controller.rate == pytest.approx(1.5)
+    assert controller.throttled == 1 and controller.errors["ConnectTimeout"] == 1
+
+    for _ in range(1000):
+        controller.on_response(200, 0.05)
+    assert controller.rate == controller.MAX_RATE == controller.max_rate_seen
+
+
+def test_slow_responses_lower_rate():
+    controller = DomainRateController("bank.ru", initial_interval=0.5)
+    for _ in range(3):
+        controller.on_response(200, 0.1)
+    rate = controller.rate
+    controller.on_response(200, 10.0)  # Средняя задержка выросла в десятки раз от лучшей
+    assert controller.rate == pytest.approx(rate * controller.SLOW_DECREASE_FACTOR)
+
+
+def test_reserve_spaces_requests_and_honours_retry_after():
+    controller = DomainRateController("bank.ru", initial_interval=0.1, adaptive=False)
+    waits = [controller.reserve() for _ in range(3)]
+    assert waits[0] == pytest.approx(0, abs=0.01)
+    assert waits[2] == pytest.approx(0.2, abs=0.01)
+
+    assert controller.on_response(429, 0.05, retry_after="2") == 2.0
+    assert controller.reserve() == pytest.approx(2.0, abs=0.05)
+    assert controller.rate == pytest.approx(10.0)  # Без адаптации темп не меняется
+
+
+def test_unpaced_until_site_pushes_back():
+    controller = DomainRateController("bank.ru", initial_interval=0)
+    assert [controller.reserve() for _ in range(3)] == [0, 0, 0]
+    controller.on_response(429, 0.05)
+    assert controller.paced and controller.rate == controller.MAX_RATE * controller.DECREASE_FACTOR
+
+    controller = DomainRateController("bank.ru", initial_interval=0)
+    controller.limit_interval(2.0)  # Crawl-delay из robots.txt
+    assert controller.paced and controller.rate == controller.max_rate == 0.5
+
+
+def test_retry_budget():
+    controller = DomainRateController("bank.ru", max_retries=2)
+    assert 0 <= controller.retry_delay(0) <= controller.BASE_BACKOFF
+    assert controller.retry_delay(1, retry_after=7.0) == 7.0
+    assert controller.retry_delay(2) is None  # Повторы этого URL закончились
+
+    while controller.retry_delay(0) is not None:  # Первые повторы разных URL - пока есть бюджет домена
+        pass
+    assert controller.retries == controller.RETRY_BUDGET_MIN
+    assert controller.budget_exhausted == 1
+    for _ in range(50):
+        controller.on_response(200, 0.05)
+    assert controller.retry_delay(0) is not None  # Бюджет растёт с числом запросов
+
+
+def test_crawl_slows_down_for_throttling_site(fake_site):
+    server = fake_site(size=60, max_rate=20)
+    scanner = scanner_class(site_crawler.DomainScanner, CHECKPOINT=False)(server.root_url)
+    scanner.start()
+
+    assert server.throttled > 0
+    assert scanner.rate_controller.throttled > 0
+    assert scanner.rate_controller.rate < scanner.rate_controller.MAX_RATE
+    assert len([record for record in read_output(scanner) if record["status"] == 200]) == server.size
@@ -0,0 +1,86 @@
+import asyncio
+import gzip
+import os
+
+import requests
+
+from http_fetcher import AsyncFetcher
+from response_cache import CachingAdapter, ResponseCache
+
+
+def cached_session(cache: ResponseCache) -> requests.Session:
+    session = requests.Session()
+    adapter = CachingAdapter(cache)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def test_put_get_and_offline(workdir):
+    cache = ResponseCache(str(workdir / "cache"), ttl=None)
+    cache.put("http://bank.ru/a/?utm_source=x", "http://bank.ru/a/", 200, {"Content-Type": "text/html"}, b"<html>")
+    cache.put("http://bank.ru/missing/", "http://bank.ru/missing/", 404, {}, b"")
+
+    cached = cache.get("http://BANK.ru:80/a/?utm_source=x")  # Ключ - канонический URL
+    assert cached is not None and cached.content == b"<html>" and cached.status == 200
+    assert cache.get("http://bank.ru/missing/") is None  # Ошибки не кэшируются
+    cache.close()
+
+
+def test_eviction_keeps_size_under_limit(workdir):
+    cache = ResponseCache(str(workdir / "cache"), ttl=None, max_size=20_000)
+    for n in range(50):
+        cache.put(f"http://bank.ru/{n}/", f"http://bank.ru/{n}/", 200, {}, os.urandom(1_000))  # Не сжимается
+    assert cache.total_size <= cache.max_size
+    assert cache.get("http://bank.ru/49/") is not None
+    assert cache.get("http://bank.ru/0/") is None  # Давно не использованная запись вытеснена
+    cache.close()
+
+
+def test_stream_is_cached_only_when_read_to_the_end(fake_site, workdir):
+    server = fake_site(size=50, sitemap=True)
+    url = server.root_url.replace("/p/0/", "/sitemap_index.xml.gz")
+    cache = ResponseCache(str(workdir / "cache"), ttl=None)
+    session = cached_session(cache)
+
+    with session.get(url, stream=True) as response:
+        assert response._content is False  # Адаптер не читает тело потокового ответа заранее
+        next(response.iter_content(16))
+    assert cache.get(url) is None  # Прочитано не до конца - в кэш не попадает
+
+    with session.get(url, stream=True) as response:
+        body = b"".join(response.iter_content(16))
+    assert gzip.decompress(body).startswith(b"<?xml")
+
+    cache.offline = True
+    with cached_session(cache).get(url, stream=True) as response:
+        assert b"".join(response.iter_content(16)) == body  # Повтор из кэша - тем же iter_content
+    cache.close()
+
+
+def test_large_stream_is_not_cached(fake_site, workdir, monkeypatch):
+    server = fake_site(size=50, page_bytes=10_000)
+    monkeypatch.setattr(CachingAdapter, "MAX_STREAMED_BODY", 1_000)
+    cache = ResponseCache(str(workdir / "cache"), ttl=None)
+    with cached_session(cache).get(server.root_url, stream=True) as response:
+        assert len(b"".join(response.iter_content(256))) > 1_000
+    assert cache.get(server.root_url) is None
+    cache.close()
+
+
+def test_fetcher_does_not_cache_truncated_body(fake_site, workdir, monkeypatch):
+    server = fake_site(size=50, page_bytes=500_000)
+    cache = ResponseCache(str(workdir / "cache"), ttl=None)
+    url = server.root_url.replace("/p/0/", "/p/1/")
+
+    async def fetch(url):
+        async with AsyncFetcher(cache=cache) as fetcher:
+            return await fetcher.fetch(url)
+
+    monkeypatch.setattr(AsyncFetcher, "MAX_BODY_SIZE", 1_000)
+    assert len(asyncio.run(fetch(server.root_url)).content) < 500_000
+    assert cache.get(server.root_url) is None  # Обрезанное тело - не весь ответ
+
+    monkeypatch.undo()
+    assert asyncio.run(fetch(url)).content == cache.get(url).content
+    cache.close()
@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from distributed_crawl import CrawlCoordinator
+from shared_frontier import HashRing, SharedFrontier
+
+DOMAIN = "www.bank.ru"
+
+
+@pytest.fixture
+def frontier():
+    frontier = SharedFrontier("frontier.sqlite")
+    frontier.add_sites([(DOMAIN, f"https://{DOMAIN}/")])
+    frontier.add_pending_many(DOMAIN, [(f"https://{DOMAIN}/p/{n}/", (), 1, None) for n in range(10)])
+    yield frontier
+    frontier.close()
+
+
+def leased_urls(leased) -> list[str]:
+    return [url for url, _, _, _ in leased[DOMAIN]]
+
+
+def test_hash_ring_moves_only_removed_nodes_domains():
+    domains = [f"bank{n}.ru" for n in range(300)]
+    ring = HashRing(range(4))
+    before = {domain: ring.node(domain) for domain in domains}
+    assert set(before.values()) == {0, 1, 2, 3}
+
+    ring.remove(2)
+    after = {domain: ring.node(domain) for domain in domains}
+    assert all(after[domain] == node for domain, node in before.items() if node != 2)
+    assert 2 not in after.values()
+    assert HashRing().node("bank.ru") is None
+
+
+def test_lease_is_exclusive_and_in_queue_order(frontier):
+    first = leased_urls(frontier.lease(0, [DOMAIN], 4))
+    second = leased_urls(frontier.lease(1, [DOMAIN], 4))
+    assert first == [f"https://{DOMAIN}/", *(f"https://{DOMAIN}/p/{n}/" for n in range(3))]
+    assert not set(first) & set(second)
+    assert frontier.counts() == {"pending": 3, "leased": 8, "done": 0, "failed": 0}
+
+    frontier.add_pending(DOMAIN, first[1], (), 1)  # Уже встреченный URL в очередь не возвращается
+    frontier.flush()
+    assert frontier.counts()["pending"] == 3
+
+
+def test_reclaim_returns_only_that_workers_leases(frontier):
+    lost = leased_urls(frontier.lease(0, [DOMAIN], 4))
+    frontier.lease(1, [DOMAIN], 4)
+    frontier.mark_done(lost[0])
+    frontier.flush()  # Отметка успела записаться до падения обработчика
+
+    assert frontier.reclaim(0) == 3
+    assert frontier.counts() == {"pending": 6, "leased": 4, "done": 1, "failed": 0}
+    assert set(leased_urls(frontier.lease(2, [DOMAIN], 10))) == set(lost[1:]) | {
+        f"https://{DOMAIN}/p/{n}/" for n in range(7, 10)}
+    assert frontier.reclaim() == 10  # Все аренды прерванного запуска
+
+
+def test_unfinished_leases_are_retried_then_failed(frontier):
+    for url in leased_urls(frontier.lease(0, [DOMAIN], 100))[1:]:
+        frontier.mark_done(url)
+    for _ in range(SharedFrontier.MAX_ATTEMPTS - 1):  # Стартовая страница каждый раз падает при обработке
+        assert not frontier.finish_domain(DOMAIN, 0)
+        assert leased_urls(frontier.lease(0, [DOMAIN], 100)) == [f"https://{DOMAIN}/"]
+    assert frontier.finish_domain(DOMAIN, 0)
+    assert frontier.counts() == {"pending": 0, "leased": 0, "done": 10, "failed": 1}
+    assert frontier.unfinished_domains() == 0
+
+
+def test_paused_domain_resumes(frontier):
+    frontier.lease(0, [DOMAIN], 3)
+    frontier.pause_domain(DOMAIN, 0)
+    assert frontier.unfinished_domains() == 0
+    assert frontier.counts()["pending"] == 11  # Аренды вернулись в очередь без учёта попытки
+    assert frontier.resume_paused() == 1
+    assert frontier.unfinished_domains() == 1
+
+
+class DeadProcess:
+    exitcode = -9
+
+    def __init__(self, alive: bool = False) -> None:
+        self.alive = alive
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def terminate(self) -> None:
+        self.alive = False
+
+    join = kill = lambda self, *args: None
+
+
+def test_coordinator_reclaims_crashed_and_hung_workers(frontier, monkeypatch):
+    coordinator = CrawlCoordinator([f"https://{DOMAIN}/"], workers=2)
+    coordinator.frontier = frontier
+    coordinator.ring = HashRing(range(2))
+    frontier.assign_domains(coordinator.ring)
+    owner = coordinator.ring.node(DOMAIN)
+    spawned = []
+    monkeypatch.setattr(coordinator, "_spawn", spawned.append)
+
+    frontier.lease(owner, [DOMAIN], 5)
+    coordinator.processes = {owner: DeadProcess(), 1 - owner: DeadProcess(alive=True)}
+    coordinator.started_at = {owner: time.time(), 1 - owner: time.time()}
+    coordinator.restarts = {owner: 0, 1 - owner: 0}
+    frontier.heartbeat(1 - owner, 1, 0)
+    coordinator._check_workers()
+
+    assert frontier.counts()["leased"] == 0  # Аренды упавшего обработчика - снова в очереди
+    assert spawned == [owner] and coordinator.restarts[owner] == 1  # Перезапущен с теми же доменами
+    assert 1 - owner not in spawned  # Живой и отмечающийся обработчик не тронут
+
+    hung = coordinator.processes[1 - owner]
+    frontier.lease(1 - owner, [DOMAIN], 2)
+    coordinator.started_at[1 - owner] = 0
+    monkeypatch.setattr(time, "time", lambda: frontier.heartbeats()[1 - owner] + coordinator.WORKER_TIMEOUT + 1)
+    coordinator._check_workers()
+    assert not hung.alive  # Зависший остановлен
+    assert frontier.counts()["leased"] == 0
+    assert 1 - owner not in coordinator.ring.nodes  # Своих доменов нет - в кольцо не возвращается
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import site_crawler
+import async_static_crawler
+from conftest import read_output, scanner_class
+from crawl_scheduler import CrawlScheduler
+
+
+def test_seeds_arrive_in_batches(fake_site, monkeypatch):
+    server = fake_site(size=300, sitemap=True, max_depth=1)  # Без карты сайта глубже первого уровня не попасть
+    batches = []
+    add_seeds = site_crawler.DomainScanner._add_seeds
+
+    def spy(self, seeds):
+        batches.append(len(seeds))
+        return add_seeds(self, seeds)
+
+    monkeypatch.setattr(site_crawler.DomainScanner, "_add_seeds", spy)
+    scanner = scanner_class(async_static_crawler.DomainScanner, SITEMAP_SEED=True, SEED_BATCH=50)(server.root_url)
+    asyncio.run(scanner.start(4))
+
+    assert len(batches) > 1 and max(batches) <= 50  # В памяти - не больше пачки, а не вся карта
+    assert sum(batches) >= server.size - 1
+    assert len([record for record in read_output(scanner) if record["error"] is None]) == server.size
+
+
+def test_scheduler_crawls_while_other_domains_seed(fake_site, monkeypatch):
+    slow_site, fast_site = fake_site(size=20, sitemap=True), fake_site(size=30, sitemap=True)
+    slow_domain = slow_site.root_url.split("/")[2]
+    seeded_at = {}
+    load_robots = site_crawler.DomainScanner._load_robots
+
+    def slow_load_robots(self):
+        if self.base_domain == slow_domain:
+            time.sleep(1)  # Медленный robots.txt одного домена (вызывается в потоке)
+            seeded_at[self.base_domain] = time.time()
+        return load_robots(self)
+
+    monkeypatch.setattr(site_crawler.DomainScanner, "_load_robots", slow_load_robots)
+    settings = {"DELAY": 0, "STATS_INTERVAL": None, "HTTP_CACHE_DIR": None, "SITEMAP_SEED": True}
+    scheduler = CrawlScheduler([slow_site.root_url, fast_site.root_url], "async-static", scanner_settings=settings)
+    slow_scanner, fast_scanner = (slot.scanner for slot in scheduler.slots)
+    asyncio.run(scheduler.start())
+
+    fast_records = read_output(fast_scanner)
+    assert len(fast_records) == fast_site.size
+    assert len(read_output(slow_scanner)) == slow_site.size
+    # Быстрый домен просканирован целиком, пока медленный ещё читал robots.txt
+    assert max(record["fetched_at"] for record in fast_records) < seeded_at[slow_domain]
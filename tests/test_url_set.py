@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+import site_crawler
+from conftest import read_output, scanner_class
+from url_set import URL_SET_MODES, make_url_set
+
+URLS = [f"https://www.bank.ru/p/{n}/" for n in range(1000)]
+
+
+@pytest.mark.parametrize("mode", URL_SET_MODES)
+def test_add_contains_discard(mode):
+    url_set = make_url_set(mode, path="seen.bloom", capacity=10_000)
+    for url in URLS[:500]:
+        url_set.add(url)
+
+    assert all(url in url_set for url in URLS[:500])
+    assert sum(url in url_set for url in URLS[500:]) <= 5  # Ложные срабатывания - только у фильтра Блума
+
+    url_set.discard(URLS[0])
+    assert URLS[0] not in url_set
+    url_set.add(URLS[0])
+    assert URLS[0] in url_set
+    if hasattr(url_set, "close"):
+        url_set.close()
+
+
+def test_bloom_disk_needs_path():
+    with pytest.raises(ValueError):
+        make_url_set("bloom-disk")
+
+
+@pytest.mark.parametrize("mode", ["hashed", "bloom-disk"])
+def test_crawl_keeps_visited_urls_in_same_mode(fake_site, mode):
+    server = fake_site(size=150)
+    scanner = scanner_class(site_crawler.DomainScanner, SEEN_SET=mode)(server.root_url)
+    assert type(scanner.visited_urls) is type(scanner.seen_urls)
+    scanner.start()
+
+    assert len(read_output(scanner)) == server.size
+    assert not os.path.exists(scanner._seen_set_path())  # Фильтры в файле удалены после завершения
+    assert not os.path.exists(scanner._visited_set_path())